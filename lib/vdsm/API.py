@@ -41,6 +41,7 @@ from vdsm.virt import secret
 from vdsm.common.define import doneCode, errCode
 from vdsm.config import config
 from vdsm.virt import sampling
+from vdsm.virt import vmbulk
 from vdsm.virt.domain_descriptor import DomainDescriptor, XmlSource
 import vdsm.virt.jobs
 from vdsm.virt.jobs import seal
@@ -149,7 +150,6 @@ class VM(APIBase):
         return self.vm.cont()
 
     @api.logged(on="api.virt")
-    @api.method
     def create(self, vmParams):
         """
         Start up a virtual machine.
@@ -167,6 +167,10 @@ class VM(APIBase):
         :param vmParams: required and optional VM parameters.
         :type vmParams: dict
         """
+        return self._create(vmParams)
+
+    @api.method
+    def _create(self, vmParams, shared_images=None, start_executor=None):
         # self._UUID is None in this call, it must be retrieved from XML
         xml = vmParams.get('_srcDomXML') or vmParams['xml']
         descriptor = DomainDescriptor(xml, xml_source=XmlSource.INITIAL)
@@ -215,7 +219,11 @@ class VM(APIBase):
                     "authentication not configured. On hosts in FIPS mode "
                     "VNC must use SASL."
                 )
-            return self._cif.createVm(vmParams)
+            return self._cif.createVm(
+                vmParams,
+                shared_images=shared_images,
+                start_executor=start_executor,
+            )
 
         except OSError as e:
             self.log.debug("OS Error creating VM", exc_info=True)
@@ -817,6 +825,11 @@ class VM(APIBase):
             drive, baseVolUUID, topVolUUID, bandwidth, jobUUID
         )
 
+    @api.logged(on="api.virt")
+    @api.method
+    def mergeDrives(self, merges, batchUUID=None):
+        return self.vm.merge_drives(merges, batchUUID)
+
     @api.logged(on="api.virt")
     @api.method
     def seal(self, job_id, sp_id, images):
@@ -1275,8 +1288,10 @@ class StorageDomain(APIBase):
     def validate(self, storagedomainID):
         return self._irs.validateStorageDomain(storagedomainID)
 
-    def dump(self, sd_id, full=False):
-        return self._irs.dumpStorageDomain(sd_id, full=full)
+    def dump(self, sd_id, full=False, image_id=None, offset=0, limit=None):
+        return self._irs.dumpStorageDomain(
+            sd_id, full=full, image_id=image_id, offset=offset, limit=limit
+        )
 
 
 class StoragePool(APIBase):
@@ -1748,6 +1763,25 @@ class Global(APIBase):
         return dict(status=doneCode)
 
     # VM-related functions
+    @api.logged(on="api.host")
+    def createVms(self, vms):
+        """
+        Start many VMs, preparing images shared by the VMs once. The call
+        returns when all VMs were created, and the VMs are started in the
+        background, using a bounded number of concurrent starts.
+
+        :param vms: VM parameters of every VM, as given to VM.create.
+        :type vms: list
+        """
+        results = vmbulk.create_vms(
+            self._cif,
+            vms,
+            lambda params, images, executor: VM(None)._create(
+                params, shared_images=images, start_executor=executor
+            ),
+        )
+        return response.success(vms=results)
+
     @api.logged(on="api.host")
     def dumpxmls(self, vmList=()):
         """
@@ -2067,6 +2101,9 @@ class Lease(APIBase):
     def status(self, lease):
         return self._irs.lease_status(lease)
 
+    def bulk_status(self, leases):
+        return self._irs.bulk_lease_status(leases)
+
     def rebuild_leases(self, sd_id):
         return self._irs.rebuild_leases(sd_id)
 
@@ -17,6 +17,7 @@ from yajsonrpc.exception import JsonRpcBindingsError
 from yajsonrpc.stompclient import StompClient
 from yajsonrpc.stompserver import StompRpcServer
 from yajsonrpc import Notification
+from vdsm import executor
 from vdsm import sslutils
 from vdsm.config import config
 from vdsm.common import exception
@@ -25,6 +26,7 @@ from vdsm.common.hostutils import host_in_shutdown
 import vdsm.common.time
 from vdsm.protocoldetector import MultiProtocolAcceptor
 from vdsm.momIF import MomClient
+from vdsm.virt import eventqueue
 from vdsm.virt import events
 from vdsm.virt import migration
 from vdsm.virt import recovery
@@ -96,6 +98,16 @@ class clientIF(object):
         self._subscriptions = defaultdict(list)
         self._scheduler = scheduler
         self._unknown_vm_ids = set()
+        self.libvirt_events = eventqueue.Dispatcher(
+            config.getint('vars', 'libvirt_event_workers')
+        )
+        # Starts the VMs created by Host.createVms.
+        self.vm_start_executor = executor.Executor(
+            'vm_start',
+            config.getint('vars', 'max_bulk_vm_creations'),
+            config.getint('vars', 'max_bulk_vm_queue'),
+            scheduler,
+        )
         if _glusterEnabled:
             self.gluster = gapi.GlusterApi()
         else:
@@ -108,6 +120,8 @@ class clientIF(object):
             self.mom = MomClient(config.get("mom", "socket_path"))
             self.mom.connect()
             secret.clear()
+            self.libvirt_events.start()
+            self.vm_start_executor.start()
             concurrent.thread(self._recoverThread, name='vmrecovery').start()
             self.channelListener.settimeout(
                 config.getint('vars', 'guest_agent_timeout')
@@ -395,6 +409,8 @@ class clientIF(object):
             secret.clear()
             self.channelListener.stop()
             self.qga_poller.stop()
+            self.libvirt_events.stop()
+            self.vm_start_executor.stop(wait=False)
             if self.irs:
                 return self.irs.prepareForShutdown()
             else:
@@ -410,7 +426,7 @@ class clientIF(object):
         )
         self.thread.start()
 
-    def prepareVolumePath(self, drive, vmId=None, path=None):
+    def prepareVolumePath(self, drive, vmId=None, path=None, images=None):
         """
         :param drive: the drive to prepare path for
         :type drive: dict, string or None
@@ -420,6 +436,9 @@ class clientIF(object):
             payload; if omitted and `drive` is a payload device then
             the path will be generated
         :type path: string or None
+        :param images: used to prepare vdsm images shared by VMs started
+            together; if omitted images are prepared using the irs
+        :type images: :class:`vdsm.virt.vmbulk.SharedImages` or None
         """
         if type(drive) is dict:
             device = drive['device']
@@ -431,7 +450,9 @@ class clientIF(object):
             # PDIV drive format
             # Since version 4.2 cdrom may use a PDIV format
             elif device in ("cdrom", "disk") and isVdsmImage(drive):
-                res = self.irs.prepareImage(
+                if images is None:
+                    images = self.irs
+                res = images.prepareImage(
                     drive['domainID'],
                     drive['poolID'],
                     drive['imageID'],
@@ -591,12 +612,32 @@ class clientIF(object):
 
         return {'status': doneCode, 'alignment': aligning}
 
-    def createVm(self, vmParams, vmRecover=False):
+    def createVm(
+        self,
+        vmParams,
+        vmRecover=False,
+        shared_images=None,
+        start_executor=None,
+    ):
+        """
+        :param shared_images: used to prepare vdsm images shared by VMs
+            started together by Host.createVms
+        :type shared_images: :class:`vdsm.virt.vmbulk.SharedImages` or None
+        :param start_executor: if set, the VM is started by the executor
+            instead of a new thread
+        :type start_executor: :class:`vdsm.executor.Executor` or None
+        """
         with self.vm_start_stop_lock:
             if not vmRecover:
                 if vmParams['vmId'] in self.vmContainer:
                     return errCode['exist']
-            vm = Vm(self, vmParams, vmRecover)
+            vm = Vm(
+                self,
+                vmParams,
+                vmRecover,
+                shared_images=shared_images,
+                start_executor=start_executor,
+            )
             ret = vm.run()
             if not response.is_error(ret):
                 with self.vm_container_lock:
@@ -629,7 +670,7 @@ class clientIF(object):
         function.retry(self._recoverExistingVms, sleep=5)
 
     def _recoverExistingVms(self):
-        start_time = vdsm.common.time.monotonic_time()
+        clock = vdsm.common.time.Clock()
         try:
             self.log.debug('recovery: started')
 
@@ -642,25 +683,28 @@ class clientIF(object):
             )
             migration.SourceThread.ongoingMigrations.bound = mog
 
-            recovery.all_domains(self)
-
-            # recover stage 3: waiting for domains to go up
-            self._waitForDomainsUp()
+            with clock.run("domains"):
+                recovery.all_domains(self)
 
+            # All recovered VMs are registered now, so we can report them
+            # while waiting for the domains and preparing their volumes.
             self._recovery = False
 
+            # recover stage 3: waiting for domains to go up
+            with clock.run("wait_domains"):
+                self._waitForDomainsUp()
+
             # Now if we have VMs to restore we should wait pool connection
             # and then prepare all volumes.
             # Actually, we need it just to get the resources for future
             # volumes manipulations
-            self._waitForStoragePool()
+            with clock.run("wait_pool"):
+                self._waitForStoragePool()
 
-            self._preparePathsForRecoveredVMs()
+            with clock.run("prepare"):
+                self._preparePathsForRecoveredVMs()
 
-            self.log.info(
-                'recovery: completed in %is',
-                vdsm.common.time.monotonic_time() - start_time,
-            )
+            self.log.info('recovery: completed: %s', clock)
 
         except:
             self.log.exception("recovery: failed")
@@ -692,6 +736,27 @@ class clientIF(object):
         if v is None:
             return
 
+        # Handle the event in the VM event queue, so slow handlers do not
+        # block the libvirt event loop thread. Only the last pending block
+        # threshold event of a drive and the last pending RTC change event
+        # need handling.
+        if eventid == libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_THRESHOLD:
+            coalesce = (eventid, args[0])
+        elif eventid == libvirt.VIR_DOMAIN_EVENT_ID_RTC_CHANGE:
+            coalesce = eventid
+        else:
+            coalesce = None
+        self.libvirt_events.dispatch(
+            v.id,
+            self._handleLibvirtEvent,
+            v,
+            dom,
+            eventid,
+            args,
+            coalesce=coalesce,
+        )
+
+    def _handleLibvirtEvent(self, v, dom, eventid, args):
         try:
             # pylint cannot tell that unpacking the args tuple is safe, so we
             # must disbale this check here.
@@ -784,27 +849,47 @@ class clientIF(object):
             time.sleep(5)
 
     def _preparePathsForRecoveredVMs(self):
+        """
+        Prepare volumes of recovered VMs, using up to
+        vars:max_recovery_workers concurrent workers.
+
+        VMs using the same storage domains are prepared by the same worker,
+        so VMs using a slow storage domain do not delay VMs using other
+        domains.
+        """
         vm_objects = list(self.getVMs().values())
         num_vm_objects = len(vm_objects)
-        for idx, vm_obj in enumerate(vm_objects):
-            # Let's recover as much VMs as possible
-            try:
-                # Do not prepare volumes when system goes down
-                if self._enabled:
-                    self.log.info(
-                        'recovery [%d/%d]: preparing paths for' ' domain %s',
+        max_workers = config.getint('vars', 'max_recovery_workers')
+        batches = _recovery_batches(vm_objects, max_workers)
+        order = {vm_obj.id: idx for idx, vm_obj in enumerate(vm_objects)}
+
+        def prepare(batch):
+            for vm_obj in batch:
+                idx = order[vm_obj.id]
+                # Let's recover as much VMs as possible
+                try:
+                    # Do not prepare volumes when system goes down
+                    if self._enabled:
+                        self.log.info(
+                            'recovery [%d/%d]: preparing paths for'
+                            ' domain %s',
+                            idx + 1,
+                            num_vm_objects,
+                            vm_obj.id,
+                        )
+                        vm_obj.preparePaths()
+                except:
+                    self.log.exception(
+                        "recovery [%d/%d]: failed for vm %s",
                         idx + 1,
                         num_vm_objects,
                         vm_obj.id,
                     )
-                    vm_obj.preparePaths()
-            except:
-                self.log.exception(
-                    "recovery [%d/%d]: failed for vm %s",
-                    idx + 1,
-                    num_vm_objects,
-                    vm_obj.id,
-                )
+
+        for _ in concurrent.tmap(
+            prepare, batches, max_workers=max_workers, name="recovery/prepare"
+        ):
+            pass
 
     def _prepare_network_drive(self, drive, res):
         """
@@ -837,3 +922,24 @@ class clientIF(object):
         # https://bugzilla.redhat.com/1465810
         drive['hosts'] = [volinfo['hosts'][0]]
         return volinfo['path']
+
+
+def _recovery_batches(vm_objects, max_workers):
+    """
+    Split recovered VMs to batches prepared by the same worker.
+
+    VMs using the same storage domains are kept in the same batches, and
+    large groups are split so all workers can be used when all VMs use the
+    same storage domains.
+    """
+    groups = defaultdict(list)
+    for vm_obj in vm_objects:
+        groups[tuple(sorted(vm_obj.sdIds))].append(vm_obj)
+
+    size = max(1, -(-len(vm_objects) // max_workers))
+    batches = []
+    for group in groups.values():
+        for i in range(0, len(group), size):
+            batches.append(group[i : i + size])
+
+    return batches
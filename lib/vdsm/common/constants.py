@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import os
+
+GLUSTER_MGMT_ENABLED = bool(0)
+
+#
+# file ownership definitions
+#
+VDSM_USER = 'vdsm'
+VDSM_GROUP = 'vdsm'
+DISKIMAGE_USER = 'vdsm'
+DISKIMAGE_GROUP = 'vdsm'
+METADATA_USER = 'vdsm'
+METADATA_GROUP = 'vdsm'
+QEMU_PROCESS_USER = 'vdsm'
+QEMU_PROCESS_GROUP = 'vdsm'
+OVIRT_VMCONSOLE_USER = 'vdsm'
+OVIRT_VMCONSOLE_GROUP = 'vdsm'
+
+
+# Sanlock definitions
+SANLOCK_ENABLED = '0' == 'yes'
+SANLOCK_USER = 'vdsm'
+
+# Libvirt selinux
+LIBVIRT_SELINUX = '0' == 'yes'
+
+#
+# Path definitions
+#
+P_LIBVIRT_NVRAM = '/var/lib/libvirt/qemu/nvram'
+P_LIBVIRT_SWTPM = '/var/lib/libvirt/swtpm'
+P_LIBVIRT_VMCHANNELS = '/var/lib/libvirt/qemu/channels/'
+P_OVIRT_VMCONSOLES = '/var/run/ovirt-vmconsole-console/'
+P_VDSM = '/tmp/vdsm/'  # NOQA: E501 (potentially long line)
+P_VDSM_HOOKS = '/tmp/vdsm/'  # NOQA: E501 (potentially long line)
+P_VDSM_LIB = '/tmp/vdsm/'  # NOQA: E501 (potentially long line)
+P_VDSM_RUN = '/tmp/vdsm/'  # NOQA: E501 (potentially long line)
+P_VDSM_CONF = '/tmp/vdsm/'  # NOQA: E501 (potentially long line)
+P_TRANSIENT_DISKS = '/tmp/vdsm/'  # NOQA: E501 (potentially long line)
+P_BACKUP = '/tmp/vdsm/'  # NOQA: E501 (potentially long line)
+
+P_VDSM_LOG = '/tmp/vdsm'  # NOQA: E501 (potentially long line)
+
+P_VDSM_EXEC = '/tmp/vdsm'  # NOQA: E501 (potentially long line)
+
+#
+# Configuration file definitions
+#
+SYSCONF_PATH = '@sysconfdir@'
+
+#
+# External programs (sorted, please keep in order).
+#
+EXT_CHOWN = '/usr/bin/true'
+
+EXT_DD = '/usr/bin/true'
+EXT_DMSETUP = '/usr/bin/true'
+
+EXT_FENCE_PREFIX = os.path.dirname('/usr/bin/true') + '/fence_'
+EXT_FSCK = '/usr/bin/true'
+EXT_FUSER = '/usr/bin/true'
+
+EXT_GREP = '/usr/bin/true'
+
+EXT_IONICE = '/usr/bin/true'
+EXT_ISCSIADM = '/usr/bin/true'
+
+EXT_KILL = '/usr/bin/true'
+
+EXT_LVM = '/usr/bin/true'
+
+EXT_MKFS = '/usr/bin/true'
+EXT_MKFS_MSDOS = '/usr/bin/true'
+EXT_MKISOFS = '/usr/bin/true'
+EXT_MOUNT = '/usr/bin/true'
+
+EXT_NICE = '/usr/bin/true'
+
+EXT_PRLIMIT = '/usr/bin/true'
+
+EXT_SETSID = '/usr/bin/true'
+EXT_SH = '/bin/sh'  # The shell path is invariable
+EXT_SU = '/usr/bin/true'
+EXT_SUDO = '/usr/bin/true'
+
+EXT_TAR = '/usr/bin/true'
+EXT_TASKSET = '/usr/bin/true'
+EXT_TUNE2FS = '@TUNE2FS_PATH@'
+
+EXT_UMOUNT = '/usr/bin/true'
+
+EXT_SAFELEASE = '/usr/bin/true'
+
+EXT_CURL_IMG_WRAP = '/tmp/vdsm/curl-img-wrap'  # NOQA: E501 (potentially long line)
+EXT_FC_SCAN = '/tmp/vdsm/fc-scan'  # NOQA: E501 (potentially long line)
+EXT_KVM_2_OVIRT = '/tmp/vdsm/kvm2ovirt'  # NOQA: E501 (potentially long line)
@@ -477,6 +477,18 @@ class GlusterApi(object):
         """
         return {'hosts': self.svdsmProxy.glusterPeerStatus()}
 
+    @exportAsVerb
+    def statusSnapshot(self, options=None):
+        """
+        Returns:
+            {'status': {'code': CODE, 'message': MESSAGE},
+             'volumes': {VOLUMENAME: {...}, ...},
+             'hosts': [{...}, ...],
+             'volumesStatus': {VOLUMENAME: {...}, ...},
+             'tasks': {TaskId: {...}, ...}}
+        """
+        return self.svdsmProxy.glusterStatusSnapshot()
+
     @exportAsVerb
     def volumeProfileStart(self, volumeName, options=None):
         self.svdsmProxy.glusterVolumeProfileStart(volumeName)
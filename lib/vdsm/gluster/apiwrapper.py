@@ -68,6 +68,9 @@ class GlusterHost(GlusterApiBase):
     def list(self):
         return self._gluster.hostsList()
 
+    def statusSnapshot(self):
+        return self._gluster.statusSnapshot()
+
     def storageDevicesList(self, options=None):
         return self._gluster.storageDevicesList()
 
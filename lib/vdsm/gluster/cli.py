@@ -3,15 +3,18 @@
 
 import calendar
 import errno
+import io
 import logging
 import os
 import socket
 import subprocess
+import threading
 import time
 import xml.etree.ElementTree as etree
 
 from vdsm.common import cmdutils
 from vdsm.common import commands
+from vdsm.config import config
 from vdsm.network.netinfo import addresses
 
 from . import exception as ge
@@ -101,20 +104,169 @@ def _getTree(out):
         errNo = int(tree.find('opErrno').text)
     except _etreeExceptions:  # pylint: disable=catching-non-exception
         raise ge.GlusterXmlErrorException(err=out)
-    if rv == 0:
-        return tree
-    else:
+    _checkOpStatus(rv, errNo, msg)
+    return tree
+
+
+def _checkOpStatus(rv, errNo, msg):
+    if rv != 0:
         if errNo != 0:
             rv = errNo
         raise ge.GlusterCmdFailedException(rc=rv, err=[msg])
 
 
+def _iterTree(out, paths):
+    """
+    Parse gluster xml output incrementally, yielding (path, element) for the
+    elements matching one of paths, relative to the root element like the
+    paths used with findall(). Yielded elements are cleared once consumed, so
+    large outputs like heal info or profile info are never kept in memory as
+    a whole tree.
+
+    The operation status is checked as soon as it is parsed, since gluster
+    may report it before or after the output elements. The caller must
+    consume all the elements before using the results.
+    """
+    status = {}
+    stack = []
+    try:
+        for event, el in etree.iterparse(
+            io.BytesIO(out), events=('start', 'end')
+        ):
+            if event == 'start':
+                stack.append(el.tag)
+                continue
+            path = '/'.join(stack[1:])
+            stack.pop()
+            if path in ('opRet', 'opErrno', 'opErrstr'):
+                status[path] = el.text
+                if len(status) == 3:
+                    _checkIterStatus(status, out)
+            elif path in paths:
+                yield path, el
+                el.clear()
+    except _etreeExceptions:  # pylint: disable=catching-non-exception
+        raise ge.GlusterXmlErrorException(err=out)
+    if len(status) != 3:
+        raise ge.GlusterXmlErrorException(err=out)
+
+
+def _checkIterStatus(status, out):
+    try:
+        rv = int(status['opRet'])
+        errNo = int(status['opErrno'])
+    except (TypeError, ValueError):
+        raise ge.GlusterXmlErrorException(err=out)
+    _checkOpStatus(rv, errNo, status['opErrstr'])
+
+
+class _QueryCache(object):
+    """
+    Keep the results of gluster queries for cli_cache_ttl seconds, keyed by
+    the query command, and run concurrent identical queries only once,
+    sharing the result or the error of the running query with the waiting
+    callers.
+
+    Commands which may change the cluster invalidate the cache. Results of
+    queries started before the invalidation are returned to their callers,
+    but are not kept. Changes made by other hosts are seen when the results
+    expire.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._results = {}
+        self._running = {}
+        self._generation = 0
+
+    def get(self, key, func):
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] > self._clock():
+                return entry[1]
+            query = self._running.get(key)
+            if query is not None:
+                owner = False
+            else:
+                owner = True
+                query = self._running[key] = _Query()
+                generation = self._generation
+
+        if not owner:
+            return query.wait()
+
+        try:
+            result = func()
+        except Exception as e:
+            with self._lock:
+                del self._running[key]
+            query.set_error(e)
+            raise
+
+        ttl = config.getint('gluster', 'cli_cache_ttl')
+        with self._lock:
+            del self._running[key]
+            if ttl > 0 and generation == self._generation:
+                self._results[key] = (self._clock() + ttl, result)
+        query.set_result(result)
+        return result
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._results.clear()
+
+
+class _Query(object):
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_error(self, error):
+        self._error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+_queries = _QueryCache()
+
+
 def _execGlusterXml(cmd):
     cmd.append('--xml')
-    return _getTree(_execGluster(cmd))
+    try:
+        return _getTree(_execGluster(cmd))
+    finally:
+        # Commands not using the cache may change the cluster.
+        _queries.invalidate()
+
+
+def _execGlusterXmlCached(cmd):
+    """
+    Run a read only gluster query, returning a recent result of the same
+    query if available. The returned tree is shared and must not be
+    modified.
+    """
+    cmd.append('--xml')
+    return _queries.get(tuple(cmd), lambda: _getTree(_execGluster(cmd)))
 
 
 def _execGlusterXmlWithTimeout(cmd, timeout=_DEFAULT_TIMEOUT):
+    return _getTree(_execGlusterWithTimeout(cmd, timeout))
+
+
+def _execGlusterWithTimeout(cmd, timeout=_DEFAULT_TIMEOUT):
     cmd.append('--xml')
     cmd = cmdutils.wrap_command(cmd)
     logging.debug(cmdutils.command_log_line(cmd))
@@ -131,7 +283,7 @@ def _execGlusterXmlWithTimeout(cmd, timeout=_DEFAULT_TIMEOUT):
     if proc.returncode != 0:
         raise ge.GlusterCmdExecFailedException(proc.returncode, out, err)
 
-    return _getTree(out)
+    return out
 
 
 def _getLocalIpAddress():
@@ -159,7 +311,7 @@ def hostUUIDGet():
     """
 
     command = _getGlusterSystemCmd() + ["uuid", "get"]
-    out = _execGluster(command)
+    out = _queries.get(tuple(command), lambda: _execGluster(command))
     out = out.decode("utf-8")
     if not out.startswith('UUID: '):
         raise ge.GlusterHostUUIDNotFoundException()
@@ -168,14 +320,29 @@ def hostUUIDGet():
 
 
 def _parseVolumeStatus(tree):
+    hostname = _getLocalIpAddress() or _getGlusterHostName()
+    return _parseVolumeStatusVolume(
+        tree.find('volStatus/volumes/volume'), hostname
+    )
+
+
+def _parseAllVolumesStatus(tree):
+    hostname = _getLocalIpAddress() or _getGlusterHostName()
+    volumes = {}
+    for el in tree.findall('volStatus/volumes/volume'):
+        status = _parseVolumeStatusVolume(el, hostname)
+        volumes[status['name']] = status
+    return volumes
+
+
+def _parseVolumeStatusVolume(volume, hostname):
     status = {
-        'name': tree.find('volStatus/volumes/volume/volName').text,
+        'name': volume.find('volName').text,
         'bricks': [],
         'nfs': [],
         'shd': [],
     }
-    hostname = _getLocalIpAddress() or _getGlusterHostName()
-    for el in tree.findall('volStatus/volumes/volume/node'):
+    for el in volume.findall('node'):
         value = {}
 
         for ch in el:
@@ -395,7 +562,7 @@ def volumeStatus(volumeName, brick=None, option=None):
     if option:
         command.append(option)
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXmlCached(command)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterVolumeStatusFailedException(rc=e.rc, err=e.err)
     try:
@@ -472,79 +639,19 @@ def _parseVolumeInfo(tree):
     return volumes
 
 
-def _parseVolumeProfileInfo(tree, nfs):
-    bricks = []
+def _profileKeys(nfs):
     if nfs:
-        brickKey = 'nfs'
-        bricksKey = 'nfsServers'
+        return 'nfs', 'nfsServers'
     else:
-        brickKey = 'brick'
-        bricksKey = 'bricks'
-    for brick in tree.findall('volProfile/brick'):
-        fopCumulative = []
-        blkCumulative = []
-        fopInterval = []
-        blkInterval = []
-        brickName = brick.find('brickName').text
-        if brickName == 'localhost':
-            brickName = _getLocalIpAddress() or _getGlusterHostName()
-        for block in brick.findall('cumulativeStats/blockStats/block'):
-            blkCumulative.append(
-                {
-                    'size': block.find('size').text,
-                    'read': block.find('reads').text,
-                    'write': block.find('writes').text,
-                }
-            )
-        for fop in brick.findall('cumulativeStats/fopStats/fop'):
-            fopCumulative.append(
-                {
-                    'name': fop.find('name').text,
-                    'hits': fop.find('hits').text,
-                    'latencyAvg': fop.find('avgLatency').text,
-                    'latencyMin': fop.find('minLatency').text,
-                    'latencyMax': fop.find('maxLatency').text,
-                }
-            )
-        for block in brick.findall('intervalStats/blockStats/block'):
-            blkInterval.append(
-                {
-                    'size': block.find('size').text,
-                    'read': block.find('reads').text,
-                    'write': block.find('writes').text,
-                }
-            )
-        for fop in brick.findall('intervalStats/fopStats/fop'):
-            fopInterval.append(
-                {
-                    'name': fop.find('name').text,
-                    'hits': fop.find('hits').text,
-                    'latencyAvg': fop.find('avgLatency').text,
-                    'latencyMin': fop.find('minLatency').text,
-                    'latencyMax': fop.find('maxLatency').text,
-                }
-            )
-        bricks.append(
-            {
-                brickKey: brickName,
-                'cumulativeStats': {
-                    'blockStats': blkCumulative,
-                    'fopStats': fopCumulative,
-                    'duration': brick.find('cumulativeStats/duration').text,
-                    'totalRead': brick.find('cumulativeStats/totalRead').text,
-                    'totalWrite': brick.find(
-                        'cumulativeStats/totalWrite'
-                    ).text,
-                },
-                'intervalStats': {
-                    'blockStats': blkInterval,
-                    'fopStats': fopInterval,
-                    'duration': brick.find('intervalStats/duration').text,
-                    'totalRead': brick.find('intervalStats/totalRead').text,
-                    'totalWrite': brick.find('intervalStats/totalWrite').text,
-                },
-            }
-        )
+        return 'brick', 'bricks'
+
+
+def _parseVolumeProfileInfo(tree, nfs):
+    brickKey, bricksKey = _profileKeys(nfs)
+    bricks = [
+        _parseBrickProfileInfo(brick, brickKey)
+        for brick in tree.findall('volProfile/brick')
+    ]
     status = {
         'volumeName': tree.find("volProfile/volname").text,
         bricksKey: bricks,
@@ -552,6 +659,80 @@ def _parseVolumeProfileInfo(tree, nfs):
     return status
 
 
+def _iterVolumeProfileInfo(out, nfs):
+    brickKey, bricksKey = _profileKeys(nfs)
+    status = {'volumeName': None, bricksKey: []}
+    for path, el in _iterTree(out, ('volProfile/volname', 'volProfile/brick')):
+        if path == 'volProfile/volname':
+            status['volumeName'] = el.text
+        else:
+            status[bricksKey].append(_parseBrickProfileInfo(el, brickKey))
+    return status
+
+
+def _parseBrickProfileInfo(brick, brickKey):
+    fopCumulative = []
+    blkCumulative = []
+    fopInterval = []
+    blkInterval = []
+    brickName = brick.find('brickName').text
+    if brickName == 'localhost':
+        brickName = _getLocalIpAddress() or _getGlusterHostName()
+    for block in brick.findall('cumulativeStats/blockStats/block'):
+        blkCumulative.append(
+            {
+                'size': block.find('size').text,
+                'read': block.find('reads').text,
+                'write': block.find('writes').text,
+            }
+        )
+    for fop in brick.findall('cumulativeStats/fopStats/fop'):
+        fopCumulative.append(
+            {
+                'name': fop.find('name').text,
+                'hits': fop.find('hits').text,
+                'latencyAvg': fop.find('avgLatency').text,
+                'latencyMin': fop.find('minLatency').text,
+                'latencyMax': fop.find('maxLatency').text,
+            }
+        )
+    for block in brick.findall('intervalStats/blockStats/block'):
+        blkInterval.append(
+            {
+                'size': block.find('size').text,
+                'read': block.find('reads').text,
+                'write': block.find('writes').text,
+            }
+        )
+    for fop in brick.findall('intervalStats/fopStats/fop'):
+        fopInterval.append(
+            {
+                'name': fop.find('name').text,
+                'hits': fop.find('hits').text,
+                'latencyAvg': fop.find('avgLatency').text,
+                'latencyMin': fop.find('minLatency').text,
+                'latencyMax': fop.find('maxLatency').text,
+            }
+        )
+    return {
+        brickKey: brickName,
+        'cumulativeStats': {
+            'blockStats': blkCumulative,
+            'fopStats': fopCumulative,
+            'duration': brick.find('cumulativeStats/duration').text,
+            'totalRead': brick.find('cumulativeStats/totalRead').text,
+            'totalWrite': brick.find('cumulativeStats/totalWrite').text,
+        },
+        'intervalStats': {
+            'blockStats': blkInterval,
+            'fopStats': fopInterval,
+            'duration': brick.find('intervalStats/duration').text,
+            'totalRead': brick.find('intervalStats/totalRead').text,
+            'totalWrite': brick.find('intervalStats/totalWrite').text,
+        },
+    }
+
+
 @gluster_api
 @gluster_mgmt_api
 def volumeInfo(volumeName=None, remoteServer=None):
@@ -574,7 +755,7 @@ def volumeInfo(volumeName=None, remoteServer=None):
     if volumeName:
         command.append(volumeName)
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXmlCached(command)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterVolumesListFailedException(rc=e.rc, err=e.err)
     try:
@@ -634,6 +815,8 @@ def volumeStart(volumeName, force=False):
         _execGluster(command)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterVolumeStartFailedException(rc=e.rc, err=e.err)
+    finally:
+        _queries.invalidate()
     return True
 
 
@@ -1011,7 +1194,7 @@ def peerStatus():
     """
     command = _getGlusterPeerCmd() + ["status"]
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXmlCached(command)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterHostsListFailedException(rc=e.rc, err=e.err)
     try:
@@ -1106,14 +1289,14 @@ def volumeProfileInfo(volumeName, nfs=False):
     command = _getGlusterVolCmd() + ["profile", volumeName, "info"]
     if nfs:
         command += ["nfs"]
+    command.append('--xml')
     try:
-        xmltree = _execGlusterXml(command)
+        out = _execGluster(command)
+        return _iterVolumeProfileInfo(out, nfs)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterVolumeProfileInfoFailedException(rc=e.rc, err=e.err)
-    try:
-        return _parseVolumeProfileInfo(xmltree, nfs)
     except _etreeExceptions:  # pylint: disable=catching-non-exception
-        raise ge.GlusterXmlErrorException(err=[etree.tostring(xmltree)])
+        raise ge.GlusterXmlErrorException(err=[out])
 
 
 def _parseVolumeTasks(tree):
@@ -1160,7 +1343,7 @@ def _parseVolumeTasks(tree):
 def volumeTasks(volumeName="all"):
     command = _getGlusterVolCmd() + ["status", volumeName, "tasks"]
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXmlCached(command)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterVolumeTasksFailedException(rc=e.rc, err=e.err)
     try:
@@ -1169,6 +1352,45 @@ def volumeTasks(volumeName="all"):
         raise ge.GlusterXmlErrorException(err=[etree.tostring(xmltree)])
 
 
+@gluster_mgmt_api
+def statusSnapshot():
+    """
+    Returns the state of the cluster, using a single status query for all
+    the started volumes instead of a volume status and a tasks query per
+    volume.
+
+    Returns:
+        {'volumes': {VOLUMENAME: {...}, ...},        # like volumeInfo()
+         'hosts': [{...}, ...],                       # like peerStatus()
+         'volumesStatus': {VOLUMENAME: {...}, ...},  # like volumeStatus()
+         'tasks': {TaskId: {...}, ...}}               # like volumeTasks()
+
+    The queries run one after the other, since glusterd rejects concurrent
+    transactions.
+    """
+    volumes = volumeInfo()
+    hosts = peerStatus()
+    volumesStatus = {}
+    tasks = {}
+    if any(v['volumeStatus'] == VolumeStatus.ONLINE for v in volumes.values()):
+        command = _getGlusterVolCmd() + ["status", "all"]
+        try:
+            xmltree = _execGlusterXmlCached(command)
+        except ge.GlusterCmdFailedException as e:
+            raise ge.GlusterVolumeStatusFailedException(rc=e.rc, err=e.err)
+        try:
+            volumesStatus = _parseAllVolumesStatus(xmltree)
+            tasks = _parseVolumeTasks(xmltree)
+        except _etreeExceptions:  # pylint: disable=catching-non-exception
+            raise ge.GlusterXmlErrorException(err=[etree.tostring(xmltree)])
+    return {
+        'volumes': volumes,
+        'hosts': hosts,
+        'volumesStatus': volumesStatus,
+        'tasks': tasks,
+    }
+
+
 @gluster_mgmt_api
 def volumeGeoRepSessionStart(
     volumeName, remoteHost, remoteVolumeName, remoteUserName=None, force=False
@@ -1353,7 +1575,7 @@ def volumeGeoRepStatus(
     command.append("status")
 
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXmlCached(command)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterGeoRepStatusFailedException(rc=e.rc, err=e.err)
     try:
@@ -1493,6 +1715,8 @@ def snapshotDelete(volumeName=None, snapName=None):
         _execGluster(command)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterSnapshotDeleteFailedException(rc=e.rc, err=e.err)
+    finally:
+        _queries.invalidate()
     return True
 
 
@@ -1721,7 +1945,7 @@ def snapshotInfo(volumeName=None):
     if volumeName:
         command += ["volume", volumeName]
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXmlCached(command)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterSnapshotInfoFailedException(rc=e.rc, err=e.err)
     try:
@@ -1830,12 +2054,12 @@ def volumeGeoRepSessionDelete(
 def volumeHealInfo(volumeName=None):
     command = _getGlusterVolCmd() + ["heal", volumeName, 'info', 'summary']
     try:
-        xmltree = _execGlusterXmlWithTimeout(command, timeout=_DEFAULT_TIMEOUT)
-        return _parseVolumeHealInfo(xmltree)
+        out = _execGlusterWithTimeout(command, timeout=_DEFAULT_TIMEOUT)
+        return _iterVolumeHealInfo(out)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterVolumeHealInfoFailedException(rc=e.rc, err=e.err)
     except _etreeExceptions:  # pylint: disable=catching-non-exception
-        raise ge.GlusterXmlErrorException(err=[etree.tostring(xmltree)])
+        raise ge.GlusterXmlErrorException(err=[out])
 
 
 def _parseVolumeHealInfo(tree):
@@ -1848,16 +2072,27 @@ def _parseVolumeHealInfo(tree):
     """
     healInfo = {'bricks': []}
     for el in tree.findall('healInfo/bricks/brick'):
-        brick = {}
-        brick['name'] = el.find('name').text
-        brick['status'] = el.find('status').text
-        brick['hostUuid'] = el.get('hostUuid')
-        if brick['status'] == 'Connected':
-            brick['numberOfEntries'] = el.find('totalNumberOfEntries').text
-        healInfo['bricks'].append(brick)
+        healInfo['bricks'].append(_parseBrickHealInfo(el))
     return healInfo
 
 
+def _iterVolumeHealInfo(out):
+    healInfo = {'bricks': []}
+    for _, el in _iterTree(out, ('healInfo/bricks/brick',)):
+        healInfo['bricks'].append(_parseBrickHealInfo(el))
+    return healInfo
+
+
+def _parseBrickHealInfo(el):
+    brick = {}
+    brick['name'] = el.find('name').text
+    brick['status'] = el.find('status').text
+    brick['hostUuid'] = el.get('hostUuid')
+    if brick['status'] == 'Connected':
+        brick['numberOfEntries'] = el.find('totalNumberOfEntries').text
+    return brick
+
+
 @gluster_mgmt_api
 def volumeResetBrickStart(volumeName, existingBrick):
     command = _getGlusterVolCmd() + [
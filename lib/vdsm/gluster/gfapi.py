@@ -6,6 +6,7 @@ import os
 
 from vdsm.gluster import exception as ge
 
+from . import gfapiworker
 from . import gluster_mgmt_api
 
 
@@ -13,9 +14,7 @@ import sys
 import json
 import argparse
 
-from vdsm import constants
-from vdsm.common import commands
-from vdsm.common import cmdutils
+from vdsm.config import config
 
 GLUSTER_VOL_PROTOCOL = 'tcp'
 GLUSTER_VOL_HOST = 'localhost'
@@ -91,17 +90,22 @@ def volumeStatvfsGet(
     port=GLUSTER_VOL_PORT,
     protocol=GLUSTER_VOL_PROTOCOL,
 ):
+    fs = glfsInit(volumeId, host, port, protocol)
+    try:
+        return _statvfs(fs)
+    finally:
+        glfsFini(fs, volumeId)
+
+
+def _statvfs(fs):
     statvfsdata = StatVfsStruct()
 
-    fs = glfsInit(volumeId, host, port, protocol)
     rc = _glfs_statvfs(
         fs, GLUSTER_VOL_PATH.encode('utf-8'), ctypes.byref(statvfsdata)
     )
     if rc != 0:
         raise ge.GlfsStatvfsException(rc=rc)
 
-    glfsFini(fs, volumeId)
-
     # To convert to os.statvfs_result we need to pass tuple/list in
     # following order: bsize, frsize, blocks, bfree, bavail, files,
     #                  ffree, favail, flag, namemax
@@ -127,41 +131,48 @@ def checkVolumeEmpty(
     port=GLUSTER_VOL_PORT,
     protocol=GLUSTER_VOL_PROTOCOL,
 ):
-    data = ctypes.POINTER(DirentStruct)()
     fs = glfsInit(volumeId, host, port, protocol)
+    try:
+        return _is_empty(fs)
+    finally:
+        glfsFini(fs, volumeId)
+
 
+def _is_empty(fs):
+    data = ctypes.POINTER(DirentStruct)()
     fd = _glfs_opendir(fs, b"/")
 
     if fd is None:
-        glfsFini(fs, volumeId)
         raise ge.GlusterVolumeEmptyCheckFailedException(
             err=['glfs_opendir() failed']
         )
 
-    entry = "."
-    flag = False
+    try:
+        entry = "."
+        flag = False
 
-    while entry in [".", "..", ".trashcan"]:
-        data = _glfs_readdir(fd)
-        if data is None:
-            glfsFini(fs, volumeId)
-            raise ge.GlusterVolumeEmptyCheckFailedException(
-                err=['glfs_readdir() failed']
-            )
+        while entry in [".", "..", ".trashcan"]:
+            data = _glfs_readdir(fd)
+            if data is None:
+                raise ge.GlusterVolumeEmptyCheckFailedException(
+                    err=['glfs_readdir() failed']
+                )
 
-        # When there are no more entries in directory _glfs_readdir()
-        # will return a null pointer. bool of null pointer will be false
-        # Using this to conclude that no more entries in volume.
-        if not bool(data):
-            flag = True
-            break
+            # When there are no more entries in directory _glfs_readdir()
+            # will return a null pointer. bool of null pointer will be false
+            # Using this to conclude that no more entries in volume.
+            if not bool(data):
+                flag = True
+                break
 
-        entry = data.contents.d_name
-    else:
-        flag = False
+            entry = data.contents.d_name
+        else:
+            flag = False
 
-    glfsFini(fs, volumeId)
-    return flag
+        return flag
+    finally:
+        # The glfs handle may be kept by the worker, do not leak the fd.
+        _glfs_closedir(fd)
 
 
 # C function prototypes for using the library gfapi
@@ -200,6 +211,10 @@ _glfs_readdir = ctypes.CFUNCTYPE(
     ctypes.POINTER(DirentStruct), ctypes.c_void_p
 )(('glfs_readdir', _lib))
 
+_glfs_closedir = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p)(
+    ('glfs_closedir', _lib)
+)
+
 
 # This is a workaround for memory leak caused by the
 # libgfapi(BZ:1093594) used to get volume statistics.
@@ -207,6 +222,44 @@ _glfs_readdir = ctypes.CFUNCTYPE(
 # avoid that, this file is executed as script.This is
 # a temporary fix for BZ:1142647. This can be reverted
 # back once the memory leak issue is fixed in libgfapi.
+#
+# The script is run as a long lived worker process for every volume, keeping
+# the glfs handle of the volume, so glfs_init() is not called for every
+# request. See gfapiworker for the details.
+
+
+_pool = gfapiworker.Pool(
+    [
+        sys.executable,
+        '-m',
+        'vdsm.gluster.gfapi',
+        '-c',
+        'serve',
+        '-i',
+        config.get('gluster', 'gfapi_worker_idle_timeout'),
+    ],
+    config.getint('gluster', 'gfapi_worker_timeout'),
+    config.getint('gluster', 'gfapi_worker_max_requests'),
+)
+
+
+def _call_worker(command, volumeName, host, port, protocol, error):
+    request = {
+        'command': command,
+        'volume': volumeName,
+        'host': host,
+        'port': port,
+        'protocol': protocol,
+    }
+    key = (volumeName, host, port, protocol)
+    try:
+        response = _pool.call(key, request)
+    except gfapiworker.WorkerError as e:
+        raise error(rc=e.rc, err=[str(e)])
+
+    if 'error' in response:
+        raise error(rc=response['error']['rc'], err=response['error']['err'])
+    return response['result']
 
 
 @gluster_mgmt_api
@@ -216,35 +269,9 @@ def volumeStatvfs(
     port=GLUSTER_VOL_PORT,
     protocol=GLUSTER_VOL_PROTOCOL,
 ):
-    module = "vdsm.gluster.gfapi"
-    command = [
-        sys.executable,
-        '-m',
-        module,
-        '-v',
-        volumeName,
-        '-p',
-        str(port),
-        '-H',
-        host,
-        '-t',
-        protocol,
-        '-c',
-        'statvfs',
-    ]
-
-    # to include /usr/share/vdsm in python path
-    env = os.environ.copy()
-    env['PYTHONPATH'] = "%s:%s" % (env.get("PYTHONPATH", ""), constants.P_VDSM)
-    env['PYTHONPATH'] = ":".join(
-        map(os.path.abspath, env['PYTHONPATH'].split(":"))
+    res = _call_worker(
+        'statvfs', volumeName, host, port, protocol, ge.GlfsStatvfsException
     )
-
-    try:
-        out = commands.run(command, env=env)
-    except cmdutils.Error as e:
-        raise ge.GlfsStatvfsException(e.rc, [e.err])
-    res = json.loads(out)
     return os.statvfs_result(
         (
             res['f_bsize'],
@@ -268,35 +295,33 @@ def volumeEmptyCheck(
     port=GLUSTER_VOL_PORT,
     protocol=GLUSTER_VOL_PROTOCOL,
 ):
-    module = "vdsm.gluster.gfapi"
-    command = [
-        sys.executable,
-        '-m',
-        module,
-        '-v',
+    return _call_worker(
+        'readdir',
         volumeName,
-        '-p',
-        str(port),
-        '-H',
         host,
-        '-t',
+        port,
         protocol,
-        '-c',
-        'readdir',
-    ]
-
-    # to include /usr/share/vdsm in python path
-    env = os.environ.copy()
-    env['PYTHONPATH'] = "%s:%s" % (env.get("PYTHONPATH", ""), constants.P_VDSM)
-    env['PYTHONPATH'] = ":".join(
-        map(os.path.abspath, env['PYTHONPATH'].split(":"))
+        ge.GlusterVolumeEmptyCheckFailedException,
     )
 
-    try:
-        out = commands.run(command, env=env)
-    except cmdutils.Error as e:
-        raise ge.GlusterVolumeEmptyCheckFailedException(e.rc, [e.err])
-    return out.upper() == "TRUE"
+
+def _statvfs_result(fs):
+    return _statvfs_dict(_statvfs(fs))
+
+
+def _statvfs_dict(res):
+    return {
+        'f_blocks': res.f_blocks,
+        'f_bfree': res.f_bfree,
+        'f_bsize': res.f_bsize,
+        'f_frsize': res.f_frsize,
+        'f_bavail': res.f_bavail,
+        'f_files': res.f_files,
+        'f_ffree': res.f_ffree,
+        'f_favail': res.f_favail,
+        'f_flag': res.f_flag,
+        'f_namemax': res.f_namemax,
+    }
 
 
 # This file is modified to act as a script which can retrive
@@ -338,13 +363,30 @@ def parse_cmdargs():
         type=str,
         help="command to be executed",
     )
+    parser.add_argument(
+        "-i",
+        "--idle-timeout",
+        action="store",
+        type=int,
+        default=300,
+        help="seconds to keep unused volume handles when serving",
+    )
     args = parser.parse_args()
     return args
 
 
 if __name__ == '__main__':
     args = parse_cmdargs()
-    if args.command.upper() == 'STATVFS':
+    if args.command.upper() == 'SERVE':
+        server = gfapiworker.Server(
+            {'statvfs': _statvfs_result, 'readdir': _is_empty},
+            glfsInit,
+            glfsFini,
+            (ge.GlusterException,),
+            args.idle_timeout,
+        )
+        server.serve(sys.stdin.buffer, sys.stdout.buffer)
+    elif args.command.upper() == 'STATVFS':
         try:
             res = volumeStatvfsGet(
                 args.volume, args.host, int(args.port), args.protocol
@@ -352,21 +394,7 @@ if __name__ == '__main__':
         except ge.GlusterException as e:
             sys.stderr.write(str(e))
             sys.exit(1)
-        json.dump(
-            {
-                'f_blocks': res.f_blocks,
-                'f_bfree': res.f_bfree,
-                'f_bsize': res.f_bsize,
-                'f_frsize': res.f_frsize,
-                'f_bavail': res.f_bavail,
-                'f_files': res.f_files,
-                'f_ffree': res.f_ffree,
-                'f_favail': res.f_favail,
-                'f_flag': res.f_flag,
-                'f_namemax': res.f_namemax,
-            },
-            sys.stdout,
-        )
+        json.dump(_statvfs_dict(res), sys.stdout)
     elif args.command.upper() == 'READDIR':
         try:
             result = checkVolumeEmpty(
@@ -0,0 +1,371 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""
+Long lived worker processes serving gfapi requests.
+
+libgfapi leaks memory (BZ:1093594), so it is used only in child processes.
+The worker process reads json requests from stdin and writes json responses
+to stdout, one per line, keeping the glfs handles of the volumes between
+requests.
+
+Every volume is served by its own worker, so a volume which does not respond
+does not delay the requests for the other volumes. A worker is killed and
+started again if a request does not complete in time.
+"""
+
+import json
+import logging
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+
+from vdsm import constants
+from vdsm.common import commands
+
+log = logging.getLogger("Gluster")
+
+
+class WorkerError(Exception):
+    """
+    Raised when the worker process terminated while handling a request.
+    """
+
+    def __init__(self, rc):
+        self.rc = rc
+
+    def __str__(self):
+        return 'gfapi worker terminated with rc={}'.format(self.rc)
+
+
+class WorkerTimeout(WorkerError):
+    """
+    Raised when the worker did not respond in time and was killed.
+    """
+
+    def __init__(self, rc, timeout):
+        self.rc = rc
+        self.timeout = timeout
+
+    def __str__(self):
+        return 'gfapi worker did not respond in {} seconds'.format(
+            self.timeout
+        )
+
+
+class Worker(object):
+    """
+    Send requests to a worker process over a pipe, starting the worker when
+    needed.
+
+    Requests are sent one at a time. If the worker terminates while handling
+    a request, it is started again and the request is sent once more. If the
+    worker does not respond in timeout seconds, it is killed and the request
+    fails. The worker is restarted after serving max_requests requests.
+    """
+
+    STOP_TIMEOUT = 5
+
+    def __init__(self, command, timeout, max_requests=0):
+        """
+        Arguments:
+            command (list): Command starting the worker.
+            timeout (float): Seconds to wait for a response.
+            max_requests (int): Number of requests served by a worker
+                process before it is restarted, or 0 to keep it running.
+        """
+        self._command = command
+        self._timeout = timeout
+        self._max_requests = max_requests
+        self._lock = threading.Lock()
+        self._proc = None
+        self._buf = b''
+        self._requests = 0
+
+    def call(self, request):
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is not None:
+                # The worker exited after it was idle.
+                self._stop()
+
+            try:
+                response = self._send(request)
+            except WorkerTimeout:
+                raise
+            except WorkerError as e:
+                log.warning('%s, restarting the worker', e)
+                response = self._send(request)
+
+            self._requests += 1
+            if self._max_requests and self._requests >= self._max_requests:
+                self._stop()
+
+        return response
+
+    def reap(self):
+        """
+        Wait for a worker which exited after it was idle. Returns True if the
+        worker is not running and is not handling a request.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if self._proc is not None and self._proc.poll() is not None:
+                self._stop()
+            return self._proc is None
+        finally:
+            self._lock.release()
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                self._stop()
+
+    @property
+    def pid(self):
+        return self._proc.pid if self._proc else None
+
+    def _send(self, request):
+        if self._proc is None:
+            self._start()
+
+        line = json.dumps(request).encode('utf-8') + b'\n'
+        try:
+            self._proc.stdin.write(line)
+            self._proc.stdin.flush()
+            line = self._readline(time.monotonic() + self._timeout)
+        except (IOError, OSError):
+            line = b''
+
+        if line is None:
+            rc = self._kill()
+            raise WorkerTimeout(rc, self._timeout)
+
+        if not line:
+            raise WorkerError(self._kill())
+
+        return json.loads(line)
+
+    def _readline(self, deadline):
+        """
+        Return the next line written by the worker, b'' if the worker
+        terminated, or None if the line was not written before deadline.
+        """
+        fd = self._proc.stdout.fileno()
+        while b'\n' not in self._buf:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return None
+            readable, _, _ = select.select([fd], [], [], timeout)
+            if not readable:
+                continue
+            data = os.read(fd, 65536)
+            if not data:
+                return b''
+            self._buf += data
+        line, self._buf = self._buf.split(b'\n', 1)
+        return line
+
+    def _start(self):
+        self._proc = commands.start(
+            self._command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=_worker_env(),
+        )
+        self._buf = b''
+        self._requests = 0
+
+    def _stop(self):
+        proc = self._proc
+        self._proc = None
+        # Closing stdin makes the worker release the handles and exit.
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(self.STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            log.warning('gfapi worker did not exit, killing it')
+            commands.terminate(proc)
+        proc.stdout.close()
+
+    def _kill(self):
+        proc = self._proc
+        self._proc = None
+        try:
+            commands.terminate(proc)
+        except commands.TerminatingFailure as e:
+            log.warning('%s', e)
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            proc.stdout.close()
+        return proc.returncode
+
+
+class Pool(object):
+    """
+    Run a worker for every key, typically the volume used by the requests.
+    """
+
+    def __init__(self, command, timeout, max_requests=0):
+        self._command = command
+        self._timeout = timeout
+        self._max_requests = max_requests
+        self._lock = threading.Lock()
+        self._workers = {}
+
+    def call(self, key, request):
+        with self._lock:
+            # Drop the workers of volumes which are not used any more.
+            for other in list(self._workers):
+                if other != key and self._workers[other].reap():
+                    del self._workers[other]
+
+            worker = self._workers.get(key)
+            if worker is None:
+                worker = Worker(
+                    self._command, self._timeout, self._max_requests
+                )
+                self._workers[key] = worker
+
+        return worker.call(request)
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+
+class Server(object):
+    """
+    Serve the requests read from a pipe, keeping the handles of the volumes.
+    A handle is released when it was not used for idle_timeout seconds, or
+    when a request using it fails, since the volume may have been restarted.
+    When no handle was used for idle_timeout seconds, the server exits.
+    """
+
+    def __init__(self, handlers, init, fini, errors, idle_timeout):
+        """
+        Arguments:
+            handlers (dict): Functions handling the request commands, called
+                with the handle of the volume, returning the json result.
+            init (callable): Called with (volume, host, port, protocol),
+                returning a new handle.
+            fini (callable): Called with a handle and the volume name to
+                release the handle.
+            errors (tuple): Exception types reported to the client as
+                {'error': {'rc': e.rc, 'err': e.err}}.
+            idle_timeout (float): Seconds to keep an unused handle.
+        """
+        self._handlers = handlers
+        self._init = init
+        self._fini = fini
+        self._errors = errors
+        self._idle_timeout = idle_timeout
+        # (volume, host, port, protocol): [handle, last_used]
+        self._handles = {}
+        self._last_used = time.monotonic()
+
+    def serve(self, infile, outfile):
+        try:
+            while True:
+                readable, _, _ = select.select(
+                    [infile], [], [], self._next_eviction()
+                )
+                if readable:
+                    line = infile.readline()
+                    if not line:
+                        break
+                    response = self._handle(json.loads(line))
+                    outfile.write(json.dumps(response).encode('utf-8'))
+                    outfile.write(b'\n')
+                    outfile.flush()
+                    self._last_used = time.monotonic()
+                self._evict_idle()
+                if not self._handles and self._idle():
+                    break
+        finally:
+            for key in list(self._handles):
+                self._release(key)
+
+    def _handle(self, request):
+        key = (
+            request['volume'],
+            request['host'],
+            int(request['port']),
+            request['protocol'],
+        )
+        try:
+            handler = self._handlers[request['command']]
+        except KeyError:
+            return {
+                'error': {
+                    'rc': -1,
+                    'err': ['Unknown command %r' % request['command']],
+                }
+            }
+        try:
+            result = self._call(key, handler)
+        except self._errors as e:
+            return {'error': {'rc': e.rc, 'err': list(e.err)}}
+        return {'result': result}
+
+    def _call(self, key, func):
+        handle = self._handles.get(key)
+        if handle is not None:
+            handle[1] = time.monotonic()
+            try:
+                return func(handle[0])
+            except self._errors:
+                self._release(key)
+
+        fs = self._init(*key)
+        self._handles[key] = [fs, time.monotonic()]
+        try:
+            return func(fs)
+        except self._errors:
+            self._release(key)
+            raise
+
+    def _idle(self):
+        return time.monotonic() - self._last_used >= self._idle_timeout
+
+    def _next_eviction(self):
+        if self._handles:
+            oldest = min(last_used for _, last_used in self._handles.values())
+        else:
+            oldest = self._last_used
+        return max(0, oldest + self._idle_timeout - time.monotonic())
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for key, (_, last_used) in list(self._handles.items()):
+            if now - last_used >= self._idle_timeout:
+                self._release(key)
+
+    def _release(self, key):
+        fs, _ = self._handles.pop(key)
+        try:
+            self._fini(fs, key[0])
+        except self._errors as e:
+            sys.stderr.write('%s\n' % e)
+
+
+def _worker_env():
+    # to include /usr/share/vdsm in python path
+    env = os.environ.copy()
+    env['PYTHONPATH'] = "%s:%s" % (env.get("PYTHONPATH", ""), constants.P_VDSM)
+    env['PYTHONPATH'] = ":".join(
+        map(os.path.abspath, env['PYTHONPATH'].split(":"))
+    )
+    return env
@@ -9,6 +9,7 @@ from vdsm import utils
 from vdsm import metrics
 from vdsm.common import hooks
 from vdsm.common.units import KiB, MiB
+from vdsm.virt import migration
 from vdsm.virt import vmstatus
 
 haClient = None
@@ -49,6 +50,9 @@ def get_stats(cif, sample, multipath=False):
         ret['incomingVmMigrations'],
         ret['outgoingVmMigrations'],
     ) = _countVms(cif)
+    eta = migration.SourceThread.ongoingMigrations.eta()
+    if eta is not None:
+        ret['outgoingVmMigrationsEta'] = eta
     tm_year, tm_mon, tm_day, tm_hour, tm_min, tm_sec, dummy, dummy, dummy = (
         time.gmtime(time.time())
     )
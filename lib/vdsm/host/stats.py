@@ -88,46 +88,58 @@ def produce(first_sample, last_sample):
 
 def _get_cpu_core_stats(first_sample, last_sample):
     interval = last_sample.timestamp - first_sample.timestamp
-
-    def compute_cpu_usage(cpu_core, mode):
-        first_core_sample = first_sample.cpuCores.getCoreSample(cpu_core)
-        last_core_sample = last_sample.cpuCores.getCoreSample(cpu_core)
-        if not first_core_sample or not last_core_sample:
-            raise MissingSample()
-        jiffies = (
-            last_core_sample[mode] - first_core_sample[mode]
-        ) % JIFFIES_BOUND
-        return "%.2f" % (jiffies / interval)
+    first = first_sample.cpuCores
+    last = last_sample.cpuCores
+
+    if first.ids == last.ids:
+        ids = last.ids
+        first_user, first_sys = first.user, first.sys
+        last_user, last_sys = last.user, last.sys
+    else:
+        # CPUs went online or offline between the samples. Only collect data
+        # for cores present in both samples.
+        ids = []
+        first_user, first_sys = [], []
+        last_user, last_sys = [], []
+        for i, cpu_core in enumerate(last.ids):
+            j = first.position(cpu_core)
+            if j is None:
+                continue
+            ids.append(cpu_core)
+            first_user.append(first.user[j])
+            first_sys.append(first.sys[j])
+            last_user.append(last.user[i])
+            last_sys.append(last.sys[i])
+
+    # Compute the usage of all the cores in one pass over the arrays.
+    usage = {
+        cpu_core: (
+            "%.2f" % ((lu - fu) % JIFFIES_BOUND / interval),
+            "%.2f" % ((ls - fs) % JIFFIES_BOUND / interval),
+        )
+        for cpu_core, fu, lu, fs, ls in zip(
+            ids, first_user, last_user, first_sys, last_sys
+        )
+    }
 
     cpu_core_stats = {}
     for node_index, numa_node in numa.topology().items():
-        cpu_cores = numa_node['cpus']
-        for cpu_core in cpu_cores:
-            try:
-                user_cpu_usage = compute_cpu_usage(cpu_core, 'user')
-                system_cpu_usage = compute_cpu_usage(cpu_core, 'sys')
-            except MissingSample:
-                # Only collect data when all required samples already present
+        node_index = int(node_index)
+        for cpu_core in numa_node['cpus']:
+            core_usage = usage.get(cpu_core)
+            if core_usage is None:
                 continue
-            core_stat = {
-                'nodeIndex': int(node_index),
-                'cpuUser': user_cpu_usage,
-                'cpuSys': system_cpu_usage,
+            user, system = core_usage
+            cpu_core_stats[str(cpu_core)] = {
+                'nodeIndex': node_index,
+                'cpuUser': user,
+                'cpuSys': system,
+                'cpuIdle': "%.2f"
+                % max(0.0, 100.0 - float(user) - float(system)),
             }
-            core_stat['cpuIdle'] = "%.2f" % max(
-                0.0,
-                100.0
-                - float(core_stat['cpuUser'])
-                - float(core_stat['cpuSys']),
-            )
-            cpu_core_stats[str(cpu_core)] = core_stat
     return cpu_core_stats
 
 
-class MissingSample(Exception):
-    pass
-
-
 def get_interfaces_stats():
     return net_api.network_stats()
 
@@ -18,6 +18,7 @@ from vdsm.network.dhcp_monitor import MonitoredItemPool
 from vdsm.network.ipwrapper import DUMMY_BRIDGE
 from vdsm.network.link import sriov
 from vdsm.network.lldp import info as lldp_info
+from vdsm.network.netinfo import cache as netinfo_cache
 from vdsm.network.nmstate import (
     add_dynamic_source_route_rules as nmstate_add_dynamic_source_route_rules,
 )
@@ -52,7 +53,10 @@ def change_numvfs(numvfs, devname):
     stored. A call to setSafeNetworkConfig() will persist it across reboots.
     """
     logging.info('Changing number of vfs on device %s -> %s.', devname, numvfs)
-    update_num_vfs(devname, numvfs)
+    try:
+        update_num_vfs(devname, numvfs)
+    finally:
+        netinfo_cache.invalidate()
     sriov.persist_numvfs(devname, numvfs)
 
 
@@ -305,7 +309,12 @@ def add_dynamic_source_route_rules(iface, address, prefixlen):
     :param address: Interface address
     :param prefixlen: Address prefixlen
     """
-    nmstate_add_dynamic_source_route_rules(iface, address, prefixlen)
+    try:
+        nmstate_add_dynamic_source_route_rules(iface, address, prefixlen)
+    finally:
+        # The host is notified right after the rules are added, report the
+        # acquired address even if its events were not handled yet.
+        netinfo_cache.invalidate([iface])
 
 
 def remove_dhcp_monitoring(iface, family):
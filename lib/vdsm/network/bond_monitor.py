@@ -4,7 +4,6 @@
 import logging
 import threading
 
-from vdsm.common import concurrent
 from vdsm.network.netlink import monitor
 
 _monitor_instance = None
@@ -12,12 +11,14 @@ _monitor_lock = threading.Lock()
 
 
 class Monitor(object):
+    """
+    Monitor that handles link events, including bonding failovers, using the
+    netlink monitor shared by the process.
+    """
+
     def __init__(self):
         self._handlers = []
-        self._nl_monitor = monitor.ifla_monitor(groups=('link',))
-        self._thread = concurrent.thread(
-            self.serve_forever, name='bond-monitor'
-        )
+        self._subscription = None
 
     @staticmethod
     def instance():
@@ -30,14 +31,15 @@ class Monitor(object):
 
     def start(self):
         logging.info('Starting Bond monitor.')
-        self._nl_monitor.start()
-        self._thread.start()
+        self._subscription = monitor.subscribe(
+            self.handle_event, groups=('link',), stopped=self._stopped
+        )
 
     def stop(self):
         logging.info('Stopping Bond monitor.')
-        self._nl_monitor.stop()
-        self._nl_monitor.wait()
-        self._thread.join()
+        if self._subscription is not None:
+            self._subscription.unsubscribe()
+            self._subscription = None
 
     def add_handler(self, handler):
         self._handlers.append(handler)
@@ -46,9 +48,9 @@ class Monitor(object):
         for handler in self._handlers:
             handler(event)
 
-    def serve_forever(self):
-        for event in self._nl_monitor:
-            self.handle_event(event)
+    def _stopped(self):
+        logging.error('Bond monitor stopped, bonding failovers are missed')
+        self._subscription = None
 
 
 def initialize_monitor(cif):
@@ -5,7 +5,6 @@ from contextlib import contextmanager
 import logging
 import threading
 
-from vdsm.common import concurrent
 from vdsm.network.netlink import monitor
 from vdsm.network.ip.address import IPAddressData
 
@@ -52,17 +51,13 @@ class MonitoredItemPool(object):
 
 class Monitor(object):
     """
-    Monitor that handles new ip notifications
+    Monitor that handles new ip notifications, using the netlink monitor
+    shared by the process.
     """
 
     def __init__(self):
         self._handlers = []
-        self._nl_monitor = monitor.object_monitor(
-            groups=('ipv4-ifaddr', 'ipv6-ifaddr')
-        )
-        self._thread = concurrent.thread(
-            self.serve_forever, name='dhcp-monitor'
-        )
+        self._subscription = None
 
     @staticmethod
     def instance(**kwargs):
@@ -75,14 +70,17 @@ class Monitor(object):
 
     def start(self):
         logging.info('Starting DHCP monitor.')
-        self._nl_monitor.start()
-        self._thread.start()
+        self._subscription = monitor.subscribe(
+            self.handle_event,
+            groups=('ipv4-ifaddr', 'ipv6-ifaddr'),
+            stopped=self._stopped,
+        )
 
     def stop(self):
         logging.info('Stopping DHCP monitor.')
-        self._nl_monitor.stop()
-        self._nl_monitor.wait()
-        self._thread.join()
+        if self._subscription is not None:
+            self._subscription.unsubscribe()
+            self._subscription = None
 
     def add_handler(self, handler):
         self._handlers.append(handler)
@@ -91,9 +89,9 @@ class Monitor(object):
         for handler in self._handlers:
             handler(event)
 
-    def serve_forever(self):
-        for event in self._nl_monitor:
-            self.handle_event(event)
+    def _stopped(self):
+        logging.error('DHCP monitor stopped, new addresses are missed')
+        self._subscription = None
 
 
 class EventField(object):
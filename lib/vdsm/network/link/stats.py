@@ -2,36 +2,151 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 import errno
+import logging
+import threading
 
 from vdsm.network.link import bond
 from vdsm.network.link import iface
 from vdsm.network.link import nic
 from vdsm.network.link import vlan
+from vdsm.network.netlink import link
+from vdsm.network.netlink import monitor
 
 
 def report():
     stats = {}
-    for iface_properties in iface.list():
+    for link_stats in link.iter_links_stats():
         try:
-            interface = iface.iface(iface_properties['name'])
-            stats[interface.device] = _generate_iface_stats(interface)
+            info = _link_info.get(link_stats)
         except IOError as e:
             if e.errno != errno.ENODEV:
                 raise
+            continue
+        stats[link_stats.name] = _generate_iface_stats(link_stats, info)
     return stats
 
 
-def _generate_iface_stats(interface):
-    stats = interface.statistics()
+def _generate_iface_stats(link_stats, info):
+    is_up = link.is_link_up(link_stats.flags, check_oper_status=True)
+    return {
+        'name': link_stats.name,
+        'rx': link_stats.rx,
+        'tx': link_stats.tx,
+        'state': 'up' if is_up else 'down',
+        'rxDropped': link_stats.rx_dropped,
+        'txDropped': link_stats.tx_dropped,
+        'rxErrors': link_stats.rx_errors,
+        'txErrors': link_stats.tx_errors,
+        'speed': info.speed,
+        'duplex': info.duplex,
+    }
+
+
+class _LinkInfo(object):
+
+    __slots__ = ('name', 'flags', 'type', 'speed', 'duplex')
+
+    def __init__(self, name, flags, type, speed, duplex):
+        self.name = name
+        self.flags = flags
+        self.type = type
+        self.speed = speed
+        self.duplex = duplex
+
+
+class _LinkInfoCache(object):
+    """
+    Keep the type, speed and duplex of the links, which are not part of the
+    netlink link dump and require reading sysfs and ethtool for every link.
+
+    The values change only when the link changes, so they are kept until a
+    link event is received for the link, or the link flags reported by the
+    dump change. Since the speed of a bond or a vlan depends on other links,
+    bonds and vlans are invalidated on every link event.
+
+    If the link monitor cannot be started, the values are read on every call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._links = {}
+        self._generation = 0
+        self._monitor = None
+
+    def get(self, link_stats):
+        monitoring = self._ensure_monitor()
+        with self._lock:
+            info = self._links.get(link_stats.index)
+            generation = self._generation
+
+        if (
+            info is not None
+            and info.name == link_stats.name
+            and info.flags == link_stats.flags
+        ):
+            return info
+
+        info = _read_link_info(link_stats)
+
+        if monitoring:
+            with self._lock:
+                # Do not keep values read before an invalidating event.
+                if generation == self._generation:
+                    self._links[link_stats.index] = info
+
+        return info
+
+    def _ensure_monitor(self):
+        with self._lock:
+            if self._monitor is not None:
+                return True
+            try:
+                self._monitor = monitor.subscribe(
+                    self._invalidate, ('link',), stopped=self._stopped
+                )
+            except Exception:
+                logging.warning(
+                    'Cannot monitor link events, link speed is not cached',
+                    exc_info=True,
+                )
+                return False
+        return True
+
+    def _stopped(self):
+        with self._lock:
+            self._links.clear()
+            self._generation += 1
+            self._monitor = None
+
+    def _invalidate(self, event):
+        with self._lock:
+            self._generation += 1
+            self._links.pop(event.get('index'), None)
+            self._links.pop(event.get('master_index'), None)
+            for index, info in list(self._links.items()):
+                if info.type in (iface.Type.BOND, iface.Type.VLAN):
+                    del self._links[index]
+
+
+def _read_link_info(link_stats):
+    name = link_stats.name
+    link_type = link_stats.type or iface.get_alternative_type(name)
+
     speed = 0
-    if interface.type() == iface.Type.NIC:
-        speed = nic.speed(interface.device)
-    elif interface.type() == iface.Type.BOND:
-        speed = bond.speed(interface.device)
-    elif interface.type() == iface.Type.VLAN:
-        speed = vlan.speed(interface.device)
+    if link_type == iface.Type.NIC:
+        if link.is_link_up(link_stats.flags, check_oper_status=True):
+            try:
+                speed = nic.read_speed_using_sysfs(name)
+            except Exception:
+                logging.debug('cannot read %s speed', name)
+    elif link_type == iface.Type.BOND:
+        speed = bond.speed(name)
+    elif link_type == iface.Type.VLAN:
+        speed = vlan.speed(name)
 
-    stats['speed'] = speed
-    stats['duplex'] = nic.duplex(interface.device)
+    return _LinkInfo(
+        name, link_stats.flags, link_type, speed, nic.duplex(name)
+    )
 
-    return stats
+
+_link_info = _LinkInfoCache()
@@ -1,13 +1,16 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import copy
 import errno
 import logging
+import threading
 
 from vdsm.network import ipwrapper
 from vdsm.network import link
 from vdsm.network import nmstate
 from vdsm.network.ip.address import ipv6_supported
+from vdsm.network.netlink import monitor
 from vdsm.network.netconfpersistence import RunningConfig
 
 from . import bonding
@@ -34,35 +37,174 @@ def _get(vdsmnets=None):
     retrieving data from the running config.
     :return: Dict of networking devices with all their details.
     """
-    ipaddrs = getIpAddrs()
-    routes = get_routes()
-
-    devices_info = _devices_report(ipaddrs, routes)
+    ipaddrs, routes, devices_info = _state.devices_report()
     nets_info = _networks_report(vdsmnets, routes, ipaddrs, devices_info)
 
     add_qos_info_to_devices(nets_info, devices_info)
 
     flat_devs_info = _get_flat_devs_info(devices_info)
     devices = _get_dev_names(nets_info, flat_devs_info)
-    extra_info = _create_default_extra_info(devices)
-
-    current_state = nmstate.get_current_state()
-    extra_info.update(
-        _get_devices_info_from_nmstate(
-            current_state.filtered_interfaces(devices)
-        )
-    )
+    extra_info, nameservers = _state.extra_info(devices)
 
     _update_caps_info(nets_info, flat_devs_info, extra_info)
 
     networking_report = {'networks': nets_info}
     networking_report.update(devices_info)
-    networking_report['nameservers'] = current_state.dns_state
+    networking_report['nameservers'] = nameservers
     networking_report['supportsIPv6'] = ipv6_supported()
 
     return networking_report
 
 
+def invalidate(devices=None):
+    """
+    Drop the cached network state, so the next report is built from scratch.
+    Must be called after changing the network configuration, since the
+    netlink events of the change may not have been handled yet.
+
+    If devices are specified, only the nmstate information of these devices
+    is dropped.
+    """
+    _state.invalidate(devices)
+
+
+class _NetworkStateCache(object):
+    """
+    Keep the devices report and the nmstate information of the devices
+    between reports.
+
+    The devices report (addresses, routes and devices) is built again after
+    any link, address or route event. The nmstate information (dhcp and ipv6
+    autoconf) is kept per device and dropped on link and address events of
+    the device. NetworkManager is queried only if a reported device has no
+    information, and the name servers are updated on each query.
+
+    Changes which are not seen as netlink events are reported after calling
+    invalidate(). If the netlink monitor cannot be started, nothing is
+    cached.
+    """
+
+    GROUPS = (
+        'link',
+        'ipv4-ifaddr',
+        'ipv6-ifaddr',
+        'ipv4-route',
+        'ipv6-route',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._report = None
+        self._extra_info = {}
+        self._nameservers = None
+        self._generation = 0
+        self._monitor = None
+
+    def devices_report(self):
+        """
+        Return the addresses, the routes and the devices report. The devices
+        report is a copy which may be modified by the caller.
+        """
+        monitoring = self._ensure_monitor()
+        with self._lock:
+            report = self._report
+            generation = self._generation
+
+        if report is None:
+            ipaddrs = getIpAddrs()
+            routes = get_routes()
+            report = (ipaddrs, routes, _devices_report(ipaddrs, routes))
+            if monitoring:
+                with self._lock:
+                    # Do not keep a report built before an event.
+                    if generation == self._generation:
+                        self._report = report
+
+        ipaddrs, routes, devices_info = report
+        return ipaddrs, routes, copy.deepcopy(devices_info)
+
+    def extra_info(self, devices):
+        """
+        Return the nmstate information of the devices and the name servers.
+        """
+        monitoring = self._ensure_monitor()
+        with self._lock:
+            extra_info = {
+                devname: dict(self._extra_info[devname])
+                for devname in devices
+                if devname in self._extra_info
+            }
+            nameservers = self._nameservers
+            generation = self._generation
+
+        missing = frozenset(devices).difference(extra_info)
+        if not missing and nameservers is not None:
+            return extra_info, nameservers
+
+        current_state = nmstate.get_current_state()
+        missing_info = _create_default_extra_info(missing)
+        if missing:
+            missing_info.update(
+                _get_devices_info_from_nmstate(
+                    current_state.filtered_interfaces(missing)
+                )
+            )
+        nameservers = current_state.dns_state
+
+        if monitoring:
+            with self._lock:
+                if generation == self._generation:
+                    self._extra_info.update(copy.deepcopy(missing_info))
+                    self._nameservers = nameservers
+
+        extra_info.update(missing_info)
+        return extra_info, nameservers
+
+    def invalidate(self, devices=None):
+        with self._lock:
+            self._generation += 1
+            self._report = None
+            if devices is None:
+                self._extra_info.clear()
+            else:
+                for devname in devices:
+                    self._extra_info.pop(devname, None)
+            self._nameservers = None
+
+    def _ensure_monitor(self):
+        with self._lock:
+            if self._monitor is not None:
+                return True
+            try:
+                self._monitor = monitor.subscribe(
+                    self._handle_event, self.GROUPS, stopped=self._stopped
+                )
+            except Exception:
+                logging.warning(
+                    'Cannot monitor network events, network state is not '
+                    'cached',
+                    exc_info=True,
+                )
+                return False
+        return True
+
+    def _stopped(self):
+        self.invalidate()
+        with self._lock:
+            self._monitor = None
+
+    def _handle_event(self, event):
+        with self._lock:
+            self._generation += 1
+            self._report = None
+            # Link events carry the link name, address events the label.
+            self._extra_info.pop(event.get('name'), None)
+            self._extra_info.pop(event.get('label'), None)
+
+
+_state = _NetworkStateCache()
+
+
 def add_qos_info_to_devices(nets_info, devices_info):
     """Update Qos data from networks on corresponding nic/bond"""
 
@@ -25,6 +25,7 @@ from ctypes import c_char_p
 from ctypes import c_int
 from ctypes import c_size_t
 from ctypes import c_uint32
+from ctypes import c_uint64
 from ctypes import c_ushort
 from ctypes import c_void_p
 from ctypes import get_errno
@@ -153,6 +154,18 @@ class IfaceStatus(object):
     IFF_ECHO = 1 << 18
 
 
+# libnl/include/netlink/route/link.h
+class RtnlLinkStat(object):
+    RTNL_LINK_RX_PACKETS = 0
+    RTNL_LINK_TX_PACKETS = 1
+    RTNL_LINK_RX_BYTES = 2
+    RTNL_LINK_TX_BYTES = 3
+    RTNL_LINK_RX_ERRORS = 4
+    RTNL_LINK_TX_ERRORS = 5
+    RTNL_LINK_RX_DROPPED = 6
+    RTNL_LINK_TX_DROPPED = 7
+
+
 # include/netlink/handlers.h
 class NlCbAction(object):
     NL_OK = 0  # Proceed with whatever would come next
@@ -873,6 +886,23 @@ def rtnl_link_get_qdisc(link):
     return conversion_util.to_str(qdisc) if qdisc else None
 
 
+def rtnl_link_get_stat(link, stat_id):
+    """Return statistical counter of link object.
+
+    @arg link            Link object
+    @arg stat_id         Counter ID, one of RtnlLinkStat values
+
+    The counters are filled from the IFLA_STATS64 attribute of the link
+    message, so reading them does not require any additional request.
+
+    @return Value of the counter, 0 if the counter is not available.
+    """
+    _rtnl_link_get_stat = _libnl_route(
+        'rtnl_link_get_stat', c_uint64, c_void_p, c_int
+    )
+    return _rtnl_link_get_stat(link, stat_id)
+
+
 def rtnl_link_i2name(cache, ifindex):
     """Translate interface index to corresponding link name.
 
@@ -1065,6 +1095,72 @@ def rtnl_route_nh_get_gateway(next_hop):
     return _rtnl_route_nh_get_gateway(next_hop)
 
 
+def rtnl_qdisc_alloc_cache(socket):
+    """Allocate new cache and fill it with the qdiscs of all the links.
+
+    @arg socket          Netlink socket
+
+    @return Newly allocated cache with qdiscs obtained from kernel.
+    """
+    _rtnl_qdisc_alloc_cache = _libnl_route(
+        'rtnl_qdisc_alloc_cache', c_int, c_void_p, c_void_p
+    )
+    cache = c_void_p()
+    err = _rtnl_qdisc_alloc_cache(socket, byref(cache))
+    if err:
+        raise IOError(-err, nl_geterror(err))
+    return cache
+
+
+def rtnl_tc_get_ifindex(tc):
+    """Return interface index of traffic control object.
+
+    @arg tc              Traffic control object (qdisc, class or classifier)
+
+    @return Interface index.
+    """
+    _rtnl_tc_get_ifindex = _libnl_route('rtnl_tc_get_ifindex', c_int, c_void_p)
+    return _rtnl_tc_get_ifindex(tc)
+
+
+def rtnl_tc_get_handle(tc):
+    """Return identifier of traffic control object.
+
+    @arg tc              Traffic control object (qdisc, class or classifier)
+
+    @return 32-bit handle, major number in the upper 16 bits.
+    """
+    _rtnl_tc_get_handle = _libnl_route(
+        'rtnl_tc_get_handle', c_uint32, c_void_p
+    )
+    return _rtnl_tc_get_handle(tc)
+
+
+def rtnl_tc_get_parent(tc):
+    """Return parent identifier of traffic control object.
+
+    @arg tc              Traffic control object (qdisc, class or classifier)
+
+    @return 32-bit parent handle, TC_H_ROOT for root objects.
+    """
+    _rtnl_tc_get_parent = _libnl_route(
+        'rtnl_tc_get_parent', c_uint32, c_void_p
+    )
+    return _rtnl_tc_get_parent(tc)
+
+
+def rtnl_tc_get_kind(tc):
+    """Return kind of traffic control object.
+
+    @arg tc              Traffic control object (qdisc, class or classifier)
+
+    @return Kind of the object (e.g. "hfsc" or "ingress") or None.
+    """
+    _rtnl_tc_get_kind = _libnl_route('rtnl_tc_get_kind', c_char_p, c_void_p)
+    kind = _rtnl_tc_get_kind(tc)
+    return conversion_util.to_str(kind) if kind else None
+
+
 def c_object_argument(argument):
     """Prepare prepare Python object to be used as an C argument.
 
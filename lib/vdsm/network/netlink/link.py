@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+from collections import namedtuple
 from contextlib import contextmanager
 from functools import partial
 from socket import AF_UNSPEC
@@ -10,6 +11,22 @@ from . import _cache_manager
 from . import _pool
 from . import libnl
 
+LinkStats = namedtuple(
+    'LinkStats',
+    (
+        'index',
+        'name',
+        'type',
+        'flags',
+        'rx',
+        'tx',
+        'rx_dropped',
+        'tx_dropped',
+        'rx_errors',
+        'tx_errors',
+    ),
+)
+
 
 def get_link(name):
     """Returns the information dictionary of the name specified link."""
@@ -34,6 +51,21 @@ def iter_links():
                 link = libnl.nl_cache_get_next(link)
 
 
+def iter_links_stats():
+    """Generator that yields a LinkStats record for each link of the system.
+
+    All the links and their statistics are fetched using a single RTM_GETLINK
+    dump, so the cost does not depend on the number of links. The type is None
+    if the kernel does not report the link type (e.g. for a NIC).
+    """
+    with _pool.socket() as sock:
+        with _nl_link_cache(sock) as cache:
+            link = libnl.nl_cache_get_first(cache)
+            while link:
+                yield _link_stats(link)
+                link = libnl.nl_cache_get_next(link)
+
+
 def is_link_up(link_flags, check_oper_status):
     """
     Check link status based on device status flags.
@@ -90,6 +122,23 @@ def _link_info(link, cache=None):
     return info
 
 
+def _link_stats(link):
+    """Returns a LinkStats record of the link object."""
+    stat = libnl.RtnlLinkStat
+    return LinkStats(
+        index=libnl.rtnl_link_get_ifindex(link),
+        name=libnl.rtnl_link_get_name(link),
+        type=libnl.rtnl_link_get_type(link),
+        flags=libnl.rtnl_link_get_flags(link),
+        rx=libnl.rtnl_link_get_stat(link, stat.RTNL_LINK_RX_BYTES),
+        tx=libnl.rtnl_link_get_stat(link, stat.RTNL_LINK_TX_BYTES),
+        rx_dropped=libnl.rtnl_link_get_stat(link, stat.RTNL_LINK_RX_DROPPED),
+        tx_dropped=libnl.rtnl_link_get_stat(link, stat.RTNL_LINK_TX_DROPPED),
+        rx_errors=libnl.rtnl_link_get_stat(link, stat.RTNL_LINK_RX_ERRORS),
+        tx_errors=libnl.rtnl_link_get_stat(link, stat.RTNL_LINK_TX_ERRORS),
+    )
+
+
 def _link_index_to_name(link_index, cache=None):
     """Returns the textual name of the link with index equal to link_index."""
     if cache is None:
@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 from contextlib import closing, contextmanager
+from ctypes import cast, py_object
 import logging
 import os
 import queue
@@ -54,6 +55,22 @@ def ifla_monitor(groups=frozenset(), timeout=None, silent_timeout=False):
     return Monitor(_c_ifla_event_input, groups, timeout, silent_timeout)
 
 
+def subscribe(handler, groups, stopped=None):
+    """
+    Call handler with the events of the groups, received by the netlink
+    monitor shared by all the subscribers of the process. Besides the
+    objects events of object_monitor(), the events of the link group include
+    the IFLA events of ifla_monitor().
+
+    The handlers are called by the monitor thread in the order of the events,
+    and should return quickly. If the monitor fails, stopped is called and
+    the subscription is dropped, the subscriber may subscribe again.
+
+    Returns a Subscription, call its unsubscribe() to stop receiving events.
+    """
+    return _shared_monitor.subscribe(handler, groups, stopped)
+
+
 class Monitor:
     """Netlink monitor. Usage:
 
@@ -208,6 +225,117 @@ class Monitor:
         self._scan_thread.join()
 
 
+class Subscription(object):
+    def __init__(self, shared_monitor, handler, groups, stopped):
+        self._shared_monitor = shared_monitor
+        self.handler = handler
+        self.groups = frozenset(groups)
+        self.stopped = stopped
+
+    def unsubscribe(self):
+        self._shared_monitor.unsubscribe(self)
+
+
+class _SharedMonitor(object):
+    """
+    Multiplex the events of a single netlink monitor to several subscribers,
+    instead of opening a socket and running a thread for each of them.
+
+    The monitor is started by the first subscription and stopped when the
+    last subscription is removed.
+    """
+
+    GROUPS = (
+        'link',
+        'ipv4-ifaddr',
+        'ipv6-ifaddr',
+        'ipv4-route',
+        'ipv6-route',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self._monitor = None
+
+    def subscribe(self, handler, groups, stopped=None):
+        unknown_groups = frozenset(groups).difference(self.GROUPS)
+        if unknown_groups:
+            raise AttributeError('Invalid groups: %s' % (unknown_groups,))
+        subscription = Subscription(self, handler, groups, stopped)
+        with self._lock:
+            if self._monitor is None:
+                mon = Monitor(_c_shared_event_input, self.GROUPS)
+                mon.start()
+                self._monitor = mon
+                t = concurrent.thread(
+                    self._serve, args=(mon,), name='netlink/shared'
+                )
+                t.start()
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            try:
+                self._subscriptions.remove(subscription)
+            except ValueError:
+                return  # Dropped when the monitor stopped.
+            if self._subscriptions:
+                return
+            mon = self._monitor
+            self._monitor = None
+        mon.stop()
+        mon.wait()
+
+    def _serve(self, mon):
+        try:
+            for event in mon:
+                self._dispatch(event)
+        except MonitorError:
+            logging.exception('Shared netlink monitor failed')
+        finally:
+            with self._lock:
+                if self._monitor is not mon:
+                    return  # Stopped by the last unsubscribe.
+                self._monitor = None
+                subscriptions = self._subscriptions
+                self._subscriptions = []
+            for subscription in subscriptions:
+                if subscription.stopped is not None:
+                    subscription.stopped()
+
+    def _dispatch(self, event):
+        group = _event_group(event)
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if group in subscription.groups:
+                try:
+                    subscription.handler(event)
+                except Exception:
+                    logging.exception(
+                        'Unhandled error handling netlink event %s', event
+                    )
+
+
+def _event_group(event):
+    if 'IFLA_EVENT' in event:
+        return 'link'
+    kind = event.get('event', '').split('_')[-1]
+    if kind == 'link':
+        return 'link'
+    family = 'ipv6' if event.get('family') == 'inet6' else 'ipv4'
+    if kind == 'addr':
+        return family + '-ifaddr'
+    if kind == 'route':
+        return family + '-route'
+    return None
+
+
+_shared_monitor = _SharedMonitor()
+
+
 def _object_input(obj, queue):
     """This function serves as a callback for nl_msg_parse(message, callback,
     extra_argument) function. When nl_msg_parse() is called, it passes message
@@ -278,6 +406,20 @@ def _event_input(msg, c_queue):
 _c_event_input = libnl.prepare_cfunction_for_nl_socket_modify_cb(_event_input)
 
 
+def _shared_event_input(msg, c_queue):
+    """This function serves as a callback for the socket of the shared
+    monitor, reporting both the objects and the IFLA events of the message.
+    """
+    libnl.nl_msg_parse(msg, _c_object_input, c_queue)
+    _ifla_event_input(msg, cast(c_queue, py_object).value)
+    return libnl.NlCbAction.NL_STOP
+
+
+_c_shared_event_input = libnl.prepare_cfunction_for_nl_socket_modify_cb(
+    _shared_event_input
+)
+
+
 @contextmanager
 def _monitoring_socket(queue, groups, epoll, c_callback_function):
     c_queue = libnl.c_object_argument(queue)
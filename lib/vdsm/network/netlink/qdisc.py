@@ -0,0 +1,65 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from functools import partial
+
+from . import _cache_manager
+from . import _pool
+from . import libnl
+from .link import _nl_link_cache
+
+TC_H_ROOT = 0xFFFFFFFF
+TC_H_UNSPEC = 0
+
+
+def iter_qdiscs(dev=None):
+    """Generator that yields an information dictionary for each qdisc in the
+    system, or of the dev link, using a single netlink dump.
+
+    The dictionaries hold the general qdisc attributes reported by
+    "tc qdisc show": kind, handle, dev and either root or parent, using the
+    same textual handle format. Noqueue qdiscs are skipped like the tc
+    output parser does."""
+    with _pool.socket() as sock:
+        with _nl_qdisc_cache(sock) as qdisc_cache:
+            with _nl_link_cache(sock) as link_cache:  # for index to name
+                qdisc = libnl.nl_cache_get_first(qdisc_cache)
+                while qdisc:
+                    info = _qdisc_info(qdisc, link_cache)
+                    if info['kind'] != 'noqueue' and (
+                        dev is None or info['dev'] == dev
+                    ):
+                        yield info
+                    qdisc = libnl.nl_cache_get_next(qdisc)
+
+
+def _qdisc_info(qdisc, link_cache):
+    """Returns a dictionary with the qdisc information."""
+    data = {
+        'kind': libnl.rtnl_tc_get_kind(qdisc),
+        'handle': format_handle(libnl.rtnl_tc_get_handle(qdisc)),
+        'dev': libnl.rtnl_link_i2name(
+            link_cache, libnl.rtnl_tc_get_ifindex(qdisc)
+        ),
+    }
+    parent = libnl.rtnl_tc_get_parent(qdisc)
+    if parent == TC_H_ROOT:
+        data['root'] = True
+    elif parent != TC_H_UNSPEC:
+        data['parent'] = format_handle(parent)
+    return data
+
+
+def format_handle(handle):
+    """Returns the textual form of a tc handle, as printed by tc."""
+    major = handle >> 16
+    minor = handle & 0xFFFF
+    if minor == 0:
+        return '%x:' % major
+    elif major == 0:
+        return ':%x' % minor
+    else:
+        return '%x:%x' % (major, minor)
+
+
+_nl_qdisc_cache = partial(_cache_manager, libnl.rtnl_qdisc_alloc_cache)
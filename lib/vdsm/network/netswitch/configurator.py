@@ -18,6 +18,7 @@ from vdsm.network.netlink import waitfor
 from vdsm.network.link import bond
 from vdsm.network.netinfo import bridges
 from vdsm.network.netinfo.cache import get as netinfo_get, NetInfo
+from vdsm.network.netinfo.cache import invalidate as netinfo_invalidate
 from vdsm.network.netinfo.cache import get_net_iface_from_config
 
 from . import validator
@@ -65,14 +66,26 @@ def _setup_nmstate(networks, bondings, options, in_rollback):
     used (the Transaction context).
     """
     logging.info('Processing setup through nmstate')
-    desired_state = nmstate.generate_state(networks, bondings)
+    start = monotonic_time()
+    current_state = nmstate.get_current_state()
+    desired_state = nmstate.generate_state(networks, bondings, current_state)
+    ifnames = nmstate.remove_unchanged_interfaces(desired_state, current_state)
     logging.info('Desired state: %s', desired_state)
     _setup_dynamic_src_routing(networks)
-    nmstate.setup(desired_state, verify_change=not in_rollback)
-    net_info = NetInfo(netinfo_get())
+    if desired_state:
+        try:
+            nmstate.setup(desired_state, verify_change=not in_rollback)
+        finally:
+            netinfo_invalidate(ifnames)
+    logging.info(
+        'Applied %d networks changing %d interfaces in %.2f seconds',
+        len(networks),
+        len(ifnames),
+        monotonic_time() - start,
+    )
 
     with Transaction(in_rollback=in_rollback, persistent=False) as config:
-        _setup_qos(networks, net_info, config.networks)
+        _setup_qos(networks, config.networks)
         for net_name, net_attrs in networks.items():
             if net_attrs.get('remove'):
                 config.removeNetwork(net_name)
@@ -90,13 +103,17 @@ def _setup_nmstate(networks, bondings, options, in_rollback):
         connectivity.check(options)
 
 
-def _setup_qos(networks, net_info, rnetworks):
+def _setup_qos(networks, rnetworks):
+    net_info = None
     for net_name, net_attrs in _order_networks(networks):
         rnet_attrs = rnetworks.get(net_name, {})
         out = _get_qos_out(net_attrs)
         rout = _get_qos_out(rnet_attrs)
 
         if net_attrs.get('remove') or (rout and not out):
+            # Reporting the devices is needed only for removing qos.
+            if net_info is None:
+                net_info = NetInfo(netinfo_get())
             _remove_qos(rnet_attrs, net_info)
         elif out:
             _configure_qos(net_attrs, out)
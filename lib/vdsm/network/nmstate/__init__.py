@@ -8,6 +8,7 @@ from .api import get_current_state
 from .api import is_autoconf_enabled
 from .api import is_dhcp_enabled
 from .api import ovs_netinfo
+from .api import remove_unchanged_interfaces
 from .api import setup
 from .api import state_show
 from .api import update_num_vfs
@@ -35,6 +36,7 @@ __all__ = [
     'is_autoconf_enabled',
     'is_dhcp_enabled',
     'ovs_netinfo',
+    'remove_unchanged_interfaces',
     'setup',
     'state_show',
     'update_num_vfs',
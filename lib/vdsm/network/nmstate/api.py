@@ -29,10 +29,14 @@ def setup(desired_state, verify_change):
     state_apply(desired_state, verify_change=verify_change)
 
 
-def generate_state(networks, bondings):
-    """Generate a new nmstate state given VDSM setup state format"""
+def generate_state(networks, bondings, current_state=None):
+    """
+    Generate a new nmstate state given VDSM setup state format.
+    The current state is read from nmstate if not specified.
+    """
     rconfig = RunningConfig()
-    current_state = get_current_state()
+    if current_state is None:
+        current_state = get_current_state()
 
     ovs_nets, linux_br_nets = split_switch_type(networks, rconfig.networks)
     ovs_bonds, linux_br_bonds = split_switch_type(bondings, rconfig.bonds)
@@ -53,6 +57,48 @@ def generate_state(networks, bondings):
     return net_state.state()
 
 
+def remove_unchanged_interfaces(desired_state, current_state):
+    """
+    Remove the interfaces which are already in their desired state from the
+    desired state, so nmstate applies and verifies only the interfaces which
+    change.
+
+    An interface is unchanged if all the values of its desired state are
+    reported by the current state. Lists must match item by item.
+
+    :returns: The names of the interfaces left in the desired state.
+    :rtype: set
+    """
+    current_ifstates = current_state.interfaces_state
+    ifstates = [
+        ifstate
+        for ifstate in desired_state.get(Interface.KEY, ())
+        if not _is_subset(
+            ifstate, current_ifstates.get(ifstate[Interface.NAME])
+        )
+    ]
+    if ifstates:
+        desired_state[Interface.KEY] = ifstates
+    else:
+        desired_state.pop(Interface.KEY, None)
+    return {ifstate[Interface.NAME] for ifstate in ifstates}
+
+
+def _is_subset(desired, current):
+    if isinstance(desired, dict):
+        return isinstance(current, dict) and all(
+            key in current and _is_subset(value, current[key])
+            for key, value in desired.items()
+        )
+    if isinstance(desired, list):
+        return (
+            isinstance(current, list)
+            and len(desired) == len(current)
+            and all(_is_subset(d, c) for d, c in zip(desired, current))
+        )
+    return desired == current
+
+
 def get_current_state():
     state = state_show()
     return CurrentState(state)
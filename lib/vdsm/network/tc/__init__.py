@@ -6,47 +6,43 @@ from functools import partial
 import errno
 
 from vdsm.network import ipwrapper
+from vdsm.network.netlink import qdisc as netlink_qdisc
 
 from . import filter as tc_filter
 from . import _parser
 from . import cls
 from . import qdisc
 from ._wrapper import TrafficControlException
+from ._wrapper import batch
 
 QDISC_INGRESS = 'ffff:'
 MISSING_OBJ_ERR_CODES = (errno.EINVAL, errno.ENOENT, errno.EOPNOTSUPP)
 
 
-def _addTarget(network, parent, target):
-    fs = list(filters(network, parent))
-    if fs:
-        filt = fs[0]
-    else:
-        filt = Filter(prio=None, handle=None, actions=[])
-    filt.actions.append(MirredAction(target))
-    _filter_replace(network, parent, filt)
-
-
-def _delTarget(network, parent, target):
-    fs = list(filters(network, parent))
-    if fs:
-        filt = fs[0]
-    else:
-        return []
-
+def _delTargets(network, parents, target):
+    fs = [_mirror_filter(network, parent) for parent in parents]
     devices = set(link.name for link in ipwrapper.getLinks())
-    acts = [
-        act
-        for act in filt.actions
-        if act.target in devices and act.target != target
-    ]
-
-    if acts:
-        filt = Filter(prio=filt.prio, handle=filt.handle, actions=acts)
-        _filter_replace(network, parent, filt)
-    else:
-        tc_filter.delete(network, filt.prio, parent=parent)
-    return acts
+    remaining = []
+    with batch():
+        for parent, filt in zip(parents, fs):
+            if filt is None:
+                continue
+            acts = [
+                act
+                for act in filt.actions
+                if act.target in devices and act.target != target
+            ]
+            if acts:
+                filt = Filter(prio=filt.prio, handle=filt.handle, actions=acts)
+                _filter_replace(network, parent, filt)
+            else:
+                tc_filter.delete(network, filt.prio, parent=parent)
+            remaining += acts
+    return remaining
+
+
+def _mirror_filter(network, parent):
+    return next(filters(network, parent), None)
 
 
 def setPortMirroring(network, target):
@@ -61,13 +57,42 @@ def setPortMirroring(network, target):
 
     this commands mirror all 'networkName' traffic to 'ifaceName'
     '''
-    _qdisc_replace_ingress(network)
-    _addTarget(network, QDISC_INGRESS, target)
+    setPortMirroringMany([(network, target)])
 
-    qdisc.replace(network, 'prio', parent=None)
-    qdisc_id = next(_qdiscs_of_device(network))
-    _addTarget(network, qdisc_id, target)
-    ipwrapper.getLink(network).promisc = True
+
+def setPortMirroringMany(mirrors):
+    '''
+    Copy the traffic of bridges to interfaces, like setPortMirroring.
+
+    :param mirrors: (network, target) pairs, mirroring the traffic of the
+                    network bridge to the target interface
+    :type mirrors: list
+
+    The qdiscs of every network are set up once, and the filters of all the
+    networks are replaced with a single tc batch.
+    '''
+    targets = {}
+    for network, target in mirrors:
+        targets.setdefault(network, []).append(target)
+
+    # Read all the filters before changing them in a single batch.
+    changes = []
+    for network in targets:
+        _qdisc_replace_ingress(network)
+        qdisc.replace(network, 'prio', parent=None)
+        qdisc_id = next(_qdiscs_of_device(network))
+        for parent in (QDISC_INGRESS, qdisc_id):
+            changes.append((network, parent, _mirror_filter(network, parent)))
+
+    with batch():
+        for network, parent, filt in changes:
+            if filt is None:
+                filt = Filter(prio=None, handle=None, actions=[])
+            filt.actions.extend(MirredAction(t) for t in targets[network])
+            _filter_replace(network, parent, filt)
+
+    for network in targets:
+        ipwrapper.getLink(network).promisc = True
 
 
 def unsetPortMirroring(network, target):
@@ -82,12 +107,12 @@ def unsetPortMirroring(network, target):
     # TODO handle the case where we have partial definitions on device due to
     # vdsm crash
     '''
-    acts = _delTarget(network, QDISC_INGRESS, target)
+    parents = [QDISC_INGRESS]
     try:
-        qdisc_id = next(_qdiscs_of_device(network))
-        acts += _delTarget(network, qdisc_id, target)
+        parents.append(next(_qdiscs_of_device(network)))
     except StopIteration:
         pass
+    acts = _delTargets(network, parents, target)
 
     if not acts:
         _qdisc_del(network)
@@ -180,6 +205,19 @@ def _iterate(module, dev, out=None, **kwargs):
         yield module.parse(tokens)
 
 
+def qdiscs(dev, out=None):
+    """
+    Generates information dictionaries of the qdiscs of dev, or of all the
+    devices if dev is None.
+
+    Unless tc output is given, the qdiscs are read with a single netlink dump
+    instead of running tc, reporting only the general qdisc attributes (kind,
+    handle, dev and root or parent).
+    """
+    if out is None:
+        return netlink_qdisc.iter_qdiscs(dev)
+    return _iterate(qdisc, dev, out=out)
+
+
 _filters = partial(_iterate, tc_filter)  # kwargs: parent and pref
-qdiscs = partial(_iterate, qdisc)  # kwargs: dev
 classes = partial(_iterate, cls)  # kwargs: parent and classid
@@ -1,32 +1,96 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+from contextlib import contextmanager
 import errno
 import os
+import tempfile
+import threading
 
 from vdsm.network import cmd
 
 EXT_TC = '/sbin/tc'
 _TC_ERR_PREFIX = 'RTNETLINK answers: '
+_TC_BATCH_ERR_PREFIX = 'Command failed '
 _errno_trans = dict(((os.strerror(code), code) for code in errno.errorcode))
 
+_local = threading.local()
+
 
 def process_request(command):
+    commands = getattr(_local, 'commands', None)
+    if commands is not None:
+        if command[1] == 'show':
+            raise RuntimeError('Cannot batch tc request: %s' % command)
+        commands.append(command)
+        return ''
     command.insert(0, EXT_TC)
     retcode, out, err = cmd.exec_sync(command)
     if retcode != 0:
         if retcode == 2 and err:
-            for err_line in err.splitlines():
-                if err_line.startswith(_TC_ERR_PREFIX):
-                    err = err_line
-                    retcode = _errno_trans.get(
-                        err[len(_TC_ERR_PREFIX) :].strip()  # noqa: E203
-                    )
-                    break
+            retcode, err = _parse_error(err, retcode)
         raise TrafficControlException(retcode, err, command)
     return out
 
 
+@contextmanager
+def batch():
+    """
+    Collect the tc requests made by this thread, and process all of them
+    with a single tc process when the context exits.
+
+    tc stops at the first failing request, raising TrafficControlException
+    for it. Only requests which do not read the state (show), and whose
+    failure is not handled by the caller, may be batched.
+    """
+    if getattr(_local, 'commands', None) is not None:
+        yield  # Nested batch, processed by the outer one.
+        return
+    _local.commands = []
+    try:
+        yield
+        commands = _local.commands
+    finally:
+        _local.commands = None
+    if commands:
+        _process_batch(commands)
+
+
+def _process_batch(commands):
+    with tempfile.NamedTemporaryFile(mode='w', prefix='tc-batch-') as f:
+        for command in commands:
+            f.write(' '.join(_quote(token) for token in command) + '\n')
+        f.flush()
+        retcode, _, err = cmd.exec_sync([EXT_TC, '-batch', f.name])
+    if retcode != 0:
+        command = commands
+        for err_line in err.splitlines():
+            if err_line.startswith(_TC_BATCH_ERR_PREFIX):
+                # Command failed <file>:<line>
+                line = err_line.rsplit(':', 1)[-1]
+                if line.isdigit() and 0 < int(line) <= len(commands):
+                    command = commands[int(line) - 1]
+                break
+        retcode, err = _parse_error(err, retcode)
+        raise TrafficControlException(retcode, err, command)
+
+
+def _parse_error(err, retcode):
+    for err_line in err.splitlines():
+        if err_line.startswith(_TC_ERR_PREFIX):
+            return (
+                _errno_trans.get(
+                    err_line[len(_TC_ERR_PREFIX) :].strip()  # noqa: E203
+                ),
+                err_line,
+            )
+    return retcode, err
+
+
+def _quote(token):
+    return '"%s"' % token if ' ' in token else token
+
+
 class TrafficControlException(Exception):
     def __init__(self, errCode, message, command):
         self.errCode = errCode
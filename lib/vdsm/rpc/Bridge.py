@@ -342,6 +342,7 @@ command_info = {
     'Host_getStorageDomains': {'ret': 'domlist'},
     'Host_getStorageRepoStats': {'ret': Host_getStorageRepoStats_Ret},
     'Host_hostdevListByCaps': {'ret': 'deviceList'},
+    'Host_createVms': {'ret': 'vms'},
     'Host_dumpxmls': {'ret': 'domxmls'},
     'Host_getVMList': {'call': Host_getVMList_Call, 'ret': 'vmList'},
     'Host_getVMFullList': {'call': Host_getVMFullList_Call, 'ret': 'vmList'},
@@ -434,6 +435,7 @@ command_info = {
     'Lease_rebuild_leases': {'ret': 'uuid'},
     'Lease_info': {'ret': 'result'},
     'Lease_status': {'ret': 'result'},
+    'Lease_bulk_status': {'ret': 'result'},
     'NBD_start_server': {'ret': 'result'},
     'ManagedVolume_attach_volume': {'ret': 'result'},
     'ManagedVolume_volumes_info': {'ret': 'result'},
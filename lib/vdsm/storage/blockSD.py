@@ -138,6 +138,19 @@ METADATA_BASE_V5 = MiB
 # Size of metadata slot in v5
 METADATA_SLOT_SIZE_V5 = 8 * KiB
 
+# Maximum size of a single read when reading metadata of multiple volumes.
+# Reading in large chunks minimizes the number of I/O operations, and limits
+# the memory used when reading metadata of thousands of volumes.
+METADATA_READ_CHUNK = 8 * MiB
+
+# Maximum gap between metadata blocks read together. Reading a few unused
+# slots is cheaper than another I/O, but blocks far apart are read
+# separately, so a few sparse slots do not cost a read of the entire chunk.
+METADATA_READ_MAX_GAP = 4 * METADATA_SLOT_SIZE_V5
+
+# Number of volumes read together when dumping volumes metadata.
+DUMP_BATCH_SIZE = 1000
+
 
 def encodePVInfo(pvInfo):
     return (
@@ -205,7 +218,9 @@ def _getVolsTree(sdUUID):
 
 
 def _iter_volumes(sdUUID):
-    for lv in lvm.getAllLVs(sdUUID):
+    # Volumes are identified only by name and tags. The size is reported for
+    # dumping inactive volumes, which have no device.
+    for lv in lvm.getAllLVs(sdUUID, fields=("vg_name", "size", "tags")):
         if lv.name in SPECIAL_LVS_V4:
             # Exclude special volumes.
             continue
@@ -268,6 +283,60 @@ def parse_lv_tags(lv):
     return LVTags(mdslot, image, parent)
 
 
+def read_metadata_blocks(
+    path,
+    offsets,
+    chunk_size=METADATA_READ_CHUNK,
+    max_gap=METADATA_READ_MAX_GAP,
+):
+    """
+    Read metadata blocks at offsets from metadata volume path.
+
+    Nearby blocks are read together using chunks of up to chunk_size bytes,
+    so reading metadata of all volumes in a domain requires few I/O
+    operations instead of one read per volume. Blocks separated by more than
+    max_gap bytes are read separately.
+
+    Arguments:
+        path (str): Path to the metadata volume.
+        offsets (iterable): Offsets of metadata blocks to read.
+        chunk_size (int): Maximum size of a single read.
+        max_gap (int): Maximum gap between blocks read together.
+
+    Returns:
+        dict mapping offset to metadata block (bytes)
+    """
+    blocks = {}
+    offsets = sorted(set(offsets))
+    i = 0
+
+    while i < len(offsets):
+        start = offsets[i]
+        end = start + sc.METADATA_SIZE
+
+        # Collect the next blocks close enough and fitting in this chunk.
+        j = i + 1
+        while (
+            j < len(offsets)
+            and offsets[j] - end <= max_gap
+            and offsets[j] + sc.METADATA_SIZE - start <= chunk_size
+        ):
+            end = offsets[j] + sc.METADATA_SIZE
+            j += 1
+
+        data = misc.readblock(path, start, end - start)
+
+        for offset in offsets[i:j]:
+            block_start = offset - start
+            blocks[offset] = bytes(
+                data[block_start : block_start + sc.METADATA_SIZE]
+            )
+
+        i = j
+
+    return blocks
+
+
 def getAllVolumes(sdUUID):
     """
     Return dict {volUUID: ((imgUUIDs,), parentUUID)} of the domain.
@@ -442,6 +511,14 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
         # BlockStorageDomain. The lock should not be used elsewhere.
         self.metadata_lock = threading.Lock()
 
+        # Volume metadata read in bulk by metadata_snapshot(), used only by
+        # the thread that took the snapshot. _md_writes counts writes per
+        # slot, so blocks modified after the snapshot was taken are read
+        # again from storage.
+        self._md_snapshot = threading.local()
+        self._md_writes_lock = threading.Lock()
+        self._md_writes = {}
+
     @classmethod
     def special_volumes(cls, version):
         if cls.supports_external_leases(version):
@@ -966,7 +1043,17 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
     def read_metadata_block(self, slot):
         """
         Reads metadata block from storage.
+
+        If the current thread took a metadata snapshot, and the slot was not
+        modified since the snapshot was taken, return the block from the
+        snapshot.
         """
+        snapshot = getattr(self._md_snapshot, "blocks", None)
+        if snapshot and slot in snapshot:
+            writes, block = snapshot[slot]
+            if writes == self._metadata_writes(slot):
+                return block
+
         # Function readblock is used here intentionally as it supports
         # short reads while DirectFile read doesn't.
         return misc.readblock(
@@ -975,6 +1062,64 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
             sc.METADATA_SIZE,
         )
 
+    def read_metadata_blocks(self, slots):
+        """
+        Read metadata blocks of multiple slots in bulk.
+
+        Returns:
+            dict mapping slot to metadata block (bytes)
+        """
+        version = self.getVersion()
+        offsets = {self.metadata_offset(slot, version): slot for slot in slots}
+        blocks = read_metadata_blocks(self.metadata_volume_path(), offsets)
+        return {offsets[offset]: block for offset, block in blocks.items()}
+
+    @contextmanager
+    def metadata_snapshot(self, img_id=None):
+        """
+        Read metadata of all volumes, or of volumes of image img_id, in bulk,
+        and use it for metadata reads in the current thread until the
+        context exits.
+
+        Blocks modified by write_metadata_block() after the snapshot was
+        taken are read again from storage. Nested snapshots use the outer
+        snapshot.
+        """
+        if getattr(self._md_snapshot, "blocks", None) is not None:
+            yield
+            return
+
+        slots = self.occupied_metadata_slots(img_id)
+
+        # Take the write counters before reading, so writes during the read
+        # invalidate the snapshot blocks.
+        writes = {slot: self._metadata_writes(slot) for slot in slots}
+        blocks = self.read_metadata_blocks(slots)
+
+        self._md_snapshot.blocks = {
+            slot: (writes[slot], block) for slot, block in blocks.items()
+        }
+        try:
+            yield
+        finally:
+            self._md_snapshot.blocks = None
+
+    def occupied_metadata_slots(self, img_id=None):
+        """
+        Return sorted list of metadata slots used by domain volumes, or by
+        volumes of image img_id.
+        """
+        if img_id is None:
+            return _occupied_metadata_slots(self.sdUUID)
+
+        slots = []
+        for lv in _iter_volumes(self.sdUUID):
+            lvtags = parse_lv_tags(lv)
+            if lvtags.image == img_id and lvtags.mdslot is not None:
+                slots.append(lvtags.mdslot)
+        slots.sort()
+        return slots
+
     def write_metadata_block(self, slot, data):
         """
         Writes prepared metadata block to the specified
@@ -983,10 +1128,24 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
         Data block is expected to be aligned to the
         storage block size.
         """
-        metavol = self.metadata_volume_path()
-        with directio.open(metavol, "r+") as f:
-            f.seek(self.metadata_offset(slot))
-            f.write(data)
+        # Count the write before and after writing, so metadata snapshots
+        # taken during the write are invalidated.
+        self._count_metadata_write(slot)
+        try:
+            metavol = self.metadata_volume_path()
+            with directio.open(metavol, "r+") as f:
+                f.seek(self.metadata_offset(slot))
+                f.write(data)
+        finally:
+            self._count_metadata_write(slot)
+
+    def _metadata_writes(self, slot):
+        with self._md_writes_lock:
+            return self._md_writes.get(slot, 0)
+
+    def _count_metadata_write(self, slot):
+        with self._md_writes_lock:
+            self._md_writes[slot] = self._md_writes.get(slot, 0) + 1
 
     def clear_metadata_block(self, slot):
         """
@@ -1833,12 +1992,17 @@ class BlockStorageDomain(sd.StorageDomain):
 
     # Dump metadata
 
-    def dump(self, full=False):
+    def dump(self, full=False, image_id=None, offset=0, limit=None):
         # Invalidate the vg pvs and lvs here, to make sure we don't return
         # stale data from the cache.
         lvm.invalidateVG(self.sdUUID, invalidateLVs=True, invalidatePVs=True)
 
-        result = {"metadata": self.getInfo(), "volumes": self._dump_volumes()}
+        result = {
+            "metadata": self.getInfo(),
+            "volumes": self._dump_volumes(
+                image_id=image_id, offset=offset, limit=limit
+            ),
+        }
 
         if full:
             # As blockSD uses sanlock for managing its leases and lockspaces
@@ -1851,78 +2015,114 @@ class BlockStorageDomain(sd.StorageDomain):
 
         return result
 
-    def _dump_volumes(self):
-        vols_md = {}
-        slots_md = self._parse_volumes_metadata()
+    def _dump_volumes(self, image_id=None, offset=0, limit=None):
+        return dict(
+            self.iter_dump_volumes(
+                image_id=image_id, offset=offset, limit=limit
+            )
+        )
 
+    def iter_dump_volumes(self, image_id=None, offset=0, limit=None):
+        """
+        Iterate over volumes metadata ordered by volume id, yielding
+        (vol_id, metadata) tuples.
+
+        Metadata is read in bulk for batches of DUMP_BATCH_SIZE volumes. If
+        image_id is specified, only the volumes of this image are read. If
+        limit is specified, only limit volumes starting at offset are read.
+        """
+        lvs = []
         for lv in _iter_volumes(self.sdUUID):
             lvtags = parse_lv_tags(lv)
-            # Complement volume metadata from parsed slots by slot number.
+            if image_id is not None and lvtags.image not in (
+                image_id,
+                sc.REMOVED_IMAGE_PREFIX + image_id,
+            ):
+                continue
+            lvs.append((lv, lvtags))
+
+        lvs.sort(key=lambda item: item[0].name)
+        end = None if limit is None else offset + limit
+        lvs = lvs[offset:end]
+
+        for start in range(0, len(lvs), DUMP_BATCH_SIZE):
+            yield from self._dump_volumes_batch(
+                lvs[start : start + DUMP_BATCH_SIZE]
+            )
+
+    def _dump_volumes_batch(self, batch):
+        slots = [lvtags.mdslot for _, lvtags in batch]
+        slots_md = self._parse_volumes_metadata(
+            [slot for slot in slots if slot is not None]
+        )
+        for lv, lvtags in batch:
+            yield lv.name, self._dump_volume(lv, lvtags, slots_md)
+
+    def _dump_volume(self, lv, lvtags, slots_md):
+        # Complement volume metadata from parsed slots by slot number.
+        try:
+            vol_md = slots_md[lvtags.mdslot]
+        except KeyError as e:
+            self.log.warning(
+                "Failed to get metadata from lv tags for lv %s/%s: %s",
+                self.sdUUID,
+                lv.name,
+                e,
+            )
+            vol_md = {"status": sc.VOL_STATUS_INVALID}
+
+        # Try to complement metadata from tags
+        # in case it was missing from slots.
+        if vol_md["status"] != sc.VOL_STATUS_OK:
+            if lvtags.image and "image" not in vol_md:
+                vol_md["image"] = lvtags.image
+            if lvtags.parent and "parent" not in vol_md:
+                vol_md["parent"] = lvtags.parent
+
+        if "image" in vol_md:
+            # Add the volume sizes information.
             try:
-                vol_md = slots_md[lvtags.mdslot]
-            except KeyError as e:
+                vol_size = self._dump_volume_size(lv)
+                vol_md["truesize"] = vol_size
+                vol_md["apparentsize"] = vol_size
+            except Exception as e:
                 self.log.warning(
-                    "Failed to get metadata from lv tags for lv %s/%s: %s",
+                    "Failed to get size for lv %s/%s: %s",
                     self.sdUUID,
                     lv.name,
                     e,
                 )
-                vol_md = {"status": sc.VOL_STATUS_INVALID}
-
-            # Try to complement metadata from tags
-            # in case it was missing from slots.
-            if vol_md["status"] != sc.VOL_STATUS_OK:
-                if lvtags.image and "image" not in vol_md:
-                    vol_md["image"] = lvtags.image
-                if lvtags.parent and "parent" not in vol_md:
-                    vol_md["parent"] = lvtags.parent
-
-            if "image" in vol_md:
-                # Add the volume sizes information.
-                try:
-                    vol_size = self.getVolumeSize(vol_md["image"], lv.name)
-                    vol_md["truesize"] = vol_size.truesize
-                    vol_md["apparentsize"] = vol_size.apparentsize
-                except Exception as e:
-                    self.log.warning(
-                        "Failed to get size for lv %s/%s: %s",
-                        self.sdUUID,
-                        lv.name,
-                        e,
-                    )
-                    vol_md["status"] = sc.VOL_STATUS_INVALID
+                vol_md["status"] = sc.VOL_STATUS_INVALID
 
-            # Check if volume was marked as removed and override status.
-            img = lvtags.image
-            if img is not None and img.startswith(sc.REMOVED_IMAGE_PREFIX):
-                vol_md["status"] = sc.VOL_STATUS_REMOVED
+        # Check if volume was marked as removed and override status.
+        img = lvtags.image
+        if img is not None and img.startswith(sc.REMOVED_IMAGE_PREFIX):
+            vol_md["status"] = sc.VOL_STATUS_REMOVED
 
-            vols_md[lv.name] = vol_md
+        return vol_md
 
-        return vols_md
+    def _dump_volume_size(self, lv):
+        # Like getVSize(), but inactive volumes use the size reported by
+        # _iter_volumes(), since the LV may not be in lvm cache, and looking
+        # it up would run lvs for every inactive volume.
+        try:
+            return fsutils.size(lvm.lvPath(self.sdUUID, lv.name))
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return int(lv.size)
 
-    def _parse_volumes_metadata(self):
+    def _parse_volumes_metadata(self, slots):
         slots_md = {}
-        slots = _occupied_metadata_slots(self.sdUUID)
         if len(slots) == 0:
             return slots_md
 
-        # Slots are sorted in an increasing order,
-        # find slots start and end offsets to read from metadata.
-        start_offset = self._manifest.metadata_offset(slots[0])
-        end_offset = (
-            self._manifest.metadata_offset(slots[-1]) + sc.METADATA_SIZE
-        )
-
-        # Read the metadata from starting offset to last offset end.
-        path = self._manifest.metadata_volume_path()
-        raw_md = misc.readblock(path, start_offset, end_offset - start_offset)
+        # Read the metadata of all slots in large chunks.
+        blocks = self._manifest.read_metadata_blocks(slots)
 
         # Parse metadata per slot.
         for slot in slots:
-            offset = self._manifest.metadata_offset(slot) - start_offset
-            slot_raw_md = raw_md[offset : offset + sc.METADATA_SIZE]
-            md_lines = slot_raw_md.rstrip(b"\0").splitlines()
+            md_lines = blocks[slot].rstrip(b"\0").splitlines()
             slot_md = volumemetadata.dump(md_lines)
             slot_md["mdslot"] = slot
             slots_md[slot] = slot_md
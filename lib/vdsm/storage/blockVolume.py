@@ -212,6 +212,24 @@ class BlockVolumeManifest(volume.VolumeManifest):
         """
         return self.getVolumeSize()
 
+    def change_token(self):
+        """
+        Return a value that changes when the volume is modified, or None if
+        the volume may be modified without changing the token.
+
+        A guest writing to a leaf volume does not change the logical volume,
+        so we cannot detect changes in a leaf volume. A template volume is
+        never modified, so we do not need to look up the logical volume.
+        """
+        if self.isLeaf():
+            return None
+
+        generation = self.getMetaParam(sc.GENERATION)
+        if self.isShared():
+            return (generation,)
+
+        return (generation, self.getVolumeSize())
+
     def setMetadata(self, meta, metaId=None, **overrides):
         """
         Set the meta data hash as the new meta data of the Volume
@@ -116,6 +116,117 @@ class TemporaryFailure(Error):
 Lease = collections.namedtuple("Lease", "name, path, offset")
 
 
+class HostsSnapshot(object):
+    """
+    Short lived snapshot of hosts status in sanlock lockspaces.
+
+    Getting the hosts status requires a round trip to the sanlock daemon.
+    All hosts in a lockspace are fetched using a single get_hosts() call,
+    and the result is shared by all callers in the next ttl seconds. This
+    avoids many small calls when inspecting many leases or checking hosts
+    status in many domains.
+    """
+
+    log = logging.getLogger("storage.sanlock")
+
+    def __init__(self, ttl=None, clock=time.monotonic):
+        if ttl is None:
+            ttl = config.getint("sanlock", "status_cache_ttl")
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._lockspaces = {}
+
+    def hosts(self, lockspace, refresh=False):
+        """
+        Return dict mapping host id to host dict for hosts in lockspace.
+        Hosts that do not have a lease in the lockspace are not included.
+
+        If refresh is True, fetch hosts from sanlock even if the snapshot
+        did not expire.
+
+        Raises sanlock.SanlockException if getting the hosts failed.
+        """
+        # Getting the hosts is fast local call to the sanlock daemon, so we
+        # do it under the lock, ensuring that concurrent callers share the
+        # same call.
+        with self._lock:
+            now = self._clock()
+            entry = self._lockspaces.get(lockspace)
+            if entry and not refresh and now < entry[0]:
+                return entry[1]
+
+            hosts = {
+                host["host_id"]: host for host in sanlock.get_hosts(lockspace)
+            }
+            self._lockspaces[lockspace] = (now + self._ttl, hosts)
+            return hosts
+
+    def invalidate(self, lockspace=None):
+        """
+        Drop the snapshot of lockspace, or of all lockspaces if lockspace is
+        None.
+        """
+        with self._lock:
+            if lockspace is None:
+                self._lockspaces.clear()
+            else:
+                self._lockspaces.pop(lockspace, None)
+
+
+class _LockspaceHosts(object):
+    """
+    Hosts in a lockspace used for inspecting one or more leases.
+
+    The hosts are taken from the hosts snapshot on the first use, and the
+    same hosts are used for all the leases. If a lease owner joined the
+    lockspace after the snapshot was taken, the snapshot is refreshed once.
+    """
+
+    def __init__(self, snapshot, lockspace):
+        self._snapshot = snapshot
+        self._lockspace = lockspace
+        self._hosts = None
+        self._refreshed = False
+
+    def owner(self, host_id, generation):
+        """
+        Return the host dict of lease owner host_id, or None if the host
+        does not have a lease in the lockspace.
+
+        If the owner is missing or the lease generation is newer than the
+        owner generation in the snapshot, the host joined the lockspace
+        after the snapshot was taken, so we check again with fresh snapshot.
+        An older lease generation means the owner reconnected and lost the
+        lease, which the snapshot already shows.
+        """
+        if self._hosts is None:
+            self._hosts = self._snapshot.hosts(self._lockspace)
+        host = self._hosts.get(host_id)
+        if not self._refreshed and (
+            host is None or host["generation"] < generation
+        ):
+            self._hosts = self._snapshot.hosts(self._lockspace, refresh=True)
+            self._refreshed = True
+            host = self._hosts.get(host_id)
+        return host
+
+
+def inspect_leases(inspect, leases):
+    """
+    Inspect leases using inspect function, returning list of
+    concurrent.Result with (version, host_id) tuple if inspect succeeded, or
+    the exception if inspect failed.
+    """
+    results = []
+    for lease in leases:
+        try:
+            results.append(concurrent.Result(True, inspect(lease)))
+        except Exception as e:
+            results.append(concurrent.Result(False, e))
+    return results
+
+
 class SafeLease(object):
     log = logging.getLogger("storage.safelease")
 
@@ -249,6 +360,9 @@ class SafeLease(object):
     def inspect(self, lease):
         raise se.InspectNotSupportedError()
 
+    def inspect_leases(self, leases):
+        return inspect_leases(self.inspect, leases)
+
     def getLockUtilFullPath(self):
         return os.path.join(self.lockUtilPath, self.lockCmd)
 
@@ -311,6 +425,9 @@ class SANLock(object):
     # when a lease is acquired, and decreased when a lease is released.
     _lease_count = 0
 
+    # Hosts status snapshot shared by all lockspaces.
+    _hosts_snapshot = HostsSnapshot()
+
     # sanlock.inquire() added in sanlock-3.8.3-2.
     # TODO: remove check when we require this version.
     supports_inquire = hasattr(sanlock, "inquire")
@@ -421,6 +538,9 @@ class SANLock(object):
         # acquired.
         self._ready.valid = True
 
+        # Our host status is going to change.
+        self._hosts_snapshot.invalidate(self._lockspace_name)
+
         with self._lock:
             self._start_add_lockspace()
             try:
@@ -501,6 +621,9 @@ class SANLock(object):
         # Ensure that future calls to acquire() will fail quickly.
         self._ready.valid = False
 
+        # Our host status is going to change.
+        self._hosts_snapshot.invalidate(self._lockspace_name)
+
         with self._lock:
             try:
                 sanlock.rem_lockspace(
@@ -553,7 +676,7 @@ class SANLock(object):
 
     def getHostStatus(self, hostId):
         try:
-            hosts = sanlock.get_hosts(self._lockspace_name, hostId)
+            hosts = self._hosts_snapshot.hosts(self._lockspace_name)
         except sanlock.SanlockException as e:
             self.log.debug(
                 "Unable to get host %d status in lockspace %s: %s",
@@ -562,9 +685,14 @@ class SANLock(object):
                 e,
             )
             return HOST_STATUS_UNAVAILABLE
-        else:
-            status = hosts[0]['flags']
-            return self.STATUS_NAME[status]
+
+        try:
+            host = hosts[hostId]
+        except KeyError:
+            # sanlock reports only hosts that have a lease.
+            return HOST_STATUS_FREE
+
+        return self.STATUS_NAME[host['flags']]
 
     # The hostId parameter is maintained here only for compatibility with
     # ClusterLock. We could consider to remove it in the future but keeping it
@@ -652,6 +780,24 @@ class SANLock(object):
         self.log.info("Successfully acquired %s for host id %s", lease, hostId)
 
     def inspect(self, lease):
+        hosts = _LockspaceHosts(self._hosts_snapshot, self._lockspace_name)
+        return self._inspect(lease, hosts)
+
+    def inspect_leases(self, leases):
+        """
+        Inspect multiple leases, checking the lease owners using the same
+        hosts, so the hosts status is fetched at most twice for all the
+        leases.
+
+        Returns list of concurrent.Result with (version, host_id) tuple if
+        inspecting the lease succeeded, or the exception if it failed.
+        """
+        hosts = _LockspaceHosts(self._hosts_snapshot, self._lockspace_name)
+        return inspect_leases(
+            lambda lease: self._inspect(lease, hosts), leases
+        )
+
+    def _inspect(self, lease, hosts):
         resource = sanlock.read_resource(
             lease.path,
             lease.offset,
@@ -685,7 +831,7 @@ class SANLock(object):
         resource_version = resource["version"]
         host_id = resource_owner["host_id"]
         try:
-            host = sanlock.get_hosts(self._lockspace_name, host_id)[0]
+            host = hosts.owner(host_id, resource_owner["generation"])
         except sanlock.SanlockException as e:
             if e.errno == errno.ENOENT:
                 # add_lockspace has not been completed yet,
@@ -707,6 +853,14 @@ class SANLock(object):
             else:
                 raise
 
+        if host is None:
+            self.log.debug(
+                "host %r does not have a lease, lease %s is free",
+                host_id,
+                lease,
+            )
+            return resource_version, None
+
         host_status = self.STATUS_NAME[host["flags"]]
 
         if resource_owner["generation"] != host["generation"]:
@@ -957,6 +1111,9 @@ class LocalLock(object):
             hostId, lockFile = self._getLease()
             return self.LVER, (hostId if lockFile else None)
 
+    def inspect_leases(self, leases):
+        return inspect_leases(self.inspect, leases)
+
     def release(self, lease):
         if lease != self._lease:
             raise MultipleLeasesNotSupported("release", lease)
@@ -890,8 +890,13 @@ class FileStorageDomain(sd.StorageDomain):
 
     # Dump metadata
 
-    def dump(self, full=False):
-        result = {"metadata": self.getInfo(), "volumes": self._dump_volumes()}
+    def dump(self, full=False, image_id=None, offset=0, limit=None):
+        result = {
+            "metadata": self.getInfo(),
+            "volumes": self._dump_volumes(
+                image_id=image_id, offset=offset, limit=limit
+            ),
+        }
 
         if full:
             if self.hasVolumeLeases():
@@ -903,24 +908,49 @@ class FileStorageDomain(sd.StorageDomain):
 
         return result
 
-    def _dump_volumes(self):
-        result = {}
-        # Glob *.meta files directly without an iterator which
-        # may break if a metadata file fails on path validation.
-        meta_files_pattern = os.path.join(
-            glob.escape(self.mountpoint),
-            self.sdUUID,
-            sd.DOMAIN_IMAGES,
-            UUID_GLOB_PATTERN,
-            "*" + fileVolume.META_FILEEXT,
+    def _dump_volumes(self, image_id=None, offset=0, limit=None):
+        return dict(
+            self.iter_dump_volumes(
+                image_id=image_id, offset=offset, limit=limit
+            )
         )
 
-        self.log.debug("Looking up files %s", meta_files_pattern)
-        for path in self.oop.glob.glob(meta_files_pattern):
-            vol_uuid, md = self._parse_metadata_file(path)
-            result[vol_uuid] = md
+    def iter_dump_volumes(self, image_id=None, offset=0, limit=None):
+        """
+        Iterate over volumes metadata ordered by volume id, yielding
+        (vol_id, metadata) tuples.
+
+        If image_id is specified, only the volumes of this image are read. If
+        limit is specified, only limit volumes starting at offset are read.
+        """
+        if image_id is None:
+            image_patterns = [UUID_GLOB_PATTERN]
+        else:
+            image_patterns = [
+                glob.escape(image_id),
+                glob.escape(sc.REMOVED_IMAGE_PREFIX + image_id),
+            ]
+
+        paths = []
+        for image_pattern in image_patterns:
+            # Glob *.meta files directly without an iterator which
+            # may break if a metadata file fails on path validation.
+            meta_files_pattern = os.path.join(
+                glob.escape(self.mountpoint),
+                self.sdUUID,
+                sd.DOMAIN_IMAGES,
+                image_pattern,
+                "*" + fileVolume.META_FILEEXT,
+            )
+
+            self.log.debug("Looking up files %s", meta_files_pattern)
+            paths.extend(self.oop.glob.glob(meta_files_pattern))
 
-        return result
+        paths.sort(key=os.path.basename)
+        end = None if limit is None else offset + limit
+
+        for path in paths[offset:end]:
+            yield self._parse_metadata_file(path)
 
     def _parse_metadata_file(self, filepath):
         img_dir, filename = os.path.split(filepath)
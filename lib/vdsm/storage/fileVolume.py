@@ -207,6 +207,17 @@ class FileVolumeManifest(volume.VolumeManifest):
         volPath = self.getVolumePath()
         return self.oop.os.stat(volPath).st_blocks * sc.STAT_BYTES_PER_BLOCK
 
+    def change_token(self):
+        """
+        Return a value that changes when the volume is modified.
+
+        Writing to the volume file changes the file size or ctime, so we
+        can detect changes also when the volume generation is not modified.
+        """
+        generation = self.getMetaParam(sc.GENERATION)
+        st = self.oop.os.stat(self.getVolumePath())
+        return (generation, st.st_size, st.st_blocks, st.st_ctime)
+
     def setMetadata(self, meta, metaId=None, **overrides):
         """
         Set the meta data hash as the new meta data of the Volume
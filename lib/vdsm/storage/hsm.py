@@ -26,6 +26,7 @@ from vdsm.common import function
 from vdsm.common import supervdsm
 from vdsm.common.marks import deprecated
 from vdsm.common.threadlocal import vars
+from vdsm.common.time import Clock
 from vdsm.common.time import monotonic_time
 from vdsm.common.units import MiB, GiB
 from vdsm.config import config
@@ -44,6 +45,7 @@ from vdsm.storage import imagetickets
 from vdsm.storage import iscsi
 from vdsm.storage import localFsSD
 from vdsm.storage import lvm
+from vdsm.storage import measurecache
 from vdsm.storage import merge
 from vdsm.storage import mpathhealth
 from vdsm.storage import misc
@@ -3301,13 +3303,22 @@ class HSM(object):
                 baseUUID,
             )
 
+        # Engine measures the same volumes many times while planning copy,
+        # move and export operations. The result depends on every volume in
+        # the measured chain, so it is cached until one of them changes.
+        if backing:
+            chain = measurecache.chain_tokens(vol, base=base)
+        else:
+            chain = [(vol.getVolumePath(), vol.change_token())]
+
         # Using unsafe=True to allow measuring an active image. Measuring an
         # active image can give less accurate results since the guest may write
         # while we measure, but it is good enough for getting an estimate of
         # the required size.
 
-        result = qemuimg.measure(
-            vol.getVolumePath(),
+        result = measurecache.measure(
+            chain,
+            image=vol.getVolumePath(),
             format=sc.fmt2str(vol.getFormat()),
             output_format=sc.fmt2str(dest_format),
             backing=backing,
@@ -3410,66 +3421,78 @@ class HSM(object):
 
         vars.task.getSharedLock(STORAGE, sdUUID)
 
+        clock = Clock()
+        try:
+            with clock.run("total"):
+                return self._prepareImage(
+                    clock, sdUUID, spUUID, imgUUID, leafUUID, allowIllegal
+                )
+        finally:
+            self.log.debug(
+                "Prepare image %s/%s timings: %s", sdUUID, imgUUID, clock
+            )
+
+    def _prepareImage(
+        self, clock, sdUUID, spUUID, imgUUID, leafUUID, allowIllegal
+    ):
         imgVolumesInfo = []
         dom = sdCache.produce(sdUUID)
-        allVols = dom.getAllVolumes()
-        # Filter volumes related to this image
-        imgVolumes = list(sd.getVolsOfImage(allVols, imgUUID))
+
+        with clock.run("volumes"):
+            allVols = dom.getAllVolumes()
+            # Filter volumes related to this image
+            imgVolumes = list(sd.getVolsOfImage(allVols, imgUUID))
 
         if leafUUID not in imgVolumes:
             raise se.VolumeDoesNotExist(leafUUID)
 
-        for volUUID in imgVolumes:
-            legality = dom.produceVolume(imgUUID, volUUID).getLegality()
-            if legality == sc.ILLEGAL_VOL:
-                if allowIllegal:
-                    self.log.info("Preparing illegal volume %s", leafUUID)
-                else:
-                    raise se.prepareIllegalVolumeError(volUUID)
-
-        imgPath = dom.activateVolumes(imgUUID, imgVolumes)
-        try:
-            for volUUID in imgVolumes:
-                dom.produceVolume(imgUUID, volUUID).updateInvalidatedSize()
-
-            if spUUID and spUUID != sd.BLANK_UUID:
-                runImgPath = dom.linkBCImage(imgPath, imgUUID)
-            else:
-                runImgPath = imgPath
-
-            leafInfo = dom.produceVolume(imgUUID, leafUUID).getVmVolumeInfo()
-
-            leafPath = os.path.join(runImgPath, leafUUID)
-            for volUUID in imgVolumes:
-                path = os.path.join(
-                    dom.domaindir, sd.DOMAIN_IMAGES, imgUUID, volUUID
-                )
-                volInfo = {
-                    'domainID': sdUUID,
-                    'imageID': imgUUID,
-                    'volumeID': volUUID,
-                    'path': path,
-                }
+        # Validating and updating the volumes reads the metadata of every
+        # volume; read the image volumes metadata once in bulk.
+        with dom.metadata_snapshot(imgUUID):
+            with clock.run("validate"):
+                for volUUID in imgVolumes:
+                    vol = dom.produceVolume(imgUUID, volUUID)
+                    if vol.getLegality() == sc.ILLEGAL_VOL:
+                        if allowIllegal:
+                            self.log.info(
+                                "Preparing illegal volume %s", leafUUID
+                            )
+                        else:
+                            raise se.prepareIllegalVolumeError(volUUID)
+
+            # Activate all the image volumes using single lvm command.
+            with clock.run("activate"):
+                imgPath = dom.activateVolumes(imgUUID, imgVolumes)
 
-                lease = dom.getVolumeLease(imgUUID, volUUID)
+            try:
+                with clock.run("update"):
+                    for volUUID in imgVolumes:
+                        vol = dom.produceVolume(imgUUID, volUUID)
+                        vol.updateInvalidatedSize()
+
+                with clock.run("link"):
+                    if spUUID and spUUID != sd.BLANK_UUID:
+                        runImgPath = dom.linkBCImage(imgPath, imgUUID)
+                    else:
+                        runImgPath = imgPath
 
-                if lease.path and isinstance(lease.offset, numbers.Integral):
-                    volInfo.update(
-                        {
-                            'leasePath': lease.path,
-                            'leaseOffset': lease.offset,
-                        }
-                    )
+                with clock.run("info"):
+                    leafVol = dom.produceVolume(imgUUID, leafUUID)
+                    leafInfo = leafVol.getVmVolumeInfo()
 
-                imgVolumesInfo.append(volInfo)
-        except Exception:
-            # Tear down everyting on failure.
-            try:
-                dom.unlinkBCImage(imgUUID)
-                dom.deactivateImage(imgUUID)
+                    leafPath = os.path.join(runImgPath, leafUUID)
+                    for volUUID in imgVolumes:
+                        imgVolumesInfo.append(
+                            self._imageVolumeInfo(dom, imgUUID, volUUID)
+                        )
             except Exception:
-                self.log.exception("Error tearing down image")
-            raise
+                # Tear down everyting on failure.
+                try:
+                    dom.unlinkBCImage(imgUUID)
+                    dom.deactivateImage(imgUUID)
+                except Exception:
+                    self.log.exception("Error tearing down image")
+                raise
 
         return {
             'path': leafPath,
@@ -3477,6 +3500,27 @@ class HSM(object):
             'imgVolumesInfo': imgVolumesInfo,
         }
 
+    def _imageVolumeInfo(self, dom, imgUUID, volUUID):
+        path = os.path.join(dom.domaindir, sd.DOMAIN_IMAGES, imgUUID, volUUID)
+        volInfo = {
+            'domainID': dom.sdUUID,
+            'imageID': imgUUID,
+            'volumeID': volUUID,
+            'path': path,
+        }
+
+        lease = dom.getVolumeLease(imgUUID, volUUID)
+
+        if lease.path and isinstance(lease.offset, numbers.Integral):
+            volInfo.update(
+                {
+                    'leasePath': lease.path,
+                    'leaseOffset': lease.offset,
+                }
+            )
+
+        return volInfo
+
     @public
     def teardownImage(self, sdUUID, spUUID, imgUUID, volUUID=None):
         """
@@ -3534,7 +3578,9 @@ class HSM(object):
         return dict(uuidlist=volUUIDs)
 
     @public
-    def dumpStorageDomain(self, sdUUID, full=False):
+    def dumpStorageDomain(
+        self, sdUUID, full=False, image_id=None, offset=0, limit=None
+    ):
         """
         Gets a dictionary of storage domain raw metadata.
 
@@ -3545,16 +3591,32 @@ class HSM(object):
                      volumes info. Using the default setting would save
                      time and bandwidth.
         :type full: boolean.
+        :param image_id: If set, dump only the volumes of this image.
+        :type image_id: UUID.
+        :param offset: Index of the first volume to dump, in volume id
+                       order.
+        :type offset: int.
+        :param limit: If set, dump at most limit volumes.
+        :type limit: int.
 
         :returns: Storage domain dumped metadata and volumes along with its
                   leases, lockspace and xleases information if full is True.
         :rtype: dict.
         """
+        if offset < 0:
+            raise se.InvalidParameterException("offset", offset)
+        if limit is not None and limit < 0:
+            raise se.InvalidParameterException("limit", limit)
+
         vars.task.getSharedLock(STORAGE, sdUUID)
         dom = sdCache.produce(sdUUID)
         # Make sure we are not reading stale metadata.
         dom.invalidateMetadata()
-        return dict(result=dom.dump(full=full))
+        return dict(
+            result=dom.dump(
+                full=full, image_id=image_id, offset=offset, limit=limit
+            )
+        )
 
     @public
     def getImagesList(self, sdUUID):
@@ -4050,6 +4112,31 @@ class HSM(object):
             dom = sdCache.produce_manifest(lease.sd_id)
             return dict(result=dom.lease_status(lease.lease_id, self._pool.id))
 
+    @public
+    def bulk_lease_status(self, leases):
+        leases = [validators.Lease(lease) for lease in leases]
+        self._check_pool_connected()
+
+        domains = defaultdict(list)
+        for i, lease in enumerate(leases):
+            domains[lease.sd_id].append(i)
+
+        results = [None] * len(leases)
+        for sd_id, indexes in domains.items():
+            lease_ids = [leases[i].lease_id for i in indexes]
+            try:
+                with rm.acquireResource(STORAGE, sd_id, rm.SHARED):
+                    dom = sdCache.produce_manifest(sd_id)
+                    statuses = dom.bulk_lease_status(lease_ids, self._pool.id)
+            except Exception as e:
+                self.log.exception("Cannot get leases status in %s", sd_id)
+                statuses = [concurrent.Result(False, e)] * len(indexes)
+
+            for i, res in zip(indexes, statuses):
+                results[i] = _lease_status_result(leases[i], res)
+
+        return dict(result=results)
+
     @public
     def fence_lease(self, lease, metadata):
         lease = validators.Lease(lease)
@@ -4103,3 +4190,18 @@ class HSM(object):
         if not self._pool.is_connected():
             # Calling when pool is not connected is client error.
             raise exception.expected(se.StoragePoolNotConnected())
+
+
+def _lease_status_result(lease, res):
+    """
+    Convert concurrent.Result with the status of lease to bulk_lease_status
+    result item.
+    """
+    result = {"sd_id": lease.sd_id, "lease_id": lease.lease_id}
+    if res.succeeded:
+        result.update(code=0, message="OK", status=res.value)
+    elif isinstance(res.value, se.GeneralException):
+        result.update(res.value.response()["status"])
+    else:
+        result.update(se.generateResponse(res.value)["status"])
+    return result
@@ -17,6 +17,7 @@ from vdsm.storage import constants as sc
 from vdsm.storage import exception as se
 from vdsm.storage import glance
 from vdsm.storage import imageSharing
+from vdsm.storage import measurecache
 from vdsm.storage import qemuimg
 from vdsm.storage import resourceManager as rm
 from vdsm.storage import sd
@@ -79,7 +80,7 @@ class Image:
             operation.run()
         self.log.debug('qemu-img operation has completed')
 
-    def estimate_qcow2_size(self, src_vol_params, dst_sd_id):
+    def estimate_qcow2_size(self, src_vol_params, dst_sd_id, chain=None):
         """
         Calculate volume allocation size for converting raw/qcow2
         source volume to qcow2 volume on destination storage domain.
@@ -88,17 +89,25 @@ class Image:
             src_vol_params(dict): Dictionary returned from
                                   `storage.volume.Volume.getVolumeParams()`
             dst_sd_id(str) : Destination volume storage domain id
+            chain(list): Source volume chain tokens returned from
+                         `storage.measurecache.chain_tokens()`. If
+                         specified, measure results are cached until a
+                         volume in the source chain changes.
 
         Returns:
             Volume allocation in bytes
         """
         # measure required size.
-        qemu_measure = qemuimg.measure(
+        measure_args = dict(
             image=src_vol_params['path'],
             format=sc.fmt2str(src_vol_params['volFormat']),
             output_format=qemuimg.FORMAT.QCOW2,
             is_block=src_vol_params["block"],
         )
+        if chain is None:
+            qemu_measure = qemuimg.measure(**measure_args)
+        else:
+            qemu_measure = measurecache.measure(chain, **measure_args)
 
         # Adds extra room so we don't have to extend this disk immediately
         # when a vm is started.
@@ -127,12 +136,17 @@ class Image:
         log_str = logutils.volume_chain_to_str(vol.volUUID for vol in chain)
         self.log.info("chain=%s ", log_str)
 
-        chain_allocation = 0
         template = chain[0].getParentVolume()
         if template:
-            chain_allocation = template.getVolumeSize()
+            chain = [template] + chain
+
+        # Volume sizes are cached, so shared volumes like the template are
+        # looked up once for all the chains using them.
+        chain_allocation = 0
         for vol in chain:
-            chain_allocation += vol.getVolumeSize()
+            chain_allocation += measurecache.volume_size(
+                vol.getVolumePath(), vol.change_token(), vol.getVolumeSize
+            )
         if chain_allocation > capacity:
             chain_allocation = capacity
         # allocate %10 more for cow metadata
@@ -144,8 +158,16 @@ class Image:
         Return the chain of volumes of image as a sorted list
         (not including a shared base (template) if any)
         """
+        dom = sdCache.produce(sdUUID)
+
+        # Building the chain reads the metadata of every volume several
+        # times; read the image volumes metadata once in bulk.
+        with dom.metadata_snapshot(imgUUID):
+            return self._getChain(dom, sdUUID, imgUUID, volUUID)
+
+    def _getChain(self, dom, sdUUID, imgUUID, volUUID):
         chain = []
-        volclass = sdCache.produce(sdUUID).getVolumeClass()
+        volclass = dom.getVolumeClass()
 
         # Use volUUID when provided
         if volUUID:
@@ -761,7 +783,11 @@ class Image:
                 # TODO: This is needed only when copying to qcow2-thin volume
                 # on block storage. Move into calculate_initial_size.
                 dst_vol_allocation = self.calculate_vol_alloc(
-                    sdUUID, volParams, dstSdUUID, dstVolFormat
+                    sdUUID,
+                    volParams,
+                    dstSdUUID,
+                    dstVolFormat,
+                    src_chain=measurecache.chain_tokens(srcVol),
                 )
 
                 # Find out dest volume parameters
@@ -918,7 +944,12 @@ class Image:
         return None
 
     def calculate_vol_alloc(
-        self, src_sd_id, src_vol_params, dst_sd_id, dst_vol_format
+        self,
+        src_sd_id,
+        src_vol_params,
+        dst_sd_id,
+        dst_vol_format,
+        src_chain=None,
     ):
         """
         Calculate destination volume allocation size for copying source volume.
@@ -929,6 +960,8 @@ class Image:
                                    `storage.volume.Volume.getVolumeParams()`
             dst_sd_id (str): Destination volume storage domain id
             dst_vol_format (int): One of sc.RAW_FORMAT, sc.COW_FORMAT
+            src_chain (list): Source volume chain tokens, used to cache
+                              qemu-img measure results.
 
         Returns:
             Volume allocation in bytes
@@ -958,11 +991,15 @@ class Image:
                     # source 'cow' without parent.
                     # Use estimate for supporting compressed source images, for
                     # example, uploaded compressed qcow2 appliance.
-                    return self.estimate_qcow2_size(src_vol_params, dst_sd_id)
+                    return self.estimate_qcow2_size(
+                        src_vol_params, dst_sd_id, chain=src_chain
+                    )
             else:
                 # source 'raw'.
                 # Add additional space for qcow2 metadata.
-                return self.estimate_qcow2_size(src_vol_params, dst_sd_id)
+                return self.estimate_qcow2_size(
+                    src_vol_params, dst_sd_id, chain=src_chain
+                )
 
     def syncVolumeChain(self, sdUUID, imgUUID, volUUID, actualChain):
         """
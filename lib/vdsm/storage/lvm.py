@@ -16,6 +16,7 @@ import logging
 from collections import namedtuple
 import pprint as pp
 import subprocess
+import sys
 import threading
 
 from itertools import chain
@@ -25,6 +26,7 @@ from vdsm import osinfo
 from vdsm import utils
 from vdsm.common import commands
 from vdsm.common import errors
+from vdsm.common.cache import memoized
 from vdsm.common import logutils
 from vdsm.common.units import MiB
 
@@ -32,6 +34,7 @@ from vdsm.storage import devicemapper
 from vdsm.storage import constants as sc
 from vdsm.storage import exception as se
 from vdsm.storage import lsof
+from vdsm.storage import lvmshell
 from vdsm.storage import misc
 from vdsm.storage import multipath
 
@@ -54,6 +57,10 @@ VG_FIELDS_LEN = len(VG_FIELDS.split(","))
 LV_FIELDS = "uuid,name,vg_name,attr,size,seg_start_pe,devices,tags"
 LV_FIELDS_LEN = len(LV_FIELDS.split(","))
 
+# LV_FIELDS reported once per LV. The other fields are reported once per LV
+# segment.
+LV_INFO_FIELDS = ("uuid", "name", "vg_name", "attr", "size", "tags")
+
 VG_ATTR_BITS = (
     "permission",
     "resizeable",
@@ -150,27 +157,37 @@ class LV(namedtuple("_LV", LV_FIELDS + ",writeable,opened,active")):
     @classmethod
     def fromlvm(cls, *args):
         """
-        Create LV from lvm pvs command output.
+        Create LV from lvm lvs command output.
+
+        Values repeated in many LVs (vg name, attributes, size and tags) are
+        shared between the LVs, to keep the cache small for VGs with
+        thousands of LVs.
         """
-        args = list(args)
-        # Convert tag string into tuple.
-        tags = _tags2Tuple(args[cls._fields.index("tags")])
-        args[LV._fields.index("tags")] = tags
+        uuid, name, vg_name, attr, size, seg_start_pe, devices, tags = args
         # Convert attr string into named tuple fields.
-        sAttr = args[cls._fields.index("attr")]
-        attr_values = tuple(sAttr[: len(LV_ATTR._fields)])
-        attrs = LV_ATTR(*attr_values)
-        args[cls._fields.index("attr")] = attrs
-        # Add properties. Should be ordered as VG_PROPERTIES.
-        args.append(attrs.permission == "w")  # writable
-        args.append(attrs.devopen == "o")  # opened
-        args.append(attrs.state == "a")  # active
-        return cls(*args)
+        attrs = _lv_attr(attr)
+        return cls(
+            uuid,
+            name,
+            sys.intern(vg_name),
+            attrs,
+            sys.intern(size),
+            sys.intern(seg_start_pe),
+            devices,
+            _tags2Tuple(tags),
+            # Add properties.
+            attrs.permission == "w",  # writable
+            attrs.devopen == "o",  # opened
+            attrs.state == "a",  # active
+        )
 
     def is_stale(self):
         return False
 
 
+_LV_SEG_START_PE = LV._fields.index("seg_start_pe")
+
+
 class Stale(namedtuple("_Stale", "name")):
     __slots__ = ()
 
@@ -330,7 +347,74 @@ def _tags2Tuple(sTags):
 
     Return an empty tuple for sTags == ""
     """
-    return tuple(sTags.split(",")) if sTags else tuple()
+    if not sTags:
+        return tuple()
+    return tuple(sys.intern(tag) for tag in sTags.split(","))
+
+
+@memoized
+def _lv_attr(sAttr):
+    """
+    Return LV_ATTR for lvs attr string. There are few distinct values, so the
+    same instance is shared by all LVs with the same attributes.
+    """
+    return LV_ATTR(*sAttr[: len(LV_ATTR._fields)])
+
+
+@memoized
+def _lv_info_type(fields):
+    """
+    Return the type of the LV records with the LV name and the specified
+    fields, returned by getAllLVs(vg_name, fields).
+    """
+    fields = ("name",) + tuple(f for f in fields if f != "name")
+    unknown = set(fields).difference(LV_INFO_FIELDS)
+    if unknown:
+        raise ValueError("Unsupported LV fields: %s" % sorted(unknown))
+    return namedtuple("_LVInfo", fields)
+
+
+_LV_INFO_CONVERTERS = {
+    "vg_name": sys.intern,
+    "attr": _lv_attr,
+    "size": sys.intern,
+    "tags": _tags2Tuple,
+}
+
+
+def _iter_report(command, lines, fields_len):
+    """
+    Iterate over the fields of lvm report lines.
+    """
+    for line in lines:
+        fields = [field.strip() for field in line.split(SEPARATOR)]
+        if len(fields) != fields_len:
+            raise InvalidOutputLine(command, line)
+        yield fields
+
+
+def _iter_lvs(lines):
+    """
+    Iterate over the LVs in lvs command output.
+    """
+    for fields in _iter_report("lvs", lines, LV_FIELDS_LEN):
+        # For LV we are only interested in its first extent
+        if fields[_LV_SEG_START_PE] == "0":
+            yield LV.fromlvm(*fields)
+
+
+def _iter_lvs_info(lines, info_type):
+    """
+    Iterate over the LV records of lvs command output, reporting only the
+    fields of info_type.
+    """
+    converters = [
+        _LV_INFO_CONVERTERS.get(field, str) for field in info_type._fields
+    ]
+    for fields in _iter_report("lvs", lines, len(converters)):
+        yield info_type._make(
+            convert(value) for convert, value in zip(converters, fields)
+        )
 
 
 class LVMRunner(object):
@@ -358,6 +442,17 @@ class LVMRunner(object):
         re.IGNORECASE,
     )
 
+    def __init__(self, use_shell=False, shell_timeout=60):
+        """
+        Arguments:
+            use_shell (bool): Run read-only reports in a long running lvm
+                shell, falling back to a new process if the shell is busy or
+                fails.
+            shell_timeout (float): Timeout in seconds waiting for a report
+                from the shell.
+        """
+        self._shell = lvmshell.Shell(shell_timeout) if use_shell else None
+
     def run(self, cmd):
         """
         Run LVM command, logging warnings for successful commands.
@@ -389,6 +484,20 @@ class LVMRunner(object):
         return out
 
     def _run_command(self, cmd):
+        if self._shell is not None and self._shell.accepts(cmd):
+            try:
+                rc, out, err = self._shell.run(cmd)
+            except lvmshell.Busy:
+                pass
+            except lvmshell.Error as e:
+                log.warning("Running %s in a new process: %s", cmd, e)
+            else:
+                if rc == 0:
+                    return rc, out, err
+                # Get the same error a new process reports, expected by the
+                # callers.
+                log.debug("Shell command failed, retrying: %s", err)
+
         p = commands.start(
             cmd, sudo=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
         )
@@ -543,11 +652,7 @@ class LVMCache(object):
         Return dict of updated PVs.
         """
         updated_pvs = {}
-        for line in pvs_output:
-            fields = [field.strip() for field in line.split(SEPARATOR)]
-            if len(fields) != PV_FIELDS_LEN:
-                raise InvalidOutputLine("pvs", line)
-
+        for fields in _iter_report("pvs", pvs_output, PV_FIELDS_LEN):
             pv = PV.fromlvm(*fields)
             if pv.name == UNKNOWN:
                 log.error("Missing pv: %s in vg: %s", pv.uuid, pv.vg_name)
@@ -670,11 +775,7 @@ class LVMCache(object):
         """
         updatedVGs = {}
         vgsFields = {}
-        for line in vgs_output:
-            fields = [field.strip() for field in line.split(SEPARATOR)]
-            if len(fields) != VG_FIELDS_LEN:
-                raise InvalidOutputLine("vgs", line)
-
+        for fields in _iter_report("vgs", vgs_output, VG_FIELDS_LEN):
             uuid = fields[VG._fields.index("uuid")]
             pvNameIdx = VG._fields.index("pv_name")
             pv_name = fields[pvNameIdx]
@@ -802,16 +903,9 @@ class LVMCache(object):
         Return dict of updated LVs.
         """
         updated_lvs = {}
-        for line in lvs_output:
-            fields = [field.strip() for field in line.split(SEPARATOR)]
-            if len(fields) != LV_FIELDS_LEN:
-                raise InvalidOutputLine("lvs", line)
-
-            lv = LV.fromlvm(*fields)
-            # For LV we are only interested in its first extent
-            if lv.seg_start_pe == "0":
-                self._lvs[(lv.vg_name, lv.name)] = lv
-                updated_lvs[(lv.vg_name, lv.name)] = lv
+        for lv in _iter_lvs(lvs_output):
+            self._lvs[(lv.vg_name, lv.name)] = lv
+            updated_lvs[(lv.vg_name, lv.name)] = lv
 
         # Determine if there are stale LVs
         items = self._lvs if lv_name is None else [(vg_name, lv_name)]
@@ -917,16 +1011,7 @@ class LVMCache(object):
         if error:
             return self._lvs.copy()
 
-        new_lvs = {}
-        for line in out:
-            fields = [field.strip() for field in line.split(SEPARATOR)]
-            if len(fields) != LV_FIELDS_LEN:
-                raise InvalidOutputLine("lvs", line)
-
-            lv = LV.fromlvm(*fields)
-            # For LV we are only interested in its first extent
-            if lv.seg_start_pe == "0":
-                new_lvs[(lv.vg_name, lv.name)] = lv
+        new_lvs = {(lv.vg_name, lv.name): lv for lv in _iter_lvs(out)}
 
         with self._lock:
             self._lvs = new_lvs
@@ -1126,7 +1211,7 @@ class LVMCache(object):
 
         return lv
 
-    def getAllLvs(self, vg_name):
+    def getAllLvs(self, vg_name, fields=None):
         """
         Get all LVs in specified VG.
 
@@ -1136,10 +1221,17 @@ class LVMCache(object):
 
         Arguments:
             vg_name (str): VG name to query.
+            fields (tuple): If specified, return records with only the LV
+                name and these fields from LV_INFO_FIELDS. If the cache
+                cannot be used, lvs reports only these fields, without
+                reading the LVs segments and updating the cache.
 
         Returns:
             List of LV namedtuple for all lvs in VG vg_name.
         """
+        if fields is not None:
+            return self._get_lvs_info(vg_name, _lv_info_type(tuple(fields)))
+
         if self._lvs_needs_reload(vg_name):
             self.stats.miss()
             lvs = self._reloadlvs(vg_name)
@@ -1154,6 +1246,31 @@ class LVMCache(object):
         ]
         return lvs
 
+    def _get_lvs_info(self, vg_name, info_type):
+        if not self._lvs_needs_reload(vg_name):
+            self.stats.hit()
+            return [
+                info_type._make(getattr(lv, f) for f in info_type._fields)
+                for lv in self._lvs.copy().values()
+                if not lv.is_stale() and lv.vg_name == vg_name
+            ]
+
+        self.stats.miss()
+        cmd = ["lvs"]
+        cmd.extend(LVM_FLAGS)
+        cmd.extend(("-o", ",".join(info_type._fields), vg_name))
+
+        out, error = self.run_command_error(
+            cmd, devices=self._getVGDevs((vg_name,))
+        )
+
+        if error:
+            with self._lock:
+                self._update_stale_lvs_locked(vg_name)
+            return []
+
+        return list(_iter_lvs_info(out, info_type))
+
     def _lvs_needs_reload(self, vg_name):
         # TODO: Return True only if VG has changed.
         if not self._cache_lvs:
@@ -1200,7 +1317,12 @@ class CacheStats(object):
             self._hits += 1
 
 
-_lvminfo = LVMCache()
+_lvminfo = LVMCache(
+    LVMRunner(
+        use_shell=config.getboolean("lvm", "use_shell"),
+        shell_timeout=config.getint("lvm", "shell_timeout"),
+    )
+)
 
 
 def bootstrap(skiplvs=()):
@@ -1544,8 +1666,14 @@ def getLV(vgName, lv_name):
     return _lvminfo.getLv(vgName, lv_name)
 
 
-def getAllLVs(vg_name):
-    return _lvminfo.getAllLvs(vg_name)
+def getAllLVs(vg_name, fields=None):
+    """
+    Return list of the LVs in VG vg_name.
+
+    If fields are specified, return records with only the LV name and these
+    fields, which is cheaper for VGs with many LVs.
+    """
+    return _lvminfo.getAllLvs(vg_name, fields=fields)
 
 
 #
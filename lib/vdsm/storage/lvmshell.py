@@ -0,0 +1,266 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""
+Long running lvm shell for read-only report commands.
+
+Running lvm without a command starts an interactive shell, reading commands
+from stdin. Running reports in a shell avoids starting sudo and lvm for
+every pvs, vgs and lvs command.
+
+The shell does not report the exit code of a command on stdout, and lvm
+error messages are written to stderr, mixed with the messages of other
+commands. To get a consistent result per command, each command is sent with
+--reportformat json and with the command log enabled. lvm prints a single
+json document for the command, including the report and the command log,
+including the messages and the command status.
+
+The report is converted back to the text format the command would report
+with --noheadings and --separator, so callers do not depend on the way the
+command was run.
+"""
+
+import json
+import logging
+import os
+import select
+import subprocess
+import threading
+
+from vdsm import constants
+from vdsm.common import commands
+from vdsm.common.time import monotonic_time
+
+log = logging.getLogger("storage.lvmshell")
+
+# Commands reporting the state without modifying it.
+REPORT_COMMANDS = frozenset(["pvs", "vgs", "lvs"])
+
+# lvm splits the shell command line to at most 64 arguments.
+MAX_ARGS = 60
+
+# Report the command messages and status in the json document.
+LOG_CONFIG = 'log {report_command_log=1 command_log_selection="all"}'
+
+PROMPT = b"lvm> "
+
+# Status log ret_code of a successful command (ECMD_PROCESSED).
+ECMD_PROCESSED = "1"
+
+# Exit code of failed command (ECMD_FAILED).
+ECMD_FAILED = 5
+
+
+class Error(Exception):
+    """
+    The shell failed, the command should be run in a new process.
+    """
+
+
+class Busy(Error):
+    """
+    The shell is running another command.
+    """
+
+
+class Shell(object):
+    """
+    Run lvm report commands in a long running lvm shell.
+
+    The shell runs one command at a time. If the shell is running another
+    command, or the shell fails, run() raises Error, and the caller should
+    run the command in a new process. A failed shell is terminated, and a
+    new shell is started for the next command.
+    """
+
+    def __init__(self, timeout, cmd=(constants.EXT_LVM,), sudo=True):
+        """
+        Arguments:
+            timeout (float): Maximum time in seconds to wait for command
+                output before terminating the shell.
+            cmd (tuple): Command starting the lvm shell.
+            sudo (bool): Run the shell with sudo.
+        """
+        self._timeout = timeout
+        self._cmd = list(cmd)
+        self._sudo = sudo
+        self._lock = threading.Lock()
+        self._proc = None
+        self._buf = b""
+
+    def accepts(self, cmd):
+        """
+        Return True if lvm command cmd, including the lvm executable, can be
+        run in the shell.
+        """
+        return (
+            len(cmd) > 1
+            and cmd[1] in REPORT_COMMANDS
+            and len(cmd) <= MAX_ARGS
+            and not any("'" in arg or "\n" in arg for arg in cmd)
+        )
+
+    def run(self, cmd):
+        """
+        Run lvm command cmd, including the lvm executable, in the shell.
+
+        Returns:
+            (rc, out, err) tuple, like running the command in a new process.
+
+        Raises:
+            Error if the command should be run in a new process.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise Busy("Shell is running another command")
+        try:
+            if self._proc is None:
+                self._start()
+            try:
+                self._send(_shell_line(cmd))
+                doc = self._read_document(monotonic_time() + self._timeout)
+            except Error:
+                self._stop()
+                raise
+        finally:
+            self._lock.release()
+
+        return _parse_document(doc)
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                self._stop()
+
+    def _start(self):
+        try:
+            self._proc = commands.start(
+                self._cmd,
+                sudo=self._sudo,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise Error("Cannot start lvm shell: %s" % e)
+        self._buf = b""
+        log.info("Started lvm shell pid=%s", self._proc.pid)
+
+    def _stop(self):
+        proc = self._proc
+        self._proc = None
+        log.info("Stopping lvm shell pid=%s", proc.pid)
+        try:
+            commands.terminate(proc)
+        except commands.TerminatingFailure as e:
+            log.warning("%s", e)
+        finally:
+            # Closing stdin flushes pending data to a terminated shell.
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            proc.stdout.close()
+
+    def _send(self, line):
+        try:
+            self._proc.stdin.write(line.encode("utf-8") + b"\n")
+            self._proc.stdin.flush()
+        except OSError as e:
+            raise Error("Cannot write to lvm shell: %s" % e)
+
+    def _read_document(self, deadline):
+        """
+        Read the json document reported by the last command.
+
+        The document may be preceded by the prompt of the shell, and by
+        lines which are not part of the document. It starts with a line
+        with an opening brace, and ends with a line with a closing brace.
+        """
+        lines = None
+        while True:
+            line = self._readline(deadline)
+            while line.startswith(PROMPT):
+                line = line[len(PROMPT) :]  # noqa: E203
+            text = line.strip()
+            if lines is None:
+                if text == b"{":
+                    lines = [line]
+                continue
+            lines.append(line)
+            if text == b"}":
+                try:
+                    return json.loads(b"".join(lines))
+                except ValueError:
+                    # A closing brace of a nested object.
+                    continue
+
+    def _readline(self, deadline):
+        fd = self._proc.stdout.fileno()
+        while b"\n" not in self._buf:
+            timeout = deadline - monotonic_time()
+            if timeout <= 0:
+                raise Error("Timeout waiting for lvm shell output")
+            readable, _, _ = select.select([fd], [], [], timeout)
+            if not readable:
+                continue
+            data = os.read(fd, 65536)
+            if not data:
+                raise Error("lvm shell terminated")
+            self._buf += data
+        line, self._buf = self._buf.split(b"\n", 1)
+        return line + b"\n"
+
+
+def _shell_line(cmd):
+    """
+    Convert lvm command to shell command line, reporting json with the
+    command log instead of text.
+    """
+    args = [cmd[1], "--reportformat", "json"]
+    it = iter(cmd[2:])
+    for arg in it:
+        if arg in ("--noheadings",):
+            continue
+        if arg == "--separator":
+            next(it)
+            continue
+        args.append(arg)
+        if arg == "--config":
+            args.append(next(it) + " " + LOG_CONFIG)
+    return " ".join(_quote(arg) for arg in args)
+
+
+def _quote(arg):
+    # The shell supports quoting whole arguments, without escaping.
+    if not arg or any(c.isspace() or c in "\"#" for c in arg):
+        return "'%s'" % arg
+    return arg
+
+
+def _parse_document(doc):
+    """
+    Convert json document reported by a command to (rc, out, err), like
+    running the command with --noheadings and --separator "|".
+    """
+    out = []
+    for report in doc.get("report", ()):
+        for rows in report.values():
+            for row in rows:
+                out.append("  " + "|".join(row.values()))
+
+    err = []
+    status = None
+    for entry in doc.get("log", ()):
+        log_type = entry.get("log_type")
+        if log_type == "status":
+            status = entry.get("log_ret_code")
+        elif log_type in ("error", "warn"):
+            err.append(entry.get("log_message", ""))
+
+    if status is None:
+        raise Error("No command status in lvm shell output")
+
+    rc = 0 if status == ECMD_PROCESSED else ECMD_FAILED
+    out = "".join(line + "\n" for line in out).encode("utf-8")
+    err = "".join(line + "\n" for line in err).encode("utf-8")
+    return rc, out, err
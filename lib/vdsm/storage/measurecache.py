@@ -0,0 +1,144 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""
+Cache for qemu-img measure results and volume sizes.
+
+Measuring a volume requires running qemu-img, which is expensive compared
+with the cost of checking if the volume was modified. Engine asks for the
+same estimates many times while planning copy, move and export operations,
+so we keep the results and reuse them while the volumes are not modified.
+
+qemu-img measure reads the entire backing chain, so a measure result is
+keyed on the change tokens of every volume in the measured chain. Chain
+size estimates are built from the sizes of the chain volumes, cached per
+volume, so volumes shared by many chains (e.g. a template) are looked up
+once.
+
+The change token is returned by VolumeManifest.change_token(). A volume
+which may be modified without changing its token (e.g. a block volume
+written by a guest) has no token, and results using it are not cached.
+Entries also expire after a short time.
+"""
+
+import threading
+import time
+
+from vdsm.config import config
+from vdsm.storage import qemuimg
+
+
+class _Entry:
+
+    __slots__ = ("token", "value", "expires")
+
+    def __init__(self, token, value, expires):
+        self.token = token
+        self.value = value
+        self.expires = expires
+
+
+class MeasureCache:
+    """
+    Keep qemu-img measure results per volume chain, and sizes per volume.
+
+    Results are valid only while the change tokens of the volumes are
+    unchanged and the entry did not expire.
+    """
+
+    def __init__(self, ttl=None, clock=time.monotonic):
+        if ttl is None:
+            ttl = config.getint("irs", "measure_cache_ttl")
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def measure(self, chain, **kwargs):
+        """
+        Return qemuimg.measure() result, running qemu-img only if there is
+        no valid cached result.
+
+        Arguments:
+            chain (list): (key, token) tuple for every volume read by
+                qemu-img, typically the volume path and the volume change
+                token. If a token is None, the result is not cached.
+            **kwargs: Arguments for qemuimg.measure().
+        """
+        keys = tuple(key for key, _ in chain)
+        tokens = tuple(token for _, token in chain)
+        if None in tokens:
+            return qemuimg.measure(**kwargs)
+
+        cache_key = ("measure", keys, tuple(sorted(kwargs.items())))
+        return self._get(cache_key, tokens, lambda: qemuimg.measure(**kwargs))
+
+    def volume_size(self, key, token, get_size):
+        """
+        Return volume size, calling get_size() only if there is no valid
+        cached size.
+
+        Arguments:
+            key (str): Volume key, typically the volume path.
+            token (tuple): Volume change token. If None, the size is not
+                cached.
+            get_size (callable): Return the volume size.
+        """
+        if token is None:
+            return get_size()
+
+        return self._get(("size", key), token, get_size)
+
+    def _get(self, cache_key, token, produce):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry.token == token and now < entry.expires:
+                return entry.value
+
+        # Run qemu-img without holding the lock, so measuring one volume
+        # does not block other callers.
+        value = produce()
+
+        with self._lock:
+            self._drop_expired(now)
+            self._entries[cache_key] = _Entry(token, value, now + self._ttl)
+
+        return value
+
+    def _drop_expired(self, now):
+        # Called with the lock held.
+        expired = [k for k, e in self._entries.items() if e.expires <= now]
+        for k in expired:
+            del self._entries[k]
+
+
+_cache = MeasureCache()
+
+
+def measure(chain, **kwargs):
+    return _cache.measure(chain, **kwargs)
+
+
+def volume_size(key, token, get_size):
+    return _cache.volume_size(key, token, get_size)
+
+
+def chain_tokens(vol, base=None):
+    """
+    Return (path, token) tuple for vol and the volumes in its backing chain,
+    ending at base if specified, for measure().
+
+    Stops at the first volume without a token, since the result cannot be
+    cached anyway.
+    """
+    chain = []
+    while vol is not None:
+        token = vol.change_token()
+        chain.append((vol.getVolumePath(), token))
+        if token is None:
+            break
+        if base is not None and vol.volUUID == base.volUUID:
+            break
+        vol = vol.getParentVolume()
+    return chain
@@ -11,6 +11,7 @@ from contextlib import contextmanager
 
 from vdsm import host
 from vdsm import utils
+from vdsm.common import concurrent
 from vdsm.common import exception
 from vdsm.common.marks import deprecated
 from vdsm.common.threadlocal import vars
@@ -542,6 +543,17 @@ class StorageDomainManifest(object):
             self.mountpoint, self.sdUUID, imgUUID, volUUID
         )
 
+    @contextmanager
+    def metadata_snapshot(self, img_id=None):
+        """
+        Read volumes metadata in bulk, and use it for metadata reads in the
+        current thread until the context exits.
+
+        Implemented only by domains keeping volumes metadata in a shared
+        metadata volume. In other domains this does nothing.
+        """
+        yield
+
     def isISO(self):
         return self.getMetaParam(DMDK_CLASS) == ISO_DOMAIN
 
@@ -860,6 +872,61 @@ class StorageDomainManifest(object):
         # tell anything about the status of the lease if we couldn't inspect
         # it.
         res_version, owner_host_id = self._domainLock.inspect(lease)
+        return self._external_lease_status(
+            lease_id, host_id, res_version, owner_host_id
+        )
+
+    def bulk_lease_status(self, lease_ids, host_id):
+        """
+        Return the status of many external leases, for example the leases
+        of the HA VMs using this domain.
+
+        All the leases are inspected using the same hosts status, instead of
+        getting the hosts status for every lease.
+
+        Returns:
+            List of concurrent.Result with the status dict returned by
+            lease_status() if getting the status succeeded, or the exception
+            if it failed, in the same order as lease_ids.
+        """
+        results = [None] * len(lease_ids)
+        found = []
+
+        with self.external_leases_lock.shared:
+            with self.external_leases_volume() as vol:
+                for i, lease_id in enumerate(lease_ids):
+                    try:
+                        info = vol.lookup(lease_id)
+                    except Exception as e:
+                        results[i] = concurrent.Result(False, e)
+                    else:
+                        lease = clusterlock.Lease(
+                            info.resource, info.path, info.offset
+                        )
+                        found.append((i, lease))
+
+        inspected = self._domainLock.inspect_leases(
+            [lease for _, lease in found]
+        )
+
+        for (i, _), res in zip(found, inspected):
+            if res.succeeded:
+                res_version, owner_host_id = res.value
+                try:
+                    status = self._external_lease_status(
+                        lease_ids[i], host_id, res_version, owner_host_id
+                    )
+                except Exception as e:
+                    res = concurrent.Result(False, e)
+                else:
+                    res = concurrent.Result(True, status)
+            results[i] = res
+
+        return results
+
+    def _external_lease_status(
+        self, lease_id, host_id, res_version, owner_host_id
+    ):
         lvb = None
 
         # We only care about reading lvb on released leases, as lvb is written
@@ -1104,8 +1171,10 @@ class StorageDomain(object):
     def getAllVolumes(self):
         return self._manifest.getAllVolumes()
 
-    def dump(self, full=False):
-        return self._manifest.dump(full=full)
+    def dump(self, full=False, image_id=None, offset=0, limit=None):
+        return self._manifest.dump(
+            full=full, image_id=image_id, offset=offset, limit=limit
+        )
 
     def iter_volumes(self):
         """
@@ -1260,6 +1329,9 @@ class StorageDomain(object):
             self.mountpoint, self.sdUUID, imgUUID, volUUID
         )
 
+    def metadata_snapshot(self, img_id=None):
+        return self._manifest.metadata_snapshot(img_id)
+
     def validateCreateVolumeParams(
         self,
         volFormat,
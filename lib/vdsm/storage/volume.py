@@ -326,6 +326,17 @@ class VolumeManifest(object):
         volParams['block'] = self.is_block()
         return volParams
 
+    def change_token(self):
+        """
+        Return a value that changes when the volume is modified, or None if
+        the volume may be modified without changing the token.
+
+        The token is used to invalidate cached results computed from the
+        volume contents, such as qemu-img measure results.
+        """
+        generation = self.getMetaParam(sc.GENERATION)
+        return (generation, self.getVolumeSize())
+
     def getVmVolumeInfo(self):
         """
         Return VM volume information.
@@ -1711,6 +1722,9 @@ class Volume(object):
     def getVolumeTrueSize(self):
         return self._manifest.getVolumeTrueSize()
 
+    def change_token(self):
+        return self._manifest.change_token()
+
     def setCapacity(self, capacity):
         self._manifest.setCapacity(capacity)
 
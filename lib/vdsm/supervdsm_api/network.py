@@ -16,7 +16,11 @@ from vdsm.network.api import (
     remove_dhcp_monitoring,
 )
 from vdsm.network.sysctl import set_rp_filter_loose, set_rp_filter_strict
-from vdsm.network.tc import setPortMirroring, unsetPortMirroring
+from vdsm.network.tc import (
+    setPortMirroring,
+    setPortMirroringMany,
+    unsetPortMirroring,
+)
 
 expose(setSafeNetworkConfig)
 expose(setupNetworks)
@@ -24,6 +28,7 @@ expose(network_caps)
 expose(network_stats)
 expose(change_numvfs)
 expose(setPortMirroring)
+expose(setPortMirroringMany)
 expose(unsetPortMirroring)
 expose(set_rp_filter_loose)
 expose(set_rp_filter_strict)
@@ -20,6 +20,9 @@ _NAME = 'dump-volume-chains'
 UNKNOWN_IMAGE = "unknown-image"
 UNKNOWN_PARENT = "unknown-parent"
 
+# Number of volumes requested in every StorageDomain.dump call.
+PAGE_SIZE = 1000
+
 
 class DumpChainsError(Exception):
     pass
@@ -92,7 +95,20 @@ def dump_chains(*args):
         parsed_args.host, parsed_args.port, use_tls=parsed_args.use_ssl
     )
     with utils.closing(cli):
-        volumes_info = _get_volumes_info(cli, parsed_args.sd_uuid)
+        volumes = _iter_volumes(cli, parsed_args.sd_uuid, parsed_args.image)
+        if parsed_args.output == 'ndjson':
+            # no analysis, stream volumes as newline delimited json
+            _dump_ndjson(
+                _filter_volumes(
+                    volumes,
+                    chain=parsed_args.chain,
+                    illegal=parsed_args.illegal,
+                ),
+                sys.stdout,
+            )
+            return
+
+        volumes_info = _get_volumes_info(dict(volumes))
         if parsed_args.output == 'text':
             # perform analysis and print in human readable format
             image_chains = _get_volumes_chains(volumes_info)
@@ -122,7 +138,7 @@ def _parse_args(args):
     parser.add_argument(
         '-o',
         '--output',
-        choices=['text', 'json', 'sqlite'],
+        choices=['text', 'json', 'ndjson', 'sqlite'],
         default='text',
         help="select output format",
     )
@@ -130,12 +146,32 @@ def _parse_args(args):
         '-p', '--port', default=config.getint('addresses', 'management_port')
     )
     parser.add_argument('-f', '--sqlite-file', help="sqlite3 db output file")
+    parser.add_argument(
+        '-i', '--image', help="dump only volumes of this image UUID"
+    )
+    parser.add_argument(
+        '-c',
+        '--chain',
+        metavar='VOL_UUID',
+        help="dump only this volume and its parents (requires ndjson output)",
+    )
+    parser.add_argument(
+        '--illegal',
+        action='store_true',
+        help="dump only illegal volumes (requires ndjson output)",
+    )
 
     parsed_args = parser.parse_args(args=args[1:])
 
     if parsed_args.output == 'sqlite' and parsed_args.sqlite_file is None:
         parser.error("--output sqlite requires --sqlite-file.")
 
+    if parsed_args.output != 'ndjson':
+        if parsed_args.chain is not None:
+            parser.error("--chain requires --output ndjson.")
+        if parsed_args.illegal:
+            parser.error("--illegal requires --output ndjson.")
+
     return parsed_args
 
 
@@ -189,10 +225,83 @@ def _iter_volumes_info(volumes_info):
             yield vol_info
 
 
-def _get_volumes_info(cli, sd_uuid):
-    volumes_info = defaultdict(dict)
+def _iter_volumes(cli, sd_uuid, image_id=None):
+    """
+    Iterate over (vol_id, vol_info) tuples of the domain volumes, or of the
+    volumes of image image_id and their template volumes.
+    """
+    if image_id is None:
+        yield from _iter_pages(cli, sd_uuid)
+        return
+
+    volumes = dict(_iter_pages(cli, sd_uuid, image_id=image_id))
+
+    # Volumes based on a template have a parent in another image. Since we
+    # cannot tell which image holds the template, look it up in the entire
+    # domain.
+    missing = {
+        vol_info.get("parent", UNKNOWN_PARENT) for vol_info in volumes.values()
+    }
+    missing -= {_BLANK_UUID, UNKNOWN_PARENT}
+    missing -= volumes.keys()
+    if missing:
+        volumes.update(_find_volumes(cli, sd_uuid, missing))
 
-    volumes = cli.StorageDomain.dump(sd_id=sd_uuid)["volumes"]
+    yield from volumes.items()
+
+
+def _find_volumes(cli, sd_uuid, vol_ids):
+    """
+    Return dict of volumes vol_ids and their parents, keeping only these
+    volumes while reading the domain volumes. Stops when all the volumes
+    were found, or when no more volumes can be found.
+    """
+    found = {}
+    missing = set(vol_ids)
+    while missing:
+        found_count = len(found)
+        for vol_id, vol_info in _iter_pages(cli, sd_uuid):
+            if vol_id not in missing:
+                continue
+            found[vol_id] = vol_info
+            missing.discard(vol_id)
+            parent = vol_info.get("parent", UNKNOWN_PARENT)
+            if parent not in found and parent not in (
+                _BLANK_UUID,
+                UNKNOWN_PARENT,
+            ):
+                missing.add(parent)
+            if not missing:
+                break
+
+        # Template volumes are base volumes, so one pass is typically
+        # enough. A parent read before its child requires another pass.
+        if len(found) == found_count:
+            break
+
+    return found
+
+
+def _iter_pages(cli, sd_uuid, image_id=None):
+    """
+    Iterate over (vol_id, vol_info) tuples, requesting PAGE_SIZE volumes at
+    a time, so the volumes of large domains are not held in memory at once.
+    """
+    kwargs = {"sd_id": sd_uuid, "limit": PAGE_SIZE}
+    if image_id is not None:
+        kwargs["image_id"] = image_id
+
+    offset = 0
+    while True:
+        volumes = cli.StorageDomain.dump(offset=offset, **kwargs)["volumes"]
+        yield from volumes.items()
+        if len(volumes) < PAGE_SIZE:
+            break
+        offset += len(volumes)
+
+
+def _get_volumes_info(volumes):
+    volumes_info = defaultdict(dict)
 
     # find volumes per image
     for vol_id, vol_info in volumes.items():
@@ -212,6 +321,52 @@ def _get_volumes_info(cli, sd_uuid):
     return volumes_info
 
 
+def _chain_ids(volumes, vol_id):
+    """
+    Return set of volume vol_id and its parents ids, using the parent index
+    of volumes. Stops at the base volume, a missing volume, or a loop.
+    """
+    chain = set()
+    while vol_id in volumes and vol_id not in chain:
+        chain.add(vol_id)
+        vol_id = volumes[vol_id].get("parent", UNKNOWN_PARENT)
+    return chain
+
+
+def _filter_volumes(volumes, chain=None, illegal=False):
+    """
+    Filter iterable of (vol_id, vol_info) tuples, keeping only the volumes
+    in the chain of volume chain if specified, and only illegal volumes if
+    illegal is True.
+
+    Finding the chain requires all the volumes, so volumes are streamed only
+    if chain is not specified.
+    """
+    if chain is not None:
+        volumes = dict(volumes)
+        chain_ids = _chain_ids(volumes, chain)
+        volumes = volumes.items()
+
+    for vol_id, vol_info in volumes:
+        if chain is not None and vol_id not in chain_ids:
+            continue
+        if illegal and vol_info.get("legality") == "LEGAL":
+            continue
+        yield vol_id, vol_info
+
+
+def _dump_ndjson(volumes, out):
+    """
+    Write volumes as newline delimited json, one volume per line, so output
+    can be processed while it is written.
+    """
+    for vol_id, vol_info in volumes:
+        line = dict(vol_info)
+        line["uuid"] = vol_id
+        out.write(json.dumps(line, sort_keys=True))
+        out.write("\n")
+
+
 def _get_volumes_chains(volumes_info):
     image_chains = {}
 
@@ -242,15 +397,15 @@ def _build_volume_chain(volumes_children):
     if len(volumes_by_parents) < len(volumes_children):
         raise DuplicateParentError(volumes_children)
 
-    child_vol = _BLANK_UUID
     chain = []  # ordered vol_UUIDs
-    while True:
-        child_vol = volumes_by_parents.get(child_vol)
-        if child_vol is None:
-            break  # end of chain
-        if child_vol in chain:
+    seen = set()
+    child_vol = volumes_by_parents.get(_BLANK_UUID)
+    while child_vol is not None:
+        if child_vol in seen:
             raise ChainLoopError(volumes_children)
+        seen.add(child_vol)
         chain.append(child_vol)
+        child_vol = volumes_by_parents.get(child_vol)
 
     if not chain and volumes_by_parents:
         raise NoBaseVolume(volumes_children)
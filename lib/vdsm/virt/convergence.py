@@ -0,0 +1,114 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""
+Live migration convergence prediction.
+
+During pre-copy migration every iteration sends the memory dirtied by the
+guest while the previous iteration was sent. If the guest dirties memory at
+rate D and the data is sent at bandwidth B, the data remaining for the next
+iteration is the data remaining for the current iteration multiplied by
+D / B. The migration can complete when the remaining data can be sent
+within the maximum downtime.
+
+The Estimator keeps the last migration progress samples and predicts the
+number of iterations needed to converge with a given downtime. The
+migration monitor uses the prediction to move to the convergence schedule
+step that is expected to work, instead of waiting until the migration
+stalls for the number of iterations specified in the schedule.
+"""
+
+import collections
+import math
+
+# Used when libvirt does not report the memory page size.
+DEFAULT_PAGE_SIZE = 4096
+
+
+class Estimator(object):
+
+    def __init__(self, samples=3):
+        """
+        Arguments:
+            samples (int): Number of progress samples used to compute the
+                average bandwidth and dirty rate.
+        """
+        self._samples = collections.deque(maxlen=samples)
+
+    def update(self, progress):
+        """
+        Add a migration progress sample.
+
+        Arguments:
+            progress (migration.Progress): Progress of the migration.
+        """
+        self._samples.append(progress)
+
+    def clear(self):
+        self._samples.clear()
+
+    @property
+    def bandwidth(self):
+        """
+        Return the average transfer bandwidth in bytes per second, or None if
+        not known yet.
+        """
+        rates = [p.mem_bps for p in self._samples if p.mem_bps > 0]
+        if rates:
+            return sum(rates) / len(rates)
+
+        # Older libvirt does not report the bandwidth, compute it from the
+        # processed memory.
+        if len(self._samples) < 2:
+            return None
+        first = self._samples[0]
+        last = self._samples[-1]
+        elapsed = (last.time_elapsed - first.time_elapsed) / 1000
+        processed = last.mem_processed - first.mem_processed
+        if elapsed <= 0 or processed <= 0:
+            return None
+        return processed / elapsed
+
+    @property
+    def dirty_rate(self):
+        """
+        Return the average rate of memory dirtied by the guest in bytes per
+        second, or None if libvirt does not report the dirty rate.
+        """
+        rates = [
+            p.dirty_rate * p.mem_page_size
+            for p in self._samples
+            if p.dirty_rate >= 0
+        ]
+        if not rates:
+            return None
+        return sum(rates) / len(rates)
+
+    def iterations(self, downtime):
+        """
+        Return the number of iterations needed to converge with maximum
+        downtime, math.inf if the migration is not expected to converge, or
+        None if there is not enough data for prediction.
+
+        Arguments:
+            downtime (int): Maximum downtime in milliseconds.
+        """
+        if not self._samples:
+            return None
+        bandwidth = self.bandwidth
+        dirty_rate = self.dirty_rate
+        if bandwidth is None or dirty_rate is None:
+            return None
+
+        remaining = self._samples[-1].mem_remaining
+        target = bandwidth * downtime / 1000
+        if remaining <= target:
+            return 0
+
+        ratio = dirty_rate / bandwidth
+        if ratio >= 1:
+            return math.inf
+        if ratio == 0:
+            return 1
+
+        return math.ceil(math.log(target / remaining) / math.log(ratio))
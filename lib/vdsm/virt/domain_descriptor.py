@@ -3,6 +3,7 @@
 
 from contextlib import contextmanager
 import enum
+import threading
 import xml.etree.ElementTree as etree
 
 from vdsm import taskset
@@ -170,6 +171,13 @@ class MutableDomainDescriptor(object):
 
 
 class DomainDescriptor(MutableDomainDescriptor):
+    """
+    Read only domain XML descriptor.
+
+    The domain XML is parsed when first needed, and the devices hash is
+    computed once from the devices section of the XML text, so creating a
+    descriptor that is replaced before it is used is cheap.
+    """
 
     def __init__(self, xmlStr, xml_source=XmlSource.LIBVIRT):
         """
@@ -183,17 +191,32 @@ class DomainDescriptor(MutableDomainDescriptor):
         :type xml_source: XmlSource
         :type migration_src: bool
         """
-        super(DomainDescriptor, self).__init__(xmlStr)
+        # Parsing is done lazily in the _dom property, so we don't call
+        # MutableDomainDescriptor.__init__.
         self._xml = xmlStr
         self._xml_source = xml_source
-        self._devices = super(DomainDescriptor, self).devices
-        if (
-            self._xml_source == XmlSource.INITIAL
-            or self._xml_source == XmlSource.MIGRATION_SOURCE
-        ):
-            self._devices_hash = None
-        else:
-            self._devices_hash = super(DomainDescriptor, self).devices_hash
+        self._lock = threading.Lock()
+        self._root = None
+        self._devices = _UNKNOWN
+        self._devices_hash = _UNKNOWN
+
+    @property
+    def _dom(self):
+        root = self._root
+        if root is None:
+            with self._lock:
+                if self._root is None:
+                    self._root = xmlutils.fromstring(self._xml)
+                root = self._root
+        return root
+
+    @property
+    def id(self):
+        return self._dom.findtext('uuid')
+
+    @property
+    def name(self):
+        return self._dom.findtext('name')
 
     @property
     def xml_source(self):
@@ -205,12 +228,52 @@ class DomainDescriptor(MutableDomainDescriptor):
 
     @property
     def devices(self):
+        if self._devices is _UNKNOWN:
+            self._devices = vmxml.find_first(self._dom, 'devices', None)
         return self._devices
 
     @property
     def devices_hash(self):
+        if self._devices_hash is _UNKNOWN:
+            if (
+                self._xml_source == XmlSource.INITIAL
+                or self._xml_source == XmlSource.MIGRATION_SOURCE
+            ):
+                self._devices_hash = None
+            else:
+                self._devices_hash = hash(_devices_section(self._xml))
         return self._devices_hash
 
+    def same_xml(self, xml):
+        """
+        Return True if this descriptor was created from libvirt domain XML
+        equal to xml.
+        """
+        return self._xml_source == XmlSource.LIBVIRT and self._xml == xml
+
     @contextmanager
     def metadata_descriptor(self):
         yield metadata.Descriptor.from_tree(self._dom)
+
+
+_UNKNOWN = object()
+
+
+def _devices_section(xml):
+    """
+    Return the text of the devices element in domain XML, or empty string if
+    the domain XML does not have devices element.
+
+    Libvirt domain XML has a single devices element, so we can find it in
+    the XML text without parsing and serializing the XML.
+    """
+    start = xml.find('<devices')
+    if start == -1:
+        return ''
+    end = xml.rfind('</devices>')
+    if end == -1:
+        # Empty devices element: <devices/>
+        end = xml.find('>', start) + 1
+    else:
+        end += len('</devices>')
+    return xml[start:end]
@@ -0,0 +1,226 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""
+Dispatching libvirt events to VMs.
+
+libvirt invokes the event callbacks on the libvirt event loop thread. If
+events are handled in the callback, a slow handler of one VM delays the
+delivery of events to all VMs.
+
+Dispatcher queues the events of every VM in order, and runs the handlers in
+a pool of worker threads. Every VM queue is served by one worker at a time,
+so handlers of a VM run in the order the events were received, and handlers
+of different VMs run in parallel.
+
+An event may be queued with a coalesce key. If an event with the same key
+is waiting in the VM queue, the waiting event is updated with the arguments
+of the new event instead of queuing another event. This is useful for events
+when only the last event matters, like repeated block threshold events for
+the same drive.
+"""
+
+import collections
+import logging
+import threading
+
+from vdsm import metrics
+from vdsm.common import concurrent
+from vdsm.common.time import monotonic_time
+
+log = logging.getLogger("virt.eventqueue")
+
+
+class _Event(object):
+
+    __slots__ = ("func", "args", "coalesce", "queued")
+
+    def __init__(self, func, args, coalesce, queued):
+        self.func = func
+        self.args = args
+        self.coalesce = coalesce
+        self.queued = queued
+
+
+class Dispatcher(object):
+    """
+    Run event handlers in order per key, and in parallel across keys.
+    """
+
+    def __init__(self, workers, name="libvirt/events", clock=monotonic_time):
+        """
+        Arguments:
+            workers (int): Number of worker threads. If 0, events are handled
+                in the caller thread.
+            name (str): Name of the worker threads.
+            clock (callable): Clock used to measure queue latency.
+        """
+        self._workers = workers
+        self._name = name
+        self._clock = clock
+        self._cond = threading.Condition(threading.Lock())
+        self._running = False
+        self._threads = []
+        # Queue of pending events per key. A key has a queue while it has
+        # pending events or while a worker is handling its event.
+        self._queues = {}
+        # Keys with pending events and no worker handling their events.
+        self._ready = collections.deque()
+        self._busy = set()
+        self._reset_stats()
+
+    def start(self):
+        if self._workers == 0:
+            log.info("Handling events in the libvirt event loop thread")
+            return
+        log.info("Starting %d event workers", self._workers)
+        with self._cond:
+            self._running = True
+        for i in range(self._workers):
+            t = concurrent.thread(
+                self._run, name="{}/{}".format(self._name, i)
+            )
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        """
+        Stop the workers. Workers finish the events they are handling, and
+        pending events are dropped.
+        """
+        with self._cond:
+            if not self._running:
+                return
+            log.info("Stopping event workers")
+            self._running = False
+            pending = 0
+            for queue in self._queues.values():
+                pending += len(queue)
+                queue.clear()
+            self._queues.clear()
+            self._ready.clear()
+            self._cond.notify_all()
+        if pending:
+            log.warning("Dropped %d pending events", pending)
+
+    def wait(self, timeout=None):
+        for t in self._threads:
+            t.join(timeout)
+
+    def dispatch(self, key, func, *args, coalesce=None):
+        """
+        Queue func(*args) to run after the events of key queued before it.
+
+        Arguments:
+            key (str): Events with the same key are handled in order.
+            func (callable): Event handler.
+            args: Arguments for the handler.
+            coalesce (object): If not None, an event waiting in the queue of
+                key with the same coalesce value is updated with args,
+                instead of queuing a new event.
+        """
+        with self._cond:
+            if not self._running:
+                run_inline = True
+            else:
+                run_inline = False
+                self._queue(key, func, args, coalesce)
+
+        if run_inline:
+            self._handle(func, args)
+
+    def stats(self):
+        """
+        Return the queue statistics, and start a new measurement interval.
+
+        Returns:
+            dict with:
+                pending (int): Number of events waiting in the queues.
+                dispatched (int): Number of events handled in the interval.
+                coalesced (int): Number of events coalesced in the interval.
+                latency (float): Mean time in seconds events waited in the
+                    queue in the interval.
+                max_latency (float): Maximum time in seconds an event waited
+                    in the queue in the interval.
+        """
+        with self._cond:
+            stats = {
+                "pending": sum(len(q) for q in self._queues.values()),
+                "dispatched": self._dispatched,
+                "coalesced": self._coalesced,
+                "latency": (
+                    self._total_latency / self._dispatched
+                    if self._dispatched
+                    else 0.0
+                ),
+                "max_latency": self._max_latency,
+            }
+            self._reset_stats()
+        return stats
+
+    def send_metrics(self):
+        prefix = "hosts.vdsm.libvirt_events."
+        report = {prefix + name: value for name, value in self.stats().items()}
+        metrics.send(report)
+
+    # Must be called with the lock held.
+
+    def _queue(self, key, func, args, coalesce):
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = collections.deque()
+
+        if coalesce is not None:
+            for event in queue:
+                if event.coalesce == coalesce:
+                    event.args = args
+                    self._coalesced += 1
+                    return
+
+        queue.append(_Event(func, args, coalesce, self._clock()))
+        if len(queue) == 1 and key not in self._busy:
+            self._ready.append(key)
+            self._cond.notify()
+
+    def _reset_stats(self):
+        self._dispatched = 0
+        self._coalesced = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    # Worker thread.
+
+    def _run(self):
+        log.debug("Event worker started")
+        while True:
+            with self._cond:
+                while self._running and not self._ready:
+                    self._cond.wait()
+                if not self._running:
+                    break
+                key = self._ready.popleft()
+                queue = self._queues[key]
+                event = queue.popleft()
+                self._busy.add(key)
+                latency = self._clock() - event.queued
+                self._dispatched += 1
+                self._total_latency += latency
+                self._max_latency = max(self._max_latency, latency)
+
+            try:
+                self._handle(event.func, event.args)
+            finally:
+                with self._cond:
+                    self._busy.discard(key)
+                    if queue:
+                        self._ready.append(key)
+                        self._cond.notify()
+                    elif self._queues.get(key) is queue:
+                        del self._queues[key]
+        log.debug("Event worker stopped")
+
+    def _handle(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            log.exception("Unhandled error in event handler %s", func)
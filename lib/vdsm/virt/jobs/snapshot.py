@@ -5,6 +5,7 @@
 This module implements a job that creates a snapshot for a given VM.
 """
 
+import functools
 import os
 import pickle
 import threading
@@ -18,6 +19,7 @@ from vdsm import utils
 from vdsm.config import config
 from vdsm.common import concurrent
 from vdsm.common import properties, xmlutils
+from vdsm.common import response
 from vdsm.common.time import monotonic_time
 
 # TODO: remove these imports, code using this should use storage apis.
@@ -95,6 +97,7 @@ class Job(vdsm.virt.jobs.Job):
         self._lock = threading.Lock()
         self._snapshot_job = {}
         self._freeze_timeout = freeze_timeout * 60
+        self._timing = {}
         if recovery:
             self._snapshot_job = _read_snapshot_md(self._vm, self._lock)
         self._load_metadata()
@@ -137,6 +140,7 @@ class Job(vdsm.virt.jobs.Job):
                     self._snapshot_job,
                     self._lock,
                     self._freeze_timeout,
+                    timing=self._timing,
                 )
                 snap.snapshot()
         except:
@@ -158,6 +162,12 @@ class Job(vdsm.virt.jobs.Job):
             if self._memory_params:
                 t.join()
 
+    def info(self):
+        info = super(Job, self).info()
+        if self._timing:
+            info['timing'] = dict(self._timing)
+        return info
+
     def _load_metadata(self):
         # If self._snapshot_job is not None, then it was already populated
         # with some data. This means, we are in recovery.
@@ -192,6 +202,7 @@ class Snapshot(properties.Owner):
         snapshot_job,
         lock,
         freeze_timeout,
+        timing=None,
     ):
         self._vm = vm
         self._snap_drives = snap_drives
@@ -207,6 +218,11 @@ class Snapshot(properties.Owner):
         self._freeze_timeout = freeze_timeout
         self._snapshot_job = snapshot_job
         self._lock = lock
+        # Time in seconds spent in the snapshot phases, reported in the job
+        # info.
+        self._timing = {} if timing is None else timing
+        self._frozen_since = None
+        self._thawed = False
         self._init_snapshot_metadata()
 
     def _init_snapshot_metadata(self):
@@ -236,8 +252,12 @@ class Snapshot(properties.Owner):
         # Must always thaw, even if freeze failed; in case the guest
         # did freeze the filesystems, but failed to reply in time.
         # Libvirt is using same logic (see src/qemu/qemu_driver.c).
-        if self._should_freeze:
-            self._vm.thaw()
+        if self._should_freeze and not self._thawed:
+            res = self._vm.thaw()
+            if not response.is_error(res):
+                self._thawed = True
+            if self._frozen_since is not None:
+                self._timing['frozen'] = monotonic_time() - self._frozen_since
 
     def finalize_vm(self, memory_vol):
         try:
@@ -330,6 +350,128 @@ class Snapshot(properties.Owner):
             id(self),
         )
 
+    def _prepare_volumes(self, new_drives, vm_drives):
+        """
+        Prepare the new volumes of the drives and the memory volumes
+        concurrently, before freezing the guest.
+
+        Returns:
+            tuple (snapshot elements of the drives in new_drives order,
+                memory volume path or None)
+        """
+        names = list(new_drives)
+        tasks = [
+            functools.partial(
+                self._prepare_drive,
+                name,
+                new_drives[name],
+                vm_drives[name][0],
+            )
+            for name in names
+        ]
+        if self._memory_params:
+            tasks.append(self._prepare_memory_volumes)
+
+        if not tasks:
+            return [], None
+
+        def run(item):
+            index, task = item
+            return index, task()
+
+        results = [None] * len(tasks)
+        failed = False
+        max_workers = min(
+            len(tasks), config.getint('vars', 'snapshot_prepare_workers')
+        )
+        for res in concurrent.tmap(
+            run,
+            enumerate(tasks),
+            max_workers=max_workers,
+            name="snapshot/" + self._job_uuid[:8],
+        ):
+            if res.succeeded:
+                index, value = res.value
+                results[index] = value
+            else:
+                # The task logged the error.
+                failed = True
+
+        memory_vol_path = None
+        if self._memory_params:
+            memory_vol_path = results.pop()
+
+        if failed:
+            # Tear down all the volumes, since a failed preparation may leave
+            # the volume active.
+            self._rollback_drives(new_drives)
+            if memory_vol_path is not None:
+                self._vm.cif.teardownVolumePath(self._memory_params['dst'])
+            raise exception.SnapshotFailed()
+
+        return results, memory_vol_path
+
+    def _prepare_drive(self, vm_dev_name, vm_device, drive):
+        try:
+            vm_device["path"] = self._vm.cif.prepareVolumePath(vm_device)
+        except Exception:
+            self._vm.log.exception(
+                'unable to prepare the volume path for disk %s', vm_dev_name
+            )
+            raise
+        return drive.get_snapshot_xml(vm_device)
+
+    def _prepare_memory_volumes(self):
+        try:
+            # Save the needed vm configuration
+            # TODO: this, as other places that use pickle.dump
+            # directly to files, should be done with outOfProcess
+            vm_conf_vol = self._memory_params['dstparams']
+            vm_conf_vol_path = self._vm.cif.prepareVolumePath(vm_conf_vol)
+            try:
+                with open(vm_conf_vol_path, "rb+") as f:
+                    vm_conf = self._vm_conf_for_memory_snapshot()
+                    # protocol=2 is needed for clusters < 4.4
+                    # (for Python 2 host compatibility)
+                    data = pickle.dumps(vm_conf, protocol=2)
+
+                    # Ensure that the volume is aligned; qemu-img may segfault
+                    # when converting unligned images.
+                    # https://bugzilla.redhat.com/1649788
+                    aligned_length = utils.round(len(data), 4096)
+                    data = data.ljust(aligned_length, b"\0")
+
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                self._vm.cif.teardownVolumePath(vm_conf_vol)
+
+            return self._vm.cif.prepareVolumePath(self._memory_params['dst'])
+        except Exception:
+            self._vm.log.exception('unable to prepare the memory volumes')
+            raise
+
+    def _vm_conf_for_memory_snapshot(self):
+        """Returns the needed vm configuration with the memory snapshot"""
+
+        return {
+            'restoreFromSnapshot': True,
+            '_srcDomXML': self._vm.migratable_domain_xml(),
+            'elapsedTimeOffset': time.time() - self._vm.start_time,
+        }
+
+    def _rollback_drives(self, new_drives):
+        """Rollback the prepared volumes for the snapshot"""
+
+        for vm_dev_name, drive in new_drives.items():
+            try:
+                self._vm.cif.teardownVolumePath(drive)
+            except Exception:
+                self._vm.log.exception(
+                    "Unable to teardown drive: %s", vm_dev_name
+                )
+
     def snapshot(self):
         """Live snapshot command"""
 
@@ -359,17 +501,6 @@ class Snapshot(properties.Owner):
 
             return base_drv, target_drv
 
-        def rollback_drives(new_drives):
-            """Rollback the prepared volumes for the snapshot"""
-
-            for vm_dev_name, drive in new_drives.items():
-                try:
-                    self._vm.cif.teardownVolumePath(drive)
-                except Exception:
-                    self._vm.log.exception(
-                        "Unable to teardown drive: %s", vm_dev_name
-                    )
-
         def memory_snapshot(memory_volume_path):
             """Libvirt snapshot XML"""
 
@@ -377,15 +508,7 @@ class Snapshot(properties.Owner):
                 'memory', snapshot='external', file=memory_volume_path
             )
 
-        def vm_conf_for_memory_snapshot():
-            """Returns the needed vm configuration with the memory snapshot"""
-
-            return {
-                'restoreFromSnapshot': True,
-                '_srcDomXML': self._vm.migratable_domain_xml(),
-                'elapsedTimeOffset': time.time() - self._vm.start_time,
-            }
-
+        prepare_start = monotonic_time()
         snap = vmxml.Element('domainsnapshot')
         disks = vmxml.Element('disks')
         new_drives = {}
@@ -440,68 +563,28 @@ class Snapshot(properties.Owner):
             # We keep the old volume ID so we can clear the block threshold.
             vm_drives[vm_dev_name] = (vm_drive, base_drv["volumeID"])
 
-        prepared_drives = {}
-
-        for vm_dev_name, vm_device in new_drives.items():
-            # Adding the device before requesting to prepare it as we want
-            # to be sure to teardown it down even when prepareVolumePath
-            # failed for some unknown issue that left the volume active.
-            prepared_drives[vm_dev_name] = vm_device
-            try:
-                new_drives[vm_dev_name]["path"] = (
-                    self._vm.cif.prepareVolumePath(new_drives[vm_dev_name])
-                )
-            except Exception:
-                self._vm.log.exception(
-                    'unable to prepare the volume path for ' 'disk %s',
-                    vm_dev_name,
-                )
-                rollback_drives(prepared_drives)
-                raise exception.SnapshotFailed()
-
-            drive, _ = vm_drives[vm_dev_name]
-            snapelem = drive.get_snapshot_xml(vm_device)
-            disks.appendChild(snapelem)
-
-        snap.appendChild(disks)
-
         snap_flags = (
             libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_REUSE_EXT
             | libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_NO_METADATA
         )
 
         if self._memory_params:
-            # Save the needed vm configuration
-            # TODO: this, as other places that use pickle.dump
-            # directly to files, should be done with outOfProcess
-            vm_conf_vol = self._memory_params['dstparams']
-            vm_conf_vol_path = self._vm.cif.prepareVolumePath(vm_conf_vol)
-            try:
-                with open(vm_conf_vol_path, "rb+") as f:
-                    vm_conf = vm_conf_for_memory_snapshot()
-                    # protocol=2 is needed for clusters < 4.4
-                    # (for Python 2 host compatibility)
-                    data = pickle.dumps(vm_conf, protocol=2)
+            memory_vol = self._memory_params['dst']
+        else:
+            memory_vol = None
+            snap_flags |= libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_DISK_ONLY
 
-                    # Ensure that the volume is aligned; qemu-img may segfault
-                    # when converting unligned images.
-                    # https://bugzilla.redhat.com/1649788
-                    aligned_length = utils.round(len(data), 4096)
-                    data = data.ljust(aligned_length, b"\0")
+        snap_elems, memory_vol_path = self._prepare_volumes(
+            new_drives, vm_drives
+        )
 
-                    f.write(data)
-                    f.flush()
-                    os.fsync(f.fileno())
-            finally:
-                self._vm.cif.teardownVolumePath(vm_conf_vol)
+        for snapelem in snap_elems:
+            disks.appendChild(snapelem)
+        snap.appendChild(disks)
 
+        if memory_vol_path is not None:
             # Adding the memory volume to the snapshot xml
-            memory_vol = self._memory_params['dst']
-            memory_vol_path = self._vm.cif.prepareVolumePath(memory_vol)
             snap.appendChild(memory_snapshot(memory_vol_path))
-        else:
-            memory_vol = memory_vol_path = None
-            snap_flags |= libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_DISK_ONLY
 
         snapxml = xmlutils.tostring(snap)
         # TODO: this is debug information. For 3.6.x we still need to
@@ -523,10 +606,13 @@ class Snapshot(properties.Owner):
         # extension for the new volume with the apparent size of the old one
         # (the apparentsize is updated as last step in updateDriveParameters)
         self._vm.volume_monitor.disable()
+        self._timing['prepare'] = monotonic_time() - prepare_start
 
         try:
             if self._should_freeze:
+                self._frozen_since = monotonic_time()
                 self._vm.freeze()
+                self._timing['freeze'] = monotonic_time() - self._frozen_since
             if not self._memory_params:
                 run_time = _running_time(self._start_time)
                 if run_time > self._freeze_timeout:
@@ -543,9 +629,11 @@ class Snapshot(properties.Owner):
                 ', '.join(drive["name"] for drive in new_drives.values()),
                 self._memory_params is not None,
             )
+            snapshot_start = monotonic_time()
             try:
                 self._vm.run_dom_snapshot(snapxml, snap_flags)
             except libvirt.libvirtError as e:
+                self._timing['snapshot'] = monotonic_time() - snapshot_start
                 if e.get_error_code() == libvirt.VIR_ERR_OPERATION_ABORTED:
                     self_abort = self._abort.is_set()
                     with self._lock:
@@ -576,6 +664,10 @@ class Snapshot(properties.Owner):
                     raise exception.ActionStopped()
                 self._thaw_vm()
                 raise exception.SnapshotFailed()
+            self._timing['snapshot'] = monotonic_time() - snapshot_start
+            # The guest must be frozen only during the libvirt call, so we
+            # thaw it before updating the metadata and the drives.
+            self._thaw_vm()
             _set_completed(
                 self._vm,
                 self._snapshot_job,
@@ -594,9 +686,11 @@ class Snapshot(properties.Owner):
             self.finalize_vm(memory_vol)
             res = False
         else:
+            teardown_start = monotonic_time()
             res = self.teardown(
                 memory_vol_path, memory_vol, new_drives, vm_drives
             )
+            self._timing['teardown'] = monotonic_time() - teardown_start
         if not res:
             raise RuntimeError(
                 "Failed to execute snapshot, "
@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import collections
 import logging
 import threading
 import time
@@ -76,6 +77,12 @@ class Job:
     # untracked, otherwise the job switches to COMMIT state.
     EXTEND = "EXTEND"
 
+    # Waiting until a commit of another job in the same batch is finished.
+    # Used only for jobs started by DriveMerger.merge_drives(). Libvirt does
+    # not know about the job in this state. When the number of running commits
+    # in the batch is below the limit, the job switches to COMMIT state.
+    WAIT = "WAIT"
+
     # Commit was started - waiting until libvirt stops reporting the job, or
     # reports that the job is ready for pivot. When commit succeeds or fails,
     # the job switches to CLEANUP.
@@ -96,6 +103,7 @@ class Job:
         state=INIT,
         extend=None,
         pivot=None,
+        batch=None,
     ):
         # Read only attributes.
         self._id = id
@@ -119,6 +127,10 @@ class Job:
         # Set when active commit job is ready for pivot.
         self.pivot = pivot
 
+        # Set when the job was started with other jobs using
+        # DriveMerger.merge_drives(). Dict with the batch "id" and "size".
+        self._batch = batch
+
         # Live job info from libvirt. This info is kept between libvirt updates
         # but not persisted to vm metadata.
         self._live_info = None
@@ -147,6 +159,10 @@ class Job:
     def bandwidth(self):
         return self._bandwidth
 
+    @property
+    def batch(self):
+        return self._batch
+
     @property
     def active_commit(self):
         return self._active_commit
@@ -166,6 +182,20 @@ class Job:
             )
         self._state = new_state
 
+    def progress(self):
+        """
+        Return the completed part of the job, between 0.0 and 1.0.
+        """
+        if self.state == self.CLEANUP:
+            return 1.0
+
+        if self.state == self.COMMIT and self.live_info:
+            end = self.live_info["end"]
+            if end:
+                return min(1.0, self.live_info["cur"] / end)
+
+        return 0.0
+
     def is_ready(self):
         """
         Return True if this is an active commit, and the job finished the first
@@ -194,7 +224,7 @@ class Job:
     # Serializing jobs.
 
     def to_dict(self):
-        return {
+        d = {
             "id": self.id,
             "drive": self.drive,
             "disk": self.disk,
@@ -205,6 +235,10 @@ class Job:
             "extend": self.extend,
             "pivot": self.pivot,
         }
+        # Keep metadata of single drive merges compatible with older vdsm.
+        if self.batch:
+            d["batch"] = self.batch
+        return d
 
     @classmethod
     def from_dict(cls, d):
@@ -218,6 +252,7 @@ class Job:
             state=d["state"],
             extend=d["extend"],
             pivot=d["pivot"],
+            batch=d.get("batch"),
         )
 
     def info(self):
@@ -255,6 +290,9 @@ class DriveMerger:
     EXTEND_TIMEOUT = 10.0
     EXTEND_ATTEMPTS = 10
 
+    # Maximum number of base volumes measured concurrently in merge_drives().
+    MEASURE_WORKERS = 8
+
     def __init__(self, vm):
         self._vm = vm
         self._dom = DomainAdapter(vm)
@@ -263,6 +301,141 @@ class DriveMerger:
         self._cleanup_threads = {}
 
     def merge(self, driveSpec, base, top, bandwidth, job_id):
+        drive, job, base_info = self._prepare_merge(
+            driveSpec, base, top, bandwidth, job_id
+        )
+
+        with self._lock:
+            try:
+                self._track_job(job, drive)
+            except JobExistsError as e:
+                raise exception.MergeFailed(str(e), job=job.id)
+
+            # Prune stale bitmaps if needed once before measuring the image.
+            # Currently, qemu-img ignores bitmaps in base, but future
+            # version may not.
+            if self._base_needs_prune_bitmaps(job, base_info):
+                self._dom._vm.prune_bitmaps(
+                    drive.domainID, drive.imageID, job.top, job.base
+                )
+
+            needs_extend, new_size = self._base_needs_extend(
+                drive, job, base_info
+            )
+
+            if needs_extend:
+                job.extend = {"attempt": 1}
+                self._start_extend(drive, job, new_size)
+            else:
+                self._start_commit(drive, job)
+
+        # Trigger the collection of stats before returning so that callers
+        # of getVmStats after this returns will see the new job
+        self._vm.updateVmJobs()
+
+    def merge_drives(self, merges, batch_id=None):
+        """
+        Merge several drives together, for example when deleting a snapshot
+        of a VM with many disks.
+
+        Unlike calling merge() for every drive, the base volumes are measured
+        concurrently and extended together, and the jobs are persisted once
+        for every state change of the batch instead of once per job. At most
+        vars:max_batch_merge_commits jobs of the batch commit or pivot at the
+        same time; the other jobs wait in WAIT state until a job is finished.
+
+        If preparing any of the merges fails, no job is started. If starting
+        the commit of a job which does not need extend fails, the job is
+        untracked and MergeFailed is raised after the other jobs were
+        started.
+
+        Arguments:
+            merges (list): List of dicts with the VM.merge arguments: "drive",
+                "baseVolUUID", "topVolUUID", and optional "bandwidth" and
+                "jobUUID".
+            batch_id (str): UUID identifying the batch in the jobs info. If
+                not set, a random UUID is used.
+        """
+        if batch_id is None:
+            batch_id = str(uuid.uuid4())
+
+        batch = {"id": batch_id, "size": len(merges)}
+        prepared = [
+            self._prepare_merge(
+                m["drive"],
+                m["baseVolUUID"],
+                m["topVolUUID"],
+                m.get("bandwidth", 0),
+                m.get("jobUUID"),
+                batch=batch,
+            )
+            for m in merges
+        ]
+
+        log.info("Starting batch %s with %d jobs", batch_id, len(prepared))
+
+        with self._lock:
+            tracked = []
+            try:
+                for drive, job, _ in prepared:
+                    self._track_job(job, drive)
+                    tracked.append(job)
+            except JobExistsError as e:
+                self._drop_jobs(tracked)
+                raise exception.MergeFailed(str(e), job=e.job_id)
+
+            try:
+                sizes = self._measure_bases(prepared)
+            except Exception:
+                self._drop_jobs(tracked)
+                raise
+
+            extends = []
+            for drive, job, _ in prepared:
+                new_size = sizes[job.id]
+                if new_size is None:
+                    job.state = Job.WAIT
+                else:
+                    job.state = Job.EXTEND
+                    job.extend = {"attempt": 1, "started": time.monotonic()}
+                    extends.append((drive, job, new_size))
+
+            # Persist the jobs once before starting the extends, to ensure
+            # that vdsm will know about the extends if it was killed after
+            # extend started.
+            self._persist_jobs()
+
+            for drive, job, new_size in extends:
+                try:
+                    self._request_extend(drive, job, new_size)
+                except Exception:
+                    # The extend will be retried when the extend times out.
+                    log.exception("Error starting extend for job %s", job.id)
+
+            errors = []
+            self._start_waiting_commits(errors=errors)
+
+        # Trigger the collection of stats before returning so that callers
+        # of getVmStats after this returns will see the new jobs.
+        self._vm.updateVmJobs()
+
+        failed = {
+            job.id: str(e) for job, e in errors if job.batch["id"] == batch_id
+        }
+        if failed:
+            raise exception.MergeFailed(
+                "Cannot start commit", batch=batch_id, jobs=failed
+            )
+
+    def _prepare_merge(
+        self, driveSpec, base, top, bandwidth, job_id, batch=None
+    ):
+        """
+        Validate merge arguments and create an untracked job.
+
+        Returns:
+            tuple of drive, job and base volume info.
+        """
         bandwidth = int(bandwidth)
         if job_id is None:
             job_id = str(uuid.uuid4())
@@ -274,7 +447,7 @@ class DriveMerger:
                 "Cannot find drive", driveSpec=driveSpec, job=job_id
             )
 
-        job = self._create_job(job_id, drive, base, top, bandwidth)
+        job = self._create_job(job_id, drive, base, top, bandwidth, batch)
 
         try:
             base_info = self._vm.getVolumeInfo(
@@ -298,33 +471,44 @@ class DriveMerger:
         if self._base_needs_refresh(drive, base_info):
             self._refresh_base(drive, base_info)
 
-        with self._lock:
-            try:
-                self._track_job(job, drive)
-            except JobExistsError as e:
-                raise exception.MergeFailed(str(e), job=job.id)
+        return drive, job, base_info
 
-            # Prune stale bitmaps if needed once before measuring the image.
-            # Currently, qemu-img ignores bitmaps in base, but future
-            # version may not.
+    def _measure_bases(self, prepared):
+        """
+        Prune bitmaps and measure the base volumes of prepared merges
+        concurrently.
+
+        Returns:
+            dict mapping job id to the new size of the base volume, or None if
+            the base volume does not need extension.
+        """
+
+        def measure(item):
+            drive, job, base_info = item
             if self._base_needs_prune_bitmaps(job, base_info):
-                self._dom._vm.prune_bitmaps(
+                self._vm.prune_bitmaps(
                     drive.domainID, drive.imageID, job.top, job.base
                 )
-
-            needs_extend, new_size = self._base_needs_extend(
-                drive, job, base_info
+            _, new_size = self._base_needs_extend(drive, job, base_info)
+            return job.id, new_size
+
+        results = list(
+            concurrent.tmap(
+                measure,
+                prepared,
+                max_workers=min(len(prepared), self.MEASURE_WORKERS) or 1,
+                name="merge/measure",
             )
+        )
 
-            if needs_extend:
-                job.extend = {"attempt": 1}
-                self._start_extend(drive, job, new_size)
-            else:
-                self._start_commit(drive, job)
+        sizes = {}
+        for res in results:
+            if not res.succeeded:
+                raise res.value
+            job_id, new_size = res.value
+            sizes[job_id] = new_size
 
-        # Trigger the collection of stats before returning so that callers
-        # of getVmStats after this returns will see the new job
-        self._vm.updateVmJobs()
+        return sizes
 
     def _validate_base_size(self, drive, base_info, top_info):
         # If the drive was resized the top volume could be larger than the
@@ -385,7 +569,89 @@ class DriveMerger:
         # started.
         job.state = Job.COMMIT
         self._persist_jobs()
+        self._commit(drive, job)
+
+    def _start_commit_or_wait(self, drive, job):
+        """
+        Start a commit, or if the job is part of a batch, wait until the
+        number of running commits in the batch is below the limit.
+
+        Must be called under self._lock.
+        """
+        if job.batch is None:
+            self._start_commit(drive, job)
+            return
+
+        job.state = Job.WAIT
+        if not self._start_waiting_commits():
+            self._persist_jobs()
+
+    def _start_waiting_commits(self, errors=None):
+        """
+        Start commits for jobs in WAIT state, keeping at most
+        vars:max_batch_merge_commits jobs committing or pivoting in every
+        batch. Returns True if commits were started.
+
+        Jobs failing to start are untracked. If errors is a list, (job,
+        error) tuples are appended to it for these jobs.
+
+        Must be called under self._lock.
+        """
+        waiting = [j for j in self._jobs.values() if j.state == Job.WAIT]
+        if not waiting:
+            return False
+
+        limit = config.getint("vars", "max_batch_merge_commits")
+        running = collections.Counter(
+            job.batch["id"]
+            for job in self._jobs.values()
+            if job.batch and job.state in (Job.COMMIT, Job.CLEANUP)
+        )
+
+        starting = []
+        for job in waiting:
+            if running[job.batch["id"]] < limit:
+                running[job.batch["id"]] += 1
+                starting.append(job)
 
+        if not starting:
+            return False
+
+        # Persist the jobs once before starting the commits, to ensure that
+        # vdsm will know about the commits if it was killed after the block
+        # jobs were started.
+        for job in starting:
+            job.state = Job.COMMIT
+        self._persist_jobs()
+
+        for job in starting:
+            try:
+                drive = self._vm.findDriveByUUIDs(job.disk)
+            except LookupError:
+                log.error(
+                    "Cannot find drive %s, untracking job %s", job.disk, job.id
+                )
+                self._untrack_job(job.id)
+                if errors is not None:
+                    errors.append((job, "Cannot find drive %s" % job.disk))
+                continue
+
+            try:
+                self._commit(drive, job)
+            except exception.MergeFailed as e:
+                log.error("Cannot start commit for job %s: %s", job.id, e)
+                if errors is not None:
+                    errors.append((job, e))
+
+        return True
+
+    def _commit(self, drive, job):
+        """
+        Start libvirt blockCommit block job for a job persisted in COMMIT
+        state.
+
+        Must be called under self._lock.
+        """
         # Check that libvirt exposes full volume chain information
         actual_chain = self._vm.query_drive_volume_chain(drive)
         if actual_chain is None:
@@ -544,7 +810,15 @@ class DriveMerger:
         job.state = Job.EXTEND
         job.extend["started"] = time.monotonic()
         self._persist_jobs()
+        self._request_extend(drive, job, new_size)
+
+    def _request_extend(self, drive, job, new_size):
+        """
+        Request extension of the base volume for a job persisted in EXTEND
+        state.
 
+        Must be called under self._lock.
+        """
         log.info(
             "Starting extend %s/%s for job=%s drive=%s volume=%s",
             job.extend["attempt"],
@@ -624,9 +898,9 @@ class DriveMerger:
                 job.id,
             )
             job.extend = None
-            self._start_commit(drive, job)
+            self._start_commit_or_wait(drive, job)
 
-    def _create_job(self, job_id, drive, base, top, bandwidth):
+    def _create_job(self, job_id, drive, base, top, bandwidth, batch=None):
         """
         Create new untracked job.
         """
@@ -642,6 +916,7 @@ class DriveMerger:
             base=base,
             top=top,
             bandwidth=bandwidth,
+            batch=batch,
         )
 
     def _get_job(self, drive):
@@ -671,12 +946,28 @@ class DriveMerger:
         else:
             raise JobExistsError(job.id, existing_job.disk["imageID"])
 
+    def _drop_jobs(self, jobs):
+        """
+        Drop tracked jobs that were not persisted yet.
+
+        Must run under self._lock.
+        """
+        for job in jobs:
+            del self._jobs[job.id]
+
     def _untrack_job(self, job_id):
         """
         Must run under self._lock.
         """
-        self._jobs.pop(job_id, None)
-        self._cleanup_threads.pop(job_id, None)
+        self._untrack_jobs([job_id])
+
+    def _untrack_jobs(self, job_ids):
+        """
+        Must run under self._lock.
+        """
+        for job_id in job_ids:
+            self._jobs.pop(job_id, None)
+            self._cleanup_threads.pop(job_id, None)
 
         # Successful job modified the volume chain, so we need to sync also
         # disk metadata.
@@ -720,19 +1011,66 @@ class DriveMerger:
         jobs for reporting job status to engine.
         """
         with self._lock:
+            # Jobs changing state together are persisted once.
+            cleanup = []
+            done = []
+
             for job in list(self._jobs.values()):
                 log.debug("Checking job %s", job.id)
                 try:
                     if job.state == Job.EXTEND:
                         self._update_extend(job)
                     if job.state == Job.COMMIT:
-                        self._update_commit(job)
+                        if self._update_commit(job):
+                            cleanup.append(job)
                     elif job.state == Job.CLEANUP:
-                        self._update_cleanup(job)
+                        if self._update_cleanup(job):
+                            done.append(job)
                 except Exception:
                     log.exception("Error updating job %s", job.id)
 
-            return {job.id: job.info() for job in self._jobs.values()}
+            try:
+                if cleanup:
+                    self._start_cleanups(cleanup)
+                if done:
+                    self._untrack_jobs([job.id for job in done])
+                self._start_waiting_commits()
+            except Exception:
+                log.exception("Error updating jobs")
+
+            return self._jobs_info()
+
+    def _jobs_info(self):
+        """
+        Return info for all tracked jobs. Jobs which are part of a batch
+        report also the aggregate progress of the batch.
+
+        Must run under self._lock.
+        """
+        batches = {}
+        for job in self._jobs.values():
+            if job.batch:
+                batches.setdefault(job.batch["id"], []).append(job)
+
+        progress = {}
+        for batch_id, jobs in batches.items():
+            size = jobs[0].batch["size"]
+            finished = size - len(jobs)
+            completed = finished + sum(job.progress() for job in jobs)
+            progress[batch_id] = {
+                "id": batch_id,
+                "jobs": size,
+                "finished": finished,
+                "progress": int(completed * 100 / size),
+            }
+
+        info = {}
+        for job in self._jobs.values():
+            info[job.id] = job.info()
+            if job.batch:
+                info[job.id]["batch"] = dict(progress[job.batch["id"]])
+
+        return info
 
     def _update_extend(self, job):
         """
@@ -808,10 +1146,12 @@ class DriveMerger:
                 job.id,
             )
             job.extend = None
-            self._start_commit(drive, job)
+            self._start_commit_or_wait(drive, job)
 
     def _update_commit(self, job):
         """
+        Return True if the job should switch to CLEANUP state.
+
         Must run under self._lock.
         """
         try:
@@ -821,23 +1161,26 @@ class DriveMerger:
         except libvirt.libvirtError:
             log.exception("Error getting block job info")
             job.live_info = None
-            return
+            return False
 
         if job.live_info:
             if self._active_commit_ready(job):
                 log.info("Job %s is ready for pivot", job.id)
                 job.pivot = True
-                self._start_cleanup(job)
+                return True
             else:
                 log.debug("Job %s is ongoing", job.id)
+                return False
         else:
             # Libvirt has stopped reporting this job so we know it will
             # never report it again.
             log.info("Job %s has completed", job.id)
-            self._start_cleanup(job)
+            return True
 
     def _update_cleanup(self, job):
         """
+        Return True if cleanup was completed and the job should be untracked.
+
         Must run under self._lock.
         """
         # If libvirt block jobs has gone, we cannot pivot.
@@ -848,7 +1191,7 @@ class DriveMerger:
             except libvirt.libvirtError:
                 # We don't know if the job exists, retry later.
                 log.exception("Error getting block job info")
-                return
+                return False
 
         cleanup = self._cleanup_threads.get(job.id)
 
@@ -866,17 +1209,33 @@ class DriveMerger:
 
         elif cleanup.state == CleanupThread.DONE:
             log.info("Cleanup completed, untracking job %s", job.id)
-            self._untrack_job(job.id)
+            return True
+
+        return False
 
     def _start_cleanup(self, job):
         """
         Must run under self._lock.
         """
-        # Persist the job before starting the cleanup, so vdsm can restart the
-        # cleanup after recovery from crash.
-        job.state = Job.CLEANUP
+        self._start_cleanups([job])
+
+    def _start_cleanups(self, jobs):
+        """
+        Must run under self._lock.
+        """
+        # Persist the jobs before starting the cleanup, so vdsm can restart
+        # the cleanup after recovery from crash.
+        for job in jobs:
+            job.state = Job.CLEANUP
         self._persist_jobs()
 
+        for job in jobs:
+            self._run_cleanup(job)
+
+    def _run_cleanup(self, job):
+        """
+        Must run under self._lock.
+        """
         try:
             drive = self._vm.findDriveByUUIDs(job.disk)
         except LookupError:
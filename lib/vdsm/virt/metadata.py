@@ -394,6 +394,10 @@ class Descriptor(object):
         self._values = {}
         self._custom = {}
         self._devices = []
+        self._dump_lock = threading.Lock()
+        self._dumped = (None, None)
+        self._written = 0
+        self._skipped = 0
 
     def __bool__(self):
         # custom properties may be missing, and that's fine.
@@ -490,18 +494,38 @@ class Descriptor(object):
         Serializes all the content stored in the descriptor, completely
         overwriting the content of the libvirt domain.
 
+        If the serialized content is the same as the content of the last
+        dump to the same domain, the domain is not modified.
+
         :param dom: domain to access
         :type dom: libvirt.Domain
         """
         md_xml = self._build_xml()
-        dom.setMetadata(
-            libvirt.VIR_DOMAIN_METADATA_ELEMENT,
-            md_xml,
-            self._namespace,
-            self._namespace_uri,
-        )
+        # Serialize dumps so the content of the last dump is the content
+        # of the domain.
+        with self._dump_lock:
+            last_dom, last_xml = self._dumped
+            if dom is last_dom and md_xml == last_xml:
+                self._skipped += 1
+                return
+            dom.setMetadata(
+                libvirt.VIR_DOMAIN_METADATA_ELEMENT,
+                md_xml,
+                self._namespace,
+                self._namespace_uri,
+            )
+            self._dumped = (dom, md_xml)
+            self._written += 1
         self._log.debug('dumped metadata for %s: %s', dom.UUIDString(), md_xml)
 
+    def dump_info(self):
+        """
+        Return the number of dumps written to libvirt and the number of
+        dumps skipped because the content did not change.
+        """
+        with self._dump_lock:
+            return {"written": self._written, "skipped": self._skipped}
+
     def to_xml(self):
         """
         Produces the namespace-prefixed XML representation of the full content
@@ -26,7 +26,9 @@ from vdsm.common.units import MiB
 from vdsm.virt.utils import DynamicBoundedSemaphore
 from vdsm.virt.utils import VolumeSize
 
+from vdsm.virt import convergence
 from vdsm.virt import cpumanagement
+from vdsm.virt import migrationscheduler
 from vdsm.virt import virdomain
 from vdsm.virt import vmexitreason
 from vdsm.virt import vmstatus
@@ -48,6 +50,9 @@ CONVERGENCE_SCHEDULE_SET_DOWNTIME = "setDowntime"
 CONVERGENCE_SCHEDULE_POST_COPY = "postcopy"
 CONVERGENCE_SCHEDULE_SET_ABORT = "abort"
 
+# Maximum downtime used by QEMU if not set by the convergence schedule.
+_DEFAULT_DOWNTIME = 300
+
 
 ADDRESS = '0'
 PORT = 54321
@@ -114,7 +119,11 @@ class SourceThread(object):
     _RECOVERY_LOOP_PAUSE = 10
     _PARALLEL_CONNECTIONS_DISABLED_VALUE = 0
 
-    ongoingMigrations = DynamicBoundedSemaphore(1)
+    ongoingMigrations = migrationscheduler.Scheduler(
+        1,
+        bandwidth=config.getint('vars', 'migration_host_bandwidth'),
+        order=config.get('vars', 'migration_schedule_order'),
+    )
 
     def __init__(
         self,
@@ -157,6 +166,10 @@ class SourceThread(object):
             kwargs.get('maxBandwidth')
             or config.getint('vars', 'migration_max_bandwidth')
         )
+        # Bandwidth changed by the user during migration, limiting the share
+        # of the host migration bandwidth.
+        self._bandwidth_limit = None
+        self._memory_size = None
         self._incomingLimit = kwargs.get('incomingLimit')
         self._outgoingLimit = kwargs.get('outgoingLimit')
         self.status = {
@@ -245,6 +258,31 @@ class SourceThread(object):
     def hibernating(self):
         return self._mode == MODE_FILE
 
+    @property
+    def bandwidth(self):
+        return self._maxBandwidth
+
+    @property
+    def bandwidth_limit(self):
+        return self._bandwidth_limit
+
+    def memory_size(self):
+        """
+        Return the VM memory size in bytes.
+        """
+        if self._memory_size is None:
+            self._memory_size = self._vm.mem_size_mb() * MiB
+        return self._memory_size
+
+    def data_remaining(self):
+        """
+        Return the data remaining to migrate in bytes.
+        """
+        monitor = self._monitorThread
+        if monitor is not None and monitor.progress is not None:
+            return monitor.progress.data_remaining
+        return self.memory_size()
+
     def _switch_state(self, value):
         if value != self._state:
             self.log.info("Switching from %s to %s", self._state, value)
@@ -496,7 +534,7 @@ class SourceThread(object):
             while not self.started:
                 try:
                     self.log.info("Migration semaphore: acquiring")
-                    with SourceThread.ongoingMigrations:
+                    with SourceThread.ongoingMigrations.schedule(self):
                         self.log.info("Migration semaphore: acquired")
                         timeout = config.getint(
                             'vars', 'guest_lifecycle_event_reply_timeout'
@@ -798,8 +836,27 @@ class SourceThread(object):
 
     def set_max_bandwidth(self, bandwidth):
         self._vm.log.debug('setting migration max bandwidth to %d', bandwidth)
+        if SourceThread.ongoingMigrations.bandwidth:
+            self._bandwidth_limit = bandwidth
+            SourceThread.ongoingMigrations.rebalance()
+        else:
+            self._maxBandwidth = bandwidth
+            # pylint: disable=no-member
+            self._dom.migrateSetMaxSpeed(bandwidth)
+
+    def set_scheduled_bandwidth(self, bandwidth):
+        """
+        Called by the migration scheduler to set the share of the host
+        migration bandwidth. If the migration was not started yet, the
+        bandwidth is used when starting the migration.
+        """
         self._maxBandwidth = bandwidth
-        self._dom.migrateSetMaxSpeed(bandwidth)  # pylint: disable=no-member
+        if self._state == State.STARTED:
+            self._vm.log.debug(
+                'setting scheduled migration bandwidth to %d', bandwidth
+            )
+            # pylint: disable=no-member
+            self._dom.migrateSetMaxSpeed(bandwidth)
 
     def stop(self):
         # if its locks we are before the migrateToURI3()
@@ -893,6 +950,11 @@ class MonitorThread(object):
         self.daemon = True
         self.progress = None
         self._conv_schedule = conv_schedule
+        self._downtime = _DEFAULT_DOWNTIME
+        if config.getboolean('vars', 'migration_convergence_prediction'):
+            self._estimator = convergence.Estimator()
+        else:
+            self._estimator = None
         self._thread = concurrent.thread(
             self.run, name='migmon/' + self._vm.id[:8]
         )
@@ -998,6 +1060,19 @@ class MonitorThread(object):
                 self._vm.log.debug('new iteration: %i', current_iteration)
                 self._next_action(current_iteration)
 
+            if (
+                self._estimator is not None
+                and not self._vm.post_copy
+                and not self._stop.is_set()
+                and progress.mem_iteration > initial_iteration
+            ):
+                # The dirty rate is reported only after the first iteration
+                # was completed.
+                self._estimator.update(progress)
+                self._predicted_action(
+                    progress.mem_iteration - initial_iteration
+                )
+
             if self._stop.is_set():
                 break
 
@@ -1025,6 +1100,63 @@ class MonitorThread(object):
                 'setting conv schedule to: %s', self._conv_schedule
             )
 
+    def _predicted_action(self, iteration):
+        """
+        Move to the stalling step expected to make the migration converge, if
+        the migration is not expected to converge soon with the current
+        settings.
+
+        We use the first downtime step expected to converge within
+        migration_convergence_iterations. If no downtime step is expected to
+        converge before the schedule switches to post-copy, we switch to
+        post-copy now instead of waiting for the stalling limit.
+        """
+        max_iterations = config.getint(
+            'vars', 'migration_convergence_iterations'
+        )
+        current = self._estimator.iterations(self._downtime)
+        if current is None or current <= max_iterations:
+            return
+
+        stalling = self._conv_schedule['stalling']
+        selected = None
+        best = current
+        for index, step in enumerate(stalling):
+            action = step['action']
+            name = str(action['name'])
+            if name == CONVERGENCE_SCHEDULE_SET_DOWNTIME:
+                predicted = self._estimator.iterations(
+                    int(action['params'][0])
+                )
+                if predicted is not None and predicted <= max_iterations:
+                    selected = index
+                    break
+                if predicted is not None:
+                    best = min(best, predicted)
+            elif name == CONVERGENCE_SCHEDULE_POST_COPY:
+                if iteration + best > step['limit']:
+                    selected = index
+                break
+            else:
+                # Aborting is left to the schedule limits.
+                break
+
+        if selected is None:
+            return
+
+        action = stalling[selected]['action']
+        self._vm.log.info(
+            'Migration not expected to converge in %d iterations with '
+            'downtime %d (predicted: %s), moving to step: %s',
+            max_iterations,
+            self._downtime,
+            current,
+            action,
+        )
+        del stalling[: selected + 1]
+        self._estimator.clear()
+        self._execute_action_with_params(action)
+
     def _execute_init(self, init_actions):
         for action_with_params in init_actions:
             self._execute_action_with_params(action_with_params)
@@ -1037,6 +1169,7 @@ class MonitorThread(object):
             vm.log.debug('Setting downtime to %d', downtime)
             # pylint: disable=no-member
             self._dom.migrateSetMaxDowntime(downtime, 0)
+            self._downtime = downtime
         elif action == CONVERGENCE_SCHEDULE_POST_COPY:
             if not self._vm.switch_migration_to_post_copy():
                 # Do nothing for now; the next action will be invoked after a
@@ -1064,6 +1197,7 @@ _Progress = collections.namedtuple(
         'compression_bytes',
         'dirty_rate',
         'mem_iteration',
+        'mem_page_size',
     ],
 )
 
@@ -1089,6 +1223,8 @@ class Progress(_Progress):
             stats.get('memory_dirty_rate', -1),
             # available since libvirt 1.3
             stats.get('memory_iteration', -1),
+            # available since libvirt 3.9
+            stats.get('memory_page_size', convergence.DEFAULT_PAGE_SIZE),
         )
 
     def __str__(self):
@@ -0,0 +1,276 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""
+Scheduling of outgoing migrations.
+
+The scheduler limits the number of concurrent outgoing migrations like a
+bounded semaphore, but queued migrations are started by priority instead of
+arrival order. When evacuating a host, starting the smallest VMs first
+minimizes the average time VMs wait for migration, and frees the migration
+slots quickly.
+
+If the host migration bandwidth is configured, the scheduler divides it
+between the running migrations, so every migration uses a fair share of the
+bandwidth, and the last migrations use all the bandwidth instead of the
+static bandwidth assigned when the migration was started.
+
+Migrations are objects with this interface:
+
+    hibernating (bool): True if saving the VM to storage. Hibernation uses
+        a migration slot, but does not use the migration bandwidth.
+    bandwidth (int): Current migration bandwidth in MiB per second.
+    bandwidth_limit (int): Maximum bandwidth in MiB per second requested by
+        the user, or None.
+    memory_size(): Return VM memory size in bytes.
+    data_remaining(): Return the data remaining to migrate in bytes.
+    set_scheduled_bandwidth(bandwidth): Set the migration bandwidth in MiB
+        per second.
+"""
+
+import contextlib
+import itertools
+import logging
+import math
+import threading
+
+from vdsm.common.units import MiB
+
+ORDER_FIFO = "fifo"
+ORDER_MEMORY = "memory"
+
+ORDERS = (ORDER_FIFO, ORDER_MEMORY)
+
+log = logging.getLogger("virt.migrationscheduler")
+
+
+class _Entry(object):
+
+    __slots__ = ("migration", "key", "memory_size", "granted")
+
+    def __init__(self, migration, key, memory_size):
+        self.migration = migration
+        self.key = key
+        self.memory_size = memory_size
+        self.granted = False
+
+
+class Scheduler(object):
+    """
+    Limit and order outgoing migrations, and divide the host migration
+    bandwidth between them.
+    """
+
+    def __init__(self, bound, bandwidth=0, order=ORDER_FIFO):
+        """
+        Arguments:
+            bound (int): Maximum number of concurrent migrations.
+            bandwidth (int): Host migration bandwidth in MiB per second
+                divided between running migrations. If 0, migrations use the
+                bandwidth they were started with.
+            order (str): Order of starting queued migrations, one of ORDERS.
+        """
+        if order not in ORDERS:
+            raise ValueError("Invalid migration order: {!r}".format(order))
+        self._cond = threading.Condition(threading.Lock())
+        # Serializes bandwidth changes, so concurrent updates do not apply
+        # stale shares.
+        self._rebalance_lock = threading.Lock()
+        self._bound = bound
+        self._bandwidth = bandwidth
+        self._order = order
+        self._seq = itertools.count()
+        self._waiting = []
+        self._running = []
+
+    @property
+    def bound(self):
+        return self._bound
+
+    @bound.setter
+    def bound(self, value):
+        """
+        Update the maximum number of concurrent migrations. When lowering the
+        bound, running migrations are not affected, but no migration is
+        started until enough migrations finish.
+        """
+        with self._cond:
+            self._bound = value
+            self._grant()
+        self.rebalance()
+
+    @property
+    def bandwidth(self):
+        return self._bandwidth
+
+    @contextlib.contextmanager
+    def schedule(self, migration):
+        """
+        Context manager waiting until migration can start, and finishing the
+        migration on exit.
+        """
+        self.acquire(migration)
+        try:
+            yield
+        finally:
+            self.release(migration)
+
+    def acquire(self, migration):
+        """
+        Queue migration, and block until it can start.
+        """
+        memory_size = migration.memory_size()
+        seq = next(self._seq)
+        if self._order == ORDER_MEMORY:
+            key = (memory_size, seq)
+        else:
+            key = (seq,)
+        entry = _Entry(migration, key, memory_size)
+
+        with self._cond:
+            self._waiting.append(entry)
+            self._waiting.sort(key=lambda e: e.key)
+            self._grant()
+            try:
+                while not entry.granted:
+                    self._cond.wait()
+            except BaseException:
+                if entry.granted:
+                    self._running.remove(entry)
+                else:
+                    self._waiting.remove(entry)
+                self._grant()
+                raise
+
+        self.rebalance()
+        self._log_state()
+
+    def release(self, migration):
+        """
+        Finish migration, starting the next queued migration.
+        """
+        with self._cond:
+            for entry in self._running:
+                if entry.migration is migration:
+                    break
+            else:
+                raise ValueError("Migration {} not running".format(migration))
+            self._running.remove(entry)
+            self._grant()
+
+        self.rebalance()
+        self._log_state()
+
+    def rebalance(self):
+        """
+        Divide the host migration bandwidth between running migrations.
+        Called when migrations start or finish, and when the bandwidth limit
+        of a migration was changed.
+        """
+        if not self._bandwidth:
+            return
+
+        with self._rebalance_lock:
+            with self._cond:
+                shares = self._shares()
+
+            for migration, bandwidth in shares:
+                if bandwidth == migration.bandwidth:
+                    continue
+                try:
+                    migration.set_scheduled_bandwidth(bandwidth)
+                except Exception:
+                    log.exception(
+                        "Cannot set migration %s bandwidth to %d MiB/s",
+                        migration,
+                        bandwidth,
+                    )
+
+    def eta(self):
+        """
+        Return the estimated time in seconds to complete all running and
+        queued migrations, or None if the bandwidth is not known.
+
+        The estimate assumes that all the memory is sent once. Memory dirtied
+        by the guests during migration is sent again, so the actual time is
+        longer for busy guests.
+        """
+        with self._cond:
+            return self._eta()
+
+    def info(self):
+        with self._cond:
+            return {
+                "running": len(self._running),
+                "waiting": len(self._waiting),
+                "bandwidth": self._bandwidth,
+                "eta": self._eta(),
+            }
+
+    # Must be called with the lock held.
+
+    def _grant(self):
+        granted = False
+        while self._waiting and len(self._running) < self._bound:
+            entry = self._waiting.pop(0)
+            entry.granted = True
+            self._running.append(entry)
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _shares(self):
+        """
+        Divide the bandwidth fairly between migrations. Migrations with a
+        bandwidth limit lower than their share get their limit, and the
+        bandwidth they do not use is divided between the other migrations.
+        """
+        migrations = [
+            e.migration for e in self._running if not e.migration.hibernating
+        ]
+        migrations.sort(key=lambda m: m.bandwidth_limit or math.inf)
+        left = self._bandwidth
+        shares = []
+        for i, migration in enumerate(migrations):
+            share = left // (len(migrations) - i)
+            if migration.bandwidth_limit:
+                share = min(share, migration.bandwidth_limit)
+            share = max(1, share)
+            left = max(0, left - share)
+            shares.append((migration, share))
+        return shares
+
+    def _eta(self):
+        remaining = 0
+        bandwidth = 0
+        for entry in self._running:
+            migration = entry.migration
+            if not migration.hibernating:
+                remaining += migration.data_remaining()
+                bandwidth += migration.bandwidth
+        for entry in self._waiting:
+            if not entry.migration.hibernating:
+                remaining += entry.memory_size
+
+        if remaining == 0:
+            return 0
+
+        if self._bandwidth:
+            bandwidth = self._bandwidth
+        if bandwidth <= 0:
+            return None
+
+        return math.ceil(remaining / (bandwidth * MiB))
+
+    def _log_state(self):
+        # Reporting must not fail the migration.
+        try:
+            info = self.info()
+        except Exception:
+            log.exception("Cannot estimate outgoing migrations time")
+            return
+        log.info(
+            "Outgoing migrations: %(running)d running, %(waiting)d waiting, "
+            "evacuation ETA %(eta)s seconds",
+            info,
+        )
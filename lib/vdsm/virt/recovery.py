@@ -5,8 +5,11 @@ import logging
 
 import libvirt
 
+from vdsm.common import concurrent
 from vdsm.common import libvirtconnection
 from vdsm.common import response
+from vdsm.common.time import Clock
+from vdsm.config import config
 from vdsm.virt import vmchannels
 from vdsm.virt import vmstatus
 from vdsm.virt import vmxml
@@ -44,29 +47,47 @@ def _is_ignored_vm(dom_uuid, dom_obj, dom_xml):
 
 def _list_domains():
     conn = libvirtconnection.get()
+    dom_objs = conn.listAllDomains()
+    # Inspecting a domain requires few libvirt calls, so we inspect domains
+    # concurrently, keeping the order of domains.
+    results = list(
+        concurrent.tmap(
+            _inspect_domain,
+            list(enumerate(dom_objs)),
+            max_workers=_max_workers(),
+            name="recovery/list",
+        )
+    )
     domains = []
-    for dom_obj in conn.listAllDomains():
-        dom_uuid = 'unknown'
-        try:
-            dom_uuid = dom_obj.UUIDString()
-            logging.debug("Found domain %s", dom_uuid)
-            dom_xml = dom_obj.XMLDesc()
-        except libvirt.libvirtError as e:
-            if e.get_error_code() == libvirt.VIR_ERR_NO_DOMAIN:
-                logging.exception("domain %s is dead", dom_uuid)
-            else:
-                raise
+    for res in results:
+        if not res.succeeded:
+            raise res.value
+        if res.value is not None:
+            domains.append(res.value)
+    domains.sort(key=lambda item: item[0])
+    return [domain for _, domain in domains]
+
+
+def _inspect_domain(item):
+    idx, dom_obj = item
+    dom_uuid = 'unknown'
+    try:
+        dom_uuid = dom_obj.UUIDString()
+        logging.debug("Found domain %s", dom_uuid)
+        dom_xml = dom_obj.XMLDesc()
+    except libvirt.libvirtError as e:
+        if e.get_error_code() == libvirt.VIR_ERR_NO_DOMAIN:
+            logging.exception("domain %s is dead", dom_uuid)
+            return None
         else:
-            if _is_ignored_vm(dom_uuid, dom_obj, dom_xml):
-                continue
-            domains.append(
-                (
-                    dom_obj,
-                    dom_xml,
-                    _is_external_vm(dom_xml),
-                )
-            )
-    return domains
+            raise
+    if _is_ignored_vm(dom_uuid, dom_obj, dom_xml):
+        return None
+    return idx, (dom_obj, dom_xml, _is_external_vm(dom_xml))
+
+
+def _max_workers():
+    return config.getint('vars', 'max_recovery_workers')
 
 
 def _recover_domain(cif, vm_id, dom_xml, external):
@@ -101,35 +122,67 @@ def _recovery_params(vm_id, dom_xml, external):
 
 
 def all_domains(cif):
-    doms = _list_domains()
+    """
+    Recover all domains running on this host.
+
+    Domains are inspected and recovered concurrently, using up to
+    vars:max_recovery_workers threads.
+    """
+    clock = Clock()
+
+    with clock.run("list"):
+        doms = _list_domains()
+
     num_doms = len(doms)
-    for idx, (dom_obj, dom_xml, external) in enumerate(doms):
-        vm_id = dom_obj.UUIDString()
-        if _recover_domain(cif, vm_id, dom_xml, external):
-            cif.log.info(
-                'recovery [1:%d/%d]: recovered domain %s',
-                idx + 1,
-                num_doms,
-                vm_id,
+
+    def recover(item):
+        idx, (dom_obj, dom_xml, external) = item
+        _recover_or_destroy(cif, idx, num_doms, dom_obj, dom_xml, external)
+
+    with clock.run("recover"):
+        results = list(
+            concurrent.tmap(
+                recover,
+                list(enumerate(doms)),
+                max_workers=_max_workers(),
+                name="recovery/vm",
             )
-        elif external:
-            cif.log.info("Failed to recover external domain: %s" % (vm_id,))
-        else:
-            cif.log.info(
-                'recovery [1:%d/%d]: loose domain %s found, killing it.',
+        )
+
+    cif.log.info("recovery: found %d domains: %s", num_doms, clock)
+
+    for res in results:
+        if not res.succeeded:
+            raise res.value
+
+
+def _recover_or_destroy(cif, idx, num_doms, dom_obj, dom_xml, external):
+    vm_id = dom_obj.UUIDString()
+    if _recover_domain(cif, vm_id, dom_xml, external):
+        cif.log.info(
+            'recovery [1:%d/%d]: recovered domain %s',
+            idx + 1,
+            num_doms,
+            vm_id,
+        )
+    elif external:
+        cif.log.info("Failed to recover external domain: %s" % (vm_id,))
+    else:
+        cif.log.info(
+            'recovery [1:%d/%d]: loose domain %s found, killing it.',
+            idx + 1,
+            num_doms,
+            vm_id,
+        )
+        try:
+            dom_obj.destroy()
+        except libvirt.libvirtError:
+            cif.log.exception(
+                'recovery [1:%d/%d]: failed to kill loose domain %s',
                 idx + 1,
                 num_doms,
                 vm_id,
             )
-            try:
-                dom_obj.destroy()
-            except libvirt.libvirtError:
-                cif.log.exception(
-                    'recovery [1:%d/%d]: failed to kill loose domain %s',
-                    idx + 1,
-                    num_doms,
-                    vm_id,
-                )
 
 
 def lookup_external_vms(cif):
@@ -3,7 +3,9 @@
 
 import libvirt
 
+from array import array
 from collections import defaultdict, deque, namedtuple
+from contextlib import contextmanager
 import logging
 import os
 import re
@@ -32,6 +34,101 @@ _METRICS_ENABLED = config.getboolean('metrics', 'enabled')
 _NOWAIT_ENABLED = config.getboolean('vars', 'nowait_domain_stats')
 
 
+_PROC_STAT_PATH = '/proc/stat'
+
+# The cpu lines at the start of /proc/stat:
+#   cpu  user nice system idle iowait irq softirq steal guest guest_nice
+#   cpu0 user nice system idle ...
+_CPU_STAT_LINE = re.compile(rb'cpu(\d*) +(\d+) (\d+) (\d+) (\d+)[^\n]*\n')
+
+_NODE_MEMINFO_PATH = '/sys/devices/system/node/node%s/meminfo'
+
+# The first lines of a numa node meminfo:
+#   Node 0 MemTotal:       32657 kB
+#   Node 0 MemFree:        16328 kB
+_NODE_MEMINFO_LINE = re.compile(rb'Node \d+ (MemTotal|MemFree): +(\d+) kB')
+
+
+class _ProcFile(object):
+    """
+    A /proc or /sys file read periodically.
+
+    The file is read into a buffer reused for every read, so sampling does
+    not allocate large strings. On hosts with many CPUs /proc/stat is big,
+    since it includes a line for every CPU and every interrupt.
+    """
+
+    def __init__(self, path, size=64 * KiB):
+        self._path = path
+        self._buf = bytearray(size)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def read(self):
+        """
+        Read the file, yielding the buffer and the number of bytes read. The
+        buffer is valid only inside the context.
+        """
+        with self._lock:
+            with open(self._path, 'rb', buffering=0) as f:
+                n = 0
+                while True:
+                    with memoryview(self._buf) as view:
+                        with view[n:] as free:
+                            count = f.readinto(free)
+                    if not count:
+                        break
+                    n += count
+                    if n == len(self._buf):
+                        self._buf.extend(bytes(len(self._buf)))
+            yield self._buf, n
+
+
+_proc_stat = _ProcFile(_PROC_STAT_PATH)
+
+# Numa nodes meminfo files, by path.
+_node_meminfo_files = {}
+
+
+class _CpuStat(object):
+    """
+    CPU times from /proc/stat.
+
+    The times of all the cores are kept in flat arrays, in the order of the
+    cores in /proc/stat, so consumers can process all the cores in one pass.
+    """
+
+    __slots__ = ('total', 'ids', 'user', 'userNice', 'sys', 'idle')
+
+    def __init__(self, proc_file=None):
+        self.total = None
+        self.ids = array('l')
+        self.user = array('Q')
+        self.userNice = array('Q')
+        self.sys = array('Q')
+        self.idle = array('Q')
+
+        with (proc_file or _proc_stat).read() as (buf, size):
+            pos = 0
+            while True:
+                match = _CPU_STAT_LINE.match(buf, pos, size)
+                if match is None:
+                    break
+                pos = match.end()
+                cpu, user, nice, sys, idle = match.groups()
+                if not cpu:
+                    self.total = (int(user), int(nice), int(sys), int(idle))
+                    continue
+                self.ids.append(int(cpu))
+                self.user.append(int(user))
+                self.userNice.append(int(nice))
+                self.sys.append(int(sys))
+                self.idle.append(int(idle))
+
+        if self.total is None:
+            raise ValueError("Missing total cpu line in /proc/stat")
+
+
 class TotalCpuSample(object):
     """
     A sample of total CPU consumption.
@@ -39,11 +136,10 @@ class TotalCpuSample(object):
     The sample is taken at initialization time and can't be updated.
     """
 
-    def __init__(self):
-        with open('/proc/stat') as f:
-            self.user, userNice, self.sys, self.idle = map(
-                int, f.readline().split()[1:5]
-            )
+    def __init__(self, stat=None):
+        if stat is None:
+            stat = _CpuStat()
+        self.user, userNice, self.sys, self.idle = stat.total
         self.user += userNice
 
 
@@ -52,29 +148,40 @@ class CpuCoreSample(object):
     A sample of the CPU consumption of each core
 
     The sample is taken at initialization time and can't be updated.
-    """
 
-    CPU_CORE_STATS_PATTERN = re.compile(r'cpu(\d+)\s+(.*)')
+    The times are kept in arrays; ids[i] is the id of the core with times
+    user[i], userNice[i], sys[i] and idle[i].
+    """
 
-    def __init__(self):
-        self.coresSample = {}
-        with open('/proc/stat') as src:
-            for line in src:
-                match = self.CPU_CORE_STATS_PATTERN.match(line)
-                if match:
-                    coreSample = {}
-                    user, userNice, sys, idle = map(
-                        int, match.group(2).split()[0:4]
-                    )
-                    coreSample['user'] = user
-                    coreSample['userNice'] = userNice
-                    coreSample['sys'] = sys
-                    coreSample['idle'] = idle
-                    self.coresSample[match.group(1)] = coreSample
+    def __init__(self, stat=None):
+        if stat is None:
+            stat = _CpuStat()
+        self.ids = stat.ids
+        self.user = stat.user
+        self.userNice = stat.userNice
+        self.sys = stat.sys
+        self.idle = stat.idle
+        self._positions = None
+
+    def position(self, coreId):
+        """
+        Return the position of core coreId in the arrays, or None if the
+        core is not in the sample.
+        """
+        if self._positions is None:
+            self._positions = {core: i for i, core in enumerate(self.ids)}
+        return self._positions.get(int(coreId))
 
     def getCoreSample(self, coreId):
-        strCoreId = str(coreId)
-        return self.coresSample.get(strCoreId)
+        i = self.position(coreId)
+        if i is None:
+            return None
+        return {
+            'user': self.user[i],
+            'userNice': self.userNice[i],
+            'sys': self.sys[i],
+            'idle': self.idle[i],
+        }
 
 
 class NumaNodeMemorySample(object):
@@ -94,7 +201,7 @@ class NumaNodeMemorySample(object):
                 idx = -1
             else:
                 idx = int(nodeIndex)
-            memInfo = numa.memory_by_cell(idx)
+            memInfo = _node_memory(nodeIndex, idx)
             nodeMemSample['memFree'] = memInfo['free']
             # in case the numa node has zero memory assigned, report the whole
             # memory as used
@@ -110,6 +217,38 @@ class NumaNodeMemorySample(object):
             self.nodesMemSample[nodeIndex] = nodeMemSample
 
 
+def _node_memory(node, index):
+    """
+    Return the memory stats of numa node like numa.memory_by_cell(index),
+    reading the node meminfo file into a reused buffer instead of calling
+    libvirt. If the kernel does not report numa nodes, use libvirt.
+    """
+    path = _NODE_MEMINFO_PATH % node
+    proc_file = _node_meminfo_files.get(path)
+    if proc_file is None:
+        proc_file = _node_meminfo_files.setdefault(
+            path, _ProcFile(path, size=4 * KiB)
+        )
+
+    values = {}
+    try:
+        with proc_file.read() as (buf, size):
+            for match in _NODE_MEMINFO_LINE.finditer(buf, 0, size):
+                values[match.group(1)] = int(match.group(2))
+                if len(values) == 2:
+                    break
+    except FileNotFoundError:
+        return numa.memory_by_cell(index)
+
+    if len(values) < 2:
+        raise ValueError("Missing memory info in %s" % path)
+
+    return {
+        'total': str(values[b'MemTotal'] // 1024),
+        'free': str(values[b'MemFree'] // 1024),
+    }
+
+
 class PidCpuSample(object):
     """
     A sample of the CPU consumption of a process.
@@ -153,7 +292,9 @@ class HostSample(object):
         self.timestamp = time.time()
         self.pidcpu = PidCpuSample(pid)
         self.ncpus = os.sysconf('SC_NPROCESSORS_ONLN')
-        self.totcpu = TotalCpuSample()
+        # /proc/stat is read once for the total and per core samples.
+        cpu_stat = _CpuStat()
+        self.totcpu = TotalCpuSample(cpu_stat)
         meminfo = utils.readMemInfo()
         freeOrCached = (
             meminfo['MemFree']
@@ -176,7 +317,7 @@ class HostSample(object):
         except:
             self.thpState = 'never'
         self.hugepages = hugepages.state()
-        self.cpuCores = CpuCoreSample()
+        self.cpuCores = CpuCoreSample(cpu_stat)
         self.numaNodeMem = NumaNodeMemorySample()
 
 
@@ -492,6 +633,7 @@ class HostMonitor(object):
         if self._cif and _METRICS_ENABLED:
             stats = hostapi.get_stats(self._cif, self._samples.stats())
             hostapi.send_metrics(stats)
+            self._cif.libvirt_events.send_metrics()
 
 
 def _translate(bulk_stats):
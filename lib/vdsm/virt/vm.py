@@ -113,6 +113,9 @@ _NO_CPU_QUOTA = 0
 # A libvirt constant for undefined cpu period
 _NO_CPU_PERIOD = 0
 
+# Maximum number of SR-IOV NICs of a VM setup concurrently
+_MAX_NIC_SETUP_WORKERS = 8
+
 
 class VolumeError(RuntimeError):
     def __str__(self):
@@ -307,6 +310,21 @@ def _undefine_stale_domain(vm, connection):
                 raise
 
 
+def _drive_groups(drives):
+    """
+    Group drives by image, keeping the drives order. Drives of the same
+    image must not be prepared or torn down concurrently.
+    """
+    groups = {}
+    for drive in drives:
+        if isVdsmImage(drive):
+            key = (drive['domainID'], drive['imageID'])
+        else:
+            key = id(drive)
+        groups.setdefault(key, []).append(drive)
+    return list(groups.values())
+
+
 class Vm(object):
     """
     Used for abstracting communication between various parts of the
@@ -326,7 +344,14 @@ class Vm(object):
                 return path
         return None
 
-    def __init__(self, cif, params, recover=False):
+    def __init__(
+        self,
+        cif,
+        params,
+        recover=False,
+        shared_images=None,
+        start_executor=None,
+    ):
         """
         Initialize a new VM instance.
 
@@ -336,6 +361,12 @@ class Vm(object):
         :type params: dict
         :param recover: Signal if the Vm is recovering;
         :type recover: bool
+        :param shared_images: Used to prepare images shared by VMs started
+            together by Host.createVms.
+        :type shared_images: :class:`vdsm.virt.vmbulk.SharedImages` or None
+        :param start_executor: If set, the VM is started by the executor
+            instead of a new thread.
+        :type start_executor: :class:`vdsm.executor.Executor` or None
         """
         self.recovering = recover
         if 'migrationDest' in params:
@@ -354,6 +385,8 @@ class Vm(object):
             self._lastStatus = vmstatus.WAIT_FOR_LAUNCH
             self._altered_state = _AlteredState()
         self._initial_vcpupin = params.pop('initialVCPUPin', None)
+        self._shared_images = shared_images
+        self._start_executor = start_executor
         elapsedTimeOffset = float(params.pop('elapsedTimeOffset', 0))
         # we need to make sure the 'devices' key exists in vm.conf regardless
         # how the Vm is initialized, either through XML or from conf.
@@ -397,6 +430,9 @@ class Vm(object):
         self._ballooning_enabled = True
         self._drive_merger = DriveMerger(self)
         self._md_desc = metadata.Descriptor.from_xml(self.conf['xml'])
+        self._md_sync_lock = threading.Lock()
+        self._md_sync_timer = None
+        self._md_sync_coalesced = 0
         self._init_from_metadata()
         self._destroy_requested = threading.Event()
         self._monitorResponse = 0
@@ -898,7 +934,15 @@ class Vm(object):
         return iface
 
     def run(self):
-        self._creationThread.start()
+        if self._start_executor is None:
+            self._creationThread.start()
+        else:
+            # Started with other VMs by Host.createVms. The start waits in
+            # the executor queue until a worker is available.
+            self._start_executor.dispatch(
+                self._startUnderlyingVm, discard=False
+            )
+            self._vmStartEvent.set()
         self._vmStartEvent.wait()
         if self._vmAsyncStartError:
             return self._vmAsyncStartError
@@ -946,6 +990,7 @@ class Vm(object):
         return mem_size_mb
 
     def hibernate(self, dst):
+        self.flush_metadata()
         hooks.before_vm_hibernate(self._dom.XMLDesc(), self._custom)
         fname = self.cif.prepareVolumePath(dst)
         try:
@@ -1061,6 +1106,8 @@ class Vm(object):
                 self.log.exception("The vm start process failed")
                 self.setDownStatus(ERROR, vmexitreason.GENERIC_ERROR, str(e))
         finally:
+            # Shared images are valid only while starting the VM.
+            self._shared_images = None
             if acquired:
                 self.log.debug('Releasing incoming migration semaphore')
                 migration.incomingMigrations.release()
@@ -1171,33 +1218,88 @@ class Vm(object):
         self._preparePathsForDrives(drives)
 
     def _preparePathsForDrives(self, drives):
-        for drive in drives:
-            with self._volPrepareLock:
-                if self._destroy_requested.is_set():
-                    # A destroy request has been issued, exit early
-                    break
-                if self._altered_state.origin is not None:
-                    # We must use the original payload path in
-                    # incoming migrations, otherwise the generated
-                    # payload path may not match the one from the
-                    # domain XML (when migrating from Vdsm versions
-                    # using different payload paths).
-                    path = drive.get('path')
-                else:
-                    path = None
-                drive['path'] = self.cif.prepareVolumePath(
-                    drive, self.id, path=path
+        """
+        Prepare drives paths. Drives of different images are prepared
+        concurrently, drives of the same image are prepared in order.
+        """
+        groups = _drive_groups(drives)
+        max_workers = config.getint('vars', 'max_drive_prepare_workers')
+        clock = vdsm.common.time.Clock()
+
+        # The lock is held for preparing all the drives, since taking it
+        # for every drive would serialize the preparation again. Drives are
+        # torn down by _cleanupDrives() only when the preparation is
+        # finished or stopped by a destroy request.
+        with self._volPrepareLock:
+            with clock.run("prepare"):
+                results = list(
+                    concurrent.tmap(
+                        self._preparePathsForDriveGroup,
+                        groups,
+                        max_workers=max_workers,
+                        name="prepare/" + self.id[:8],
+                    )
                 )
-                if isVdsmImage(drive):
-                    # This is the only place we support manipulation of a
-                    # prepared image, required for the localdisk hook. The hook
-                    # may change drive's diskType, path and format.
-                    modified = hooks.after_disk_prepare(drive, self._custom)
-                    drive.update(modified)
-        else:
+
+            for res in results:
+                if not res.succeeded:
+                    raise res.value
+
+            prepared = all(res.value for res in results)
+            if prepared:
+                with clock.run("hooks"):
+                    prepared = self._runDiskPrepareHooks(drives)
+
+        self.log.info(
+            "Prepared %d drives of %d images: %s",
+            len(drives),
+            len(groups),
+            clock,
+        )
+
+        if prepared:
             # Now we got all the resources we needed
             self.volume_monitor.enable()
 
+    def _preparePathsForDriveGroup(self, drives):
+        """
+        Prepare paths for drives in order, returning False if preparation
+        was stopped by a destroy request.
+        """
+        for drive in drives:
+            if self._destroy_requested.is_set():
+                # A destroy request has been issued, exit early
+                return False
+            if self._altered_state.origin is not None:
+                # We must use the original payload path in
+                # incoming migrations, otherwise the generated
+                # payload path may not match the one from the
+                # domain XML (when migrating from Vdsm versions
+                # using different payload paths).
+                path = drive.get('path')
+            else:
+                path = None
+            drive['path'] = self.cif.prepareVolumePath(
+                drive, self.id, path=path, images=self._shared_images
+            )
+        return True
+
+    def _runDiskPrepareHooks(self, drives):
+        """
+        Run after_disk_prepare hooks for the prepared drives in order,
+        returning False if stopped by a destroy request.
+        """
+        for drive in drives:
+            if self._destroy_requested.is_set():
+                return False
+            if isVdsmImage(drive):
+                # This is the only place we support manipulation of a
+                # prepared image, required for the localdisk hook. The hook
+                # may change drive's diskType, path and format.
+                modified = hooks.after_disk_prepare(drive, self._custom)
+                drive.update(modified)
+        return True
+
     def _prepareTransientDisks(self, drives):
         for drive in drives:
             self._createTransientDisk(drive)
@@ -1831,24 +1933,38 @@ class Vm(object):
         self._cleanupDrives(*drives_list)
         """
         drives = drives or self._devices[hwclass.DISK]
+        groups = _drive_groups(drives)
+        if not groups:
+            return
+
+        max_workers = config.getint('vars', 'max_drive_prepare_workers')
+
         # clean them up
         with self._volPrepareLock:
-            for drive in drives:
-                try:
-                    self._removeTransientDisk(drive)
-                except Exception:
-                    self.log.warning(
-                        "Drive transient volume deletion failed "
-                        "for drive %s",
-                        drive,
-                        exc_info=True,
-                    )
-                    # Skip any exception as we don't want to interrupt the
-                    # teardown process for any reason.
-                try:
-                    self.cif.teardownVolumePath(drive)
-                except Exception:
-                    self.log.exception("Drive teardown failure for %s", drive)
+            for _ in concurrent.tmap(
+                self._cleanupDriveGroup,
+                groups,
+                max_workers=max_workers,
+                name="cleanup/" + self.id[:8],
+            ):
+                pass
+
+    def _cleanupDriveGroup(self, drives):
+        for drive in drives:
+            try:
+                self._removeTransientDisk(drive)
+            except Exception:
+                self.log.warning(
+                    "Drive transient volume deletion failed for drive %s",
+                    drive,
+                    exc_info=True,
+                )
+                # Skip any exception as we don't want to interrupt the
+                # teardown process for any reason.
+            try:
+                self.cif.teardownVolumePath(drive)
+            except Exception:
+                self.log.exception("Drive teardown failure for %s", drive)
 
     def _cleanupGuestAgent(self):
         """
@@ -2210,6 +2326,7 @@ class Vm(object):
 
     def migration_parameters(self):
         guest_stats = self._getGuestStats()
+        self.flush_metadata()
         return {
             '_srcDomXML': self._dom.XMLDesc(),
             'vmId': self.id,
@@ -2228,6 +2345,7 @@ class Vm(object):
         modified by libvirt and will not be rejected by the migration
         end.
         """
+        self.flush_metadata()
         return self._dom.XMLDesc(flags=libvirt.VIR_DOMAIN_XML_MIGRATABLE)
 
     def _get_vm_migration_progress(self):
@@ -2707,9 +2825,13 @@ class Vm(object):
 
         # Currently there is no protection agains mirroring a network twice,
         if not self.recovering:
-            for nic in self._devices[hwclass.NIC]:
-                for network in nic.portMirroring:
-                    supervdsm.getProxy().setPortMirroring(network, nic.name)
+            mirrors = [
+                (network, nic.name)
+                for nic in self._devices[hwclass.NIC]
+                for network in nic.portMirroring
+            ]
+            if mirrors:
+                supervdsm.getProxy().setPortMirroringMany(mirrors)
 
             vmdevices.common.save_device_metadata(
                 self._md_desc, self._devices, self.log
@@ -2838,20 +2960,77 @@ class Vm(object):
         go through the devices that were successfully setup and tear
         them down, logging all exceptions we encounter. Exception is then
         raised as we cannot continue the VM creation due to device failures.
+
+        Setting up SR-IOV NICs detaches their host devices, which is slow.
+        These NICs do not depend on each other, so they are setup
+        concurrently after the other devices.
         """
+        start = vdsm.common.time.monotonic_time()
+        hostdev_nics = [
+            nic for nic in self._devices[hwclass.NIC] if nic.is_hostdevice
+        ]
         done = []
         for dev_object in self._tracked_devices():
+            if dev_object in hostdev_nics:
+                continue
             try:
-                dev_object.setup()
+                self._setup_device(dev_object)
             except Exception:
-                self.log.exception(
-                    "Failed to setup device %s", dev_object.device
-                )
                 self._teardown_devices(done)
                 raise
             else:
                 done.append(dev_object)
 
+        error = None
+        if len(hostdev_nics) > 1:
+            results = concurrent.tmap(
+                self._try_setup_device,
+                hostdev_nics,
+                max_workers=min(len(hostdev_nics), _MAX_NIC_SETUP_WORKERS),
+                name="setup/" + self.id[:8],
+            )
+            for res in results:
+                dev_object, e = res.value
+                if e is None:
+                    done.append(dev_object)
+                elif error is None:
+                    error = e
+        else:
+            for dev_object in hostdev_nics:
+                dev_object, error = self._try_setup_device(dev_object)
+                if error is None:
+                    done.append(dev_object)
+
+        if error is not None:
+            self._teardown_devices(done)
+            raise error
+
+        self.log.info(
+            "Setup %d devices in %.2f seconds",
+            len(done),
+            vdsm.common.time.monotonic_time() - start,
+        )
+
+    def _setup_device(self, dev_object):
+        start = vdsm.common.time.monotonic_time()
+        try:
+            dev_object.setup()
+        except Exception:
+            self.log.exception("Failed to setup device %s", dev_object.device)
+            raise
+        self.log.debug(
+            "Setup device %s in %.2f seconds",
+            dev_object.device,
+            vdsm.common.time.monotonic_time() - start,
+        )
+
+    def _try_setup_device(self, dev_object):
+        try:
+            self._setup_device(dev_object)
+        except Exception as e:
+            return dev_object, e
+        return dev_object, None
+
     def _make_devices(self):
         disk_objs = self._perform_host_local_adjustment()
         return self._make_devices_from_xml(disk_objs)
@@ -3614,7 +3793,7 @@ class Vm(object):
 
     def update_guest_agent_api_version(self):
         self._guest_agent_api_version = self.guestAgent.effectiveApiVersion
-        self._update_metadata()
+        self._update_metadata(delay=True)
         return self._guest_agent_api_version
 
     @api.guard(_not_migrating)
@@ -5687,7 +5866,7 @@ class Vm(object):
                     self.volume_monitor.on_enospc(drive)
 
             self._send_ioerror_status_event(reason, blockDevAlias, drive=drive)
-            self._update_metadata()
+            self._update_metadata(delay=True)
 
         elif action == libvirt.VIR_DOMAIN_EVENT_IO_ERROR_REPORT:
             self.log.info(
@@ -5735,6 +5914,10 @@ class Vm(object):
 
     def _updateDomainDescriptor(self, xml=None):
         domxml = self._dom.XMLDesc() if xml is None else xml
+        if xml is None and self._domain.same_xml(domxml):
+            # Nothing changed since the last update, keep the current
+            # descriptor and its parsed XML.
+            return
         self._domain = DomainDescriptor(
             domxml,
             xml_source=(
@@ -5753,7 +5936,7 @@ class Vm(object):
         # load will overwrite any existing content, as per doc.
         self._md_desc.load(self._dom)
 
-    def _update_metadata(self):
+    def _update_metadata(self, delay=False):
         with self._md_desc.values() as vm:
             vm['startTime'] = self.start_time
             if self._guest_agent_api_version is not None:
@@ -5786,7 +5969,7 @@ class Vm(object):
                 except KeyError:
                     # It been cleared by a different flow on the metadata.
                     pass
-        self.sync_metadata()
+        self.sync_metadata(delay=delay)
 
     def save_custom_properties(self):
         if self.min_cluster_version(4, 2):
@@ -5796,10 +5979,78 @@ class Vm(object):
         # in the XML metadata.
         self._md_desc.add_custom(self._custom['custom'])
 
-    def sync_metadata(self):
+    def sync_metadata(self, delay=False):
+        """
+        Write the metadata to the libvirt domain.
+
+        If delay is True, the write is deferred by vars:metadata_sync_delay
+        seconds, and all delayed writes requested during this time are
+        coalesced into a single write. Use delay only for changes that do
+        not have to be persisted before the caller continues.
+        """
         if self._external:
             return
-        self._md_desc.dump(self._dom)
+        if delay:
+            self._schedule_metadata_sync()
+        else:
+            self._md_desc.dump(self._dom)
+
+    def flush_metadata(self):
+        """
+        Write pending delayed metadata changes to the libvirt domain. Must be
+        called before using the metadata in the domain XML.
+        """
+        with self._md_sync_lock:
+            timer = self._md_sync_timer
+            self._md_sync_timer = None
+        if timer is not None:
+            timer.cancel()
+        # The timer may have fired and still be writing the metadata, so
+        # always write it. This waits for the running write, and does not
+        # modify the domain if the metadata did not change.
+        self.sync_metadata()
+
+    def metadata_sync_info(self):
+        info = self._md_desc.dump_info()
+        with self._md_sync_lock:
+            info["coalesced"] = self._md_sync_coalesced
+        return info
+
+    def _schedule_metadata_sync(self):
+        delay = config.getfloat('vars', 'metadata_sync_delay')
+        if delay <= 0:
+            self._md_desc.dump(self._dom)
+            return
+        with self._md_sync_lock:
+            if self._md_sync_timer is not None:
+                self._md_sync_coalesced += 1
+                return
+            self._md_sync_timer = concurrent.Timer(
+                delay,
+                self._delayed_metadata_sync,
+                name="md-sync/" + self.id[:8],
+                log=self.log,
+            )
+            self._md_sync_timer.start()
+
+    def _cancel_metadata_sync(self):
+        with self._md_sync_lock:
+            timer = self._md_sync_timer
+            self._md_sync_timer = None
+        if timer is not None:
+            timer.cancel()
+        self.log.debug("Metadata sync stats: %s", self.metadata_sync_info())
+
+    def _delayed_metadata_sync(self):
+        with self._md_sync_lock:
+            if self._md_sync_timer is None:
+                # Flushed or cancelled by another thread.
+                return
+            self._md_sync_timer = None
+        try:
+            self.sync_metadata()
+        except (libvirt.libvirtError, virdomain.NotConnectedError) as e:
+            self.log.warning("Cannot write delayed metadata changes: %s", e)
 
     def releaseVm(self, gracefulAttempts=1):
         """
@@ -5836,6 +6087,7 @@ class Vm(object):
             # Terminate the VM's creation thread.
             self._incoming_migration_vm_running.set()
             self.guestAgent.stop()
+            self._cancel_metadata_sync()
             if self._dom.connected:
                 result = self._destroyVm(gracefulAttempts)
                 if response.is_error(result):
@@ -6090,7 +6342,7 @@ class Vm(object):
             raise exception.BalloonError(str(e))
         else:
             self._balloon_target = target
-            self._update_metadata()
+            self._update_metadata(delay=True)
 
     def get_balloon_info(self):
         if self._balloon_minimum is None or self._balloon_target is None:
@@ -6552,6 +6804,9 @@ class Vm(object):
             driveSpec, baseVolUUID, topVolUUID, bandwidth, jobUUID
         )
 
+    def merge_drives(self, merges, batchUUID):
+        return self._drive_merger.merge_drives(merges, batchUUID)
+
     def query_drive_volume_chain(self, drive):
         self._updateDomainDescriptor()
         disk_xml = vmdevices.lookup.xml_device_by_alias(
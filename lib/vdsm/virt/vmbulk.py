@@ -0,0 +1,144 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""
+Starting many VMs in one request.
+
+When a VDI pool is started, many VMs using the same images (e.g. the same
+ISO image, or shared disks) are started together. Starting them using
+separate VM.create calls starts a creation thread for every VM, all
+competing for storage and libvirt, and prepares the shared images again for
+every VM.
+
+create_vms() creates all the VMs and returns, and the VMs are started in the
+background by the fixed size VM start executor, instead of a new thread for
+every VM. VMs waiting for an executor worker do not use any thread or
+storage resources. Images used by more than one VM in the request are
+prepared only once.
+"""
+
+import copy
+import logging
+import threading
+
+from vdsm.common import response
+from vdsm.common.time import monotonic_time
+
+log = logging.getLogger("virt.vmbulk")
+
+
+class _Preparation(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SharedImages(object):
+    """
+    Prepare images shared by VMs started together only once.
+
+    Provides the prepareImage() method of the irs, and used instead of the
+    irs when preparing VM drives. The first caller prepares the image, and
+    concurrent callers preparing the same image wait for the result. Failed
+    preparations are not shared, so the next caller will try again.
+    """
+
+    def __init__(self, irs):
+        self._irs = irs
+        self._lock = threading.Lock()
+        self._preparations = {}
+
+    def prepareImage(self, sdUUID, spUUID, imgUUID, leafUUID):
+        key = (sdUUID, spUUID, imgUUID, leafUUID)
+        while True:
+            with self._lock:
+                prep = self._preparations.get(key)
+                if prep is None:
+                    prep = self._preparations[key] = _Preparation()
+                    owner = True
+                else:
+                    owner = False
+
+            if owner:
+                return self._prepare(key, prep)
+
+            prep.done.wait()
+            if prep.result is not None:
+                # Callers modify the drive volume chain, so every caller
+                # must get its own copy.
+                return copy.deepcopy(prep.result)
+
+            # Preparation failed, try again.
+
+    def _prepare(self, key, prep):
+        try:
+            res = self._irs.prepareImage(*key)
+        except BaseException:
+            self._drop(key, prep)
+            raise
+
+        if response.is_error(res):
+            self._drop(key, prep)
+            return res
+
+        prep.result = res
+        prep.done.set()
+        return copy.deepcopy(res)
+
+    def _drop(self, key, prep):
+        with self._lock:
+            del self._preparations[key]
+        prep.done.set()
+
+
+def create_vms(cif, vms, create):
+    """
+    Create VMs, starting them in the background using the VM start executor
+    of cif.
+
+    Arguments:
+        cif (clientIF.clientIF): The client interface owning the VMs.
+        vms (list): List of VM parameters, as given to VM.create.
+        create (callable): Called with VM parameters, SharedImages and the
+            executor starting the VM, to create a VM, returning a response.
+
+    Returns:
+        List of dicts with the creation result of every VM, in the same
+        order as vms.
+    """
+    images = SharedImages(cif.irs)
+    started = monotonic_time()
+
+    results = []
+    for params in vms:
+        vm_started = monotonic_time()
+        try:
+            result = _create_vm(params, create, images, cif.vm_start_executor)
+        except Exception as e:
+            log.exception("Error creating VM")
+            result = response.error("unexpected", str(e))["status"]
+        result["timing"] = {
+            "queued": vm_started - started,
+            "create": monotonic_time() - vm_started,
+        }
+        results.append(result)
+
+    log.info(
+        "Created %d VMs in %.2f seconds",
+        len(vms),
+        monotonic_time() - started,
+    )
+    return results
+
+
+def _create_vm(params, create, images, executor):
+    res = create(params, images, executor)
+    result = dict(res["status"])
+    if response.is_error(res):
+        return result
+
+    status = res["vmList"]
+    result["vmId"] = status["vmId"]
+    result["status"] = status["status"]
+    return result
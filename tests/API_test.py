@@ -141,7 +141,7 @@ class FakeClientIF(object):
         self.log = logging.getLogger('tests.FakeClientIF')
 
     @recorded
-    def createVm(self, vmParams):
+    def createVm(self, vmParams, shared_images=None, start_executor=None):
         return response.success(vmList=[self])
 
     def getInstance(self):
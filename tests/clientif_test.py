@@ -247,6 +247,59 @@ class getVMsTests(TestCaseBase):
                 self.assertIn(testvm2.id, vms)
 
 
+class RecoveryVm(object):
+
+    def __init__(self, vm_id, sd_ids, log=None):
+        self.id = vm_id
+        self.sdIds = set(sd_ids)
+        self.log = log
+
+    def preparePaths(self):
+        if self.log is not None:
+            self.log.append(self.id)
+
+
+class TestRecoveryBatches(TestCaseBase):
+
+    def test_empty(self):
+        assert clientIF._recovery_batches([], 4) == []
+
+    def test_group_by_storage_domains(self):
+        vms = [
+            RecoveryVm('a', ['sd1']),
+            RecoveryVm('b', ['sd2']),
+            RecoveryVm('c', ['sd1']),
+            RecoveryVm('d', ['sd2', 'sd1']),
+            RecoveryVm('e', ['sd1', 'sd2']),
+        ]
+        batches = clientIF._recovery_batches(vms, 1)
+        assert [[v.id for v in batch] for batch in batches] == [
+            ['a', 'c'],
+            ['b'],
+            ['d', 'e'],
+        ]
+
+    def test_split_large_group(self):
+        vms = [RecoveryVm('vm%d' % i, ['sd1']) for i in range(10)]
+        batches = clientIF._recovery_batches(vms, 4)
+        assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+        assert [v for batch in batches for v in batch] == vms
+
+    def test_prepare_recovered_vms(self):
+        cif = FakeClientIF()
+        cif._enabled = True
+        prepared = []
+        for i in range(10):
+            vm_id = 'vm%d' % i
+            cif.vmContainer[vm_id] = RecoveryVm(
+                vm_id, ['sd%d' % (i % 3)], log=prepared
+            )
+
+        cif._preparePathsForRecoveredVMs()
+
+        assert sorted(prepared) == sorted(cif.vmContainer)
+
+
 class TestNotification(TestCaseBase):
 
     TEST_EVENT_NAME = 'test_event'
@@ -2,6 +2,9 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 import os
+import threading
+import time
+
 import pytest
 
 from vdsm.gluster import cli
@@ -37,3 +40,307 @@ def test_getTree(relative_filepath, expected):
 def test_get_tree_empty_input():
     with pytest.raises(ge.GlusterXmlErrorException):
         cli._getTree("")
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeQuery(object):
+
+    def __init__(self, result='result', error=None, block=None):
+        self.result = result
+        self.error = error
+        self.block = block
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.block:
+            self.block.wait(5)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def query_cache(clock, monkeypatch):
+    monkeypatch.setattr(cli.config, 'getint', lambda section, key: 2)
+    return cli._QueryCache(clock=clock)
+
+
+def test_query_cache_ttl(query_cache, clock):
+    query = FakeQuery()
+    assert query_cache.get(('vol', 'info'), query) == 'result'
+    assert query_cache.get(('vol', 'info'), query) == 'result'
+    assert query.calls == 1
+
+    clock.now = 2
+    assert query_cache.get(('vol', 'info'), query) == 'result'
+    assert query.calls == 2
+
+
+def test_query_cache_key(query_cache):
+    query = FakeQuery()
+    query_cache.get(('vol', 'info'), query)
+    query_cache.get(('vol', 'info', 'vol1'), query)
+    assert query.calls == 2
+
+
+def test_query_cache_invalidate(query_cache):
+    query = FakeQuery()
+    query_cache.get(('vol', 'info'), query)
+    query_cache.invalidate()
+    query_cache.get(('vol', 'info'), query)
+    assert query.calls == 2
+
+
+def test_query_cache_error_not_cached(query_cache):
+    query = FakeQuery(error=ge.GlusterCmdFailedException(rc=1))
+    for i in range(2):
+        with pytest.raises(ge.GlusterCmdFailedException):
+            query_cache.get(('vol', 'info'), query)
+    assert query.calls == 2
+
+
+def test_query_cache_disabled(query_cache, monkeypatch):
+    monkeypatch.setattr(cli.config, 'getint', lambda section, key: 0)
+    query = FakeQuery()
+    query_cache.get(('vol', 'info'), query)
+    query_cache.get(('vol', 'info'), query)
+    assert query.calls == 2
+
+
+@pytest.mark.parametrize("error", [None, ge.GlusterCmdFailedException(rc=1)])
+def test_query_cache_single_flight(query_cache, error):
+    block = threading.Event()
+    query = FakeQuery(error=error, block=block)
+    results = []
+
+    def run():
+        try:
+            results.append(query_cache.get(('vol', 'info'), query))
+        except ge.GlusterCmdFailedException as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=run) for i in range(4)]
+    for t in threads:
+        t.start()
+    # Let the threads wait for the running query.
+    time.sleep(0.2)
+    block.set()
+    for t in threads:
+        t.join()
+
+    assert query.calls == 1
+    assert results == [error or 'result'] * 4
+
+
+def test_query_cache_invalidate_running(query_cache):
+    block = threading.Event()
+    query = FakeQuery(block=block)
+    t = threading.Thread(target=query_cache.get, args=(('vol',), query))
+    t.start()
+    time.sleep(0.2)
+    # The running query may not see this change, so its result is not kept.
+    query_cache.invalidate()
+    block.set()
+    t.join()
+
+    query_cache.get(('vol',), FakeQuery())
+    assert query.calls == 1
+
+
+HEAL_INFO_XML = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<cliOutput>
+  <healInfo>
+    <bricks>
+      <brick hostUuid="f0ef3d05-3ef3-411a-af2c-628b0a14278b">
+        <name>host1:/brick-1</name>
+        <status>Connected</status>
+        <totalNumberOfEntries>10</totalNumberOfEntries>
+      </brick>
+      <brick hostUuid="-">
+        <name>host1:/brick-2</name>
+        <status>Transport endpoint is not connected</status>
+        <totalNumberOfEntries>0</totalNumberOfEntries>
+      </brick>
+    </bricks>
+  </healInfo>
+  <opRet>%d</opRet>
+  <opErrno>%d</opErrno>
+  <opErrstr>%s</opErrstr>
+</cliOutput>
+"""
+
+
+def test_iter_heal_info():
+    out = HEAL_INFO_XML % (0, 0, b"")
+    expected = {
+        'bricks': [
+            {
+                'name': 'host1:/brick-1',
+                'status': 'Connected',
+                'hostUuid': 'f0ef3d05-3ef3-411a-af2c-628b0a14278b',
+                'numberOfEntries': '10',
+            },
+            {
+                'name': 'host1:/brick-2',
+                'status': 'Transport endpoint is not connected',
+                'hostUuid': '-',
+            },
+        ]
+    }
+    assert cli._iterVolumeHealInfo(out) == expected
+    assert cli._parseVolumeHealInfo(cli._getTree(out)) == expected
+
+
+def test_iter_tree_failed():
+    out = HEAL_INFO_XML % (-1, 2, b"Volume is not started")
+    with pytest.raises(ge.GlusterCmdFailedException) as e:
+        cli._iterVolumeHealInfo(out)
+    assert e.value.rc == 2
+    assert e.value.err == ["Volume is not started"]
+
+
+@pytest.mark.parametrize(
+    "out",
+    [
+        b"",
+        b"<cliOutput><healInfo>",
+        b"<cliOutput><healInfo/></cliOutput>",
+        b"<cliOutput><opRet>x</opRet><opErrno>0</opErrno><opErrstr/>"
+        b"</cliOutput>",
+    ],
+)
+def test_iter_tree_invalid(out):
+    with pytest.raises(ge.GlusterXmlErrorException):
+        cli._iterVolumeHealInfo(out)
+
+
+def test_iter_tree_clears_elements():
+    out = HEAL_INFO_XML % (0, 0, b"")
+    for path, el in cli._iterTree(out, ('healInfo/bricks/brick',)):
+        assert path == 'healInfo/bricks/brick'
+        assert el.find('name') is not None
+        last = el
+    assert len(last) == 0
+
+
+VOLUMES_STATUS_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<cliOutput>
+  <opRet>0</opRet>
+  <opErrno>0</opErrno>
+  <opErrstr/>
+  <volStatus>
+    <volumes>
+      <volume>
+        <volName>vol1</volName>
+        <node>
+          <hostname>host1</hostname>
+          <path>/bricks/vol1</path>
+          <peerid>f0ef3d05-3ef3-411a-af2c-628b0a14278b</peerid>
+          <status>1</status>
+          <ports>
+            <tcp>49152</tcp>
+            <rdma>N/A</rdma>
+          </ports>
+          <pid>1234</pid>
+        </node>
+        <tasks>
+          <task>
+            <type>Rebalance</type>
+            <id>12345473-9165-4f33-97c4-6e4e3b3b8d0a</id>
+            <status>1</status>
+            <statusStr>in progress</statusStr>
+          </task>
+        </tasks>
+      </volume>
+      <volume>
+        <volName>vol2</volName>
+        <node>
+          <hostname>host1</hostname>
+          <path>/bricks/vol2</path>
+          <peerid>f0ef3d05-3ef3-411a-af2c-628b0a14278b</peerid>
+          <status>0</status>
+          <ports>
+            <tcp>N/A</tcp>
+            <rdma>N/A</rdma>
+          </ports>
+          <pid>-1</pid>
+        </node>
+        <tasks/>
+      </volume>
+    </volumes>
+  </volStatus>
+</cliOutput>
+"""
+
+
+@pytest.fixture
+def fake_cluster(monkeypatch, query_cache):
+    commands = []
+
+    def execGluster(cmd):
+        commands.append(cmd)
+        return VOLUMES_STATUS_XML
+
+    volumes = {
+        'vol1': {'volumeStatus': cli.VolumeStatus.ONLINE},
+        'vol2': {'volumeStatus': cli.VolumeStatus.ONLINE},
+    }
+    monkeypatch.setattr(cli, '_queries', query_cache)
+    monkeypatch.setattr(cli, '_execGluster', execGluster)
+    monkeypatch.setattr(cli, '_getGlusterVolCmd', lambda: ['gluster'])
+    monkeypatch.setattr(cli, '_getLocalIpAddress', lambda: '10.0.0.1')
+    monkeypatch.setattr(cli, 'volumeInfo', lambda: volumes)
+    monkeypatch.setattr(cli, 'peerStatus', lambda: ['host1'])
+    return volumes, commands
+
+
+def test_status_snapshot(fake_cluster):
+    volumes, commands = fake_cluster
+    snapshot = cli.statusSnapshot()
+
+    # One status query for all the volumes.
+    assert len(commands) == 1
+    assert commands[0][-3:] == ['status', 'all', '--xml']
+    assert snapshot['volumes'] == volumes
+    assert snapshot['hosts'] == ['host1']
+    assert sorted(snapshot['volumesStatus']) == ['vol1', 'vol2']
+    assert snapshot['volumesStatus']['vol2']['bricks'][0]['status'] == (
+        'OFFLINE'
+    )
+    assert snapshot['tasks'] == {
+        '12345473-9165-4f33-97c4-6e4e3b3b8d0a': {
+            'volumeName': 'vol1',
+            'taskType': cli.TaskType.REBALANCE,
+            'status': 'IN_PROGRESS',
+            'bricks': [],
+        }
+    }
+
+    cli.statusSnapshot()
+    assert len(commands) == 1
+
+
+def test_status_snapshot_no_started_volumes(fake_cluster):
+    volumes, commands = fake_cluster
+    for info in volumes.values():
+        info['volumeStatus'] = cli.VolumeStatus.OFFLINE
+
+    snapshot = cli.statusSnapshot()
+
+    assert commands == []
+    assert snapshot['volumesStatus'] == {}
+    assert snapshot['tasks'] == {}
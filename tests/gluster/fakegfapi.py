@@ -0,0 +1,59 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""
+Fake gfapi worker, serving requests without libgfapi.
+
+Usage: fakegfapi.py IDLE_TIMEOUT
+"""
+
+import os
+import sys
+import time
+
+from vdsm.gluster import exception as ge
+from vdsm.gluster import gfapiworker
+
+
+def init(volume, host, port, protocol):
+    if volume == "bad":
+        raise ge.GlfsInitException(rc=1, err=["Volume:bad is stopped."])
+    return volume
+
+
+def fini(fs, volume):
+    pass
+
+
+def pid(fs):
+    return os.getpid()
+
+
+def sleep(fs):
+    time.sleep(60)
+
+
+def crash(fs):
+    os._exit(1)
+
+
+def crash_once(fs):
+    # The volume is a path marking that the worker crashed.
+    if not os.path.exists(fs):
+        open(fs, "w").close()
+        os._exit(1)
+    return os.getpid()
+
+
+handlers = {
+    "pid": pid,
+    "sleep": sleep,
+    "crash": crash,
+    "crash_once": crash_once,
+}
+
+if __name__ == "__main__":
+    server = gfapiworker.Server(
+        handlers, init, fini, (ge.GlusterException,), float(sys.argv[1])
+    )
+    server.serve(sys.stdin.buffer, sys.stdout.buffer)
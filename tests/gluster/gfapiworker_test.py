@@ -0,0 +1,271 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from vdsm.common import concurrent
+from vdsm.gluster import exception as ge
+from vdsm.gluster import gfapiworker
+
+FAKE_WORKER = os.path.join(os.path.dirname(__file__), "fakegfapi.py")
+
+TIMEOUT = 10
+
+
+def worker_command(idle_timeout=60):
+    return [sys.executable, FAKE_WORKER, str(idle_timeout)]
+
+
+def request(command, volume="vol"):
+    return {
+        "command": command,
+        "volume": volume,
+        "host": "localhost",
+        "port": 24007,
+        "protocol": "tcp",
+    }
+
+
+@pytest.fixture
+def worker():
+    w = gfapiworker.Worker(worker_command(), TIMEOUT)
+    yield w
+    w.close()
+
+
+def test_worker_reuse(worker):
+    pid = worker.call(request("pid"))["result"]
+    assert worker.call(request("pid"))["result"] == pid
+
+
+def test_worker_error(worker):
+    response = worker.call(request("pid", volume="bad"))
+    assert response == {"error": {"rc": 1, "err": ["Volume:bad is stopped."]}}
+
+
+def test_worker_restart_after_crash(worker, tmp_path):
+    marker = str(tmp_path / "crashed")
+    pid = worker.call(request("pid"))["result"]
+
+    # The worker crashed, and the request was sent to a new worker.
+    new_pid = worker.call(request("crash_once", volume=marker))["result"]
+    assert new_pid != pid
+    assert os.path.exists(marker)
+
+
+def test_worker_crash_again(worker):
+    # The request crashed the restarted worker too.
+    with pytest.raises(gfapiworker.WorkerError):
+        worker.call(request("crash"))
+    assert worker.pid is None
+
+    # The next request starts a new worker.
+    assert worker.call(request("pid"))["result"] == worker.pid
+
+
+def test_worker_max_requests():
+    w = gfapiworker.Worker(worker_command(), TIMEOUT, max_requests=2)
+    try:
+        first = w.call(request("pid"))["result"]
+        assert w.call(request("pid"))["result"] == first
+        # The worker was recycled after 2 requests.
+        assert w.pid is None
+        assert w.call(request("pid"))["result"] != first
+    finally:
+        w.close()
+
+
+def test_worker_timeout():
+    w = gfapiworker.Worker(worker_command(), 0.5)
+    try:
+        pid = w.call(request("pid"))["result"]
+
+        start = time.monotonic()
+        with pytest.raises(gfapiworker.WorkerTimeout):
+            w.call(request("sleep"))
+        assert time.monotonic() - start < TIMEOUT
+
+        # The hung worker was killed, and a new worker serves the next
+        # request.
+        assert w.pid is None
+        assert w.call(request("pid"))["result"] != pid
+    finally:
+        w.close()
+
+
+def test_worker_idle_exit():
+    w = gfapiworker.Worker(worker_command(idle_timeout=0.2), TIMEOUT)
+    try:
+        pid = w.call(request("pid"))["result"]
+        proc = w._proc
+        proc.wait(TIMEOUT)
+
+        # The worker exited when it was idle, and a new worker serves the
+        # next request.
+        assert w.call(request("pid"))["result"] != pid
+    finally:
+        w.close()
+
+
+def test_pool_worker_per_key():
+    pool = gfapiworker.Pool(worker_command(), TIMEOUT)
+    try:
+        pid1 = pool.call("vol1", request("pid", volume="vol1"))["result"]
+        pid2 = pool.call("vol2", request("pid", volume="vol2"))["result"]
+        assert pid1 != pid2
+        response = pool.call("vol1", request("pid", volume="vol1"))
+        assert response["result"] == pid1
+    finally:
+        pool.close()
+
+
+def test_pool_hung_worker():
+    pool = gfapiworker.Pool(worker_command(), 2)
+    try:
+        t = concurrent.thread(
+            pool.call, args=("vol1", request("sleep", volume="vol1"))
+        )
+        t.start()
+        try:
+            # A hung volume does not block the other volumes.
+            start = time.monotonic()
+            pool.call("vol2", request("pid", volume="vol2"))
+            assert time.monotonic() - start < 1
+        finally:
+            t.join()
+    finally:
+        pool.close()
+
+
+def test_pool_drop_idle_workers():
+    pool = gfapiworker.Pool(worker_command(idle_timeout=0.2), TIMEOUT)
+    try:
+        pool.call("vol1", request("pid", volume="vol1"))
+        pool._workers["vol1"]._proc.wait(TIMEOUT)
+
+        # The idle worker of vol1 is dropped when using another volume.
+        pool.call("vol2", request("pid", volume="vol2"))
+        assert list(pool._workers) == ["vol2"]
+    finally:
+        pool.close()
+
+
+class FakeGlfs:
+
+    def __init__(self):
+        self.handles = []
+        self.released = []
+
+    def init(self, volume, host, port, protocol):
+        if volume == "bad":
+            raise ge.GlfsInitException(rc=1, err=["Volume:bad is stopped."])
+        handle = "fs-{}".format(len(self.handles))
+        self.handles.append(handle)
+        return handle
+
+    def fini(self, fs, volume):
+        self.released.append(fs)
+
+
+class ServerConnection:
+
+    def __init__(self, glfs, idle_timeout):
+        self.fail_handle = False
+        rfd, self._wfd = os.pipe()
+        self._rfd, wfd = os.pipe()
+        self._infile = os.fdopen(rfd, "rb")
+        self._outfile = os.fdopen(wfd, "wb")
+        self._reader = os.fdopen(self._rfd, "rb")
+        server = gfapiworker.Server(
+            {"statvfs": self._check, "readdir": lambda fs: True},
+            glfs.init,
+            glfs.fini,
+            (ge.GlusterException,),
+            idle_timeout,
+        )
+        self._thread = threading.Thread(
+            target=server.serve, args=(self._infile, self._outfile)
+        )
+        self._thread.start()
+
+    def _check(self, fs):
+        if fs == "fs-0" and self.fail_handle:
+            raise ge.GlfsStatvfsException(rc=5)
+        return fs
+
+    def call(self, req):
+        os.write(self._wfd, json.dumps(req).encode("utf-8") + b"\n")
+        return json.loads(self._reader.readline())
+
+    def wait(self):
+        self._thread.join(TIMEOUT)
+        return not self._thread.is_alive()
+
+    def close(self):
+        os.close(self._wfd)
+        self._thread.join(TIMEOUT)
+        self._infile.close()
+        self._outfile.close()
+        self._reader.close()
+
+
+@pytest.fixture
+def glfs():
+    return FakeGlfs()
+
+
+def test_server_keep_handle(glfs):
+    conn = ServerConnection(glfs, 60)
+    try:
+        assert conn.call(request("statvfs")) == {"result": "fs-0"}
+        assert conn.call(request("readdir")) == {"result": True}
+        assert glfs.handles == ["fs-0"]
+    finally:
+        conn.close()
+
+    # Handles are released when the server exits.
+    assert glfs.released == ["fs-0"]
+
+
+def test_server_release_failed_handle(glfs):
+    conn = ServerConnection(glfs, 60)
+    try:
+        conn.call(request("statvfs"))
+        conn.fail_handle = True
+
+        # The request failed with the old handle, and was retried with a new
+        # handle.
+        assert conn.call(request("statvfs")) == {"result": "fs-1"}
+        assert glfs.released == ["fs-0"]
+    finally:
+        conn.close()
+
+
+def test_server_errors(glfs):
+    conn = ServerConnection(glfs, 60)
+    try:
+        assert conn.call(request("statvfs", volume="bad")) == {
+            "error": {"rc": 1, "err": ["Volume:bad is stopped."]}
+        }
+        response = conn.call(request("no-such-command"))
+        assert response["error"]["rc"] == -1
+    finally:
+        conn.close()
+
+
+def test_server_idle_eviction(glfs):
+    conn = ServerConnection(glfs, 0.2)
+    try:
+        conn.call(request("statvfs"))
+
+        # The unused handle is released, and the server exits.
+        assert conn.wait()
+        assert glfs.released == ["fs-0"]
+    finally:
+        conn.close()
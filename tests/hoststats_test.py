@@ -1,11 +1,16 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import logging
 import os
 import tempfile
 import shutil
+import time
+
+import pytest
 
 from vdsm.host import stats as hoststats
+from vdsm.virt import sampling
 from vdsm import numa
 
 from testlib import VdsmTestCase as TestCaseBase
@@ -13,6 +18,8 @@ from monkeypatch import MonkeyPatchScope
 
 from virt import vmfakelib as fake
 
+log = logging.getLogger("test")
+
 
 class BootTimeTests(TestCaseBase):
     proc_stat_template = """
@@ -186,6 +193,114 @@ class HostStatsThreadTests(TestCaseBase):
         )
 
 
+NCPUS = 512
+
+
+def synthetic_proc_stat(tick, ncpus=NCPUS, offline=()):
+    """
+    Return /proc/stat contents of a host with ncpus CPUs, after tick
+    seconds, using 100 jiffies per second. CPU n spends n % 100 percent of
+    the time in user mode, and 1 percent in system mode.
+    """
+    lines = []
+    total = [0, 0, 0, 0]
+    cores = []
+    for cpu in range(ncpus):
+        user = 1000000 + (cpu % 100) * tick
+        sys = 500000 + tick
+        idle = 2000000 + (100 - cpu % 100 - 1) * tick
+        total = [
+            total[0] + user,
+            total[1] + 10,
+            total[2] + sys,
+            total[3] + idle,
+        ]
+        if cpu not in offline:
+            cores.append(
+                "cpu%d %d 10 %d %d 500 200 100 0 0 0" % (cpu, user, sys, idle)
+            )
+    lines.append("cpu  %d %d %d %d 500 200 100 0 0 0" % tuple(total))
+    lines.extend(cores)
+    lines.append("intr " + " ".join(["0"] * 4096))
+    lines.append("ctxt 690239751")
+    lines.append("btime 1395249141")
+    return "\n".join(lines) + "\n"
+
+
+class CpuSample(object):
+
+    def __init__(self, path, timestamp):
+        self.timestamp = timestamp
+        stat = sampling._CpuStat(sampling._ProcFile(path))
+        self.cpuCores = sampling.CpuCoreSample(stat)
+
+
+def two_nodes_topology(ncpus=NCPUS):
+    def topology():
+        return {
+            '0': {'cpus': list(range(ncpus // 2))},
+            '1': {'cpus': list(range(ncpus // 2, ncpus))},
+        }
+
+    return topology
+
+
+def test_cpu_core_stats(tmpdir, monkeypatch):
+    monkeypatch.setattr(numa, 'topology', two_nodes_topology())
+    path = tmpdir.join("stat")
+    path.write(synthetic_proc_stat(0))
+    first = CpuSample(str(path), 0.0)
+    path.write(synthetic_proc_stat(100, offline={7}))
+    last = CpuSample(str(path), 100.0)
+
+    stats = hoststats._get_cpu_core_stats(first, last)
+
+    assert len(stats) == NCPUS - 1
+    assert '7' not in stats
+    assert stats['0'] == {
+        'nodeIndex': 0,
+        'cpuUser': '0.00',
+        'cpuSys': '1.00',
+        'cpuIdle': '99.00',
+    }
+    assert stats['342'] == {
+        'nodeIndex': 1,
+        'cpuUser': '42.00',
+        'cpuSys': '1.00',
+        'cpuIdle': '57.00',
+    }
+
+
+@pytest.mark.slow
+def test_cpu_core_stats_benchmark(tmpdir, monkeypatch):
+    monkeypatch.setattr(numa, 'topology', two_nodes_topology())
+    path = tmpdir.join("stat")
+    path.write(synthetic_proc_stat(0))
+    proc_file = sampling._ProcFile(str(path))
+    first = CpuSample(str(path), 0.0)
+    path.write(synthetic_proc_stat(1))
+
+    runs = 200
+    start = time.monotonic()
+    for _ in range(runs):
+        stat = sampling._CpuStat(proc_file)
+    sample_time = (time.monotonic() - start) / runs
+
+    last = CpuSample(str(path), 1.0)
+    start = time.monotonic()
+    for _ in range(runs):
+        hoststats._get_cpu_core_stats(first, last)
+    stats_time = (time.monotonic() - start) / runs
+
+    log.info(
+        "%d cpus: sampling %.3f msec, computing stats %.3f msec",
+        len(stat.ids),
+        sample_time * 1000,
+        stats_time * 1000,
+    )
+    assert len(stat.ids) == NCPUS
+
+
 class HostStatsNetworkTests(TestCaseBase):
 
     def test_report_format(self):
@@ -250,6 +250,68 @@ class TestNetlinkEventMonitor(object):
                     break
 
 
+class TestSharedMonitor(object):
+
+    TIMEOUT = 5
+
+    def test_events_of_subscribed_groups(self):
+        links = EventsCollector()
+        addrs = EventsCollector()
+        link_sub = monitor.subscribe(links.put, ('link',))
+        addr_sub = monitor.subscribe(addrs.put, ('ipv4-ifaddr',))
+        try:
+            with dummy_device() as dev:
+                Interface.from_existing_dev_name(dev).add_ip(
+                    IP_ADDRESS, IP_CIDR, IpFamily.IPv4
+                )
+                assert links.wait_for(
+                    lambda e: e.get('name') == dev, self.TIMEOUT
+                )
+                assert addrs.wait_for(
+                    lambda e: e.get('label') == dev, self.TIMEOUT
+                )
+        finally:
+            link_sub.unsubscribe()
+            addr_sub.unsubscribe()
+
+        assert not any(
+            e.get('event', '').endswith('_addr') for e in links.events
+        )
+        assert all(e['event'].endswith('_addr') for e in addrs.events)
+
+    def test_ifla_event(self, bond_in_mode_1, slaves):
+        bond = bond_in_mode_1
+        slaves = iter(slaves)
+        bond.set_options({'active_slave': next(slaves)})
+        links = EventsCollector()
+        sub = monitor.subscribe(links.put, ('link',))
+        try:
+            bond.set_options({'active_slave': next(slaves)})
+            assert links.wait_for(
+                lambda e: e.get('IFLA_EVENT') == 'IFLA_EVENT_BONDING_FAILOVER',
+                self.TIMEOUT,
+            )
+        finally:
+            sub.unsubscribe()
+
+
+class EventsCollector(object):
+    def __init__(self):
+        self.events = []
+        self._cond = threading.Condition()
+
+    def put(self, event):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def wait_for(self, predicate, timeout):
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: any(predicate(e) for e in self.events), timeout
+            )
+
+
 class TestSocketPool(object):
     def test_reuse_socket_per_thread(self):
         # The same thread should always get the same socket. Otherwise any
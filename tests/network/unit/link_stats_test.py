@@ -0,0 +1,223 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import logging
+import time
+from unittest import mock
+
+import pytest
+
+from vdsm.network.link import iface
+from vdsm.network.link import stats
+from vdsm.network.netlink import libnl
+from vdsm.network.netlink import link
+
+UP = libnl.IfaceStatus.IFF_UP | libnl.IfaceStatus.IFF_RUNNING
+DOWN = 0
+
+
+def link_stats(index, name, type=None, flags=UP):
+    return link.LinkStats(
+        index=index,
+        name=name,
+        type=type,
+        flags=flags,
+        rx=index * 10,
+        tx=index * 20,
+        rx_dropped=1,
+        tx_dropped=2,
+        rx_errors=3,
+        tx_errors=4,
+    )
+
+
+class FakeLinks(object):
+    """
+    Fake links and the per-link sources of type, speed and duplex, counting
+    the reads.
+    """
+
+    def __init__(self, links):
+        self.links = links
+        self.reads = 0
+
+    def iter_links_stats(self):
+        return iter(self.links)
+
+    def get_alternative_type(self, name):
+        self.reads += 1
+        return iface.Type.NIC
+
+    def read_speed_using_sysfs(self, name):
+        self.reads += 1
+        return 10000
+
+    def duplex(self, name):
+        self.reads += 1
+        return 'full'
+
+    def bond_speed(self, name):
+        self.reads += 1
+        return 20000
+
+    def vlan_speed(self, name):
+        self.reads += 1
+        return 10000
+
+
+@pytest.fixture
+def fake_links():
+    fake = FakeLinks(
+        [
+            link_stats(1, 'eth0'),
+            link_stats(2, 'eth1', flags=DOWN),
+            link_stats(3, 'bond0', type='bond'),
+            link_stats(4, 'bond0.100', type='vlan'),
+            link_stats(5, 'vnet0', type='tun'),
+        ]
+    )
+    cache = stats._LinkInfoCache()
+    with mock.patch.object(stats, '_link_info', cache), mock.patch.object(
+        cache, '_ensure_monitor', lambda: True
+    ), mock.patch.object(
+        link, 'iter_links_stats', fake.iter_links_stats
+    ), mock.patch.object(
+        iface, 'get_alternative_type', fake.get_alternative_type
+    ), mock.patch.object(
+        stats.nic, 'read_speed_using_sysfs', fake.read_speed_using_sysfs
+    ), mock.patch.object(
+        stats.nic, 'duplex', fake.duplex
+    ), mock.patch.object(
+        stats.bond, 'speed', fake.bond_speed
+    ), mock.patch.object(
+        stats.vlan, 'speed', fake.vlan_speed
+    ):
+        yield fake
+
+
+def test_report(fake_links):
+    assert stats.report() == {
+        'eth0': {
+            'name': 'eth0',
+            'rx': 10,
+            'tx': 20,
+            'state': 'up',
+            'rxDropped': 1,
+            'txDropped': 2,
+            'rxErrors': 3,
+            'txErrors': 4,
+            'speed': 10000,
+            'duplex': 'full',
+        },
+        'eth1': {
+            'name': 'eth1',
+            'rx': 20,
+            'tx': 40,
+            'state': 'down',
+            'rxDropped': 1,
+            'txDropped': 2,
+            'rxErrors': 3,
+            'txErrors': 4,
+            'speed': 0,
+            'duplex': 'full',
+        },
+        'bond0': {
+            'name': 'bond0',
+            'rx': 30,
+            'tx': 60,
+            'state': 'up',
+            'rxDropped': 1,
+            'txDropped': 2,
+            'rxErrors': 3,
+            'txErrors': 4,
+            'speed': 20000,
+            'duplex': 'full',
+        },
+        'bond0.100': {
+            'name': 'bond0.100',
+            'rx': 40,
+            'tx': 80,
+            'state': 'up',
+            'rxDropped': 1,
+            'txDropped': 2,
+            'rxErrors': 3,
+            'txErrors': 4,
+            'speed': 10000,
+            'duplex': 'full',
+        },
+        'vnet0': {
+            'name': 'vnet0',
+            'rx': 50,
+            'tx': 100,
+            'state': 'up',
+            'rxDropped': 1,
+            'txDropped': 2,
+            'rxErrors': 3,
+            'txErrors': 4,
+            'speed': 0,
+            'duplex': 'full',
+        },
+    }
+
+
+def test_cached(fake_links):
+    stats.report()
+    reads = fake_links.reads
+    stats.report()
+    assert fake_links.reads == reads
+
+
+def test_flags_changed(fake_links):
+    stats.report()
+    fake_links.links[1] = link_stats(2, 'eth1', flags=UP)
+
+    report = stats.report()
+
+    assert report['eth1']['state'] == 'up'
+    assert report['eth1']['speed'] == 10000
+
+
+def test_link_event(fake_links):
+    stats.report()
+    fake_links.reads = 0
+
+    stats._link_info._invalidate({'event': 'new_link', 'index': 1})
+    stats.report()
+
+    # eth0 was invalidated (type, speed and duplex), and bonds and vlans
+    # depend on other links (speed and duplex).
+    assert fake_links.reads == 3 + 2 + 2
+
+
+def test_no_monitor(fake_links):
+    with mock.patch.object(stats._link_info, '_ensure_monitor', lambda: False):
+        stats.report()
+        reads = fake_links.reads
+        stats.report()
+        assert fake_links.reads == 2 * reads
+
+
+@pytest.mark.slow
+def test_report_benchmark(fake_links):
+    fake_links.links = [link_stats(1, 'eth0'), link_stats(2, 'bond0', 'bond')]
+    fake_links.links.extend(
+        link_stats(i, 'vnet{}'.format(i), type='tun') for i in range(3, 1003)
+    )
+
+    start = time.monotonic()
+    stats.report()
+    first = time.monotonic() - start
+
+    fake_links.reads = 0
+    start = time.monotonic()
+    report = stats.report()
+    cached = time.monotonic() - start
+
+    logging.info(
+        'Reported %d links in %.3f seconds, %.3f seconds when cached',
+        len(report),
+        first,
+        cached,
+    )
+    assert len(report) == 1002
+    assert fake_links.reads == 0
@@ -0,0 +1,221 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from unittest import mock
+
+import pytest
+
+from vdsm.network import nmstate
+from vdsm.network.netinfo import cache
+
+
+def ifstate(dhcp=False):
+    return {
+        nmstate.Interface.IPV4: {
+            nmstate.InterfaceIP.ENABLED: True,
+            nmstate.InterfaceIP.DHCP: dhcp,
+        },
+        nmstate.Interface.IPV6: {nmstate.InterfaceIP.ENABLED: False},
+    }
+
+
+class FakeState(object):
+    def __init__(self, interfaces, dns):
+        self._interfaces = interfaces
+        self.dns_state = dns
+
+    def filtered_interfaces(self, filter=None):
+        return {
+            name: state
+            for name, state in self._interfaces.items()
+            if name in filter
+        }
+
+
+class FakeHost(object):
+    """
+    Fake devices and NetworkManager state, counting the reports and the
+    queries.
+    """
+
+    def __init__(self):
+        self.interfaces = {'eth0': ifstate(dhcp=True), 'eth1': ifstate()}
+        self.dns = {'server': ['192.0.2.1']}
+        self.mtu = 1500
+        self.reports = 0
+        self.queries = 0
+        self.filters = []
+
+    def devices_report(self, ipaddrs, routes):
+        self.reports += 1
+        return {
+            'bondings': {},
+            'bridges': {},
+            'nics': {
+                'eth0': {'mtu': self.mtu},
+                'eth1': {'mtu': self.mtu},
+            },
+            'vlans': {},
+        }
+
+    def get_current_state(self):
+        self.queries += 1
+        return FakeState(
+            {name: dict(state) for name, state in self.interfaces.items()},
+            dict(self.dns),
+        )
+
+
+@pytest.fixture
+def host():
+    host = FakeHost()
+    state = cache._NetworkStateCache()
+    filtered_interfaces = FakeState.filtered_interfaces
+
+    def record_filter(self, filter=None):
+        host.filters.append(frozenset(filter))
+        return filtered_interfaces(self, filter)
+
+    with mock.patch.object(cache, '_state', state), mock.patch.object(
+        state, '_ensure_monitor', lambda: True
+    ), mock.patch.object(cache, 'getIpAddrs', lambda: {}), mock.patch.object(
+        cache, 'get_routes', lambda: {}
+    ), mock.patch.object(
+        cache, '_devices_report', host.devices_report
+    ), mock.patch.object(
+        cache.nmstate, 'get_current_state', host.get_current_state
+    ), mock.patch.object(
+        cache.bonding, 'permanent_address', lambda: {}
+    ), mock.patch.object(
+        cache, 'ipv6_supported', lambda: True
+    ), mock.patch.object(
+        FakeState, 'filtered_interfaces', record_filter
+    ):
+        yield host
+
+
+def get():
+    return cache.get(vdsmnets={})
+
+
+def test_report(host):
+    report = get()
+
+    assert report['nics'] == {
+        'eth0': {
+            'mtu': 1500,
+            'dhcpv4': True,
+            'dhcpv6': False,
+            'ipv6autoconf': False,
+        },
+        'eth1': {
+            'mtu': 1500,
+            'dhcpv4': False,
+            'dhcpv6': False,
+            'ipv6autoconf': False,
+        },
+    }
+    assert report['nameservers'] == {'server': ['192.0.2.1']}
+
+
+def test_cached(host):
+    get()
+    host.mtu = 9000
+    host.interfaces['eth0'] = ifstate()
+
+    report = get()
+
+    assert host.reports == 1
+    assert host.queries == 1
+    assert report['nics']['eth0']['mtu'] == 1500
+    assert report['nics']['eth0']['dhcpv4']
+
+
+def test_report_is_a_copy(host):
+    get()['nics']['eth0']['mtu'] = 9000
+    assert get()['nics']['eth0']['mtu'] == 1500
+
+
+@pytest.mark.parametrize(
+    'event',
+    [
+        {'event': 'new_link', 'name': 'eth0'},
+        {'event': 'new_addr', 'label': 'eth0'},
+    ],
+)
+def test_device_event(host, event):
+    get()
+    host.mtu = 9000
+    host.interfaces['eth0'] = ifstate()
+    host.interfaces['eth1'] = ifstate(dhcp=True)
+
+    cache._state._handle_event(event)
+    report = get()
+
+    assert host.reports == 2
+    assert host.queries == 2
+    assert host.filters[-1] == {'eth0'}
+    assert report['nics']['eth0']['mtu'] == 9000
+    assert not report['nics']['eth0']['dhcpv4']
+    # eth1 did not change according to the events.
+    assert not report['nics']['eth1']['dhcpv4']
+
+
+def test_route_event(host):
+    get()
+    cache._state._handle_event({'event': 'new_route', 'oif': 'eth0'})
+    get()
+
+    assert host.reports == 2
+    assert host.queries == 1
+
+
+def test_invalidate(host):
+    get()
+    host.interfaces['eth1'] = ifstate(dhcp=True)
+    host.dns = {'server': ['192.0.2.2']}
+
+    cache.invalidate()
+    report = get()
+
+    assert host.reports == 2
+    assert host.queries == 2
+    assert report['nics']['eth1']['dhcpv4']
+    assert report['nameservers'] == {'server': ['192.0.2.2']}
+
+
+def test_event_during_report(host):
+    devices_report = host.devices_report
+
+    def racing_devices_report(ipaddrs, routes):
+        cache._state._handle_event({'event': 'new_link', 'name': 'eth0'})
+        return devices_report(ipaddrs, routes)
+
+    with mock.patch.object(cache, '_devices_report', racing_devices_report):
+        get()
+    get()
+
+    # The first report was built before the event, so it was not kept.
+    assert host.reports == 2
+
+
+def test_no_monitor(host):
+    with mock.patch.object(cache._state, '_ensure_monitor', lambda: False):
+        get()
+        get()
+
+    assert host.reports == 2
+    assert host.queries == 2
+
+
+def test_invalidate_devices(host):
+    get()
+    host.interfaces['eth0'] = ifstate()
+    host.interfaces['eth1'] = ifstate(dhcp=True)
+
+    cache.invalidate(['eth0'])
+    report = get()
+
+    assert host.filters[-1] == {'eth0'}
+    assert not report['nics']['eth0']['dhcpv4']
+    assert not report['nics']['eth1']['dhcpv4']
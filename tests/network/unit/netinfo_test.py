@@ -12,12 +12,22 @@ from vdsm.network import netinfo
 from vdsm.network.ip.address import prefix2netmask
 from vdsm.network.link import nic
 from vdsm.network.link.bond import Bond, bond_speed
+from vdsm.network.netinfo import cache
 from vdsm.network.netinfo.cache import get
 
 from vdsm.network import nmstate
 from vdsm.network.nmstate import api
 
 
+@pytest.fixture(autouse=True)
+def no_state_cache():
+    state = cache._NetworkStateCache()
+    with mock.patch.object(cache, '_state', state), mock.patch.object(
+        state, '_ensure_monitor', lambda: False
+    ):
+        yield
+
+
 @pytest.fixture
 def current_state_mock():
     with mock.patch.object(api, 'state_show') as state:
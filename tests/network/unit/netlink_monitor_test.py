@@ -0,0 +1,129 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import queue
+import threading
+from unittest import mock
+
+import pytest
+
+from vdsm.network.netlink import monitor
+
+
+class FakeMonitor(object):
+    def __init__(self, callback, groups):
+        self.groups = groups
+        self.events = queue.Queue()
+        self.stopped = False
+
+    def __iter__(self):
+        for event in iter(self.events.get, None):
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.stopped = True
+        self.events.put(None)
+
+    def wait(self):
+        pass
+
+
+class Handler(object):
+    def __init__(self):
+        self.events = []
+        self.stopped = threading.Event()
+        self._received = threading.Semaphore(0)
+
+    def __call__(self, event):
+        self.events.append(event)
+        self._received.release()
+
+    def wait(self, count=1):
+        for _ in range(count):
+            assert self._received.acquire(timeout=2)
+
+    def on_stopped(self):
+        self.stopped.set()
+
+
+@pytest.fixture
+def shared():
+    monitors = []
+
+    def create(callback, groups):
+        mon = FakeMonitor(callback, groups)
+        monitors.append(mon)
+        return mon
+
+    shared = monitor._SharedMonitor()
+    with mock.patch.object(monitor, 'Monitor', create):
+        shared.monitors = monitors
+        yield shared
+    for mon in monitors:
+        mon.stop()
+
+
+LINK = {'event': 'new_link', 'name': 'eth0'}
+IFLA = {'IFLA_EVENT': 'IFLA_EVENT_BONDING_FAILOVER'}
+ADDR4 = {'event': 'new_addr', 'family': 'inet', 'label': 'eth0'}
+ADDR6 = {'event': 'del_addr', 'family': 'inet6', 'label': 'eth0'}
+ROUTE4 = {'event': 'new_route', 'family': 'inet', 'oif': 'eth0'}
+
+
+def test_single_monitor(shared):
+    subs = [shared.subscribe(Handler(), ('link',)) for _ in range(3)]
+    assert len(shared.monitors) == 1
+    for sub in subs:
+        sub.unsubscribe()
+    assert shared.monitors[0].stopped
+
+
+def test_dispatch_by_group(shared):
+    links = Handler()
+    addrs = Handler()
+    shared.subscribe(links, ('link',))
+    shared.subscribe(addrs, ('ipv4-ifaddr', 'ipv6-ifaddr'))
+
+    for event in (LINK, ADDR4, ROUTE4, IFLA, ADDR6):
+        shared.monitors[0].events.put(event)
+    links.wait(2)
+    addrs.wait(2)
+
+    assert links.events == [LINK, IFLA]
+    assert addrs.events == [ADDR4, ADDR6]
+
+
+def test_handler_error(shared):
+    handler = Handler()
+    shared.subscribe(mock.Mock(side_effect=RuntimeError), ('link',))
+    shared.subscribe(handler, ('link',))
+
+    shared.monitors[0].events.put(LINK)
+    handler.wait()
+
+    assert handler.events == [LINK]
+
+
+def test_monitor_failure(shared):
+    handler = Handler()
+    sub = shared.subscribe(handler, ('link',), stopped=handler.on_stopped)
+
+    shared.monitors[0].events.put(monitor.MonitorError('failed'))
+
+    assert handler.stopped.wait(2)
+    sub.unsubscribe()
+
+    # Subscribing again starts a new monitor.
+    shared.subscribe(Handler(), ('link',))
+    assert len(shared.monitors) == 2
+
+
+def test_invalid_groups(shared):
+    with pytest.raises(AttributeError):
+        shared.subscribe(Handler(), ('tc',))
+    assert shared.monitors == []
@@ -0,0 +1,176 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import logging
+import time
+
+import pytest
+
+from vdsm.network import nmstate
+
+from .testlib import (
+    IFACE0,
+    IFACE1,
+    MTU_2000,
+    create_ethernet_iface_state,
+    create_network_config,
+    create_vlan_iface_state,
+    disable_iface_ip,
+)
+
+
+def current_state(*ifstates):
+    return nmstate.api.CurrentState(
+        {
+            nmstate.Interface.KEY: list(ifstates),
+            nmstate.DNS.KEY: {},
+            nmstate.Route.KEY: {},
+            nmstate.RouteRule.KEY: {},
+        }
+    )
+
+
+def test_remove_unchanged_interface():
+    eth0_state = create_ethernet_iface_state(IFACE0)
+    eth1_state = create_ethernet_iface_state(IFACE1)
+    desired_state = {nmstate.Interface.KEY: [eth0_state, eth1_state]}
+
+    current_eth0_state = create_ethernet_iface_state(IFACE0, include_type=True)
+    current_eth1_state = create_ethernet_iface_state(IFACE1, mtu=MTU_2000)
+    ifnames = nmstate.remove_unchanged_interfaces(
+        desired_state, current_state(current_eth0_state, current_eth1_state)
+    )
+
+    assert ifnames == {IFACE1}
+    assert desired_state == {nmstate.Interface.KEY: [eth1_state]}
+
+
+def test_remove_all_interfaces():
+    desired_state = {
+        nmstate.Interface.KEY: [create_ethernet_iface_state(IFACE0)]
+    }
+    ifnames = nmstate.remove_unchanged_interfaces(
+        desired_state, current_state(create_ethernet_iface_state(IFACE0))
+    )
+
+    assert ifnames == set()
+    assert desired_state == {}
+
+
+def test_keep_new_and_absent_interfaces():
+    absent_state = {
+        nmstate.Interface.NAME: IFACE0,
+        nmstate.Interface.STATE: nmstate.InterfaceState.ABSENT,
+    }
+    new_state = create_ethernet_iface_state(IFACE1)
+    desired_state = {nmstate.Interface.KEY: [absent_state, new_state]}
+
+    ifnames = nmstate.remove_unchanged_interfaces(
+        desired_state, current_state(create_ethernet_iface_state(IFACE0))
+    )
+
+    assert ifnames == {IFACE0, IFACE1}
+
+
+def ipv4_addresses(*addresses):
+    return {
+        nmstate.Interface.IPV4: {
+            nmstate.InterfaceIP.ENABLED: True,
+            nmstate.InterfaceIP.ADDRESS: [
+                {
+                    nmstate.InterfaceIP.ADDRESS_IP: address,
+                    nmstate.InterfaceIP.ADDRESS_PREFIX_LENGTH: 24,
+                }
+                for address in addresses
+            ],
+        }
+    }
+
+
+@pytest.mark.parametrize(
+    'addresses',
+    [('192.0.2.1',), ('192.0.2.2', '192.0.2.1')],
+    ids=['other-address', 'more-addresses'],
+)
+def test_keep_changed_list(addresses):
+    eth0_state = create_ethernet_iface_state(IFACE0)
+    eth0_state.update(ipv4_addresses('192.0.2.2'))
+    desired_state = {nmstate.Interface.KEY: [eth0_state]}
+
+    current_eth0_state = create_ethernet_iface_state(IFACE0)
+    current_eth0_state.update(ipv4_addresses(*addresses))
+    ifnames = nmstate.remove_unchanged_interfaces(
+        desired_state, current_state(current_eth0_state)
+    )
+
+    assert ifnames == {IFACE0}
+
+
+def _vlan_networks(vlans):
+    return {
+        'net{}'.format(vlan): create_network_config(
+            'nic', IFACE0, bridged=False, vlan=vlan
+        )
+        for vlan in vlans
+    }
+
+
+def _host_state(vlans):
+    eth0_state = create_ethernet_iface_state(IFACE0, include_type=True)
+    disable_iface_ip(eth0_state)
+    ifstates = [eth0_state]
+    for vlan in vlans:
+        vlan_state = create_vlan_iface_state(IFACE0, vlan)
+        disable_iface_ip(vlan_state)
+        vlan_state[nmstate.Interface.TYPE] = nmstate.InterfaceType.VLAN
+        ifstates.append(vlan_state)
+    return current_state(*ifstates)
+
+
+def _desired_state(networks, state):
+    desired_state = nmstate.generate_state(networks, {}, state)
+    ifnames = nmstate.remove_unchanged_interfaces(desired_state, state)
+    return desired_state, ifnames
+
+
+def test_add_network_on_host_with_networks(rconfig_mock):
+    existing_vlans = range(1, 101)
+    rconfig_mock.networks = _vlan_networks(existing_vlans)
+    state = _host_state(existing_vlans)
+
+    _, ifnames = _desired_state(_vlan_networks([101]), state)
+
+    assert ifnames == {'eth0.101'}
+
+
+def test_reapply_networks(rconfig_mock):
+    existing_vlans = range(1, 101)
+    rconfig_mock.networks = _vlan_networks(existing_vlans)
+    state = _host_state(existing_vlans)
+
+    desired_state, ifnames = _desired_state(
+        _vlan_networks(existing_vlans), state
+    )
+
+    assert ifnames == set()
+    assert nmstate.Interface.KEY not in desired_state
+
+
+@pytest.mark.slow
+def test_setup_timing(rconfig_mock):
+    existing_vlans = range(1, 101)
+    rconfig_mock.networks = _vlan_networks(existing_vlans)
+    state = _host_state(existing_vlans)
+
+    for vlans in ([101], range(101, 201)):
+        start = time.monotonic()
+        _, ifnames = _desired_state(_vlan_networks(vlans), state)
+        elapsed = time.monotonic() - start
+        logging.info(
+            'Generated state for %d networks changing %d interfaces on a '
+            'host with 100 networks in %.3f seconds',
+            len(vlans),
+            len(ifnames),
+            elapsed,
+        )
+        assert len(ifnames) == len(vlans)
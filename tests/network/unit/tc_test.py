@@ -2,11 +2,17 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import errno
 import os
 
 from itertools import zip_longest
+from unittest import mock
+
+import pytest
 
 from vdsm.network import tc
+from vdsm.network.netlink import qdisc as netlink_qdisc
+from vdsm.network.tc import _wrapper
 
 
 class TestFilters(object):
@@ -350,3 +356,166 @@ class TestFilters(object):
             tc.classes(None, out=data), classes
         ):
             assert parsed == correct
+
+
+class FakeTc(object):
+    def __init__(self, retcode=0, err=''):
+        self.retcode = retcode
+        self.err = err
+        self.calls = []
+        self.batches = []
+
+    def __call__(self, command):
+        self.calls.append(command)
+        if command[1] == '-batch':
+            with open(command[2]) as f:
+                self.batches.append(f.read().splitlines())
+        return self.retcode, '', self.err
+
+
+@pytest.fixture
+def fake_tc():
+    fake = FakeTc()
+    with mock.patch.object(_wrapper.cmd, 'exec_sync', fake):
+        yield fake
+
+
+class TestBatch(object):
+    def test_single_process(self, fake_tc):
+        with tc.batch():
+            tc.qdisc.add('eth0', 'ingress')
+            tc.filter.replace(
+                'eth0',
+                parent='1389:',
+                protocol='all',
+                pref=16,
+                basic=['match', 'meta(vlan eq 16)', 'flowid', '1389:10'],
+            )
+            assert fake_tc.calls == []
+
+        assert len(fake_tc.calls) == 1
+        assert fake_tc.batches == [
+            [
+                'qdisc add dev eth0 ingress',
+                'filter replace dev eth0 protocol all parent 1389: pref 16 '
+                'basic match "meta(vlan eq 16)" flowid 1389:10',
+            ]
+        ]
+
+    def test_nested(self, fake_tc):
+        with tc.batch():
+            tc.qdisc.add('eth0', 'ingress')
+            with tc.batch():
+                tc.qdisc.add('eth1', 'ingress')
+            assert fake_tc.calls == []
+
+        assert fake_tc.batches == [
+            ['qdisc add dev eth0 ingress', 'qdisc add dev eth1 ingress']
+        ]
+
+    def test_empty(self, fake_tc):
+        with tc.batch():
+            pass
+        assert fake_tc.calls == []
+
+    def test_show_not_batched(self, fake_tc):
+        with pytest.raises(RuntimeError):
+            with tc.batch():
+                tc.qdisc.show('eth0')
+        assert fake_tc.calls == []
+
+    def test_error(self, fake_tc):
+        fake_tc.retcode = 1
+        fake_tc.err = (
+            'RTNETLINK answers: File exists\n'
+            'Command failed /tmp/tc-batch-xyz:2\n'
+        )
+        with pytest.raises(tc.TrafficControlException) as e:
+            with tc.batch():
+                tc.qdisc.add('eth0', 'ingress')
+                tc.qdisc.add('eth1', 'ingress')
+
+        assert e.value.errCode == errno.EEXIST
+        assert e.value.msg == 'RTNETLINK answers: File exists'
+        assert e.value.command == ['qdisc', 'add', 'dev', 'eth1', 'ingress']
+
+    def test_error_in_context(self, fake_tc):
+        with pytest.raises(ZeroDivisionError):
+            with tc.batch():
+                tc.qdisc.add('eth0', 'ingress')
+                1 / 0
+        assert fake_tc.calls == []
+
+        # The batch was dropped, requests are processed again.
+        tc.qdisc.add('eth0', 'ingress')
+        assert len(fake_tc.calls) == 1
+
+
+class TestSetPortMirroringMany(object):
+    @pytest.fixture
+    def links(self, fake_tc):
+        links = {}
+
+        def get_link(name):
+            return links.setdefault(name, mock.Mock(promisc=False))
+
+        with mock.patch.object(
+            tc, '_qdiscs_of_device', lambda dev: iter(['8001:'])
+        ), mock.patch.object(
+            tc, 'filters', lambda dev, parent: iter([])
+        ), mock.patch.object(
+            tc.ipwrapper, 'getLink', get_link
+        ):
+            yield links
+
+    def test_single_batch(self, fake_tc, links):
+        tc.setPortMirroringMany(
+            [('net1', 'vnet0'), ('net1', 'vnet1'), ('net2', 'vnet2')]
+        )
+
+        filters = [
+            command for command in fake_tc.calls if command[1] == '-batch'
+        ]
+        assert len(filters) == 1
+        assert fake_tc.batches == [
+            [
+                _mirror_filter('net1', 'ffff:', 'vnet0', 'vnet1'),
+                _mirror_filter('net1', '8001:', 'vnet0', 'vnet1'),
+                _mirror_filter('net2', 'ffff:', 'vnet2'),
+                _mirror_filter('net2', '8001:', 'vnet2'),
+            ]
+        ]
+        assert links['net1'].promisc
+        assert links['net2'].promisc
+
+    def test_qdiscs_setup_once_per_network(self, fake_tc, links):
+        tc.setPortMirroringMany([('net1', 'vnet0'), ('net1', 'vnet1')])
+
+        qdisc_commands = [
+            command for command in fake_tc.calls if command[1] == 'qdisc'
+        ]
+        assert len(qdisc_commands) == 2
+
+
+def _mirror_filter(dev, parent, *targets):
+    actions = ''.join(
+        ' action mirred egress mirror dev ' + target for target in targets
+    )
+    return (
+        'filter replace dev %s protocol all parent %s u32 match u8 0 0%s'
+        % (dev, parent, actions)
+    )
+
+
+@pytest.mark.parametrize(
+    'handle, expected',
+    [
+        (0xFFFF0000, 'ffff:'),
+        (0x13890000, '1389:'),
+        (0x13891388, '1389:1388'),
+        (0xFFFFFFF1, 'ffff:fff1'),
+        (0x00000010, ':10'),
+    ],
+)
+def test_format_handle(handle, expected):
+    assert netlink_qdisc.format_handle(handle) == expected
@@ -3,6 +3,7 @@
 
 from collections import namedtuple
 from contextlib import contextmanager
+import logging
 import os
 import time
 import uuid
@@ -13,6 +14,7 @@ import pytest
 from vdsm import jobs
 from vdsm import utils
 from vdsm.config import config
+from vdsm.common import concurrent
 from vdsm.common.units import MiB, GiB
 from vdsm.storage import blockSD
 from vdsm.storage import clusterlock
@@ -114,7 +116,7 @@ def domain_factory(tmp_storage, tmp_repo):
     return DomainFactory(tmp_storage, tmp_repo)
 
 
-def fakeGetLV(vgName):
+def fakeGetLV(vgName, fields=None):
     """ This function returns lvs output in lvm.getLV() format.
 
     Input file name: lvs_<sdName>.out
@@ -133,14 +135,14 @@ def fakeGetLV(vgName):
     return lvs
 
 
-def make_lv(name=None, tags=()):
+def make_lv(name=None, tags=(), size=None):
     return lvm.LV(
         tags=tags,
         uuid=None,
         name=name,
         vg_name=None,
         attr=None,
-        size=None,
+        size=size,
         seg_start_pe=None,
         devices=None,
         writeable=None,
@@ -314,7 +316,7 @@ class TestIterVolumes:
             make_lv(name="lv2", tags=(sc.TAG_VOL_UNINIT,)),
             make_lv(name="lv3"),
         ]
-        monkeypatch.setattr(lvm, 'getAllLVs', lambda sd_uuid: lvs)
+        monkeypatch.setattr(lvm, 'getAllLVs', lambda sd_uuid, fields=None: lvs)
 
         # Expecting to have only user initialized volumes.
         expected_lvs = [make_lv(name="lv1"), make_lv(name="lv3")]
@@ -322,6 +324,93 @@ class TestIterVolumes:
         assert list(blockSD._iter_volumes("sd-id")) == expected_lvs
 
 
+class TestIterDumpVolumes:
+
+    class FakeDomain:
+
+        sdUUID = "sd-id"
+
+        def __init__(self):
+            self.batches = []
+
+        def _dump_volumes_batch(self, batch):
+            self.batches.append([lv.name for lv, _ in batch])
+            for lv, lvtags in batch:
+                yield lv.name, {"image": lvtags.image}
+
+    @pytest.fixture
+    def lvs(self, monkeypatch):
+        lvs = [
+            make_lv(name="vol-3", tags=("IU_img-1", "MD_3")),
+            make_lv(name="vol-1", tags=("IU_img-1", "MD_1")),
+            make_lv(
+                name="vol-4",
+                tags=("IU_" + sc.REMOVED_IMAGE_PREFIX + "img-2", "MD_4"),
+            ),
+            make_lv(name="vol-2", tags=("IU_img-2", "MD_2")),
+        ]
+        monkeypatch.setattr(lvm, 'getAllLVs', lambda sd_uuid, fields=None: lvs)
+        monkeypatch.setattr(blockSD, 'DUMP_BATCH_SIZE', 2)
+        return lvs
+
+    def dump(self, dom, **kwargs):
+        volumes = blockSD.BlockStorageDomain.iter_dump_volumes(dom, **kwargs)
+        return [vol_id for vol_id, _ in volumes]
+
+    def test_all(self, lvs):
+        dom = self.FakeDomain()
+        # Volumes are ordered by volume id, and read in batches.
+        assert self.dump(dom) == ["vol-1", "vol-2", "vol-3", "vol-4"]
+        assert dom.batches == [["vol-1", "vol-2"], ["vol-3", "vol-4"]]
+
+    def test_image(self, lvs):
+        dom = self.FakeDomain()
+        assert self.dump(dom, image_id="img-2") == ["vol-2", "vol-4"]
+
+    @pytest.mark.parametrize(
+        "offset,limit,expected",
+        [
+            (0, 3, ["vol-1", "vol-2", "vol-3"]),
+            (3, 3, ["vol-4"]),
+            (4, 3, []),
+            (1, None, ["vol-2", "vol-3", "vol-4"]),
+        ],
+    )
+    def test_page(self, lvs, offset, limit, expected):
+        dom = self.FakeDomain()
+        assert self.dump(dom, offset=offset, limit=limit) == expected
+
+
+class TestDumpVolumeSize:
+
+    FakeDomain = namedtuple("FakeDomain", "sdUUID")
+
+    def test_active_volume(self, monkeypatch, tmpdir):
+        dev = tmpdir.join("lv1")
+        dev.write(b"x" * 4096)
+        monkeypatch.setattr(lvm, "lvPath", lambda vg, lv: str(dev))
+        dom = self.FakeDomain("sd-id")
+        lv = make_lv(name="lv1", size="8192")
+
+        size = blockSD.BlockStorageDomain._dump_volume_size(dom, lv)
+        assert size == 4096
+
+    def test_inactive_volume(self, monkeypatch, tmpdir):
+        dev = tmpdir.join("lv1")
+        monkeypatch.setattr(lvm, "lvPath", lambda vg, lv: str(dev))
+
+        def getLV(vg, lv):
+            raise RuntimeError("Unexpected lvs command")
+
+        monkeypatch.setattr(lvm, "getLV", getLV)
+        dom = self.FakeDomain("sd-id")
+        lv = make_lv(name="lv1", size="8192")
+
+        # The size reported by _iter_volumes() is used without running lvs.
+        size = blockSD.BlockStorageDomain._dump_volume_size(dom, lv)
+        assert size == 8192
+
+
 class TestOccupiedSlots:
 
     @pytest.mark.parametrize(
@@ -357,7 +446,7 @@ class TestOccupiedSlots:
         ],
     )
     def test_occupied_slots(self, lvs, expected, monkeypatch):
-        monkeypatch.setattr(lvm, 'getAllLVs', lambda sd_uuid: lvs)
+        monkeypatch.setattr(lvm, 'getAllLVs', lambda sd_uuid, fields=None: lvs)
         occupied = blockSD._occupied_metadata_slots("sd-id")
         assert occupied == expected
 
@@ -404,6 +493,241 @@ def test_metadata_offset(monkeypatch):
     assert 1867776 == sd_manifest.metadata_offset(100, version=5)
 
 
+def make_metadata_volume(path, version, slots):
+    """
+    Create a fake metadata volume file with a block for every slot. Block
+    content is "SLOT=<slot>", making it easy to check the slot of a block.
+    """
+    if version < 5:
+        base = blockSD.METADATA_BASE_V4
+        slot_size = blockSD.METADATA_SLOT_SIZE_V4
+    else:
+        base = blockSD.METADATA_BASE_V5
+        slot_size = blockSD.METADATA_SLOT_SIZE_V5
+
+    with open(path, "wb") as f:
+        f.truncate(base + (max(slots) + 1) * slot_size)
+        for slot in slots:
+            f.seek(base + slot * slot_size)
+            f.write(slot_block(slot))
+
+
+def slot_block(slot, data=b""):
+    block = b"SLOT=%d\n%sEOF\n" % (slot, data)
+    return block.ljust(sc.METADATA_SIZE, b"\0")
+
+
+@pytest.fixture
+def metadata_manifest(monkeypatch, tmpdir):
+    sd_uuid = str(uuid.uuid4())
+    fake_metadata = {
+        sd.DMDK_VERSION: 5,
+        sd.DMDK_LOGBLKSIZE: 512,
+        sd.DMDK_PHYBLKSIZE: 512,
+    }
+
+    monkeypatch.setattr(
+        sd.StorageDomainManifest, "_makeDomainLock", lambda _: None
+    )
+    sd_manifest = blockSD.BlockStorageDomainManifest(sd_uuid, fake_metadata)
+
+    path = str(tmpdir.join("metadata"))
+    monkeypatch.setattr(sd_manifest, "metadata_volume_path", lambda: path)
+    return sd_manifest
+
+
+class CountingReadblock:
+
+    def __init__(self, monkeypatch):
+        self.calls = []
+        self._readblock = blockSD.misc.readblock
+        monkeypatch.setattr(blockSD.misc, "readblock", self)
+
+    def __call__(self, name, offset, size):
+        self.calls.append((offset, size))
+        return self._readblock(name, offset, size)
+
+
+class TestReadMetadataBlocks:
+
+    @pytest.mark.parametrize("version,expected_reads", [(4, 3), (5, 4)])
+    def test_read_all(
+        self, monkeypatch, metadata_manifest, version, expected_reads
+    ):
+        slots = [0, 1, 7, 100, 1000]
+        path = metadata_manifest.metadata_volume_path()
+        make_metadata_volume(path, version, slots)
+        readblock = CountingReadblock(monkeypatch)
+
+        offsets = [
+            metadata_manifest.metadata_offset(slot, version) for slot in slots
+        ]
+        blocks = blockSD.read_metadata_blocks(path, offsets)
+
+        assert blocks == {
+            offset: slot_block(slot) for offset, slot in zip(offsets, slots)
+        }
+        # Nearby slots are read together, distant slots separately.
+        assert len(readblock.calls) == expected_reads
+
+    def test_read_nearby(self, monkeypatch, metadata_manifest):
+        slots = [0, 1, 2, 5]
+        path = metadata_manifest.metadata_volume_path()
+        make_metadata_volume(path, 5, slots)
+        readblock = CountingReadblock(monkeypatch)
+
+        offsets = [metadata_manifest.metadata_offset(s, 5) for s in slots]
+        blockSD.read_metadata_blocks(path, offsets)
+
+        assert readblock.calls == [
+            (offsets[0], offsets[-1] + sc.METADATA_SIZE - offsets[0])
+        ]
+
+    def test_read_distant(self, monkeypatch, metadata_manifest):
+        # Slots at both ends of the chunk.
+        slots = [0, 1000]
+        path = metadata_manifest.metadata_volume_path()
+        make_metadata_volume(path, 5, slots)
+        readblock = CountingReadblock(monkeypatch)
+
+        offsets = [metadata_manifest.metadata_offset(s, 5) for s in slots]
+        blocks = blockSD.read_metadata_blocks(path, offsets)
+
+        assert blocks == {
+            offset: slot_block(slot) for offset, slot in zip(offsets, slots)
+        }
+        assert readblock.calls == [
+            (offset, sc.METADATA_SIZE) for offset in offsets
+        ]
+
+    def test_read_chunks(self, monkeypatch, metadata_manifest):
+        slots = list(range(0, 2000, 3))
+        path = metadata_manifest.metadata_volume_path()
+        make_metadata_volume(path, 5, slots)
+        readblock = CountingReadblock(monkeypatch)
+
+        offsets = [metadata_manifest.metadata_offset(s, 5) for s in slots]
+        blocks = blockSD.read_metadata_blocks(path, offsets, chunk_size=MiB)
+
+        assert blocks == {
+            offset: slot_block(slot) for offset, slot in zip(offsets, slots)
+        }
+
+        # Every read is limited to the chunk size.
+        for offset, size in readblock.calls:
+            assert size <= MiB
+
+        # 2000 slots of 8 KiB use 16 MiB.
+        assert len(readblock.calls) == 16
+
+    def test_read_empty(self, monkeypatch, metadata_manifest):
+        path = metadata_manifest.metadata_volume_path()
+        readblock = CountingReadblock(monkeypatch)
+
+        assert blockSD.read_metadata_blocks(path, []) == {}
+        assert readblock.calls == []
+
+    def test_manifest_read_blocks(self, metadata_manifest):
+        slots = [3, 5, 8]
+        path = metadata_manifest.metadata_volume_path()
+        make_metadata_volume(path, 5, slots)
+
+        blocks = metadata_manifest.read_metadata_blocks(slots)
+
+        assert blocks == {slot: slot_block(slot) for slot in slots}
+
+    @pytest.mark.slow
+    def test_benchmark(self, monkeypatch, metadata_manifest):
+        # Fake metadata volume of a domain with 5000 volumes.
+        slots = list(range(5000))
+        path = metadata_manifest.metadata_volume_path()
+        make_metadata_volume(path, 5, slots)
+
+        start = time.monotonic()
+        for slot in slots[:500]:
+            assert metadata_manifest.read_metadata_block(slot) == (
+                slot_block(slot)
+            )
+        single = (time.monotonic() - start) * len(slots) / 500
+
+        start = time.monotonic()
+        blocks = metadata_manifest.read_metadata_blocks(slots)
+        bulk = time.monotonic() - start
+
+        assert len(blocks) == len(slots)
+
+        logging.info(
+            "Read %d slots: single reads %.3f seconds (estimated), "
+            "bulk read %.3f seconds",
+            len(slots),
+            single,
+            bulk,
+        )
+
+        assert bulk < single
+
+
+class TestMetadataSnapshot:
+
+    def test_snapshot(self, monkeypatch, metadata_manifest):
+        slots = [1, 2, 3]
+        path = metadata_manifest.metadata_volume_path()
+        make_metadata_volume(path, 5, slots)
+        monkeypatch.setattr(
+            metadata_manifest, "occupied_metadata_slots", lambda img: slots
+        )
+
+        with metadata_manifest.metadata_snapshot():
+            readblock = CountingReadblock(monkeypatch)
+            for slot in slots:
+                block = metadata_manifest.read_metadata_block(slot)
+                assert block == slot_block(slot)
+
+            # All blocks read from the snapshot.
+            assert readblock.calls == []
+
+        # Snapshot dropped after the context exits.
+        metadata_manifest.read_metadata_block(1)
+        assert len(readblock.calls) == 1
+
+    def test_snapshot_write(self, monkeypatch, metadata_manifest):
+        slots = [1, 2, 3]
+        path = metadata_manifest.metadata_volume_path()
+        make_metadata_volume(path, 5, slots)
+        monkeypatch.setattr(
+            metadata_manifest, "occupied_metadata_slots", lambda img: slots
+        )
+
+        with metadata_manifest.metadata_snapshot():
+            new_block = slot_block(2, b"DESCRIPTION=modified\n")
+            metadata_manifest.write_metadata_block(2, new_block)
+
+            # Modified block is read again from storage.
+            assert metadata_manifest.read_metadata_block(2) == new_block
+            assert metadata_manifest.read_metadata_block(3) == slot_block(3)
+
+    def test_snapshot_other_thread(self, monkeypatch, metadata_manifest):
+        slots = [1]
+        path = metadata_manifest.metadata_volume_path()
+        make_metadata_volume(path, 5, slots)
+        monkeypatch.setattr(
+            metadata_manifest, "occupied_metadata_slots", lambda img: slots
+        )
+        result = []
+
+        with metadata_manifest.metadata_snapshot():
+            readblock = CountingReadblock(monkeypatch)
+            t = concurrent.thread(
+                lambda: result.append(metadata_manifest.read_metadata_block(1))
+            )
+            t.start()
+            t.join()
+
+        # The other thread does not use the snapshot.
+        assert result == [slot_block(1)]
+        assert len(readblock.calls) == 1
+
+
 @pytest.mark.parametrize(
     "version,block_size",
     [
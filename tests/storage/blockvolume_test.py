@@ -222,6 +222,25 @@ class TestBlockVolumeManifest(VdsmTestCase):
                 vol = env.chain[1]
                 self.assertEqual(vol.optimal_size(as_leaf=True), 1536 * MiB)
 
+    def test_change_token(self):
+        with fake_env('block') as env:
+            img_id = make_uuid()
+            internal_id = make_uuid()
+            leaf_id = make_uuid()
+            env.make_volume(GiB, img_id, internal_id, vol_type=sc.INTERNAL_VOL)
+            env.make_volume(GiB, img_id, leaf_id, parent_vol_id=internal_id)
+            internal = env.sd_manifest.produceVolume(img_id, internal_id)
+            leaf = env.sd_manifest.produceVolume(img_id, leaf_id)
+
+            # A guest may write to the leaf without changing the LV.
+            self.assertIsNone(leaf.change_token())
+
+            token = internal.change_token()
+            self.assertEqual(token, (0, internal.getVolumeSize()))
+
+            internal.setMetaParam(sc.GENERATION, 1)
+            self.assertNotEqual(internal.change_token(), token)
+
     @permutations(
         [
             # capacity, virtual_size, expected_capacity
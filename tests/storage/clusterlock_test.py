@@ -30,6 +30,11 @@ def lock(monkeypatch):
     # Reset class attributes to keep tests isolated.
     monkeypatch.setattr(clusterlock.SANLock, "_process_fd", None)
     monkeypatch.setattr(clusterlock.SANLock, "_lease_count", 0)
+    monkeypatch.setattr(
+        clusterlock.SANLock,
+        "_hosts_snapshot",
+        clusterlock.HostsSnapshot(ttl=60),
+    )
 
     # Monkeypatch clusterlock.panic() to allow testing panic without killing
     # the tests process.
@@ -45,6 +50,22 @@ def lock(monkeypatch):
     return sanlock
 
 
+@pytest.fixture
+def get_hosts_calls(fake_sanlock, monkeypatch):
+    """
+    Count the calls to sanlock.get_hosts().
+    """
+    calls = []
+    get_hosts = fake_sanlock.get_hosts
+
+    def counting_get_hosts(lockspace, host_id=0):
+        calls.append(lockspace)
+        return get_hosts(lockspace, host_id=host_id)
+
+    monkeypatch.setattr(fake_sanlock, "get_hosts", counting_get_hosts)
+    return calls
+
+
 def test_acquire_host_id_sync(fake_sanlock, lock):
     lock.acquireHostId(HOST_ID, wait=True)
     acquired = fake_sanlock.inq_lockspace(LS_NAME, HOST_ID, LS_PATH, LS_OFF)
@@ -326,6 +347,169 @@ def test_inspect_has_no_owner(fake_sanlock, lock):
     assert owner is None
 
 
+def test_inspect_stale_leases_use_hosts_snapshot(
+    fake_sanlock, lock, get_hosts_calls
+):
+    other = clusterlock.Lease("other", "leases", 2 * MiB)
+    fake_sanlock.write_resource(LS_NAME, b"other", [("leases", 2 * MiB)])
+
+    lock.acquireHostId(HOST_ID, wait=True)
+    lock.acquire(HOST_ID, LEASE)
+    lock.acquire(HOST_ID, other)
+
+    # Simulate the owner reconnecting to the lockspace, losing the leases.
+    fake_sanlock.hosts[HOST_ID]["generation"] += 1
+    lock._hosts_snapshot.invalidate()
+    del get_hosts_calls[:]
+
+    for lease in (LEASE, other) * 3:
+        assert lock.inspect(lease) == (0, None)
+
+    # The snapshot shows the owner lost the leases, no refresh needed.
+    assert get_hosts_calls == [LS_NAME]
+
+
+def test_inspect_leases(fake_sanlock, lock, get_hosts_calls):
+    free = clusterlock.Lease("free", "leases", 2 * MiB)
+    fake_sanlock.write_resource(LS_NAME, b"free", [("leases", 2 * MiB)])
+    bad_name = clusterlock.Lease("bad-name", "leases", 2 * MiB)
+
+    lock.acquireHostId(HOST_ID, wait=True)
+    lock.acquire(HOST_ID, LEASE)
+    lock._hosts_snapshot.invalidate()
+    del get_hosts_calls[:]
+
+    results = lock.inspect_leases([LEASE, free, bad_name])
+
+    assert results[0] == concurrent.Result(True, (0, HOST_ID))
+    assert results[1] == concurrent.Result(True, (None, None))
+    assert not results[2].succeeded
+    assert isinstance(results[2].value, clusterlock.InvalidLeaseName)
+
+    # Single sanlock call for all leases.
+    assert get_hosts_calls == [LS_NAME]
+
+
+def test_inspect_leases_owner_reconnected(fake_sanlock, lock, get_hosts_calls):
+    other = clusterlock.Lease("other", "leases", 2 * MiB)
+    fake_sanlock.write_resource(LS_NAME, b"other", [("leases", 2 * MiB)])
+
+    lock.acquireHostId(HOST_ID, wait=True)
+    lock.acquire(HOST_ID, LEASE)
+    lock.acquire(HOST_ID, other)
+    lock.inspect(LEASE)
+    del get_hosts_calls[:]
+
+    # Simulate the owner reconnecting to the lockspace and acquiring the
+    # leases again after the snapshot was taken.
+    fake_sanlock.hosts[HOST_ID]["generation"] += 1
+    for offset in (MiB, 2 * MiB):
+        res = fake_sanlock.resources[("leases", offset)]
+        res["generation"] = fake_sanlock.hosts[HOST_ID]["generation"]
+
+    results = lock.inspect_leases([LEASE, other])
+    assert [r.value for r in results] == [(0, HOST_ID), (0, HOST_ID)]
+
+    # The snapshot was refreshed once for all leases.
+    assert get_hosts_calls == [LS_NAME]
+
+
+def test_inspect_uses_hosts_snapshot(fake_sanlock, lock):
+    lock.acquireHostId(HOST_ID, wait=True)
+    lock.acquire(HOST_ID, LEASE)
+    assert lock.inspect(LEASE) == (0, HOST_ID)
+
+    # Host status changed, but the snapshot did not expire yet.
+    fake_sanlock.hosts[HOST_ID]["flags"] = sanlock.HOST_DEAD
+    assert lock.inspect(LEASE) == (0, HOST_ID)
+
+    lock._hosts_snapshot.invalidate()
+    assert lock.inspect(LEASE) == (0, None)
+
+
+def test_inspect_owner_reconnected_after_snapshot(fake_sanlock, lock):
+    lock.acquireHostId(HOST_ID, wait=True)
+    lock.acquire(HOST_ID, LEASE)
+    lock.inspect(LEASE)
+
+    # Simulate another host reconnecting to the lockspace and acquiring the
+    # lease after the snapshot was taken.
+    fake_sanlock.hosts[HOST_ID]["generation"] += 1
+    res = fake_sanlock.resources[("leases", MiB)]
+    res["generation"] = fake_sanlock.hosts[HOST_ID]["generation"]
+
+    # The snapshot is refreshed since the owner generation does not match.
+    assert lock.inspect(LEASE) == (0, HOST_ID)
+
+
+@pytest.mark.parametrize(
+    "status,expected",
+    [
+        (sanlock.HOST_LIVE, clusterlock.HOST_STATUS_LIVE),
+        (sanlock.HOST_FAIL, clusterlock.HOST_STATUS_FAIL),
+        (sanlock.HOST_DEAD, clusterlock.HOST_STATUS_DEAD),
+    ],
+)
+def test_get_host_status(fake_sanlock, lock, status, expected):
+    lock.acquireHostId(HOST_ID, wait=True)
+    fake_sanlock.hosts[HOST_ID]["flags"] = status
+    assert lock.getHostStatus(HOST_ID) == expected
+
+
+def test_get_host_status_free(fake_sanlock, lock):
+    lock.acquireHostId(HOST_ID, wait=True)
+    assert lock.getHostStatus(HOST_ID + 1) == clusterlock.HOST_STATUS_FREE
+
+
+def test_get_host_status_unavailable(fake_sanlock, lock):
+    # Lockspace was not initialized.
+    other = clusterlock.SANLock("other-sd-uuid", LS_PATH, LEASE)
+    assert other.getHostStatus(HOST_ID) == clusterlock.HOST_STATUS_UNAVAILABLE
+
+
+def test_get_host_status_many_hosts(fake_sanlock, lock, get_hosts_calls):
+    lock.acquireHostId(HOST_ID, wait=True)
+    for host_id in range(2, 251):
+        fake_sanlock.hosts[host_id] = {
+            "id": host_id,
+            "host_id": host_id,
+            "generation": 0,
+            "flags": sanlock.HOST_LIVE,
+        }
+
+    for host_id in range(1, 251):
+        assert lock.getHostStatus(host_id) == clusterlock.HOST_STATUS_LIVE
+
+    # Single sanlock call for all hosts.
+    assert get_hosts_calls == [LS_NAME]
+
+
+def test_hosts_snapshot_expires(fake_sanlock, lock, get_hosts_calls):
+    lock.acquireHostId(HOST_ID, wait=True)
+
+    now = [0]
+    snapshot = clusterlock.HostsSnapshot(ttl=2, clock=lambda: now[0])
+
+    snapshot.hosts(LS_NAME)
+    now[0] = 1.9
+    snapshot.hosts(LS_NAME)
+    assert get_hosts_calls == [LS_NAME]
+
+    now[0] = 2
+    snapshot.hosts(LS_NAME)
+    assert get_hosts_calls == [LS_NAME, LS_NAME]
+
+
+def test_hosts_snapshot_error_not_cached(fake_sanlock, lock, get_hosts_calls):
+    snapshot = clusterlock.HostsSnapshot(ttl=60)
+    for i in range(2):
+        with pytest.raises(fake_sanlock.SanlockException):
+            snapshot.hosts(b"no-such-lockspace")
+
+    # The failed call was not cached.
+    assert get_hosts_calls == [b"no-such-lockspace"] * 2
+
+
 def test_inquire(fake_sanlock, lock):
     # No lockspace yet...
     assert lock.inquire() == []
@@ -144,6 +144,7 @@ class FakeSanlock(object):
 
         host = {
             "id": host_id,
+            "host_id": host_id,
             "generation": generation,
             "flags": sanlock.HOST_LIVE,
         }
@@ -472,7 +473,11 @@ class FakeSanlock(object):
         except KeyError:
             raise self._error(errno.ENOSPC, error)
 
-        return [self.hosts[host_id]]
+        if host_id == 0:
+            # Return all hosts.
+            return [host.copy() for host in self.hosts.values()]
+
+        return [self.hosts[host_id].copy()]
 
     def write_lockspace(
         self,
@@ -629,6 +629,14 @@ def test_get_hosts():
     assert host[0]["generation"] == 0
 
 
+def test_get_hosts_all():
+    fs = FakeSanlock()
+    fs.write_lockspace(LOCKSPACE_NAME, "path")
+    fs.add_lockspace(LOCKSPACE_NAME, 1, "path")
+    hosts = fs.get_hosts(LOCKSPACE_NAME)
+    assert [h["host_id"] for h in hosts] == [1]
+
+
 def test_get_hosts_no_lockspace():
     fs = FakeSanlock()
     with pytest.raises(fs.SanlockException) as e:
@@ -15,6 +15,7 @@ from testlib import VdsmTestCase
 from vdsm.common.units import GiB
 from vdsm.storage import constants as sc
 from vdsm.storage import image
+from vdsm.storage import measurecache
 from vdsm.storage import qemuimg
 
 CONFIG = make_config([('irs', 'volume_utilization_chunk_mb', '1024')])
@@ -24,10 +25,33 @@ def fake_estimate_chain_size(self, sdUUID, imgUUID, volUUID, size):
     return 2.25 * GiB
 
 
-def fake_estimate_qcow2_size(self, src_vol_params, dst_sd_id):
+def fake_estimate_qcow2_size(self, src_vol_params, dst_sd_id, chain=None):
     return 1.25 * GiB
 
 
+class FakeChainVolume:
+
+    def __init__(self, vol_id, size, parent=None, token=(0, 0)):
+        self.volUUID = vol_id
+        self.size = size
+        self.parent = parent
+        self.token = token
+        self.size_calls = 0
+
+    def getVolumePath(self):
+        return "/" + self.volUUID
+
+    def change_token(self):
+        return self.token
+
+    def getParentVolume(self):
+        return self.parent
+
+    def getVolumeSize(self):
+        self.size_calls += 1
+        return self.size
+
+
 @expandPermutations
 class TestCalculateVolAlloc(VdsmTestCase):
 
@@ -174,6 +198,66 @@ class TestEstimateQcow2Size:
 
         assert estimated_size == 1074135040
 
+    @pytest.mark.parametrize('sd_class', [FakeFileSD, FakeBlockSD])
+    def test_estimated_size_cached(self, monkeypatch, sd_class):
+        monkeypatch.setattr(image, "config", CONFIG)
+        calls = []
+
+        def fake_measure(**args):
+            calls.append(args)
+            return {"required": 393216}
+
+        monkeypatch.setattr(qemuimg, 'measure', fake_measure)
+        monkeypatch.setattr(image, 'sdCache', FakeStorageDomainCache())
+        monkeypatch.setattr(
+            measurecache, '_cache', measurecache.MeasureCache(ttl=60)
+        )
+
+        image.sdCache.domains['sdUUID'] = sd_class("fake manifest")
+        img = image.Image("/path/to/repo")
+
+        vol_params = dict(
+            capacity=GiB,
+            volFormat=sc.RAW_FORMAT,
+            path='path',
+            block=sd_class.is_block(),
+        )
+
+        chain = [("path", (0, GiB)), ("base", (0, GiB))]
+        for i in range(3):
+            estimated_size = img.estimate_qcow2_size(
+                vol_params, "sdUUID", chain=chain
+            )
+            assert estimated_size == 1074135040
+
+        assert len(calls) == 1
+
+        # Modifying a volume in the chain invalidates the cached result.
+        chain = [("path", (0, GiB)), ("base", (1, GiB))]
+        img.estimate_qcow2_size(vol_params, "sdUUID", chain=chain)
+        assert len(calls) == 2
+
+    def test_estimate_chain_size_cached(self, monkeypatch):
+        monkeypatch.setattr(
+            measurecache, '_cache', measurecache.MeasureCache(ttl=60)
+        )
+        template = FakeChainVolume("template", GiB, token=(0,))
+        internal = FakeChainVolume("internal", GiB, parent=template)
+        leaf = FakeChainVolume("leaf", GiB, parent=internal, token=None)
+        monkeypatch.setattr(
+            image.Image, 'getChain', lambda *args: [internal, leaf]
+        )
+        img = image.Image("/path/to/repo")
+
+        for i in range(3):
+            size = img.estimateChainSize("sdUUID", "imgUUID", "leaf", 4 * GiB)
+            assert size == int(3 * GiB * sc.COW_OVERHEAD)
+
+        # The sizes of volumes with a token are cached.
+        assert template.size_calls == 1
+        assert internal.size_calls == 1
+        assert leaf.size_calls == 3
+
     @pytest.mark.parametrize(
         "storage,format,prealloc,estimate,expected",
         [
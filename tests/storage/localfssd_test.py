@@ -1285,6 +1285,71 @@ def test_dump_sd_volumes_removed_image(
     }
 
 
+def test_dump_sd_volumes_image_filter(user_domain):
+    vols = {}
+    for _ in range(3):
+        img_uuid = str(uuid.uuid4())
+        vol_uuid = str(uuid.uuid4())
+        user_domain.createVolume(
+            imgUUID=img_uuid,
+            capacity=SPARSE_VOL_SIZE,
+            volFormat=sc.RAW_FORMAT,
+            preallocate=sc.SPARSE_VOL,
+            diskType="DATA",
+            volUUID=vol_uuid,
+            desc="test",
+            srcImgUUID=sc.BLANK_UUID,
+            srcVolUUID=sc.BLANK_UUID,
+        )
+        vols[img_uuid] = vol_uuid
+
+    # Mark one image as removed.
+    removed_img, removed_vol = list(vols.items())[0]
+    vol = user_domain.produceVolume(removed_img, removed_vol)
+    user_domain.deleteImage(
+        user_domain.sdUUID, removed_img, [{removed_vol: vol}]
+    )
+
+    all_volumes = user_domain.dump()["volumes"]
+    assert set(all_volumes) == set(vols.values())
+
+    for img_uuid, vol_uuid in vols.items():
+        volumes = user_domain.dump(image_id=img_uuid)["volumes"]
+        assert volumes == {vol_uuid: all_volumes[vol_uuid]}
+
+    assert user_domain.dump(image_id=str(uuid.uuid4()))["volumes"] == {}
+
+
+def test_dump_sd_volumes_pages(user_domain):
+    for _ in range(5):
+        user_domain.createVolume(
+            imgUUID=str(uuid.uuid4()),
+            capacity=SPARSE_VOL_SIZE,
+            volFormat=sc.RAW_FORMAT,
+            preallocate=sc.SPARSE_VOL,
+            diskType="DATA",
+            volUUID=str(uuid.uuid4()),
+            desc="test",
+            srcImgUUID=sc.BLANK_UUID,
+            srcVolUUID=sc.BLANK_UUID,
+        )
+
+    all_volumes = user_domain.dump()["volumes"]
+
+    # Volumes are dumped in volume id order.
+    pages = [
+        user_domain.dump(offset=offset, limit=2)["volumes"]
+        for offset in (0, 2, 4)
+    ]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [vol_id for page in pages for vol_id in page] == sorted(all_volumes)
+    for page in pages:
+        for vol_id, vol_md in page.items():
+            assert vol_md == all_volumes[vol_id]
+
+    assert user_domain.dump(offset=5, limit=2)["volumes"] == {}
+
+
 def test_create_illegal_volume(user_domain, local_fallocate):
     image_id = str(uuid.uuid4())
     vol_id = str(uuid.uuid4())
@@ -1,8 +1,10 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import logging
 import os
 import time
+import tracemalloc
 import uuid
 
 import pytest
@@ -2251,6 +2253,128 @@ def test_lv_reload_for_stale_vg(fake_devices):
     assert not lc._lvs_needs_reload("vg")
 
 
+def test_lv_fromlvm_shared_values():
+    lv1 = make_lv(lv_name="lv1", vg_name="vg-name", pvs="/dev/mapper/pv1")
+    lv2 = make_lv(lv_name="lv2", vg_name="vg-name", pvs="/dev/mapper/pv1")
+
+    assert lv1.attr == lvm.LV_ATTR("-", "w", "i", "-", "-", "-", "-", "-")
+    assert lv1.attr is lv2.attr
+    assert lv1.tags == ("IU_image-uid", "PU_00000000", "MD_1")
+    assert all(t1 is t2 for t1, t2 in zip(lv1.tags, lv2.tags))
+    assert lv1.writeable
+    assert not lv1.opened
+    assert not lv1.active
+
+
+def test_lv_reload_skip_segments(fake_devices):
+    fake_runner = FakeRunner(
+        out=b"\n".join(
+            [
+                b"  uuid1|lv1|vg-name|-wi-------|1073741824|0|pv1(0)|",
+                b"  uuid1|lv1|vg-name|-wi-------|1073741824|8|pv2(0)|",
+                b"  uuid2|lv2|vg-name|-wi-ao----|1073741824|0|pv1(8)|MD_2",
+            ]
+        )
+    )
+    lc = lvm.LVMCache(fake_runner)
+
+    lvs = sorted(lc.getAllLvs("vg-name"))
+
+    assert [(lv.name, lv.devices, lv.tags) for lv in lvs] == [
+        ("lv1", "pv1(0)", ()),
+        ("lv2", "pv1(8)", ("MD_2",)),
+    ]
+    assert lvs[1].active
+
+
+def test_lv_fields_reload(fake_devices):
+    fake_runner = FakeRunner(
+        out=b"\n".join(
+            [
+                b"  lv1|vg-name|IU_image-uid,MD_1",
+                b"  lv2|vg-name|",
+            ]
+        )
+    )
+    lc = lvm.LVMCache(fake_runner)
+
+    lvs = lc.getAllLvs("vg-name", fields=("vg_name", "tags"))
+
+    cmd = fake_runner.calls[0]
+    assert cmd[cmd.index("-o") + 1] == "name,vg_name,tags"
+    assert lvs == [
+        ("lv1", "vg-name", ("IU_image-uid", "MD_1")),
+        ("lv2", "vg-name", ()),
+    ]
+    assert lvs[0].tags == ("IU_image-uid", "MD_1")
+
+    # The cache is not updated, since the records are partial.
+    assert lc._lvs == {}
+
+
+def test_lv_fields_cached(fake_devices):
+    fake_runner = FakeRunner()
+    lc = lvm.LVMCache(fake_runner, cache_lvs=True)
+    lv1 = make_lv(lv_name="lv1", pvs=["/dev/mapper/pv1"], vg_name="vg1")
+    lc._freshlv = {"vg1"}
+    lc._lvs = {
+        ("vg1", "lv1"): lv1,
+        ("vg2", "lv2"): lvm.Stale("lv2"),
+    }
+
+    lvs = lc.getAllLvs("vg1", fields=("size",))
+
+    assert fake_runner.calls == []
+    assert lvs == [("lv1", "128")]
+    assert lvs[0].size == "128"
+
+
+def test_lv_fields_error(fake_devices):
+    fake_runner = FakeRunner(rc=5, err=b"Fake lvm error")
+    lc = lvm.LVMCache(fake_runner)
+    lc._lvs = {("vg-name", "lv-name"): lvm.Stale("lv-name")}
+
+    assert lc.getAllLvs("vg-name", fields=("tags",)) == []
+    assert lc._lvs == {("vg-name", "lv-name"): lvm.Unreadable("lv-name")}
+
+
+def test_lv_fields_unsupported():
+    lc = lvm.LVMCache(FakeRunner())
+    with pytest.raises(ValueError):
+        lc.getAllLvs("vg-name", fields=("devices",))
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("count", [10000])
+def test_lv_parse_benchmark(count):
+    lines = [
+        "  uuid-{i}|lv-{i}|vg-name|-wi-------|1073741824|0|pv1({i})|"
+        "IU_image-{img},PU_00000000-0000-0000-0000-000000000000,"
+        "MD_{i}".format(i=i, img=i // 10)
+        for i in range(count)
+    ]
+
+    tracemalloc.start()
+    try:
+        start = time.monotonic()
+        lvs = list(lvm._iter_lvs(lines))
+        elapsed = time.monotonic() - start
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    logging.info(
+        "Parsed %d lvs in %.3f seconds, using %.1f KiB (%.0f bytes per lv)",
+        count,
+        elapsed,
+        size / 1024,
+        size / count,
+    )
+    assert len(lvs) == count
+    assert len({id(lv.attr) for lv in lvs}) == 1
+    assert len({id(lv.tags[1]) for lv in lvs}) == 1
+
+
 @requires_root
 @pytest.mark.root
 def test_retry_with_wider_filter(tmp_storage):
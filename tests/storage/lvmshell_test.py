@@ -0,0 +1,194 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import logging
+import os
+import time
+
+import pytest
+
+from vdsm.common import commands
+from vdsm.storage import exception as se
+from vdsm.storage import lvm
+from vdsm.storage import lvmshell
+
+TEST_DIR = os.path.dirname(__file__)
+FAKE_LVM = os.path.join(TEST_DIR, "fake-lvm")
+
+
+def lvs(*names):
+    return [
+        FAKE_LVM,
+        "lvs",
+        "--noheadings",
+        "--separator",
+        "|",
+        "-o",
+        "name,tags",
+        "--config",
+        'devices { filter=["a|.*|"] }',
+    ] + list(names)
+
+
+@pytest.fixture
+def no_sudo(monkeypatch):
+    start = commands.start
+
+    def start_no_sudo(*args, **kwargs):
+        kwargs["sudo"] = False
+        return start(*args, **kwargs)
+
+    monkeypatch.setattr(commands, "start", start_no_sudo)
+
+
+@pytest.fixture
+def shell(no_sudo):
+    shell = lvmshell.Shell(10, cmd=(FAKE_LVM,))
+    yield shell
+    shell.close()
+
+
+@pytest.fixture
+def runner(shell):
+    runner = lvm.LVMRunner(use_shell=True)
+    runner._shell = shell
+    return runner
+
+
+def test_shell_line():
+    line = lvmshell._shell_line(lvs("vg/lv"))
+    assert line == (
+        "lvs --reportformat json -o name,tags --config "
+        "'devices { filter=[\"a|.*|\"] } "
+        "log {report_command_log=1 command_log_selection=\"all\"}' "
+        "vg/lv"
+    )
+
+
+@pytest.mark.parametrize(
+    "cmd, accepted",
+    [
+        (lvs("vg/lv"), True),
+        (["lvm", "vgs", "vg"], True),
+        (["lvm", "pvs", "/dev/sda"], True),
+        (["lvm", "lvchange", "-an", "vg/lv"], False),
+        (["lvm", "lvs", "vg/lv'"], False),
+        (["lvm", "lvs", "vg\nlv"], False),
+        (["lvm"], False),
+        (lvs(*["vg/lv%d" % i for i in range(lvmshell.MAX_ARGS)]), False),
+    ],
+)
+def test_accepts(cmd, accepted):
+    assert lvmshell.Shell(10).accepts(cmd) == accepted
+
+
+def test_run(shell):
+    rc, out, err = shell.run(lvs("vg/lv1", "vg/lv2"))
+    assert rc == 0
+    assert out == b"  vg/lv1-name|vg/lv1-tags\n  vg/lv2-name|vg/lv2-tags\n"
+    assert err == b""
+
+
+def test_run_error(shell):
+    rc, out, err = shell.run(lvs("vg/lv1", "missing"))
+    assert rc == lvmshell.ECMD_FAILED
+    assert out == b"  vg/lv1-name|vg/lv1-tags\n"
+    assert err == b'Failed to find lv "missing"\n'
+
+
+def test_reuse(shell):
+    shell.run(lvs("vg/lv1"))
+    pid = shell._proc.pid
+    shell.run(lvs("vg/lv2"))
+    assert shell._proc.pid == pid
+
+
+def test_shell_terminated(shell):
+    shell.run(lvs("vg/lv1"))
+    with pytest.raises(lvmshell.Error):
+        shell.run(lvs("exit"))
+    assert shell._proc is None
+
+    # The next command starts a new shell.
+    rc, out, _ = shell.run(lvs("vg/lv1"))
+    assert rc == 0
+    assert out == b"  vg/lv1-name|vg/lv1-tags\n"
+
+
+def test_timeout(no_sudo):
+    shell = lvmshell.Shell(0.5, cmd=(FAKE_LVM,))
+    try:
+        start = time.monotonic()
+        with pytest.raises(lvmshell.Error):
+            shell.run(lvs("hang"))
+        assert time.monotonic() - start < 5
+        assert shell._proc is None
+
+        rc, _, _ = shell.run(lvs("vg/lv1"))
+        assert rc == 0
+    finally:
+        shell.close()
+
+
+def test_busy(shell):
+    with shell._lock:
+        with pytest.raises(lvmshell.Busy):
+            shell.run(lvs("vg/lv1"))
+
+
+def test_start_error(no_sudo):
+    shell = lvmshell.Shell(10, cmd=("/no/such/lvm",))
+    with pytest.raises(lvmshell.Error):
+        shell.run(lvs("vg/lv1"))
+
+
+def test_runner_uses_shell(runner):
+    out = runner.run(lvs("vg/lv1"))
+    assert out == ["  vg/lv1-name|vg/lv1-tags"]
+    assert runner._shell._proc is not None
+
+
+def test_runner_shell_busy(runner):
+    with runner._shell._lock:
+        out = runner.run(lvs("vg/lv1"))
+    assert out == ["  vg/lv1-name|vg/lv1-tags"]
+    assert runner._shell._proc is None
+
+
+def test_runner_shell_error(runner, no_sudo):
+    runner._shell = lvmshell.Shell(10, cmd=("/no/such/lvm",))
+    out = runner.run(lvs("vg/lv1"))
+    assert out == ["  vg/lv1-name|vg/lv1-tags"]
+
+
+def test_runner_command_error(runner):
+    # The failed command is run again in a new process, reporting the error
+    # like a command not using the shell.
+    with pytest.raises(se.LVMCommandError) as e:
+        runner.run(lvs("vg/lv1", "missing"))
+    assert e.value.rc == 5
+    assert e.value.err == ['  Failed to find lv "missing"']
+
+
+@pytest.mark.slow
+def test_latency_benchmark(no_sudo):
+    count = 50
+    process_runner = lvm.LVMRunner()
+    shell_runner = lvm.LVMRunner(use_shell=True)
+    shell_runner._shell = lvmshell.Shell(10, cmd=(FAKE_LVM,))
+    try:
+        runners = [("process", process_runner), ("shell", shell_runner)]
+        for name, runner in runners:
+            start = time.monotonic()
+            for i in range(count):
+                runner.run(lvs("vg/lv%d" % i))
+            elapsed = time.monotonic() - start
+            logging.info(
+                "Ran %d reports using %s in %.3f seconds (%.3f ms/report)",
+                count,
+                name,
+                elapsed,
+                elapsed / count * 1000,
+            )
+    finally:
+        shell_runner._shell.close()
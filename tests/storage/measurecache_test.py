@@ -0,0 +1,215 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import logging
+import time
+
+import pytest
+
+from vdsm.storage import measurecache
+from vdsm.storage import qemuimg
+
+log = logging.getLogger("test")
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeMeasure:
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.delay:
+            time.sleep(self.delay)
+        return {"required": 1024 * len(self.calls), "fully-allocated": 0}
+
+
+@pytest.fixture
+def fake_measure(monkeypatch):
+    fake = FakeMeasure()
+    monkeypatch.setattr(qemuimg, "measure", fake)
+    return fake
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    return measurecache.MeasureCache(ttl=60, clock=clock)
+
+
+def test_measure_cached(cache, fake_measure):
+    chain = [("/vol", (1, 1024))]
+    first = cache.measure(chain, image="/vol", format="raw")
+    second = cache.measure(chain, image="/vol", format="raw")
+
+    assert first == second
+    assert len(fake_measure.calls) == 1
+    assert fake_measure.calls[0] == {"image": "/vol", "format": "raw"}
+
+
+def test_measure_token_changed(cache, fake_measure):
+    cache.measure([("/vol", (1, 1024))], image="/vol")
+    cache.measure([("/vol", (2, 1024))], image="/vol")
+
+    assert len(fake_measure.calls) == 2
+    assert len(cache._entries) == 1
+
+
+def test_measure_parent_changed(cache, fake_measure):
+    cache.measure([("/top", (1, 1024)), ("/base", (1, 1024))], image="/top")
+
+    # Modifying the base volume (e.g. merging into it) invalidates the
+    # result.
+    cache.measure([("/top", (1, 1024)), ("/base", (2, 1024))], image="/top")
+    assert len(fake_measure.calls) == 2
+
+    # Measuring the top volume without the backing chain is a different
+    # result.
+    cache.measure([("/top", (1, 1024))], image="/top", backing=False)
+    assert len(fake_measure.calls) == 3
+    assert len(cache._entries) == 2
+
+
+def test_measure_no_token(cache, fake_measure):
+    chain = [("/top", None), ("/base", (1, 1024))]
+    cache.measure(chain, image="/top")
+    cache.measure(chain, image="/top")
+
+    assert len(fake_measure.calls) == 2
+    assert len(cache._entries) == 0
+
+
+def test_measure_different_args(cache, fake_measure):
+    chain = [("/vol", (1, 1024))]
+    cache.measure(chain, image="/vol", output_format="qcow2")
+    cache.measure(chain, image="/vol", output_format="raw")
+
+    assert len(fake_measure.calls) == 2
+    assert len(cache._entries) == 2
+
+
+def test_measure_expired(cache, fake_measure, clock):
+    chain = [("/vol", (1, 1024))]
+    cache.measure(chain, image="/vol")
+
+    clock.now += 59
+    cache.measure(chain, image="/vol")
+    assert len(fake_measure.calls) == 1
+
+    clock.now += 1
+    cache.measure(chain, image="/vol")
+    assert len(fake_measure.calls) == 2
+
+
+def test_measure_error_not_cached(cache, monkeypatch):
+    def fail(**kwargs):
+        raise qemuimg.InvalidOutput(["qemu-img"], b"", "fake error")
+
+    monkeypatch.setattr(qemuimg, "measure", fail)
+    with pytest.raises(qemuimg.InvalidOutput):
+        cache.measure([("/vol", (1, 1024))], image="/vol")
+
+    assert len(cache._entries) == 0
+
+
+def test_volume_size(cache):
+    calls = []
+
+    def get_size():
+        calls.append(1)
+        return 1024
+
+    assert cache.volume_size("/vol", (1,), get_size) == 1024
+    assert cache.volume_size("/vol", (1,), get_size) == 1024
+    assert len(calls) == 1
+
+    cache.volume_size("/vol", (2,), get_size)
+    assert len(calls) == 2
+
+    # Volume without a token is not cached.
+    cache.volume_size("/leaf", None, get_size)
+    cache.volume_size("/leaf", None, get_size)
+    assert len(calls) == 4
+
+
+class FakeVolume:
+
+    def __init__(self, vol_id, parent=None, token=(0, 1024)):
+        self.volUUID = vol_id
+        self.parent = parent
+        self.token = token
+
+    def getVolumePath(self):
+        return "/" + self.volUUID
+
+    def change_token(self):
+        return self.token
+
+    def getParentVolume(self):
+        return self.parent
+
+
+def test_chain_tokens():
+    base = FakeVolume("base")
+    mid = FakeVolume("mid", parent=base)
+    top = FakeVolume("top", parent=mid)
+
+    assert measurecache.chain_tokens(top) == [
+        ("/top", (0, 1024)),
+        ("/mid", (0, 1024)),
+        ("/base", (0, 1024)),
+    ]
+    assert measurecache.chain_tokens(top, base=mid) == [
+        ("/top", (0, 1024)),
+        ("/mid", (0, 1024)),
+    ]
+
+
+def test_chain_tokens_no_token():
+    base = FakeVolume("base")
+    top = FakeVolume("top", parent=base, token=None)
+
+    assert measurecache.chain_tokens(top) == [("/top", None)]
+
+
+@pytest.mark.slow
+def test_chain_timing(monkeypatch, cache):
+    # Measuring a real volume takes 10-50 milliseconds; use 20 milliseconds
+    # delay to simulate qemu-img measure.
+    fake = FakeMeasure(delay=0.02)
+    monkeypatch.setattr(qemuimg, "measure", fake)
+
+    chain = ["/vol-{:02}".format(i) for i in range(20)]
+
+    def estimate():
+        start = time.monotonic()
+        for path in chain:
+            cache.measure([(path, (0, 1024))], image=path, format="qcow2")
+        return time.monotonic() - start
+
+    uncached = estimate()
+    cached = estimate()
+
+    log.info(
+        "Measured 20 volumes chain uncached: %.6f seconds, "
+        "cached: %.6f seconds",
+        uncached,
+        cached,
+    )
+
+    assert len(fake.calls) == len(chain)
+    assert cached < uncached / 10
@@ -180,6 +180,10 @@ class FakeDomainManifest(object):
     def external_leases_path(self):
         pass
 
+    @recorded
+    def metadata_snapshot(self, img_id=None):
+        pass
+
 
 class FakeBlockDomainManifest(FakeDomainManifest):
     def __init__(self):
@@ -470,6 +474,10 @@ class FakeVolumeManifest(object):
     def getVolumeTrueSize(self):
         pass
 
+    @recorded
+    def change_token(self):
+        pass
+
     @recorded
     def metadata2info(self, meta):
         pass
@@ -760,6 +768,7 @@ class DomainTestMixin(object):
             ['refresh', 0],
             ['getVolumeLease', 2],
             ['external_leases_path', 0],
+            ['metadata_snapshot', 1],
         ]
     )
     def test_common_functions(self, fn, nargs):
@@ -858,6 +867,7 @@ class VolumeTestMixin(object):
             ['isSparse', 0],
             ['getVolumeSize', 0],
             ['getVolumeTrueSize', 0],
+            ['change_token', 0],
             ['metadata2info', 1],
             ['getInfo', 0],
             ['getVmVolumeInfo', 0],
@@ -274,7 +274,7 @@ class FakeLVM(object):
     def getLV(self, vgName, lvName=None):
         return self._getLV(vgName, lvName)
 
-    def getAllLVs(self, vgName):
+    def getAllLVs(self, vgName, fields=None):
         return [
             self._getLV(vgName, lv) for vg, lv in self.lvmd if vg == vgName
         ]
@@ -1,10 +1,19 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import io
+import json
+import time
+
 import pytest
 
+from vdsm.tool import dump_volume_chains
 from vdsm.tool.dump_volume_chains import (
     _build_volume_chain,
+    _chain_ids,
+    _dump_ndjson,
+    _filter_volumes,
+    _iter_volumes,
     _BLANK_UUID,
     OrphanVolumes,
     ChainLoopError,
@@ -48,3 +57,147 @@ def test_no_base_volume():
 def test_duplicate_parent():
     with pytest.raises(DuplicateParentError):
         _build_volume_chain([(_BLANK_UUID, 'a'), ('a', 'b'), ('a', 'c')])
+
+
+def test_long_chain():
+    # Build a chain of 10000 volumes, ordered from the top down.
+    count = 10000
+    vols = ['vol-%05d' % i for i in range(count)]
+    volumes_children = [(_BLANK_UUID, vols[0])]
+    volumes_children.extend(zip(vols[:-1], vols[1:]))
+    volumes_children.reverse()
+
+    start = time.monotonic()
+    chain = _build_volume_chain(volumes_children)
+    elapsed = time.monotonic() - start
+
+    assert chain == vols
+    # Building the chain with a linear scan for loops took minutes.
+    assert elapsed < 1
+
+
+VOLUMES = {
+    'template': {'image': 'img-t', 'parent': _BLANK_UUID, 'legality': 'LEGAL'},
+    'a': {'image': 'img-1', 'parent': 'template', 'legality': 'LEGAL'},
+    'b': {'image': 'img-1', 'parent': 'a', 'legality': 'ILLEGAL'},
+    'c': {'image': 'img-2', 'parent': _BLANK_UUID, 'legality': 'LEGAL'},
+    'd': {'image': 'img-2', 'parent': 'c', 'legality': 'ILLEGAL'},
+}
+
+
+def test_chain_ids():
+    assert _chain_ids(VOLUMES, 'b') == {'b', 'a', 'template'}
+    assert _chain_ids(VOLUMES, 'c') == {'c'}
+    assert _chain_ids(VOLUMES, 'missing') == set()
+
+
+def test_chain_ids_loop():
+    volumes = {'a': {'parent': 'b'}, 'b': {'parent': 'a'}}
+    assert _chain_ids(volumes, 'a') == {'a', 'b'}
+
+
+@pytest.mark.parametrize(
+    "chain,illegal,expected",
+    [
+        (None, False, ['template', 'a', 'b', 'c', 'd']),
+        ('b', False, ['template', 'a', 'b']),
+        (None, True, ['b', 'd']),
+        ('d', True, ['d']),
+    ],
+)
+def test_filter_volumes(chain, illegal, expected):
+    volumes = _filter_volumes(VOLUMES.items(), chain=chain, illegal=illegal)
+    assert [vol_id for vol_id, _ in volumes] == expected
+
+
+def test_dump_ndjson():
+    out = io.StringIO()
+    _dump_ndjson(_filter_volumes(VOLUMES.items(), chain='d'), out)
+
+    lines = out.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        dict(VOLUMES['c'], uuid='c'),
+        dict(VOLUMES['d'], uuid='d'),
+    ]
+
+
+class FakeStorageDomain:
+
+    def __init__(self, volumes):
+        self.volumes = volumes
+        self.calls = []
+
+    def dump(self, sd_id, image_id=None, offset=0, limit=None):
+        self.calls.append((image_id, offset))
+        vol_ids = sorted(
+            vol_id
+            for vol_id, vol_info in self.volumes.items()
+            if image_id is None or vol_info['image'] == image_id
+        )
+        end = None if limit is None else offset + limit
+        return {
+            "volumes": {
+                vol_id: dict(self.volumes[vol_id])
+                for vol_id in vol_ids[offset:end]
+            }
+        }
+
+
+class FakeClient:
+
+    def __init__(self, volumes):
+        self.StorageDomain = FakeStorageDomain(volumes)
+
+
+@pytest.fixture
+def page_size(monkeypatch):
+    monkeypatch.setattr(dump_volume_chains, "PAGE_SIZE", 2)
+
+
+def test_iter_volumes_pages(page_size):
+    cli = FakeClient(VOLUMES)
+    volumes = dict(_iter_volumes(cli, 'sd-id'))
+    assert volumes == VOLUMES
+    assert cli.StorageDomain.calls == [(None, 0), (None, 2), (None, 4)]
+
+
+def test_iter_volumes_image(page_size):
+    cli = FakeClient(VOLUMES)
+    volumes = dict(_iter_volumes(cli, 'sd-id', image_id='img-2'))
+    assert set(volumes) == {'c', 'd'}
+    assert cli.StorageDomain.calls == [('img-2', 0), ('img-2', 2)]
+
+
+def test_iter_volumes_image_template(page_size):
+    cli = FakeClient(VOLUMES)
+    volumes = dict(_iter_volumes(cli, 'sd-id', image_id='img-1'))
+    # The template volume is in another image, so the domain volumes are
+    # read until the template is found.
+    assert set(volumes) == {'template', 'a', 'b'}
+    assert cli.StorageDomain.calls == [
+        ('img-1', 0),
+        ('img-1', 2),
+        (None, 0),
+        (None, 2),
+        (None, 4),
+    ]
+
+
+def test_iter_volumes_image_template_chain(page_size):
+    volumes = {
+        'a': {'image': 'img-t', 'parent': _BLANK_UUID},
+        'b': {'image': 'img-t', 'parent': 'a'},
+        'c': {'image': 'img-1', 'parent': 'b'},
+    }
+    cli = FakeClient(volumes)
+    # The template parent was read before the template, so the domain
+    # volumes are read again to find it.
+    assert dict(_iter_volumes(cli, 'sd-id', image_id='img-1')) == volumes
+
+
+def test_iter_volumes_image_missing_parent(page_size):
+    volumes = {'a': {'image': 'img-1', 'parent': 'missing'}}
+    cli = FakeClient(volumes)
+    assert dict(_iter_volumes(cli, 'sd-id', image_id='img-1')) == volumes
+    # The domain volumes are read once.
+    assert cli.StorageDomain.calls == [('img-1', 0), (None, 0)]
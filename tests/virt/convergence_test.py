@@ -0,0 +1,397 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import logging
+import math
+
+import libvirt
+import pytest
+
+from vdsm.common.units import MiB, GiB
+from vdsm.virt import convergence
+from vdsm.virt import migration
+
+from testlib import make_config
+
+log = logging.getLogger("test")
+
+PAGE_SIZE = 4096
+
+
+def progress(
+    time_elapsed=0,
+    mem_processed=0,
+    mem_remaining=GiB,
+    mem_bps=0,
+    dirty_rate=-1,
+    mem_iteration=1,
+):
+    return migration.Progress(
+        job_type=libvirt.VIR_DOMAIN_JOB_UNBOUNDED,
+        time_elapsed=time_elapsed,
+        data_total=GiB,
+        data_processed=mem_processed,
+        data_remaining=mem_remaining,
+        mem_total=GiB,
+        mem_processed=mem_processed,
+        mem_remaining=mem_remaining,
+        mem_bps=mem_bps,
+        mem_constant=0,
+        compression_bytes=0,
+        dirty_rate=dirty_rate,
+        mem_iteration=mem_iteration,
+        mem_page_size=PAGE_SIZE,
+    )
+
+
+class TestEstimator:
+
+    def test_no_samples(self):
+        est = convergence.Estimator()
+        assert est.bandwidth is None
+        assert est.dirty_rate is None
+        assert est.iterations(500) is None
+
+    def test_no_dirty_rate(self):
+        est = convergence.Estimator()
+        est.update(progress(mem_bps=100 * MiB))
+        assert est.iterations(500) is None
+
+    def test_bandwidth_from_stats(self):
+        est = convergence.Estimator()
+        est.update(progress(mem_bps=100 * MiB))
+        est.update(progress(mem_bps=200 * MiB))
+        assert est.bandwidth == 150 * MiB
+
+    def test_bandwidth_from_processed(self):
+        est = convergence.Estimator()
+        est.update(progress(time_elapsed=1000, mem_processed=100 * MiB))
+        est.update(progress(time_elapsed=3000, mem_processed=500 * MiB))
+        assert est.bandwidth == 200 * MiB
+
+    def test_dirty_rate(self):
+        est = convergence.Estimator()
+        est.update(progress(dirty_rate=1000))
+        est.update(progress(dirty_rate=3000))
+        assert est.dirty_rate == 2000 * PAGE_SIZE
+
+    def test_samples_window(self):
+        est = convergence.Estimator(samples=2)
+        for rate in (100000, 1000, 3000):
+            est.update(progress(dirty_rate=rate))
+        assert est.dirty_rate == 2000 * PAGE_SIZE
+
+    def test_converged(self):
+        est = convergence.Estimator()
+        est.update(
+            progress(mem_remaining=40 * MiB, mem_bps=100 * MiB, dirty_rate=0)
+        )
+        assert est.iterations(500) == 0
+
+    def test_not_converging(self):
+        est = convergence.Estimator()
+        est.update(
+            progress(
+                mem_remaining=GiB,
+                mem_bps=100 * MiB,
+                dirty_rate=200 * MiB // PAGE_SIZE,
+            )
+        )
+        assert est.iterations(500) == math.inf
+
+    @pytest.mark.parametrize(
+        "downtime, expected",
+        [
+            # 1024 MiB -> 512 -> 256 -> 128 -> 64 -> 32 (<= 50 MiB)
+            (500, 5),
+            # 1024 MiB -> 512 -> 256 -> 128 -> 64 -> 32 -> 16 (<= 20 MiB)
+            (200, 6),
+            # 1024 MiB -> 512 (<= 1000 MiB)
+            (10000, 1),
+        ],
+    )
+    def test_iterations(self, downtime, expected):
+        est = convergence.Estimator()
+        est.update(
+            progress(
+                mem_remaining=GiB,
+                mem_bps=100 * MiB,
+                dirty_rate=50 * MiB // PAGE_SIZE,
+            )
+        )
+        assert est.iterations(downtime) == expected
+
+
+# Guest dirty page rate traces, in pages per second sampled every second,
+# replayed in a loop during the simulated migration.
+TRACES = {
+    # Mostly idle guest.
+    "idle": [500, 800, 600, 2000, 700, 500],
+    # Web server, request bursts.
+    "web": [8000, 12000, 20000, 9000, 15000, 11000],
+    # In memory cache, steady write load.
+    "cache": [12000, 14000, 16000, 14000, 13000, 15000],
+    # Database with a write heavy load, dirtying memory almost as fast as we
+    # can send it.
+    "database": [26000, 30000, 28000, 31000, 27000, 29000],
+}
+
+# 1 Gbit/s link.
+BANDWIDTH = 125 * MiB
+
+MEMORY = 8 * GiB
+
+MAX_DOWNTIME = 500
+
+
+class MigrationSimulator:
+    """
+    Simulate pre-copy migration of a guest dirtying memory at the rates in
+    the trace, reporting the progress as libvirt job stats.
+    """
+
+    TICK = 0.1
+
+    # Time to pause the VM and switch the migration to post-copy mode.
+    POST_COPY_DOWNTIME = 0.05
+
+    def __init__(self, trace, memory=MEMORY, bandwidth=BANDWIDTH):
+        self.trace = trace
+        self.memory = memory
+        self.bandwidth = bandwidth
+        self.time = 0.0
+        self.iteration = 0
+        self.iteration_start = 0.0
+        self.processed = 0
+        self.remaining = memory
+        self.dirty = 0
+        self.dirty_rate = 0
+        self.max_downtime = migration._DEFAULT_DOWNTIME
+        self.downtime = None
+        self.post_copy = False
+        self.aborted = False
+        self.completed = False
+
+    @property
+    def done(self):
+        return self.completed or self.aborted
+
+    def advance(self, seconds):
+        end = self.time + seconds
+        while self.time < end and not self.done:
+            self._tick()
+
+    def job_stats(self):
+        if self.done:
+            return {'type': libvirt.VIR_DOMAIN_JOB_NONE}
+        return {
+            'type': libvirt.VIR_DOMAIN_JOB_UNBOUNDED,
+            'operation': libvirt.VIR_DOMAIN_JOB_OPERATION_MIGRATION_OUT,
+            libvirt.VIR_DOMAIN_JOB_TIME_ELAPSED: int(self.time * 1000),
+            libvirt.VIR_DOMAIN_JOB_DATA_TOTAL: self.memory,
+            libvirt.VIR_DOMAIN_JOB_DATA_PROCESSED: self.processed,
+            libvirt.VIR_DOMAIN_JOB_DATA_REMAINING: self.remaining,
+            libvirt.VIR_DOMAIN_JOB_MEMORY_TOTAL: self.memory,
+            libvirt.VIR_DOMAIN_JOB_MEMORY_PROCESSED: self.processed,
+            libvirt.VIR_DOMAIN_JOB_MEMORY_REMAINING: self.remaining,
+            libvirt.VIR_DOMAIN_JOB_MEMORY_BPS: self.bandwidth,
+            'memory_dirty_rate': self.dirty_rate,
+            'memory_iteration': self.iteration,
+            'memory_page_size': PAGE_SIZE,
+        }
+
+    def start_post_copy(self):
+        self.post_copy = True
+        self.downtime = self.POST_COPY_DOWNTIME
+        self.time += self.POST_COPY_DOWNTIME
+        self.remaining += self.dirty
+        self.dirty = 0
+
+    def _guest_dirty_rate(self):
+        return self.trace[int(self.time) % len(self.trace)]
+
+    def _tick(self):
+        sent = min(self.remaining, self.bandwidth * self.TICK)
+        self.remaining -= sent
+        self.processed += sent
+        if not self.post_copy:
+            dirtied = self._guest_dirty_rate() * PAGE_SIZE * self.TICK
+            self.dirty = min(self.memory, self.dirty + dirtied)
+        self.time += self.TICK
+
+        if self.remaining > 0:
+            return
+
+        if self.post_copy:
+            self.completed = True
+        elif self.dirty * 1000 / self.bandwidth <= self.max_downtime:
+            # Pause the VM and send the rest.
+            self.downtime = self.dirty / self.bandwidth
+            self.time += self.downtime
+            self.completed = True
+        else:
+            # QEMU reports the dirty rate measured during the last
+            # iteration.
+            elapsed = self.time - self.iteration_start
+            self.dirty_rate = int(self.dirty / PAGE_SIZE / elapsed)
+            self.iteration += 1
+            self.iteration_start = self.time
+            self.remaining = self.dirty
+            self.dirty = 0
+
+
+class SimulatedEvent:
+    """
+    Replaces the monitor thread stop event, advancing the simulation instead
+    of waiting.
+    """
+
+    def __init__(self, sim):
+        self._sim = sim
+        self._set = False
+
+    def wait(self, timeout):
+        self._sim.advance(timeout)
+        return self.is_set()
+
+    def is_set(self):
+        return self._set or self._sim.done
+
+    def set(self):
+        self._set = True
+
+
+class SimulatedDomain:
+
+    def __init__(self, sim):
+        self._sim = sim
+
+    def migrateSetMaxDowntime(self, downtime, flags=0):
+        self._sim.max_downtime = downtime
+
+
+class SimulatedVM:
+
+    log = logging.getLogger("test")
+    id = "simulated-vm"
+
+    def __init__(self, sim):
+        self._sim = sim
+        self._dom = SimulatedDomain(sim)
+        self.post_copy = migration.PostCopyPhase.NONE
+
+    def job_stats(self):
+        return self._sim.job_stats()
+
+    def send_migration_status_event(self):
+        pass
+
+    def switch_migration_to_post_copy(self):
+        self._sim.start_post_copy()
+        self.post_copy = migration.PostCopyPhase.RUNNING
+        return True
+
+    def abort_domjob(self):
+        self._sim.aborted = True
+
+
+def legacy_schedule():
+    return migration.SourceThread._legacy_convergence_schedule(
+        None, MAX_DOWNTIME
+    )
+
+
+def post_copy_schedule():
+    def downtime(value, limit):
+        return {
+            'action': {'name': 'setDowntime', 'params': [str(value)]},
+            'limit': limit,
+        }
+
+    return {
+        'init': [
+            {'name': 'setDowntime', 'params': ['100']},
+        ],
+        'stalling': [
+            downtime(150, 1),
+            downtime(200, 2),
+            downtime(300, 3),
+            downtime(400, 4),
+            downtime(500, 6),
+            {'action': {'name': 'postcopy', 'params': []}, 'limit': 10},
+            {'action': {'name': 'abort', 'params': []}, 'limit': -1},
+        ],
+    }
+
+
+def simulate(monkeypatch, trace, schedule, prediction):
+    monkeypatch.setattr(
+        migration,
+        'config',
+        make_config(
+            [
+                (
+                    'vars',
+                    'migration_convergence_prediction',
+                    str(prediction).lower(),
+                ),
+            ]
+        ),
+    )
+    sim = MigrationSimulator(trace)
+    vm = SimulatedVM(sim)
+    monitor = migration.MonitorThread(vm, 0, schedule)
+    monitor._stop = SimulatedEvent(sim)
+    monitor.monitor_migration()
+    return sim
+
+
+@pytest.mark.parametrize("schedule", [legacy_schedule, post_copy_schedule])
+@pytest.mark.parametrize("name", sorted(TRACES))
+def test_simulate(monkeypatch, name, schedule):
+    trace = TRACES[name]
+    current = simulate(monkeypatch, trace, schedule(), prediction=False)
+    predicted = simulate(monkeypatch, trace, schedule(), prediction=True)
+
+    log.info(
+        "trace %s, schedule %s: "
+        "current: completed=%s time=%.1f downtime=%s iterations=%d, "
+        "predicted: completed=%s time=%.1f downtime=%s iterations=%d",
+        name,
+        schedule.__name__,
+        current.completed,
+        current.time,
+        current.downtime,
+        current.iteration,
+        predicted.completed,
+        predicted.time,
+        predicted.downtime,
+        predicted.iteration,
+    )
+
+    # Prediction may only move faster through the schedule, so migrations
+    # completing with the current schedule must complete, and must not take
+    # more time.
+    if current.completed:
+        assert predicted.completed
+        assert predicted.time <= current.time
+    if predicted.completed:
+        assert predicted.downtime * 1000 <= MAX_DOWNTIME
+
+
+def test_simulate_early_post_copy(monkeypatch):
+    # The database trace cannot converge before the schedule switches to
+    # post-copy, so we switch after the first iteration.
+    sim = simulate(monkeypatch, TRACES["database"], post_copy_schedule(), True)
+    assert sim.completed
+    assert sim.post_copy
+    assert sim.iteration == 1
+
+
+def test_simulate_early_downtime(monkeypatch):
+    # The cache trace converges in few iterations with larger downtime, so
+    # we skip the small downtime steps.
+    sim = simulate(monkeypatch, TRACES["cache"], legacy_schedule(), True)
+    assert sim.completed
+    assert sim.max_downtime == MAX_DOWNTIME
+    assert sim.iteration < 8
@@ -1,10 +1,17 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import logging
+import time
+
+import pytest
+
 from vdsm.common import xmlutils
+from vdsm.virt import domain_descriptor
 from vdsm.virt.domain_descriptor import (
     DomainDescriptor,
     MutableDomainDescriptor,
+    XmlSource,
 )
 from testlib import VdsmTestCase, XMLTestCase, permutations, expandPermutations
 
@@ -145,6 +152,63 @@ class DevicesHashTests(VdsmTestCase):
         desc2 = DomainDescriptor(SOME_DEVICES)
         assert desc1.devices_hash == desc2.devices_hash
 
+    def test_hash_without_parsing(self):
+        desc = DomainDescriptor(SOME_DEVICES)
+        assert desc.devices_hash is not None
+        assert desc._root is None
+
+    def test_no_hash_for_initial_xml(self):
+        desc = DomainDescriptor(SOME_DEVICES, xml_source=XmlSource.INITIAL)
+        assert desc.devices_hash is None
+
+    def test_no_hash_for_migration_source(self):
+        desc = DomainDescriptor(
+            SOME_DEVICES, xml_source=XmlSource.MIGRATION_SOURCE
+        )
+        assert desc.devices_hash is None
+
+
+class LazyParsingTests(VdsmTestCase):
+
+    def test_not_parsed_on_init(self):
+        desc = DomainDescriptor(SOME_DEVICES)
+        assert desc._root is None
+
+    def test_parsed_once(self):
+        desc = DomainDescriptor(SOME_DEVICES)
+        assert desc.id == 'xyz'
+        root = desc._root
+        assert root is not None
+        assert len(list(desc.get_device_elements('device'))) == 2
+        assert desc._root is root
+
+    def test_same_xml(self):
+        desc = DomainDescriptor(SOME_DEVICES)
+        assert desc.same_xml(SOME_DEVICES)
+        assert not desc.same_xml(REORDERED_DEVICES)
+
+    def test_same_xml_initial(self):
+        desc = DomainDescriptor(SOME_DEVICES, xml_source=XmlSource.INITIAL)
+        assert not desc.same_xml(SOME_DEVICES)
+
+
+@pytest.mark.parametrize(
+    "xml, section",
+    [
+        (NO_DEVICES, ''),
+        (EMPTY_DEVICES, '<devices/>'),
+        (
+            SOME_DEVICES,
+            '<devices>\n'
+            '        <device name="foo"/>\n'
+            '        <device name="bar"/>\n'
+            '    </devices>',
+        ),
+    ],
+)
+def test_devices_section(xml, section):
+    assert domain_descriptor._devices_section(xml) == section
+
 
 @expandPermutations
 class DomainDescriptorTests(XMLTestCase):
@@ -292,3 +356,78 @@ class DomainDescriptorTests(XMLTestCase):
         desc = DomainDescriptor(NO_PINNED_CPUS)
         pinning = desc.pinned_cpus
         assert pinning == {}
+
+
+def _large_domain_xml(disks=60, nics=30):
+    devices = []
+    for i in range(disks):
+        devices.append(
+            """
+        <disk device="disk" type="block">
+            <driver name="qemu" type="qcow2" cache="none"/>
+            <source dev="/rhev/data-center/mnt/blockSD/sd/images/{i}/vol"/>
+            <target dev="sd{i}" bus="scsi"/>
+            <serial>{i}</serial>
+            <alias name="ua-{i}"/>
+            <address type="drive" controller="0" bus="0" unit="{i}"/>
+        </disk>""".format(
+                i=i
+            )
+        )
+    for i in range(nics):
+        devices.append(
+            """
+        <interface type="bridge">
+            <mac address="00:1a:4a:16:01:{i:02x}"/>
+            <source bridge="ovirtmgmt"/>
+            <model type="virtio"/>
+            <alias name="ua-net-{i}"/>
+            <address type="pci" domain="0x0000" bus="0x01" slot="{i:#04x}"/>
+        </interface>""".format(
+                i=i
+            )
+        )
+    return """
+<domain type="kvm">
+    <name>large</name>
+    <uuid>xyz</uuid>
+    <memory unit="KiB">1048576</memory>
+    <devices>{}
+    </devices>
+</domain>
+""".format(
+        "".join(devices)
+    )
+
+
+@pytest.mark.slow
+def test_update_timing():
+    log = logging.getLogger("test")
+    xml = _large_domain_xml()
+    count = 200
+
+    # Old behavior: parse the domain XML and serialize the devices element
+    # on every update.
+    start = time.monotonic()
+    for _ in range(count):
+        dom = xmlutils.fromstring(xml)
+        hash(xmlutils.tostring(dom.find('devices')))
+    eager = time.monotonic() - start
+
+    start = time.monotonic()
+    desc = DomainDescriptor(xml)
+    for _ in range(count):
+        if not desc.same_xml(xml):
+            desc = DomainDescriptor(xml)
+        desc.devices_hash
+    lazy = time.monotonic() - start
+
+    log.info(
+        "%d updates of domain with 90 devices eager: %.6f seconds, "
+        "lazy: %.6f seconds",
+        count,
+        eager,
+        lazy,
+    )
+
+    assert lazy < eager
@@ -0,0 +1,212 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import threading
+import time
+
+import pytest
+
+from vdsm.virt import eventqueue
+
+
+class Recorder:
+
+    def __init__(self):
+        self.events = []
+        self.threads = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, key, value, delay=0):
+        time.sleep(delay)
+        with self.lock:
+            self.events.append((key, value))
+            self.threads.setdefault(key, set()).add(
+                threading.current_thread().name
+            )
+
+    def values(self, key):
+        with self.lock:
+            return [v for k, v in self.events if k == key]
+
+
+@pytest.fixture
+def dispatcher():
+    d = eventqueue.Dispatcher(4, name="test/events")
+    d.start()
+    yield d
+    d.stop()
+    d.wait(5)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise RuntimeError("Timeout waiting for {}".format(predicate))
+        time.sleep(0.005)
+
+
+def test_order_per_key(dispatcher):
+    rec = Recorder()
+    for i in range(50):
+        for key in ("vm-1", "vm-2", "vm-3"):
+            dispatcher.dispatch(key, rec, key, i)
+
+    wait_for(lambda: len(rec.events) == 150)
+    for key in ("vm-1", "vm-2", "vm-3"):
+        assert rec.values(key) == list(range(50))
+
+
+def test_slow_handler_does_not_block_other_keys(dispatcher):
+    blocked = threading.Event()
+    rec = Recorder()
+    dispatcher.dispatch("slow", blocked.wait, 5)
+    dispatcher.dispatch("slow", rec, "slow", 0)
+    dispatcher.dispatch("fast", rec, "fast", 0)
+
+    wait_for(lambda: rec.values("fast") == [0])
+    assert rec.values("slow") == []
+
+    blocked.set()
+    wait_for(lambda: rec.values("slow") == [0])
+
+
+def test_coalesce_pending(dispatcher):
+    blocked = threading.Event()
+    rec = Recorder()
+    dispatcher.dispatch("vm", blocked.wait, 5)
+    dispatcher.dispatch("vm", rec, "vm", 1, coalesce="vda")
+    dispatcher.dispatch("vm", rec, "vm", 2, coalesce="vdb")
+    dispatcher.dispatch("vm", rec, "vm", 3, coalesce="vda")
+    dispatcher.dispatch("vm", rec, "vm", 4)
+    dispatcher.dispatch("vm", rec, "vm", 5, coalesce="vda")
+    blocked.set()
+
+    wait_for(lambda: len(rec.events) == 3)
+    # The first pending event was updated with the arguments of the last
+    # event, keeping its place in the queue.
+    assert rec.values("vm") == [5, 2, 4]
+    assert dispatcher.stats()["coalesced"] == 2
+
+
+def test_coalesce_running_event(dispatcher):
+    started = threading.Event()
+    blocked = threading.Event()
+    rec = Recorder()
+
+    def handler(value):
+        started.set()
+        blocked.wait(5)
+        rec("vm", value)
+
+    dispatcher.dispatch("vm", handler, 1, coalesce="vda")
+    started.wait(5)
+    # The running event cannot be updated, so this event is queued.
+    dispatcher.dispatch("vm", rec, "vm", 2, coalesce="vda")
+    blocked.set()
+
+    wait_for(lambda: len(rec.events) == 2)
+    assert rec.values("vm") == [1, 2]
+
+
+def test_handler_error(dispatcher):
+    rec = Recorder()
+
+    def fail():
+        raise RuntimeError("Handler failed")
+
+    dispatcher.dispatch("vm", fail)
+    dispatcher.dispatch("vm", rec, "vm", 1)
+    wait_for(lambda: rec.values("vm") == [1])
+
+
+def test_not_started():
+    d = eventqueue.Dispatcher(4)
+    rec = Recorder()
+    d.dispatch("vm", rec, "vm", 1)
+    assert rec.values("vm") == [1]
+    assert rec.threads["vm"] == {threading.current_thread().name}
+
+
+def test_no_workers():
+    d = eventqueue.Dispatcher(0)
+    d.start()
+    rec = Recorder()
+    d.dispatch("vm", rec, "vm", 1)
+    assert rec.values("vm") == [1]
+    d.stop()
+
+
+def test_stop_drops_pending():
+    d = eventqueue.Dispatcher(1)
+    d.start()
+    started = threading.Event()
+    blocked = threading.Event()
+    rec = Recorder()
+
+    def handler():
+        started.set()
+        blocked.wait(5)
+
+    d.dispatch("vm", handler)
+    started.wait(5)
+    d.dispatch("vm", rec, "vm", 1)
+    d.stop()
+    blocked.set()
+    d.wait(5)
+
+    assert rec.values("vm") == []
+    assert d.stats()["pending"] == 0
+
+
+def test_stats():
+    now = [0.0]
+    d = eventqueue.Dispatcher(1, clock=lambda: now[0])
+    d.start()
+    try:
+        blocked = threading.Event()
+        rec = Recorder()
+        d.dispatch("vm-1", blocked.wait, 5)
+        wait_for(lambda: d.stats()["dispatched"] == 1)
+
+        d.dispatch("vm-1", rec, "vm-1", 1)
+        now[0] = 2.0
+        d.dispatch("vm-2", rec, "vm-2", 1)
+        assert d.stats() == {
+            "pending": 2,
+            "dispatched": 0,
+            "coalesced": 0,
+            "latency": 0.0,
+            "max_latency": 0.0,
+        }
+
+        now[0] = 4.0
+        blocked.set()
+        wait_for(lambda: len(rec.events) == 2)
+        assert d.stats() == {
+            "pending": 0,
+            "dispatched": 2,
+            "coalesced": 0,
+            "latency": 3.0,
+            "max_latency": 4.0,
+        }
+    finally:
+        d.stop()
+        d.wait(5)
+
+
+@pytest.mark.slow
+def test_parallel_handlers(dispatcher):
+    # 10 VMs getting 10 events taking 10 milliseconds each. Handling the
+    # events in the libvirt event loop thread takes 1 second.
+    rec = Recorder()
+    start = time.monotonic()
+    for i in range(10):
+        for n in range(10):
+            dispatcher.dispatch("vm-{}".format(n), rec, n, i, 0.01)
+    wait_for(lambda: len(rec.events) == 100)
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.5
+    for n in range(10):
+        assert rec.values(n) == list(range(10))
@@ -7,6 +7,7 @@ import logging
 import os
 import threading
 import time
+import types
 import yaml
 
 import pytest
@@ -18,6 +19,7 @@ from vdsm.common.config import config
 from vdsm.common.units import GiB, MiB
 
 from vdsm.virt import errors
+from vdsm.virt import livemerge
 from vdsm.virt import metadata
 from vdsm.virt import migration
 from vdsm.virt import thinp
@@ -33,7 +35,7 @@ from vdsm.virt.livemerge import (
 from vdsm.virt.vm import Vm
 from vdsm.virt.vmdevices import storage
 
-from testlib import maybefail, recorded, read_data, read_files
+from testlib import make_config, maybefail, recorded, read_data, read_files
 
 from . import vmfakelib as fake
 
@@ -1458,6 +1460,362 @@ def test_merge_base_too_small(monkeypatch):
     assert parse_jobs(vm) == {}
 
 
+def test_merge_drives_persisted_job():
+    config = Config('internal-merge')
+    sd_id = config.values["drive"]["domainID"]
+    img_id = config.values["drive"]["imageID"]
+    merge_params = config.values["merge_params"]
+    job_id = merge_params["jobUUID"]
+    top_id = merge_params["topVolUUID"]
+    base_id = merge_params["baseVolUUID"]
+
+    vm = RunningVM(config)
+
+    simulate_base_needs_extend(
+        vm, sd_id, img_id, top_id, base_id, active=False
+    )
+
+    vm.merge_drives(
+        [
+            {
+                "drive": merge_params["driveSpec"],
+                "baseVolUUID": base_id,
+                "topVolUUID": top_id,
+                "jobUUID": job_id,
+            }
+        ],
+        "batch-id",
+    )
+
+    # The job is persisted with the batch.
+    persisted_job = parse_jobs(vm)[job_id]
+    assert persisted_job["state"] == Job.EXTEND
+    assert persisted_job["batch"] == {"id": "batch-id", "size": 1}
+
+    simulate_volume_extension(vm, base_id)
+
+    persisted_job = parse_jobs(vm)[job_id]
+    assert persisted_job["state"] == Job.COMMIT
+
+    block_job = vm._dom.block_jobs["sda"]
+    block_job["cur"] = block_job["end"] // 2
+
+    info = vm.query_jobs()[job_id]
+    assert info["batch"] == {
+        "id": "batch-id",
+        "jobs": 1,
+        "finished": 0,
+        "progress": 50,
+    }
+
+    # Loading persisted jobs keeps the batch.
+    jobs = vm._drive_merger.dump_jobs()
+    vm._drive_merger.load_jobs(jobs)
+    assert vm._drive_merger.dump_jobs() == jobs
+
+
+class BatchDrive:
+
+    diskType = storage.DISK_TYPE.BLOCK
+    chunked = True
+    domainID = "sd-id"
+    poolID = "pool-id"
+
+    def __init__(self, index):
+        self.name = "vd" + chr(ord("a") + index)
+        self.alias = "ua-" + self.name
+        self.imageID = "img-{}".format(index)
+        self.volumeID = "leaf-{}".format(index)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def getMaxVolumeSize(self, capacity):
+        return capacity * 2
+
+    def volume_target(self, vol_id, actual_chain):
+        return vol_id
+
+
+class BatchDomain:
+
+    def __init__(self):
+        self.block_jobs = {}
+
+    def blockCommit(self, drive, base_target, top_target, bandwidth, flags=0):
+        self.block_jobs[drive] = {
+            "bandwidth": 0,
+            "cur": 0,
+            "end": 100,
+            "type": libvirt.VIR_DOMAIN_BLOCK_JOB_TYPE_COMMIT,
+        }
+
+    def blockJobInfo(self, drive, flags=0):
+        return self.block_jobs.get(drive, {})
+
+
+class BatchVM:
+    """
+    VM with many drives, each merging top-N into base-N, where base-N needs
+    extension.
+    """
+
+    log = logging.getLogger("test")
+
+    def __init__(self, drives):
+        self._dom = BatchDomain()
+        self.drives = {
+            drive.imageID: drive for drive in map(BatchDrive, range(drives))
+        }
+        self.extend_requests = []
+        self.measured = []
+        self.persisted = 0
+        self._drive_merger = DriveMerger(self)
+
+    def merge_drives(self, merges, batch_id):
+        return self._drive_merger.merge_drives(merges, batch_id)
+
+    def query_jobs(self):
+        return self._drive_merger.query_jobs()
+
+    def findDriveByUUIDs(self, drive_spec):
+        try:
+            return self.drives[drive_spec["imageID"]]
+        except KeyError:
+            raise LookupError(drive_spec["imageID"])
+
+    def getVolumeInfo(self, sd_id, sp_id, img_id, vol_id):
+        return {
+            "uuid": vol_id,
+            "voltype": "INTERNAL",
+            "format": "COW",
+            "capacity": 10 * GiB,
+            "apparentsize": 1 * GiB,
+        }
+
+    def prune_bitmaps(self, sd_id, img_id, top_id, base_id):
+        pass
+
+    def measure(self, sd_id, img_id, top_id, dest_format, baseID=None):
+        self.measured.append(img_id)
+        return {"required": 2 * GiB}
+
+    def extend_volume(self, drive, vol_id, new_size, callback=None):
+        self.extend_requests.append((drive, callback))
+
+    def query_drive_volume_chain(self, drive):
+        i = drive.imageID.split("-")[1]
+        return [
+            types.SimpleNamespace(uuid=vol_id)
+            for vol_id in ("base-" + i, "top-" + i, drive.volumeID)
+        ]
+
+    def sync_jobs_metadata(self):
+        self.persisted += 1
+
+    def sync_metadata(self):
+        pass
+
+    def update_domain_descriptor(self):
+        pass
+
+    def sync_disk_metadata(self):
+        pass
+
+    def updateVmJobs(self):
+        pass
+
+
+class BatchCleanupThread(CleanupThread):
+
+    def run(self):
+        self._setState(self.DONE)
+
+
+def batch_merges(vm):
+    merges = []
+    for drive in vm.drives.values():
+        i = drive.imageID.split("-")[1]
+        merges.append(
+            {
+                "drive": {
+                    "poolID": drive.poolID,
+                    "domainID": drive.domainID,
+                    "imageID": drive.imageID,
+                    "volumeID": drive.volumeID,
+                },
+                "baseVolUUID": "base-" + i,
+                "topVolUUID": "top-" + i,
+                "jobUUID": "job-" + i,
+            }
+        )
+    return merges
+
+
+def batch_states(vm):
+    states = {}
+    for job in vm._drive_merger.dump_jobs().values():
+        states[job["state"]] = states.get(job["state"], 0) + 1
+    return states
+
+
+@pytest.fixture
+def batch_vm(monkeypatch):
+    monkeypatch.setattr(
+        livemerge,
+        "config",
+        make_config([("vars", "max_batch_merge_commits", "2")]),
+    )
+    monkeypatch.setattr(livemerge, "CleanupThread", BatchCleanupThread)
+    return BatchVM(5)
+
+
+def test_merge_drives(batch_vm):
+    vm = batch_vm
+    vm.merge_drives(batch_merges(vm), "batch-id")
+
+    # All bases were measured, the jobs persisted once, and the extends of
+    # all bases requested together.
+    assert sorted(vm.measured) == sorted(vm.drives)
+    assert vm.persisted == 1
+    assert len(vm.extend_requests) == 5
+    assert batch_states(vm) == {Job.EXTEND: 5}
+
+    # Complete all extends. Only 2 commits are started, the other jobs wait.
+    for _, callback in vm.extend_requests:
+        callback()
+    assert batch_states(vm) == {Job.COMMIT: 2, Job.WAIT: 3}
+    assert len(vm._dom.block_jobs) == 2
+
+    # Aggregate progress.
+    for block_job in vm._dom.block_jobs.values():
+        block_job["cur"] = 50
+    info = vm.query_jobs()
+    for job_info in info.values():
+        assert job_info["batch"] == {
+            "id": "batch-id",
+            "jobs": 5,
+            "finished": 0,
+            "progress": 20,
+        }
+
+    # Both commits finish, and the jobs switch to cleanup together.
+    vm._dom.block_jobs.clear()
+    persisted = vm.persisted
+    vm.query_jobs()
+    assert vm.persisted == persisted + 1
+    assert batch_states(vm) == {Job.CLEANUP: 2, Job.WAIT: 3}
+    vm._drive_merger.wait_for_cleanup(TIMEOUT)
+
+    # When cleanup is done, the jobs are untracked together, and the next
+    # commits are started.
+    persisted = vm.persisted
+    info = vm.query_jobs()
+    assert vm.persisted == persisted + 2
+    assert batch_states(vm) == {Job.COMMIT: 2, Job.WAIT: 1}
+    assert len(vm._dom.block_jobs) == 2
+    for job_info in info.values():
+        assert job_info["batch"]["finished"] == 2
+        assert job_info["batch"]["progress"] == 40
+
+    # Complete the rest of the jobs.
+    for _ in range(2):
+        vm._dom.block_jobs.clear()
+        vm.query_jobs()
+        vm._drive_merger.wait_for_cleanup(TIMEOUT)
+        vm.query_jobs()
+
+    assert vm.query_jobs() == {}
+
+
+def test_merge_drives_job_exists(batch_vm):
+    vm = batch_vm
+    merges = batch_merges(vm)
+    vm.merge_drives(merges[:1], "batch-1")
+
+    # One of the drives is already merged, so no job is started.
+    with pytest.raises(exception.MergeFailed):
+        vm.merge_drives(merges, "batch-2")
+
+    assert list(vm._drive_merger.dump_jobs()) == [merges[0]["jobUUID"]]
+    assert len(vm.extend_requests) == 1
+
+
+def test_merge_drives_measure_error(batch_vm, monkeypatch):
+    vm = batch_vm
+
+    def measure(sd_id, img_id, top_id, dest_format, baseID=None):
+        if img_id == "img-3":
+            raise errors.StorageUnavailableError("Cannot measure")
+        return {"required": 2 * GiB}
+
+    monkeypatch.setattr(vm, "measure", measure)
+
+    with pytest.raises(errors.StorageUnavailableError):
+        vm.merge_drives(batch_merges(vm), "batch-id")
+
+    assert vm._drive_merger.dump_jobs() == {}
+    assert vm.persisted == 0
+    assert vm.extend_requests == []
+
+
+def test_merge_drives_commit_error(batch_vm, monkeypatch):
+    vm = batch_vm
+
+    def commit_error(drive, *args, **kwargs):
+        if drive == "vda":
+            raise fake.libvirt_error(
+                [libvirt.VIR_ERR_INTERNAL_ERROR], "Block commit failed"
+            )
+        BatchDomain.blockCommit(vm._dom, drive, *args, **kwargs)
+
+    monkeypatch.setattr(vm._dom, "blockCommit", commit_error)
+
+    vm.merge_drives(batch_merges(vm), "batch-id")
+    for _, callback in vm.extend_requests:
+        callback()
+
+    # The failed job was untracked, and the next job started instead.
+    assert "job-0" not in vm._drive_merger.dump_jobs()
+    assert batch_states(vm) == {Job.COMMIT: 2, Job.WAIT: 2}
+
+    info = vm.query_jobs()
+    for job_info in info.values():
+        assert job_info["batch"]["finished"] == 1
+
+
+def test_merge_drives_start_commit_error(batch_vm, monkeypatch):
+    vm = batch_vm
+
+    def measure(sd_id, img_id, top_id, dest_format, baseID=None):
+        # Base does not need extend, so commits are started immediately.
+        return {"required": 1 * GiB}
+
+    def commit_error(drive, *args, **kwargs):
+        if drive == "vda":
+            raise fake.libvirt_error(
+                [libvirt.VIR_ERR_INTERNAL_ERROR], "Block commit failed"
+            )
+        BatchDomain.blockCommit(vm._dom, drive, *args, **kwargs)
+
+    monkeypatch.setattr(vm, "measure", measure)
+    monkeypatch.setattr(vm._dom, "blockCommit", commit_error)
+
+    with pytest.raises(exception.MergeFailed) as e:
+        vm.merge_drives(batch_merges(vm), "batch-id")
+
+    # The failed job is reported to the caller.
+    assert list(e.value.context["jobs"]) == ["job-0"]
+
+    # The failed job was untracked, and the other jobs were started.
+    assert "job-0" not in vm._drive_merger.dump_jobs()
+    assert batch_states(vm) == {Job.COMMIT: 1, Job.WAIT: 3}
+
+    # The next job is started on the next update.
+    vm.query_jobs()
+    assert batch_states(vm) == {Job.COMMIT: 2, Job.WAIT: 2}
+
+
 def simulate_base_needs_extend(
     vm, sd_id, img_id, top_id, base_id, active=True
 ):
@@ -325,6 +325,43 @@ class DescriptorTests(XMLTestCase):
         with self.md_desc.values() as vals:
             assert vals == {}
 
+    def test_dump_skips_unchanged(self):
+        dom = FakeDomain()
+        with self.md_desc.values() as vals:
+            vals['foo'] = 'bar'
+        self.md_desc.dump(dom)
+        dom.xml.clear()
+
+        self.md_desc.dump(dom)
+        assert dom.xml == {}
+        assert self.md_desc.dump_info() == {"written": 1, "skipped": 1}
+
+    def test_dump_changed(self):
+        dom = FakeDomain()
+        with self.md_desc.values() as vals:
+            vals['foo'] = 'bar'
+        self.md_desc.dump(dom)
+
+        with self.md_desc.values() as vals:
+            vals['foo'] = 'baz'
+        self.md_desc.dump(dom)
+
+        md_desc = metadata.Descriptor()
+        md_desc.load(dom)
+        with md_desc.values() as vals:
+            assert vals == {'foo': 'baz'}
+        assert self.md_desc.dump_info() == {"written": 2, "skipped": 0}
+
+    def test_dump_other_domain(self):
+        with self.md_desc.values() as vals:
+            vals['foo'] = 'bar'
+        self.md_desc.dump(FakeDomain())
+
+        dom = FakeDomain()
+        self.md_desc.dump(dom)
+        assert dom.xml
+        assert self.md_desc.dump_info() == {"written": 2, "skipped": 0}
+
     def test_context_creates_missing_element(self):
         # libvirt takes care of namespace massaging
         expected_xml = u'''<vm />'''
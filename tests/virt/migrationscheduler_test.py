@@ -0,0 +1,412 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import logging
+import threading
+import time
+
+import pytest
+
+from vdsm.common.units import MiB, GiB
+from vdsm.virt import migrationscheduler
+
+log = logging.getLogger("test")
+
+
+class FakeMigration:
+
+    def __init__(self, name, memory, bandwidth=52, dirty_rate=0):
+        self.name = name
+        self.memory = memory
+        self.remaining = memory
+        self.dirty_rate = dirty_rate
+        self.hibernating = False
+        self.bandwidth = bandwidth
+        self.bandwidth_limit = None
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.finish_time = None
+        self._thread = None
+
+    def memory_size(self):
+        return self.memory
+
+    def data_remaining(self):
+        return self.remaining
+
+    def set_scheduled_bandwidth(self, bandwidth):
+        self.bandwidth = bandwidth
+
+    def start(self, scheduler):
+        self._thread = threading.Thread(
+            target=self._run, args=(scheduler,), daemon=True
+        )
+        self._thread.start()
+
+    def finish(self):
+        self.done.set()
+        self._thread.join()
+
+    def _run(self, scheduler):
+        with scheduler.schedule(self):
+            self.started.set()
+            self.done.wait()
+
+    def __repr__(self):
+        return "<FakeMigration {}>".format(self.name)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise RuntimeError("Timeout waiting for {}".format(predicate))
+        time.sleep(0.005)
+
+
+def queue(scheduler, migrations):
+    # Start migrations one by one, so they are queued in order.
+    for m in migrations:
+        waiting = scheduler.info()["waiting"]
+        m.start(scheduler)
+        wait_for(
+            lambda: m.started.is_set() or scheduler.info()["waiting"] > waiting
+        )
+
+
+def running(migrations):
+    return [m.name for m in migrations if m.started.is_set()]
+
+
+def test_invalid_order():
+    with pytest.raises(ValueError):
+        migrationscheduler.Scheduler(1, order="largest")
+
+
+def test_bound():
+    s = migrationscheduler.Scheduler(2)
+    migrations = [FakeMigration(str(i), GiB) for i in range(3)]
+    queue(s, migrations)
+    wait_for(lambda: len(running(migrations)) == 2)
+    assert s.info()["waiting"] == 1
+
+    migrations[0].finish()
+    migrations[2].started.wait(5)
+    assert running(migrations) == ["0", "1", "2"]
+
+    for m in migrations[1:]:
+        m.finish()
+    assert s.info()["running"] == 0
+
+
+def test_bound_increase():
+    s = migrationscheduler.Scheduler(1)
+    migrations = [FakeMigration(str(i), GiB) for i in range(3)]
+    queue(s, migrations)
+    assert running(migrations) == ["0"]
+
+    s.bound = 3
+    wait_for(lambda: len(running(migrations)) == 3)
+
+    for m in migrations:
+        m.finish()
+
+
+def test_bound_decrease():
+    s = migrationscheduler.Scheduler(2)
+    migrations = [FakeMigration(str(i), GiB) for i in range(4)]
+    queue(s, migrations)
+    s.bound = 1
+
+    # Running migrations are not affected, but the next migration can start
+    # only when both finished.
+    migrations[0].finish()
+    assert s.info() == dict(s.info(), running=1, waiting=2)
+    migrations[1].finish()
+    migrations[2].started.wait(5)
+    assert s.info() == dict(s.info(), running=1, waiting=1)
+
+    for m in migrations[2:]:
+        m.finish()
+
+
+@pytest.mark.parametrize(
+    "order, expected",
+    [
+        (migrationscheduler.ORDER_FIFO, ["8g", "4g", "16g", "1g", "2g"]),
+        (migrationscheduler.ORDER_MEMORY, ["8g", "1g", "2g", "4g", "16g"]),
+    ],
+)
+def test_order(order, expected):
+    s = migrationscheduler.Scheduler(1, order=order)
+    migrations = [
+        FakeMigration("8g", 8 * GiB),
+        FakeMigration("4g", 4 * GiB),
+        FakeMigration("16g", 16 * GiB),
+        FakeMigration("1g", 1 * GiB),
+        FakeMigration("2g", 2 * GiB),
+    ]
+    queue(s, migrations)
+
+    started = []
+    for _ in migrations:
+        wait_for(lambda: len(running(migrations)) > len(started))
+        m = next(
+            m for m in migrations if m.started.is_set() and not m.done.is_set()
+        )
+        started.append(m)
+        m.finish()
+
+    assert [m.name for m in started] == expected
+
+
+def test_bandwidth_disabled():
+    s = migrationscheduler.Scheduler(2)
+    migrations = [FakeMigration(str(i), GiB, bandwidth=52) for i in range(2)]
+    queue(s, migrations)
+    assert [m.bandwidth for m in migrations] == [52, 52]
+
+    for m in migrations:
+        m.finish()
+
+
+def test_bandwidth_divided():
+    s = migrationscheduler.Scheduler(3, bandwidth=1000)
+    migrations = [FakeMigration(str(i), GiB) for i in range(4)]
+
+    queue(s, migrations[:1])
+    assert migrations[0].bandwidth == 1000
+
+    queue(s, migrations[1:])
+    assert [m.bandwidth for m in migrations[:3]] == [333, 333, 334]
+
+    # The waiting migration got the bandwidth of the finished one.
+    migrations[0].finish()
+    migrations[3].started.wait(5)
+    assert [m.bandwidth for m in migrations[1:]] == [333, 333, 334]
+
+    migrations[1].finish()
+    assert [m.bandwidth for m in migrations[2:]] == [500, 500]
+
+    for m in migrations[2:]:
+        m.finish()
+
+
+def test_bandwidth_limit():
+    s = migrationscheduler.Scheduler(3, bandwidth=1000)
+    migrations = [FakeMigration(str(i), GiB) for i in range(3)]
+    queue(s, migrations)
+
+    # Bandwidth not used by the limited migration is divided between the
+    # other migrations.
+    migrations[1].bandwidth_limit = 100
+    s.rebalance()
+    assert [m.bandwidth for m in migrations] == [450, 100, 450]
+
+    # Limit higher than the share does not change anything.
+    migrations[1].bandwidth_limit = 800
+    s.rebalance()
+    assert [m.bandwidth for m in migrations] == [333, 333, 334]
+
+    for m in migrations:
+        m.finish()
+
+
+def test_bandwidth_hibernation():
+    s = migrationscheduler.Scheduler(2, bandwidth=1000)
+    hibernation = FakeMigration("hibernation", GiB, bandwidth=52)
+    hibernation.hibernating = True
+    migration = FakeMigration("migration", GiB)
+    queue(s, [hibernation, migration])
+
+    assert hibernation.bandwidth == 52
+    assert migration.bandwidth == 1000
+
+    hibernation.finish()
+    migration.finish()
+
+
+def test_bandwidth_error():
+    class FailingMigration(FakeMigration):
+        def set_scheduled_bandwidth(self, bandwidth):
+            raise RuntimeError("Migration not running")
+
+    s = migrationscheduler.Scheduler(2, bandwidth=1000)
+    migrations = [FailingMigration("0", GiB), FakeMigration("1", GiB)]
+    queue(s, migrations)
+
+    assert migrations[1].bandwidth == 500
+
+    for m in migrations:
+        m.finish()
+
+
+def test_eta_idle():
+    s = migrationscheduler.Scheduler(2)
+    assert s.eta() == 0
+
+
+def test_eta_host_bandwidth():
+    s = migrationscheduler.Scheduler(1, bandwidth=1024)
+    migrations = [FakeMigration(str(i), 4 * GiB) for i in range(3)]
+    queue(s, migrations)
+    migrations[0].remaining = 2 * GiB
+
+    # 2 GiB remaining + 8 GiB waiting at 1 GiB/s.
+    assert s.eta() == 10
+
+    for m in migrations:
+        m.finish()
+
+
+def test_eta_migrations_bandwidth():
+    s = migrationscheduler.Scheduler(2)
+    migrations = [FakeMigration(str(i), GiB, bandwidth=256) for i in range(2)]
+    queue(s, migrations)
+
+    # 2 GiB at 512 MiB/s.
+    assert s.eta() == 4
+
+    for m in migrations:
+        m.finish()
+
+
+def test_eta_unknown_bandwidth():
+    s = migrationscheduler.Scheduler(1)
+    migrations = [FakeMigration(str(i), GiB, bandwidth=0) for i in range(2)]
+    queue(s, migrations)
+
+    assert s.eta() is None
+
+    for m in migrations:
+        m.finish()
+
+
+# 10 Gbit/s migration network.
+LINK = 1190
+
+# Memory size and dirty rate in MiB per second of the VMs on a host being
+# evacuated, in the order engine requests the migrations.
+HOST = [
+    (64 * GiB, 200),
+    (4 * GiB, 20),
+    (32 * GiB, 300),
+    (2 * GiB, 10),
+    (8 * GiB, 50),
+    (16 * GiB, 100),
+    (1 * GiB, 5),
+    (4 * GiB, 40),
+    (2 * GiB, 20),
+    (8 * GiB, 80),
+]
+
+MAX_OUTGOING = 2
+
+
+class Evacuation:
+    """
+    Simulate evacuation of a host, migrating VMs over a shared link.
+
+    Every tick, a migration sends data at the lower of its bandwidth and its
+    fair share of the link. The guest dirties memory during the migration,
+    so the migration completes when the bandwidth is higher than the dirty
+    rate and the remaining data can be sent within a tick.
+    """
+
+    TICK = 1
+
+    def __init__(self, scheduler, static_bandwidth):
+        self.scheduler = scheduler
+        self.time = 0
+        self.migrations = [
+            FakeMigration(
+                str(i), memory, bandwidth=static_bandwidth, dirty_rate=dirty
+            )
+            for i, (memory, dirty) in enumerate(HOST)
+        ]
+        self.eta = None
+
+    def run(self):
+        queue(self.scheduler, self.migrations)
+        self.eta = self.scheduler.eta()
+        while not all(m.done.is_set() for m in self.migrations):
+            self._tick()
+            if self.time > 3600:
+                raise RuntimeError("Evacuation did not complete")
+
+    @property
+    def mean_completion(self):
+        return sum(m.finish_time for m in self.migrations) / len(
+            self.migrations
+        )
+
+    def _tick(self):
+        active = [
+            m
+            for m in self.migrations
+            if m.started.is_set() and not m.done.is_set()
+        ]
+        link_share = LINK / len(active)
+        self.time += self.TICK
+        for m in active:
+            rate = min(m.bandwidth, link_share) * MiB
+            sent = rate * self.TICK
+            if m.remaining <= sent:
+                m.finish_time = self.time
+                m.finish()
+            else:
+                m.remaining -= sent
+                m.remaining += min(rate, m.dirty_rate * MiB) * self.TICK
+
+        # Wait until the next migrations started.
+        wait_for(
+            lambda: self.scheduler.info()["running"]
+            == len(
+                [
+                    m
+                    for m in self.migrations
+                    if m.started.is_set() and not m.done.is_set()
+                ]
+            )
+        )
+
+
+def simulate(order, bandwidth):
+    scheduler = migrationscheduler.Scheduler(
+        MAX_OUTGOING, bandwidth=bandwidth, order=order
+    )
+    evacuation = Evacuation(scheduler, static_bandwidth=LINK // MAX_OUTGOING)
+    evacuation.run()
+    return evacuation
+
+
+def test_simulate_evacuation():
+    current = simulate(migrationscheduler.ORDER_FIFO, 0)
+    ordered = simulate(migrationscheduler.ORDER_MEMORY, 0)
+    scheduled = simulate(migrationscheduler.ORDER_MEMORY, LINK)
+
+    for name, sim in [
+        ("current", current),
+        ("ordered", ordered),
+        ("scheduled", scheduled),
+    ]:
+        log.info(
+            "%s: evacuation %d seconds, mean completion %.1f seconds, "
+            "eta %s seconds",
+            name,
+            sim.time,
+            sim.mean_completion,
+            sim.eta,
+        )
+
+    # Starting small VMs first minimizes the time VMs wait for migration.
+    assert ordered.mean_completion < current.mean_completion * 0.7
+
+    # Using all the link when one migration is left shortens the
+    # evacuation.
+    assert scheduled.time < ordered.time
+    assert scheduled.time < current.time
+    assert scheduled.mean_completion <= ordered.mean_completion
+
+    # The estimate ignores memory dirtied during migration.
+    assert scheduled.eta <= scheduled.time
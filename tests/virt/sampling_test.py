@@ -219,6 +219,12 @@ class NumaNodeMemorySampleTests(TestCaseBase):
                 (numa, 'topology', fakeNumaTopology),
                 (numa, 'memory_by_cell', fakeMemoryStats),
                 (numa.libvirtconnection, 'get', lambda: fakeConnection),
+                # Kernel without numa nodes, using libvirt memory stats.
+                (
+                    sampling,
+                    '_NODE_MEMINFO_PATH',
+                    '/no/such/node/node%s/meminfo',
+                ),
             ]
         )
 
@@ -273,6 +279,37 @@ class NumaNodeMemorySampleTests(TestCaseBase):
             assert memorySample.nodesMemSample == expected
 
 
+NODE_MEMINFO = """\
+Node 1 MemTotal:       32657 kB
+Node 1 MemFree:        13082 kB
+Node 1 MemUsed:        19575 kB
+Node 1 Active:          9536 kB
+"""
+
+
+def test_node_memory(tmpdir, monkeypatch):
+    tmpdir.mkdir("node1").join("meminfo").write(NODE_MEMINFO * 100)
+    path = str(tmpdir.join("node%s", "meminfo"))
+    monkeypatch.setattr(sampling, "_NODE_MEMINFO_PATH", path)
+    monkeypatch.setattr(numa, "memory_by_cell", None)
+
+    # The buffer grows to the size of the file, and is reused.
+    for _ in range(2):
+        assert sampling._node_memory("1", 1) == {
+            'total': '31',
+            'free': '12',
+        }
+
+
+def test_node_memory_missing_info(tmpdir, monkeypatch):
+    tmpdir.mkdir("node0").join("meminfo").write("Node 0 MemUsed: 1 kB\n")
+    path = str(tmpdir.join("node%s", "meminfo"))
+    monkeypatch.setattr(sampling, "_NODE_MEMINFO_PATH", path)
+
+    with pytest.raises(ValueError):
+        sampling._node_memory("0", -1)
+
+
 class HostStatsMonitorTests(TestCaseBase):
     FAILED_SAMPLE = 3  # random 'small' value
     STOP_SAMPLE = 6  # ditto
@@ -312,6 +349,72 @@ class HostStatsMonitorTests(TestCaseBase):
             assert last.id == FakeHostSample.counter - 1
 
 
+PROC_STAT = """\
+cpu  4350684 14521 1120299 20687999 677480 197238 48056 0 1383 0
+cpu0 1082143 1040 335283 19253788 628168 104752 21570 0 351 0
+cpu1 1010362 2065 294113 474697 18915 41743 9793 0 308 0
+cpu3 961889 4603 207289 486787 11732 20192 6916 0 511 0
+intr 114930548 113199788 3 0 5 263 0 4 [...]
+ctxt 690239751
+btime 1395249141
+processes 450432
+"""
+
+
+@pytest.fixture
+def proc_stat(tmpdir):
+    path = tmpdir.join("stat")
+    path.write(PROC_STAT)
+    return str(path)
+
+
+def test_cpu_stat(proc_stat):
+    stat = sampling._CpuStat(sampling._ProcFile(proc_stat))
+    assert stat.total == (4350684, 14521, 1120299, 20687999)
+    assert list(stat.ids) == [0, 1, 3]
+    assert list(stat.user) == [1082143, 1010362, 961889]
+    assert list(stat.userNice) == [1040, 2065, 4603]
+    assert list(stat.sys) == [335283, 294113, 207289]
+    assert list(stat.idle) == [19253788, 474697, 486787]
+
+
+def test_cpu_stat_grow_buffer(proc_stat):
+    proc_file = sampling._ProcFile(proc_stat, size=16)
+    for _ in range(2):
+        stat = sampling._CpuStat(proc_file)
+        assert list(stat.ids) == [0, 1, 3]
+
+
+def test_cpu_stat_missing_total(tmpdir):
+    path = tmpdir.join("stat")
+    path.write("intr 114930548\n")
+    with pytest.raises(ValueError):
+        sampling._CpuStat(sampling._ProcFile(str(path)))
+
+
+def test_total_cpu_sample(proc_stat):
+    stat = sampling._CpuStat(sampling._ProcFile(proc_stat))
+    sample = sampling.TotalCpuSample(stat)
+    assert sample.user == 4350684 + 14521
+    assert sample.sys == 1120299
+    assert sample.idle == 20687999
+
+
+def test_cpu_core_sample(proc_stat):
+    stat = sampling._CpuStat(sampling._ProcFile(proc_stat))
+    sample = sampling.CpuCoreSample(stat)
+    assert sample.position(3) == 2
+    assert sample.position(2) is None
+    assert sample.getCoreSample(1) == {
+        'user': 1010362,
+        'userNice': 2065,
+        'sys': 294113,
+        'idle': 474697,
+    }
+    assert sample.getCoreSample('3')['user'] == 961889
+    assert sample.getCoreSample(2) is None
+
+
 class FakeClock(object):
 
     STEP = 1
@@ -0,0 +1,245 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import logging
+import threading
+import time
+
+import pytest
+
+from vdsm import jobs
+from vdsm.common import exception
+from vdsm.common import response
+from vdsm.virt import vmxml
+from vdsm.virt.jobs import snapshot
+
+JOB_UUID = "d0a51930-0b9a-4b5e-8d3c-000000000001"
+
+
+class FakeNotifier:
+
+    def notify(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def notifier():
+    jobs.start(None, FakeNotifier())
+    yield
+    jobs.stop()
+
+
+class FakeDrive:
+
+    hasVolumeLeases = False
+    transientDisk = False
+    diskType = "block"
+    poolID = "pool"
+
+    def __init__(self, name, volume_id):
+        self.name = name
+        self.volume_id = volume_id
+
+    def get_snapshot_xml(self, snap_info):
+        return vmxml.Element(
+            "disk", name=self.name, snapshot="external", type="block"
+        )
+
+    def getXML(self):
+        return vmxml.Element("disk", name=self.name)
+
+
+class FakeVolumeMonitor:
+
+    def __init__(self, events):
+        self._events = events
+
+    def enable(self):
+        self._events.append("monitor enabled")
+
+    def disable(self):
+        self._events.append("monitor disabled")
+
+
+class FakeClientIF:
+
+    def __init__(self, events, delay, fail):
+        self._events = events
+        self._delay = delay
+        self._fail = fail
+        self._lock = threading.Lock()
+        self.preparing = 0
+        self.max_preparing = 0
+        self.prepared = set()
+
+    def prepareVolumePath(self, drive):
+        with self._lock:
+            self.preparing += 1
+            self.max_preparing = max(self.max_preparing, self.preparing)
+        try:
+            time.sleep(self._delay)
+            if drive["volumeID"] in self._fail:
+                raise RuntimeError("Cannot prepare volume")
+            with self._lock:
+                self._events.append("prepared")
+                self.prepared.add(drive["volumeID"])
+            return "/dev/vg/" + drive["volumeID"]
+        finally:
+            with self._lock:
+                self.preparing -= 1
+
+    def teardownVolumePath(self, drive):
+        with self._lock:
+            self.prepared.discard(drive["volumeID"])
+
+
+class FakeVM:
+
+    log = logging.getLogger("test")
+    id = "vm-id"
+
+    def __init__(self, drives=8, delay=0.05, fail=()):
+        self.events = []
+        self.cif = FakeClientIF(self.events, delay, fail)
+        self.volume_monitor = FakeVolumeMonitor(self.events)
+        self.drives = {
+            "vol-{}".format(i): FakeDrive("sd{}".format(i), "vol-{}".format(i))
+            for i in range(drives)
+        }
+        self.metadata = None
+
+    def findDriveByUUIDs(self, drive):
+        try:
+            return self.drives[drive["volumeID"]]
+        except KeyError:
+            raise LookupError(drive["volumeID"])
+
+    def update_snapshot_metadata(self, data):
+        self.metadata = data
+
+    def snapshot_metadata(self):
+        return self.metadata
+
+    def freeze(self):
+        self.events.append("freeze")
+        return response.success()
+
+    def thaw(self):
+        self.events.append("thaw")
+        return response.success()
+
+    def run_dom_snapshot(self, snapxml, flags):
+        self.events.append("snapshot")
+
+    def updateDriveParameters(self, drive):
+        pass
+
+    def getDiskDevices(self):
+        return list(self.drives.values())
+
+    def clear_drive_threshold(self, drive, old_volume_id):
+        pass
+
+    def updateDriveVolume(self, drive):
+        pass
+
+
+def snap_drives(vm):
+    return [
+        {
+            "domainID": "sd",
+            "imageID": "img-{}".format(volume_id),
+            "baseVolumeID": volume_id,
+            "volumeID": "new-" + volume_id,
+        }
+        for volume_id in vm.drives
+    ]
+
+
+def run_job(vm):
+    job = snapshot.Job(vm, snap_drives(vm), None, False, JOB_UUID)
+    job.autodelete = False
+    job.run()
+    return job
+
+
+def test_prepare_in_parallel():
+    vm = FakeVM(drives=8, delay=0.1)
+    start = time.monotonic()
+    job = run_job(vm)
+    elapsed = time.monotonic() - start
+
+    assert job.status == jobs.STATUS.DONE
+    assert vm.cif.max_preparing > 1
+    assert elapsed < 0.8
+    assert vm.cif.prepared == {"new-" + vol_id for vol_id in vm.drives}
+
+
+def test_freeze_only_libvirt_call():
+    vm = FakeVM()
+    run_job(vm)
+
+    # All the volumes are prepared before the guest is frozen, and the guest
+    # is thawed right after the libvirt call.
+    freeze = vm.events.index("freeze")
+    assert vm.events[:freeze].count("prepared") == len(vm.drives)
+    assert vm.events[freeze : freeze + 3] == ["freeze", "snapshot", "thaw"]
+    assert vm.events.count("thaw") == 1
+
+
+def test_prepare_failure():
+    vm = FakeVM(fail={"new-vol-3"})
+    job = run_job(vm)
+
+    assert job.status == jobs.STATUS.FAILED
+    assert "freeze" not in vm.events
+    assert "snapshot" not in vm.events
+    # All prepared volumes were torn down.
+    assert vm.cif.prepared == set()
+
+
+def test_prepare_failure_snapshot():
+    vm = FakeVM(fail={"new-vol-3"})
+    snap = snapshot.Snapshot(
+        vm,
+        snap_drives(vm),
+        None,
+        False,
+        JOB_UUID,
+        threading.Event(),
+        threading.Event(),
+        time.monotonic(),
+        1800,
+        {},
+        threading.Lock(),
+        480,
+    )
+    with pytest.raises(exception.SnapshotFailed):
+        snap.snapshot()
+
+
+def test_timing():
+    vm = FakeVM()
+    job = run_job(vm)
+    timing = job.info()["timing"]
+
+    assert set(timing) == {
+        "prepare",
+        "freeze",
+        "snapshot",
+        "frozen",
+        "teardown",
+    }
+    assert timing["frozen"] >= timing["snapshot"]
+    assert timing["prepare"] >= 0.05
+
+
+def test_timing_frozen_by_engine():
+    vm = FakeVM()
+    job = snapshot.Job(vm, snap_drives(vm), None, True, JOB_UUID)
+    job.autodelete = False
+    job.run()
+    timing = job.info()["timing"]
+
+    assert "freeze" not in vm.events
+    assert set(timing) == {"prepare", "snapshot", "teardown"}
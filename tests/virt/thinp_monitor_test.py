@@ -52,6 +52,7 @@ from vdsm import utils
 from vdsm.common import response
 from vdsm.common.config import config
 from vdsm.common.units import MiB, GiB
+from vdsm.virt.domain_descriptor import DomainDescriptor, XmlSource
 from vdsm.virt.vmdevices.storage import Drive, DISK_TYPE, BLOCK_THRESHOLD
 from vdsm.virt.vmdevices import hwclass
 from vdsm.virt.utils import TimedAcquireLock
@@ -673,6 +674,9 @@ class FakeVM(Vm):
             self.block_stats[block_info["backingIndex"]] = block_info
 
         self._devices = {hwclass.DISK: disks}
+        self._domain = DomainDescriptor(
+            self._dom.XMLDesc(), xml_source=XmlSource.INITIAL
+        )
 
         # needed for pause()/cont()
 
@@ -978,6 +978,70 @@ class TestVmDeviceHandling(TestCaseBase):
             assert devices[1].state == fake.SETUP
             assert devices[2].state == fake.CREATED
 
+    def test_nic_setup_success(self):
+        devices = [fake.Device('device_0')]
+        nics = [
+            fake.Device('nic_{}'.format(i), is_hostdevice=True)
+            for i in range(3)
+        ]
+
+        with fake.VM(self.conf, create_device_objects=True) as testvm:
+            testvm._devices['general'] = devices
+            testvm._devices[hwclass.NIC] = nics
+            self.assertNotRaises(testvm._setup_devices)
+            assert devices[0].state == fake.SETUP
+            assert all(nic.state == fake.SETUP for nic in nics)
+
+    def test_nic_setup_fail(self):
+        devices = [fake.Device('device_0')]
+        nics = [
+            fake.Device('nic_0', is_hostdevice=True),
+            fake.Device('nic_1', fail_setup=ExpectedError, is_hostdevice=True),
+            fake.Device('nic_2', is_hostdevice=True),
+        ]
+
+        with fake.VM(self.conf, create_device_objects=True) as testvm:
+            testvm._devices['general'] = devices
+            testvm._devices[hwclass.NIC] = nics
+            with pytest.raises(ExpectedError):
+                testvm._setup_devices()
+            # SR-IOV NICs are setup concurrently, all of them were setup,
+            # and all the successful ones were torn down.
+            assert devices[0].state == fake.TEARDOWN
+            assert nics[0].state == fake.TEARDOWN
+            assert nics[1].state == fake.SETUP
+            assert nics[2].state == fake.TEARDOWN
+
+    def test_bridge_nic_setup_fail(self):
+        nics = [
+            fake.Device('nic_0'),
+            fake.Device('nic_1', fail_setup=ExpectedError),
+            fake.Device('nic_2'),
+        ]
+
+        with fake.VM(self.conf, create_device_objects=True) as testvm:
+            testvm._devices[hwclass.NIC] = nics
+            with pytest.raises(ExpectedError):
+                testvm._setup_devices()
+            # Other NICs are setup sequentially with the other devices.
+            assert nics[0].state == fake.TEARDOWN
+            assert nics[1].state == fake.SETUP
+            assert nics[2].state == fake.CREATED
+
+    def test_nic_setup_skipped_on_device_failure(self):
+        devices = [fake.Device('device_0', fail_setup=ExpectedError)]
+        nics = [
+            fake.Device('nic_{}'.format(i), is_hostdevice=True)
+            for i in range(2)
+        ]
+
+        with fake.VM(self.conf, create_device_objects=True) as testvm:
+            testvm._devices['general'] = devices
+            testvm._devices[hwclass.NIC] = nics
+            with pytest.raises(ExpectedError):
+                testvm._setup_devices()
+            assert all(nic.state == fake.CREATED for nic in nics)
+
     def test_device_teardown_success(self):
         devices = [fake.Device('device_{}'.format(i)) for i in range(3)]
 
@@ -2175,6 +2239,79 @@ class MetadataTests(TestCaseBase):
         with self.test_vm(test_xml=self._TEST_XML_IMPLIED_PIN) as testvm:
             assert testvm.manually_pinned_cpus() == frozenset([0])
 
+    @MonkeyPatch(
+        vm, 'config', make_config([('vars', 'metadata_sync_delay', '60')])
+    )
+    def test_sync_metadata_delayed(self):
+        with self.test_vm() as testvm:
+            testvm._dom = fake.Domain()
+            for i in range(3):
+                with testvm._md_desc.values() as md:
+                    md['value'] = i
+                testvm.sync_metadata(delay=True)
+            assert testvm._dom._metadata == ""
+
+            testvm.flush_metadata()
+            assert '>2<' in testvm._dom._metadata
+            assert testvm.metadata_sync_info() == {
+                'written': 1,
+                'skipped': 0,
+                'coalesced': 2,
+            }
+
+    def test_flush_metadata_without_timer(self):
+        with self.test_vm() as testvm:
+            testvm._dom = fake.Domain()
+            testvm.sync_metadata()
+            # No timer is pending, as if the timer fired and is writing the
+            # older metadata.
+            with testvm._md_desc.values() as md:
+                md['value'] = 42
+
+            testvm.flush_metadata()
+            assert '>42<' in testvm._dom._metadata
+
+            # Flushing unchanged metadata does not modify the domain.
+            testvm.flush_metadata()
+            assert testvm.metadata_sync_info() == {
+                'written': 2,
+                'skipped': 1,
+                'coalesced': 0,
+            }
+
+    @MonkeyPatch(
+        vm, 'config', make_config([('vars', 'metadata_sync_delay', '0.05')])
+    )
+    def test_sync_metadata_delayed_written(self):
+        with self.test_vm() as testvm:
+            testvm._dom = fake.Domain()
+            testvm.sync_metadata(delay=True)
+            deadline = time.monotonic() + 5
+            while testvm._dom._metadata == "":
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+            assert testvm.metadata_sync_info()['written'] == 1
+
+    @MonkeyPatch(
+        vm, 'config', make_config([('vars', 'metadata_sync_delay', '0')])
+    )
+    def test_sync_metadata_no_delay(self):
+        with self.test_vm() as testvm:
+            testvm._dom = fake.Domain()
+            testvm.sync_metadata(delay=True)
+            assert testvm._dom._metadata != ""
+
+    def test_sync_metadata_skips_unchanged(self):
+        with self.test_vm() as testvm:
+            testvm._dom = fake.Domain()
+            testvm.sync_metadata()
+            testvm.sync_metadata()
+            assert testvm.metadata_sync_info() == {
+                'written': 1,
+                'skipped': 1,
+                'coalesced': 0,
+            }
+
 
 class TestQgaContext(TestCaseBase):
 
@@ -2244,6 +2381,108 @@ class TestQgaContext(TestCaseBase):
                     pass
 
 
+class PrepareClientIF(fake.ClientIF):
+
+    def __init__(self, delay=0.05, fail=()):
+        super().__init__()
+        self.delay = delay
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.prepared = []
+
+    def prepareVolumePath(self, drive, vmId=None, path=None, images=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.delay)
+            if drive['volumeID'] in self.fail:
+                raise ExpectedError(drive['volumeID'])
+            with self.lock:
+                self.prepared.append(drive['volumeID'])
+            return '/run/vdsm/storage/' + drive['volumeID']
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def _vdsm_drive(img_id, vol_id):
+    return {
+        'device': 'disk',
+        'domainID': 'sd-id',
+        'poolID': 'sp-id',
+        'imageID': img_id,
+        'volumeID': vol_id,
+    }
+
+
+class TestPreparePathsForDrives(TestCaseBase):
+
+    def setUp(self):
+        self.cif = PrepareClientIF()
+
+    @MonkeyPatch(vm.hooks, 'after_disk_prepare', lambda drive, custom: {})
+    def test_different_images_concurrently(self):
+        drives = [_vdsm_drive('img-%d' % i, 'vol-%d' % i) for i in range(4)]
+        with fake.VM(cif=self.cif) as testvm:
+            testvm._preparePathsForDrives(drives)
+            assert testvm.volume_monitor.enabled()
+
+        assert self.cif.max_running > 1
+        assert sorted(self.cif.prepared) == ['vol-%d' % i for i in range(4)]
+        for drive in drives:
+            assert drive['path'] == '/run/vdsm/storage/' + drive['volumeID']
+
+    @MonkeyPatch(vm.hooks, 'after_disk_prepare', lambda drive, custom: {})
+    def test_same_image_in_order(self):
+        drives = [_vdsm_drive('img', 'vol-%d' % i) for i in range(3)]
+        with fake.VM(cif=self.cif) as testvm:
+            testvm._preparePathsForDrives(drives)
+
+        assert self.cif.max_running == 1
+        assert self.cif.prepared == ['vol-0', 'vol-1', 'vol-2']
+
+    def test_hooks_in_order(self):
+        drives = [_vdsm_drive('img-%d' % i, 'vol-%d' % i) for i in range(4)]
+        calls = []
+
+        def after_disk_prepare(drive, custom):
+            # Hooks run after all drives were prepared.
+            assert len(self.cif.prepared) == len(drives)
+            calls.append(drive['volumeID'])
+            return {'path': '/local/' + drive['volumeID']}
+
+        with MonkeyPatchScope(
+            [(vm.hooks, 'after_disk_prepare', after_disk_prepare)]
+        ):
+            with fake.VM(cif=self.cif) as testvm:
+                testvm._preparePathsForDrives(drives)
+
+        assert calls == ['vol-%d' % i for i in range(4)]
+        for drive in drives:
+            assert drive['path'] == '/local/' + drive['volumeID']
+
+    @MonkeyPatch(vm.hooks, 'after_disk_prepare', lambda drive, custom: {})
+    def test_failure(self):
+        self.cif.fail = ('vol-1',)
+        drives = [_vdsm_drive('img-%d' % i, 'vol-%d' % i) for i in range(3)]
+        with fake.VM(cif=self.cif) as testvm:
+            with pytest.raises(ExpectedError):
+                testvm._preparePathsForDrives(drives)
+            assert not testvm.volume_monitor.enabled()
+
+    def test_destroy_requested(self):
+        drives = [_vdsm_drive('img-%d' % i, 'vol-%d' % i) for i in range(3)]
+        with fake.VM(cif=self.cif) as testvm:
+            testvm._destroy_requested.set()
+            testvm._preparePathsForDrives(drives)
+            assert not testvm.volume_monitor.enabled()
+
+        assert self.cif.prepared == []
+
+
 class FakeLeaseDomain(object):
 
     def attachDevice(self, device_xml):
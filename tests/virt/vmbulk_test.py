@@ -0,0 +1,329 @@
+# SPDX-FileCopyrightText: oVirt Developers
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import logging
+import threading
+import time
+
+import pytest
+
+from vdsm import executor
+from vdsm.common import concurrent
+from vdsm.common import exception
+from vdsm.common import response
+from vdsm.virt import vmbulk
+from vdsm.virt import vmstatus
+
+log = logging.getLogger("test")
+
+
+class FakeIRS:
+
+    def __init__(self, delay=0.05, fail=0, error=0):
+        self.delay = delay
+        self.fail = fail
+        self.error = error
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def prepareImage(self, sdUUID, spUUID, imgUUID, leafUUID):
+        with self.lock:
+            self.calls.append(imgUUID)
+        time.sleep(self.delay)
+        with self.lock:
+            if self.fail:
+                self.fail -= 1
+                raise RuntimeError("Cannot prepare image")
+            if self.error:
+                self.error -= 1
+                return response.error("imageErr")
+        return response.success(
+            path="/run/vdsm/storage/{}/{}/{}".format(
+                sdUUID, imgUUID, leafUUID
+            ),
+            info={"volumeID": leafUUID},
+            imgVolumesInfo=[{"volumeID": leafUUID}],
+        )
+
+
+class FakeVM:
+
+    def __init__(self, vm_id, start_delay, images):
+        self.id = vm_id
+        self.lastStatus = vmstatus.WAIT_FOR_LAUNCH
+        self.done = threading.Event()
+        self._start_delay = start_delay
+        self._images = images
+
+    def start(self, cif, executor):
+        def run():
+            # Like Vm._startUnderlyingVm, preparing the VM images when an
+            # executor worker is available.
+            try:
+                with cif.lock:
+                    cif.starting += 1
+                    cif.max_starting = max(cif.max_starting, cif.starting)
+                for img_id in self._images:
+                    self._images[img_id].prepareImage(
+                        "sd", "pool", img_id, "vol"
+                    )
+                time.sleep(self._start_delay)
+                with cif.lock:
+                    cif.starting -= 1
+                self.lastStatus = vmstatus.UP
+            finally:
+                self.done.set()
+
+        executor.dispatch(run, discard=False)
+
+
+class FakeClientIF:
+
+    def __init__(self, irs=None, start_delay=0.02, workers=4, max_tasks=100):
+        self.irs = irs or FakeIRS()
+        self.vmContainer = {}
+        self.lock = threading.Lock()
+        self.starting = 0
+        self.max_starting = 0
+        self.start_delay = start_delay
+        self.vm_start_executor = executor.Executor(
+            "test.vm_start", workers, max_tasks, None
+        )
+        self.vm_start_executor.start()
+
+    def create(self, params, images, executor):
+        # Like VM.create, returning once the VM start was queued.
+        vm_id = params["vmId"]
+        if vm_id in self.vmContainer:
+            return response.error("exist")
+        vm = FakeVM(
+            vm_id,
+            self.start_delay,
+            {img_id: images for img_id in params["images"]},
+        )
+        try:
+            vm.start(self, executor)
+        except exception.ResourceExhausted as e:
+            return e.response()
+        self.vmContainer[vm_id] = vm
+        return response.success(
+            vmList={"vmId": vm_id, "status": vm.lastStatus}
+        )
+
+    def wait_for_vms(self, timeout=10):
+        for vm in self.vmContainer.values():
+            assert vm.done.wait(timeout)
+
+    def close(self):
+        self.vm_start_executor.stop()
+
+
+@pytest.fixture
+def cif():
+    cif = FakeClientIF()
+    yield cif
+    cif.close()
+
+
+class TestSharedImages:
+
+    def test_prepare_once(self):
+        irs = FakeIRS()
+        images = vmbulk.SharedImages(irs)
+
+        def prepare(n):
+            return images.prepareImage("sd", "pool", "img", "vol")
+
+        results = list(concurrent.tmap(prepare, range(8), max_workers=8))
+
+        assert irs.calls == ["img"]
+        for res in results:
+            assert res.succeeded
+            assert res.value["path"] == "/run/vdsm/storage/sd/img/vol"
+
+    def test_prepare_different_images(self):
+        irs = FakeIRS(delay=0)
+        images = vmbulk.SharedImages(irs)
+        images.prepareImage("sd", "pool", "img1", "vol")
+        images.prepareImage("sd", "pool", "img2", "vol")
+        images.prepareImage("sd", "pool", "img1", "vol")
+
+        assert irs.calls == ["img1", "img2"]
+
+    def test_result_copied(self):
+        images = vmbulk.SharedImages(FakeIRS(delay=0))
+        res1 = images.prepareImage("sd", "pool", "img", "vol")
+        res1["imgVolumesInfo"].append({"volumeID": "modified"})
+        res2 = images.prepareImage("sd", "pool", "img", "vol")
+
+        assert res2["imgVolumesInfo"] == [{"volumeID": "vol"}]
+
+    def test_failure_not_shared(self):
+        irs = FakeIRS(delay=0, fail=1)
+        images = vmbulk.SharedImages(irs)
+        with pytest.raises(RuntimeError):
+            images.prepareImage("sd", "pool", "img", "vol")
+
+        res = images.prepareImage("sd", "pool", "img", "vol")
+        assert not response.is_error(res)
+        assert irs.calls == ["img", "img"]
+
+    def test_error_not_shared(self):
+        irs = FakeIRS(delay=0, error=1)
+        images = vmbulk.SharedImages(irs)
+        res = images.prepareImage("sd", "pool", "img", "vol")
+        assert response.is_error(res)
+
+        res = images.prepareImage("sd", "pool", "img", "vol")
+        assert not response.is_error(res)
+        assert irs.calls == ["img", "img"]
+
+    def test_waiters_retry_after_failure(self):
+        irs = FakeIRS(fail=1)
+        images = vmbulk.SharedImages(irs)
+
+        def prepare(n):
+            return images.prepareImage("sd", "pool", "img", "vol")
+
+        results = list(concurrent.tmap(prepare, range(4), max_workers=4))
+
+        # One caller failed, one prepared the image again, and the rest
+        # shared the result.
+        assert len([r for r in results if not r.succeeded]) == 1
+        assert irs.calls == ["img", "img"]
+
+
+def test_create_vms(cif):
+    cif.start_delay = 0.05
+    vms = [
+        {"vmId": "vm-{:03}".format(i), "images": ["iso", "disk-{}".format(i)]}
+        for i in range(20)
+    ]
+
+    start = time.monotonic()
+    results = vmbulk.create_vms(cif, vms, cif.create)
+    elapsed = time.monotonic() - start
+
+    # Returns once the VMs were created, before they were started.
+    assert elapsed < 20 * 0.05 / 4
+    assert [r["vmId"] for r in results] == [p["vmId"] for p in vms]
+    for r in results:
+        assert r["code"] == 0
+        assert r["status"] == vmstatus.WAIT_FOR_LAUNCH
+        assert r["timing"]["create"] >= 0
+
+    # The VMs were created one after another.
+    queued = [r["timing"]["queued"] for r in results]
+    assert queued == sorted(queued)
+
+    cif.wait_for_vms()
+
+    for vm in cif.vmContainer.values():
+        assert vm.lastStatus == vmstatus.UP
+
+    # The shared ISO image was prepared once.
+    assert sorted(cif.irs.calls) == sorted(
+        ["iso"] + ["disk-{}".format(i) for i in range(20)]
+    )
+
+    # The VMs were started by the executor workers.
+    assert cif.max_starting == 4
+
+
+def test_create_vms_errors(cif):
+    def create(params, images, executor):
+        if params["vmId"] == "fail":
+            raise RuntimeError("Cannot create VM")
+        return cif.create(params, images, executor)
+
+    vms = [
+        {"vmId": "vm-1", "images": []},
+        {"vmId": "fail", "images": []},
+        {"vmId": "vm-1", "images": []},
+    ]
+    results = vmbulk.create_vms(cif, vms, create)
+
+    assert results[0]["code"] == 0
+    assert results[0]["vmId"] == "vm-1"
+    assert results[0]["status"] == vmstatus.WAIT_FOR_LAUNCH
+
+    assert results[1]["code"] == response.error("unexpected")["status"]["code"]
+    assert "vmId" not in results[1]
+    assert "create" in results[1]["timing"]
+
+    assert results[2]["code"] == response.error("exist")["status"]["code"]
+    assert "status" not in results[2]
+
+    cif.wait_for_vms()
+
+
+def test_create_vms_queue_full():
+    cif = FakeClientIF(workers=1, max_tasks=2)
+    try:
+        # Block the worker, so the VMs wait in the executor queue.
+        running = threading.Event()
+        blocked = threading.Event()
+
+        def block():
+            running.set()
+            blocked.wait()
+
+        cif.vm_start_executor.dispatch(block, discard=False)
+        assert running.wait(2)
+
+        vms = [{"vmId": "vm-{}".format(i), "images": []} for i in range(4)]
+        results = vmbulk.create_vms(cif, vms, cif.create)
+        blocked.set()
+
+        codes = [r["code"] for r in results]
+        assert codes[:2] == [0, 0]
+        assert codes[2:] == [exception.ResourceExhausted.code] * 2
+
+        cif.wait_for_vms()
+        assert cif.max_starting == 1
+    finally:
+        cif.close()
+
+
+@pytest.mark.slow
+def test_create_vms_timing():
+    # Preparing an image takes 50 milliseconds, and starting a VM 20
+    # milliseconds. Compare starting 40 VMs sharing an ISO image one by one
+    # with starting them in bulk.
+    vms = [
+        {"vmId": "vm-{:03}".format(i), "images": ["iso", "disk-{}".format(i)]}
+        for i in range(40)
+    ]
+
+    cif = FakeClientIF(workers=1)
+    try:
+        start = time.monotonic()
+        for params in vms:
+            cif.create(
+                params, vmbulk.SharedImages(cif.irs), cif.vm_start_executor
+            )
+            cif.vmContainer[params["vmId"]].done.wait()
+        serial = time.monotonic() - start
+    finally:
+        cif.close()
+
+    cif = FakeClientIF()
+    try:
+        start = time.monotonic()
+        vmbulk.create_vms(cif, vms, cif.create)
+        created = time.monotonic() - start
+        cif.wait_for_vms()
+        bulk = time.monotonic() - start
+    finally:
+        cif.close()
+
+    log.info(
+        "Started %d VMs one by one in %.3f seconds, in bulk in %.3f "
+        "seconds (created in %.3f seconds)",
+        len(vms),
+        serial,
+        bulk,
+        created,
+    )
+    assert len(cif.irs.calls) == len(vms) + 1
+    assert bulk < serial / 2
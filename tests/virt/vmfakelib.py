@@ -223,7 +223,7 @@ class ClientIF(object):
     def getInstance(self):
         return self
 
-    def prepareVolumePath(self, drive, vmId=None, path=None):
+    def prepareVolumePath(self, drive, vmId=None, path=None, images=None):
         if path is not None:
             return path
         elif isinstance(drive, dict):
@@ -518,7 +518,7 @@ def VM(
             cif = ClientIF() if cif is None else cif
             fake = vm.Vm(cif, params, recover=recover)
             cif.vmContainer[fake.id] = fake
-            fake._update_metadata = lambda: None
+            fake._update_metadata = lambda delay=False: None
             fake.send_status_event = lambda **kwargs: None
             fake.arch = arch
             fake.guestAgent = GuestAgent()
@@ -579,6 +579,10 @@ class SuperVdsm(object):
             )
         )
 
+    def setPortMirroringMany(self, mirrors):
+        for network, nic_name in mirrors:
+            self.setPortMirroring(network, nic_name)
+
     def unsetPortMirroring(self, network, nic_name):
         self.mirrored_networks.remove(
             (
@@ -608,6 +612,15 @@ class CpuCoreSample(object):
 
     def __init__(self, samples):
         self._samples = samples
+        self.ids = sorted(samples)
+        self.user = [samples[key]['user'] for key in self.ids]
+        self.sys = [samples[key]['sys'] for key in self.ids]
+
+    def position(self, key):
+        try:
+            return self.ids.index(key)
+        except ValueError:
+            return None
 
     def getCoreSample(self, key):
         return self._samples.get(key)
@@ -628,10 +641,13 @@ TEARDOWN = "teardown"
 class Device(object):
     log = logging.getLogger('fake.Device')
 
-    def __init__(self, device, fail_setup=None, fail_teardown=None):
+    def __init__(
+        self, device, fail_setup=None, fail_teardown=None, is_hostdevice=False
+    ):
         self.fail_setup = fail_setup
         self.fail_teardown = fail_teardown
         self.device = device
+        self.is_hostdevice = is_hostdevice
         self.state = CREATED
 
     @recorded
@@ -1,6 +1,9 @@
 # SPDX-FileCopyrightText: oVirt Developers
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import threading
+import time
+
 import libvirt
 
 from vdsm.common import libvirtconnection
@@ -104,6 +107,45 @@ class TestAllDomains(TestCaseBase):
         assert self.cif.vmRequests == {}
         assert all(vm.destroyed for vm in self.conn.domains.values())
 
+    def test_list_domains_keeps_order(self):
+        self.conn.domains = _make_domains_collection(
+            [('vm%02d' % i, False) for i in range(20)]
+        )
+        domains = recovery._list_domains()
+        assert [dom_obj.UUIDString() for dom_obj, _, _ in domains] == list(
+            self.conn.domains
+        )
+
+    def test_recover_concurrently(self):
+        self.conn.domains = _make_domains_collection(
+            [('vm%02d' % i, False) for i in range(8)]
+        )
+        lock = threading.Lock()
+        running = [0]
+        max_running = [0]
+
+        def slow_xml(dom):
+            xml = dom.XMLDesc
+
+            def XMLDesc(*args):
+                with lock:
+                    running[0] += 1
+                    max_running[0] = max(max_running[0], running[0])
+                time.sleep(0.05)
+                with lock:
+                    running[0] -= 1
+                return xml(*args)
+
+            return XMLDesc
+
+        for dom in self.conn.domains.values():
+            dom.XMLDesc = slow_xml(dom)
+
+        recovery.all_domains(self.cif)
+
+        assert len(self.cif.vmRequests) == 8
+        assert max_running[0] > 1
+
     def test_domain_error(self):
         """
         We find VMs to recover through libvirt, but we get a failure trying